@@ -0,0 +1,649 @@
+# api.py
+# API JSON in sola lettura per client mobile / PWA, in un processo separato
+# dall'app Streamlit ma con gli stessi core/db.py e core/models.py.
+#
+#   uvicorn api:app --port 8502        # oppure: python api.py
+#
+# Applicazione ASGI "nuda" (nessun framework, basta uvicorn). Le query sono
+# sincrone e girano nel thread pool dell'event loop, una sessione DB per
+# richiesta.
+#
+# Autenticazione: POST /api/login {"club", "email", "password"} restituisce
+# un token di sessione (lo stesso formato dell'app, core/auth.py); le altre
+# chiamate usano "Authorization: Bearer <token>". Per condividere i token con
+# l'app Streamlit impostare lo stesso SESSION_SECRET nei due processi.
+#
+# Endpoint GET (paginati: parametro "cursor", risposta "next_cursor"):
+#   /api/me
+#   /api/events        ?from=YYYY-MM-DD&limit=
+#   /api/attendance    ?event_id=&from=YYYY-MM-DD&limit=
+#   /api/messages      ?limit=
+#
+# Unico endpoint di scrittura, per l'uso offline (core/sync.py):
+#   POST /api/sync     {"cursor", "changes": [{"id", "base_version",
+#                       "client_ts", "status", ...}]}
+#   -> esito di ogni modifica + presenze cambiate dopo il cursore
+#
+# Feed ICS per i calendari (Google, Apple, ...), che non sanno mandare
+# header di autenticazione: il token di feed (core/auth.py) è nell'URL.
+#   GET /api/calendar.ics?token=   (core/calendar_feed.py)
+# Il feed è in cache per utente; ETag e Last-Modified dipendono dall'ultima
+# modifica degli eventi, quindi un calendario che interroga ogni pochi
+# minuti riceve quasi sempre un 304.
+#
+# Ogni risposta porta un ETag debole calcolato dalle versioni delle righe
+# restituite (EventAttendance.version, Event.updated_at, id dei messaggi) e
+# dai nomi presi da altre tabelle (categoria, atleta, mittente). Le liste
+# lo calcolano prima con una query ridotta (solo quelle colonne, stessa
+# pagina): se il client manda lo stesso valore in If-None-Match riceve un
+# 304 senza corpo, senza la query completa né la serializzazione.
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from sqlalchemy import and_, or_, select, true
+from sqlalchemy.orm import Session
+
+from core.access import get_scope
+from core.auth import (
+    SESSION_TTL_SECONDS,
+    Principal,
+    authenticate,
+    get_principal,
+    issue_session_token,
+    verify_feed_token,
+    verify_session_token,
+)
+from core.calendar_feed import get_feed
+from core.db import SessionLocal
+from core.models import Athlete, Category, Event, EventAttendance, Message, User
+from core.sync import SyncError, sync_attendance
+from core.tenancy import get_club, get_club_by_slug, list_clubs, set_tenant
+from seed import init_db_and_seed
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# corpo massimo accettato per le richieste POST
+MAX_BODY_BYTES = 1024 * 1024
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    query: Dict[str, str]
+    headers: Dict[str, str]
+    body: bytes = b""
+
+    def json(self) -> dict:
+        try:
+            data = json.loads(self.body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "JSON non valido")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "Atteso un oggetto JSON")
+        return data
+
+
+@dataclass
+class Response:
+    status: int = 200
+    payload: Optional[dict] = None
+    etag: Optional[str] = None
+    # risposte non JSON (feed ICS): corpo già pronto e data di modifica (UTC)
+    body: Optional[bytes] = None
+    content_type: Optional[bytes] = None
+    last_modified: Optional[datetime] = None
+
+
+# --------- UTILS ----------
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Tipo non serializzabile: {type(value)!r}")
+
+
+def _encode_cursor(values: list) -> str:
+    raw = json.dumps(values, default=_json_default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).rstrip(b"=").decode("ascii")
+
+
+def _decode_cursor(request: Request, *parsers: Callable) -> Optional[list]:
+    """Cursore della pagina precedente, un valore per parser (es. int)."""
+    return _parse_cursor(request.query.get("cursor"), *parsers)
+
+
+def _parse_cursor(token: Optional[str], *parsers: Callable) -> Optional[list]:
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+        if len(values) != len(parsers):
+            raise ValueError(values)
+        return [parse(v) for parse, v in zip(parsers, values)]
+    except (ValueError, TypeError):
+        raise HTTPError(400, "cursor non valido")
+
+
+def _etag(*parts) -> str:
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _validated(request: Request, db: Session, stmt, *parts) -> Tuple[str, bool]:
+    """ETag della pagina dalla query ridotta e se il client ce l'ha già."""
+    etag = _etag(*parts, [tuple(r) for r in db.execute(stmt)])
+    return etag, _not_modified(request, Response(etag=etag))
+
+
+def _limit(request: Request) -> int:
+    try:
+        limit = int(request.query.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise HTTPError(400, "limit non valido")
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _date_param(request: Request, name: str, default: date) -> date:
+    value = request.query.get(name)
+    if not value:
+        return default
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPError(400, f"{name} non valido (YYYY-MM-DD)")
+
+
+def _int_param(request: Request, name: str) -> Optional[int]:
+    value = request.query.get(name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPError(400, f"{name} non valido")
+
+
+def _page(rows: list, limit: int, cursor_of: Callable) -> Tuple[list, Optional[str]]:
+    """Le query leggono limit + 1 righe: se c'è la riga in più, c'è un'altra pagina."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, _encode_cursor(cursor_of(rows[-1]))
+
+
+def _principal(db: Session, request: Request) -> Principal:
+    header = request.headers.get("authorization", "")
+    scheme, _, token = header.partition(" ")
+    if scheme.lower() != "bearer":
+        raise HTTPError(401, "Token mancante")
+
+    user_id = verify_session_token(token.strip())
+    principal = get_principal(db, user_id) if user_id is not None else None
+    if principal is None:
+        raise HTTPError(401, "Token non valido o scaduto")
+
+    set_tenant(db, principal.club_id)
+    return principal
+
+
+# --------- ENDPOINT ----------
+
+
+def login(db: Session, request: Request) -> Response:
+    data = request.json()
+    if not all(isinstance(data.get(k, ""), str) for k in ("club", "email", "password")):
+        raise HTTPError(400, "club, email e password devono essere stringhe")
+
+    slug = data.get("club")
+    if slug:
+        club = get_club_by_slug(db, slug)
+    else:
+        clubs = list_clubs(db)
+        club = clubs[0] if len(clubs) == 1 else None
+    if club is None:
+        raise HTTPError(400, "Club mancante o sconosciuto")
+
+    set_tenant(db, club.id)
+    principal = authenticate(db, data.get("email", ""), data.get("password", ""))
+    if principal is None:
+        raise HTTPError(401, "Email o password non corretti")
+
+    return Response(
+        payload={
+            "token": issue_session_token(principal.id),
+            "expires_in": SESSION_TTL_SECONDS,
+            "user": _user_payload(principal),
+        }
+    )
+
+
+def _user_payload(principal: Principal) -> dict:
+    return {
+        "id": principal.id,
+        "name": principal.name,
+        "email": principal.email,
+        "role": principal.role,
+        "club_id": principal.club_id,
+    }
+
+
+def me(db: Session, principal: Principal, request: Request) -> Response:
+    scope = get_scope(db, principal)
+    payload = {
+        **_user_payload(principal),
+        "athlete_ids": sorted(scope.athlete_ids),
+        "category_ids": sorted(scope.category_ids),
+    }
+    return Response(payload=payload, etag=_etag("me", payload))
+
+
+def list_events(db: Session, principal: Principal, request: Request) -> Response:
+    scope = get_scope(db, principal)
+    start = _date_param(request, "from", date.today())
+    limit = _limit(request)
+    cursor = _decode_cursor(request, date.fromisoformat, int)
+
+    def page(*columns):
+        stmt = (
+            select(*columns)
+            .join(Category, Category.id == Event.category_id)
+            .where(scope.events_filter(), Event.date >= start)
+            .order_by(Event.date, Event.id)
+            .limit(limit + 1)
+        )
+        if cursor:
+            last_date, last_id = cursor
+            stmt = stmt.where(
+                or_(
+                    Event.date > last_date,
+                    and_(Event.date == last_date, Event.id > last_id),
+                )
+            )
+        return stmt
+
+    validator = (Event.id, Event.updated_at, Category.name)
+    etag, cached = _validated(
+        request, db, page(*validator), "events", start, cursor, limit
+    )
+    if cached:
+        return Response(etag=etag)
+
+    rows = db.execute(
+        page(
+            Event.id,
+            Event.type,
+            Event.title,
+            Event.description,
+            Event.location,
+            Event.location_id,
+            Event.date,
+            Event.category_id,
+            Category.name.label("category"),
+            Event.ask_skiroom,
+            Event.ask_carpool,
+            Event.series_id,
+            Event.updated_at,
+        )
+    ).all()
+    # la pagina può essere cambiata dopo la query ridotta
+    etag = _etag(
+        "events", start, cursor, limit, [(r.id, r.updated_at, r.category) for r in rows]
+    )
+    rows, next_cursor = _page(rows, limit, lambda r: [r.date, r.id])
+    return Response(
+        payload={"items": [r._asdict() for r in rows], "next_cursor": next_cursor},
+        etag=etag,
+    )
+
+
+def list_attendance(db: Session, principal: Principal, request: Request) -> Response:
+    scope = get_scope(db, principal)
+    start = _date_param(request, "from", date.today())
+    event_id = _int_param(request, "event_id")
+    limit = _limit(request)
+    cursor = _decode_cursor(request, int)
+
+    def page(*columns):
+        stmt = (
+            select(*columns)
+            .join(Event, Event.id == EventAttendance.event_id)
+            .join(Athlete, Athlete.id == EventAttendance.athlete_id)
+            .where(scope.attendance_filter(), Event.date >= start)
+            .order_by(EventAttendance.id)
+            .limit(limit + 1)
+        )
+        if event_id is not None:
+            stmt = stmt.where(EventAttendance.event_id == event_id)
+        if cursor:
+            stmt = stmt.where(EventAttendance.id > cursor[0])
+        return stmt
+
+    parts = ("attendance", start, event_id, cursor, limit)
+    validator = (EventAttendance.id, EventAttendance.version, Athlete.name)
+    etag, cached = _validated(request, db, page(*validator), *parts)
+    if cached:
+        return Response(etag=etag)
+
+    rows = db.execute(
+        page(
+            EventAttendance.id,
+            EventAttendance.event_id,
+            EventAttendance.athlete_id,
+            Athlete.name.label("athlete"),
+            EventAttendance.status,
+            EventAttendance.skis_in_skiroom,
+            EventAttendance.car_available,
+            EventAttendance.car_seats,
+            EventAttendance.updated_at,
+            EventAttendance.version,
+        )
+    ).all()
+    etag = _etag(*parts, [(r.id, r.version, r.athlete) for r in rows])
+    rows, next_cursor = _page(rows, limit, lambda r: [r.id])
+    return Response(
+        payload={"items": [r._asdict() for r in rows], "next_cursor": next_cursor},
+        etag=etag,
+    )
+
+
+def list_messages(db: Session, principal: Principal, request: Request) -> Response:
+    scope = get_scope(db, principal)
+    limit = _limit(request)
+    cursor = _decode_cursor(request, int)
+
+    if scope.all_access:
+        visible = true()
+    else:
+        # messaggi a tutto il club, alle categorie o agli atleti visibili
+        visible = or_(
+            and_(Message.category_id.is_(None), Message.athlete_id.is_(None)),
+            scope.category_filter(Message.category_id),
+            scope.athlete_filter(Message.athlete_id),
+        )
+
+    def page(*columns):
+        stmt = (
+            select(*columns)
+            .join(User, User.id == Message.sender_id)
+            .where(visible)
+            .order_by(Message.id.desc())
+            .limit(limit + 1)
+        )
+        if cursor:
+            stmt = stmt.where(Message.id < cursor[0])
+        return stmt
+
+    # i messaggi non si modificano: bastano gli id (e il nome del mittente)
+    parts = ("messages", principal.id, cursor, limit)
+    etag, cached = _validated(request, db, page(Message.id, User.name), *parts)
+    if cached:
+        return Response(etag=etag)
+
+    rows = db.execute(
+        page(
+            Message.id,
+            Message.title,
+            Message.content,
+            Message.category_id,
+            Message.athlete_id,
+            Message.created_at,
+            User.name.label("sender"),
+        )
+    ).all()
+    etag = _etag(*parts, [(r.id, r.sender) for r in rows])
+    rows, next_cursor = _page(rows, limit, lambda r: [r.id])
+    return Response(
+        payload={"items": [r._asdict() for r in rows], "next_cursor": next_cursor},
+        etag=etag,
+    )
+
+
+def sync(db: Session, principal: Principal, request: Request) -> Response:
+    data = request.json()
+    changes = data.get("changes") or []
+    if not isinstance(changes, list):
+        raise HTTPError(400, "changes deve essere una lista")
+    cursor = _parse_cursor(data.get("cursor"), int, int)
+
+    try:
+        result = sync_attendance(
+            db,
+            get_scope(db, principal),
+            principal.id,
+            changes,
+            tuple(cursor) if cursor else None,
+        )
+    except SyncError as exc:
+        raise HTTPError(400, str(exc))
+
+    return Response(
+        payload={
+            "applied": result.applied,
+            "conflicts": result.conflicts,
+            "rejected": result.rejected,
+            "changes": result.changes,
+            "cursor": _encode_cursor(list(result.cursor)) if result.cursor else None,
+            "has_more": result.has_more,
+        }
+    )
+
+
+def calendar_feed(db: Session, request: Request) -> Response:
+    user_id = verify_feed_token(db, request.query.get("token"))
+    principal = get_principal(db, user_id) if user_id is not None else None
+    if principal is None:
+        raise HTTPError(401, "Token del calendario non valido")
+
+    set_tenant(db, principal.club_id)
+    feed = get_feed(db, get_scope(db, principal), get_club(db, principal.club_id))
+    return Response(
+        body=feed.body,
+        content_type=b"text/calendar; charset=utf-8",
+        etag=feed.etag,
+        last_modified=feed.last_modified,
+    )
+
+
+# endpoint pubblici (senza token di sessione) e autenticati
+PUBLIC_ROUTES: Dict[Tuple[str, str], Callable] = {
+    ("POST", "/api/login"): login,
+    ("GET", "/api/calendar.ics"): calendar_feed,
+}
+ROUTES: Dict[Tuple[str, str], Callable] = {
+    ("GET", "/api/me"): me,
+    ("GET", "/api/events"): list_events,
+    ("GET", "/api/attendance"): list_attendance,
+    ("GET", "/api/messages"): list_messages,
+    ("POST", "/api/sync"): sync,
+}
+
+
+def handle(request: Request) -> Response:
+    """Gestione sincrona di una richiesta (gira nel thread pool)."""
+    key = (request.method, request.path.rstrip("/") or "/")
+    public = PUBLIC_ROUTES.get(key)
+    handler = ROUTES.get(key)
+    if public is None and handler is None:
+        known = {path for _, path in list(PUBLIC_ROUTES) + list(ROUTES)}
+        if key[1] in known:
+            raise HTTPError(405, "Metodo non consentito")
+        raise HTTPError(404, "Risorsa non trovata")
+
+    db = SessionLocal()
+    try:
+        if public is not None:
+            return public(db, request)
+        principal = _principal(db, request)
+        return handler(db, principal, request)
+    finally:
+        db.close()
+
+
+# --------- ASGI ----------
+
+
+def _not_modified(request: Request, response: Response) -> bool:
+    candidates = request.headers.get("if-none-match")
+    if candidates is not None:
+        # con If-None-Match l'If-Modified-Since si ignora (RFC 9110)
+        if response.etag is None:
+            return False
+        return (
+            response.etag in {c.strip() for c in candidates.split(",")}
+            or candidates.strip() == "*"
+        )
+
+    since = request.headers.get("if-modified-since")
+    if since is None or response.last_modified is None:
+        return False
+    try:
+        since_at = parsedate_to_datetime(since)
+    except (TypeError, ValueError):
+        return False
+    if since_at.tzinfo is None:
+        since_at = since_at.replace(tzinfo=timezone.utc)
+    return response.last_modified.replace(tzinfo=timezone.utc) <= since_at
+
+
+def _http_date(moment: datetime) -> bytes:
+    return format_datetime(moment.replace(tzinfo=timezone.utc), usegmt=True).encode()
+
+
+async def _read_body(receive) -> bytes:
+    chunks: List[bytes] = []
+    size = 0
+    while True:
+        message = await receive()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise HTTPError(413, "Richiesta troppo grande")
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def _send(send, status: int, body: bytes = b"", headers: Optional[list] = None):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-length", str(len(body)).encode()),
+                *(headers or []),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+def _json_body(payload: dict) -> bytes:
+    return json.dumps(
+        payload, default=_json_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+_JSON_HEADERS = [(b"content-type", b"application/json; charset=utf-8")]
+
+
+async def _lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await asyncio.get_running_loop().run_in_executor(None, init_db_and_seed)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    try:
+        request = Request(
+            method=scope["method"],
+            path=scope["path"],
+            query={
+                k: v[-1]
+                for k, v in parse_qs(scope.get("query_string", b"").decode()).items()
+            },
+            headers={
+                k.decode("latin-1").lower(): v.decode("latin-1")
+                for k, v in scope["headers"]
+            },
+        )
+        if request.method in ("POST", "PUT"):
+            request.body = await _read_body(receive)
+
+        response = await asyncio.get_running_loop().run_in_executor(
+            None, handle, request
+        )
+    except HTTPError as exc:
+        await _send(send, exc.status, _json_body({"error": exc.message}), _JSON_HEADERS)
+        return
+    except Exception:
+        logging.exception("Errore nella richiesta API %s", scope.get("path"))
+        await _send(send, 500, _json_body({"error": "Errore interno"}), _JSON_HEADERS)
+        return
+
+    headers = [(b"cache-control", b"private, no-cache")]
+    if response.etag:
+        headers.append((b"etag", response.etag.encode()))
+    if response.last_modified:
+        headers.append((b"last-modified", _http_date(response.last_modified)))
+
+    if _not_modified(request, response):
+        await _send(send, 304, headers=headers)
+        return
+
+    if response.body is not None:
+        await _send(
+            send, response.status, response.body,
+            [(b"content-type", response.content_type)] + headers,
+        )
+        return
+
+    await _send(
+        send, response.status, _json_body(response.payload or {}), _JSON_HEADERS + headers
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="API JSON Sci Club")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    args = parser.parse_args()
+
+    uvicorn.run(app, host=args.host, port=args.port)
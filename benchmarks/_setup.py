@@ -0,0 +1,34 @@
+# benchmarks/_setup.py
+# Ambiente comune dei benchmark: file SQLite in una cartella temporanea,
+# da importare prima di core (le impostazioni si leggono all'import).
+
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+ROOT = Path(__file__).resolve().parent.parent
+WORKDIR = Path(tempfile.mkdtemp(prefix="sciclub-bench-"))
+
+os.environ.setdefault("SCICLUB_DATABASE_URL", f"sqlite:///{WORKDIR / 'sci_club_v2.db'}")
+os.environ.setdefault("SCICLUB_ARCHIVE_PATH", str(WORKDIR / "sci_club_archive.db"))
+os.environ.setdefault("SCICLUB_CACHE_PATH", str(WORKDIR / "sci_club_cache.db"))
+os.environ.setdefault("SCICLUB_BACKUP_DIR", str(WORKDIR / "backups"))
+os.environ.setdefault("SESSION_SECRET", "bench-secret")
+
+sys.path.insert(0, str(ROOT))
+
+
+@contextmanager
+def timed(label: str, count: int = 0, unit: str = "op") -> Iterator[None]:
+    """Stampa il tempo del blocco (e le operazioni al secondo se `count`)."""
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    rate = f"  {count / elapsed:,.0f} {unit}/s" if count else ""
+    print(f"{label:<48} {elapsed * 1000:9.1f} ms{rate}")
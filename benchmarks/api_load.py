@@ -0,0 +1,78 @@
+# benchmarks/api_load.py
+# Richieste al secondo sull'API (api.py servita da uvicorn in locale), con
+# più client in parallelo: risposta completa contro 304 da If-None-Match.
+#
+#   python benchmarks/api_load.py [richieste] [client]
+
+from __future__ import annotations
+
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import _setup  # noqa: F401  (prima di core)
+from _setup import timed
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main() -> None:
+    requests_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    import httpx
+    import uvicorn
+
+    from api import app
+
+    port = _free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(
+            app, host="127.0.0.1", port=port, log_level="warning", access_log=False
+        )
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    base = f"http://127.0.0.1:{port}"
+    token = httpx.post(
+        f"{base}/api/login", json={"email": "luca@club.test", "password": "valdayas"}
+    ).json()["token"]
+    auth = {"Authorization": f"Bearer {token}"}
+
+    local = threading.local()
+
+    def client() -> httpx.Client:
+        if not hasattr(local, "client"):
+            local.client = httpx.Client(base_url=base, headers=auth)
+        return local.client
+
+    def run(path: str, headers: dict, expected: int) -> None:
+        def one(_):
+            status = client().get(path, headers=headers).status_code
+            if status != expected:
+                raise RuntimeError(f"{path}: {status}")
+
+        with ThreadPoolExecutor(clients) as pool:
+            list(pool.map(one, range(requests_count)))
+
+    print(f"{requests_count} richieste, {clients} client in parallelo\n")
+    for path in ("/api/events?limit=200", "/api/attendance?limit=200", "/api/me"):
+        etag = httpx.get(base + path, headers=auth).headers["etag"]
+        with timed(f"{path} 200", requests_count, "req"):
+            run(path, {}, 200)
+        with timed(f"{path} 304", requests_count, "req"):
+            run(path, {"If-None-Match": etag}, 304)
+
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
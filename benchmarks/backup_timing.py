@@ -0,0 +1,126 @@
+# benchmarks/backup_timing.py
+# Backup a caldo (core/backup.py) di un database di qualche centinaio di MB
+# mentre l'app lavora: latenza di letture (pagina Allenatore) e scritture
+# (una presenza salvata) senza backup e durante il backup, più durata e
+# velocità della copia. Con SCICLUB_MULTIPROCESS=1 il database è in WAL.
+#
+#   python benchmarks/backup_timing.py [MB]
+#   SCICLUB_MULTIPROCESS=1 python benchmarks/backup_timing.py [MB]
+
+from __future__ import annotations
+
+import statistics
+import sys
+import threading
+import time
+
+import _setup  # noqa: F401  (prima di core)
+from _setup import WORKDIR
+
+
+def _summary(label: str, latencies) -> None:
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95)]
+    print(f"{label:<32} {len(latencies):6d} {statistics.median(latencies) * 1000:9.2f}"
+          f" {p95 * 1000:9.2f} {latencies[-1] * 1000:9.2f}")
+
+
+def main() -> None:
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+
+    from sqlalchemy import select, text, update
+
+    from core import backup
+    from core.access import get_scope
+    from core.auth import get_principal
+    from core.db import MULTIPROCESS, SessionLocal, engine
+    from core.models import EventAttendance, User
+    from core.read_models import attendance_by_event, future_events
+    from core.tenancy import DEFAULT_CLUB_SLUG, get_club_by_slug, set_tenant
+    from seed import init_db_and_seed
+
+    init_db_and_seed()
+    # zavorra per arrivare alla dimensione voluta (righe da ~4 KiB)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE bench_ballast (id INTEGER PRIMARY KEY, data BLOB)"))
+        conn.execute(
+            text(
+                "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < :rows) "
+                "INSERT INTO bench_ballast (data) SELECT randomblob(4000) FROM n"
+            ),
+            {"rows": size_mb * 256},
+        )
+
+    db = SessionLocal()
+    club_id = get_club_by_slug(db, DEFAULT_CLUB_SLUG).id
+    set_tenant(db, club_id)
+    coach_id = db.execute(select(User.id).where(User.email == "luca@club.test")).scalar_one()
+    row_id = db.execute(select(EventAttendance.id).limit(1)).scalar_one()
+    db.close()
+
+    def read_page() -> None:
+        session = SessionLocal()
+        try:
+            set_tenant(session, club_id)
+            scope = get_scope(session, get_principal(session, coach_id))
+            attendance_by_event(session, [ev.id for ev in future_events(session, scope)])
+        finally:
+            session.close()
+
+    def write_row(i: int) -> None:
+        session = SessionLocal()
+        try:
+            set_tenant(session, club_id)
+            session.execute(
+                update(EventAttendance)
+                .where(EventAttendance.id == row_id)
+                .values(status="present" if i % 2 else "absent")
+            )
+            session.commit()
+        finally:
+            session.close()
+
+    def measure(stop: threading.Event, reads: list, writes: list) -> None:
+        i = 0
+        while not stop.is_set():
+            started = time.perf_counter()
+            read_page()
+            reads.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            write_row(i)
+            writes.append(time.perf_counter() - started)
+            i += 1
+            time.sleep(0.005)
+
+    size = sum(p.stat().st_size for p in backup.database_files().values() if p.exists())
+    print(f"\ndatabase {size / 2**20:.0f} MiB, "
+          f"{'WAL' if MULTIPROCESS else 'journal classico'}\n")
+    print(f"{'':<32} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+
+    stop = threading.Event()
+    reads, writes = [], []
+    worker = threading.Thread(target=measure, args=(stop, reads, writes))
+    worker.start()
+    time.sleep(3)
+    stop.set()
+    worker.join()
+    _summary("lettura, senza backup", reads)
+    _summary("scrittura, senza backup", writes)
+
+    stop = threading.Event()
+    reads, writes = [], []
+    worker = threading.Thread(target=measure, args=(stop, reads, writes))
+    worker.start()
+    result = backup.create_snapshot(str(WORKDIR / "backups"), force=True)
+    stop.set()
+    worker.join()
+    _summary("lettura, durante il backup", reads)
+    _summary("scrittura, durante il backup", writes)
+
+    copied = sum((result.path / name).stat().st_size for name in result.copied)
+    print(f"\nbackup: {result.seconds:.1f} s, {copied / 2**20 / result.seconds:.0f} MiB/s"
+          f" ({', '.join(result.copied)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# benchmarks/export_memory.py
+# Memoria di picco (tracemalloc) di un export di un'intera stagione:
+# write_export in streaming contro le stesse righe caricate tutte in una
+# lista, prima dalle tabelle calde e poi, archiviata la stagione, dall'archivio.
+# I tempi includono il costo di tracemalloc; lo streaming formatta anche le
+# celle (etichette, date), la lista no.
+#
+#   python benchmarks/export_memory.py [atleti] [eventi]
+
+from __future__ import annotations
+
+import csv
+import io
+import sys
+import tracemalloc
+from datetime import date, timedelta
+
+import _setup  # noqa: F401  (prima di core)
+from _setup import timed
+
+
+def _peak_mb(fn) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def main() -> None:
+    athletes = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    events = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+
+    from sqlalchemy import insert, select
+    from sqlalchemy.orm import Session
+
+    from core.archive import archive_season, season_bounds
+    from core.db import engine
+    from core.exports import _base_query, write_export
+    from core.models import Athlete, Category, Club, Event, EventAttendance
+    from core.tenancy import set_tenant
+    from seed import init_db_and_seed
+
+    init_db_and_seed()
+    season = date.today().year - 3
+    start, end = season_bounds(season)
+
+    db = Session(bind=engine)
+    club = Club(slug="bench-export", name="Bench export")
+    db.add(club)
+    db.flush()
+    category = Category(name="Bench", club_id=club.id)
+    db.add(category)
+    db.flush()
+    db.execute(insert(Athlete), [
+        {"name": f"Atleta {i:04d}", "category_id": category.id, "club_id": club.id}
+        for i in range(athletes)
+    ])
+    db.execute(insert(Event), [
+        {"type": "training", "category_id": category.id, "title": f"Allenamento {i}",
+         "date": start + timedelta(days=i % 300), "club_id": club.id}
+        for i in range(events)
+    ])
+    athlete_ids = db.execute(select(Athlete.id).where(Athlete.club_id == club.id)).scalars().all()
+    event_ids = db.execute(select(Event.id).where(Event.club_id == club.id)).scalars().all()
+    db.execute(insert(EventAttendance), [
+        {"event_id": e, "athlete_id": a, "club_id": club.id, "status": "present"}
+        for e in event_ids for a in athlete_ids
+    ])
+    db.commit()
+    set_tenant(db, club.id)
+    rows = athletes * events
+    print(f"stagione {season}: {rows:,} righe di presenza\n")
+
+    def streaming():
+        write_export(db, "attendance", start, end).close()
+
+    def materialised():
+        stmt, _, _ = _base_query(db, start, end, None, archived=False)
+        out = io.StringIO()
+        csv.writer(out, delimiter=";").writerows(db.execute(stmt).all())
+        out.getvalue().encode("utf-8")
+
+    for label, fn in (("lista completa + CSV in memoria", materialised),
+                      ("write_export (streaming)", streaming)):
+        with timed(f"calde, {label}", rows, "righe"):
+            peak = _peak_mb(fn)
+        print(f"{'':<48} picco {peak:9.1f} MB")
+
+    set_tenant(db, None)
+    archive_season(db, season)
+    set_tenant(db, club.id)
+    with timed("archivio, write_export (streaming)", rows, "righe"):
+        peak = _peak_mb(streaming)
+    print(f"{'':<48} picco {peak:9.1f} MB")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# benchmarks/push_throughput.py
+# Invii al secondo verso un server FCM finto in locale (HTTP/1.1 keep-alive):
+# richiesta nuova per ogni invio (com'era prima di core/push_transport.py)
+# contro i trasporti con connessioni persistenti, e il dispatcher completo.
+#
+#   python benchmarks/push_throughput.py [invii]
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import _setup  # noqa: F401  (prima di core)
+from _setup import timed
+
+
+class _MockFCM(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # header e corpo partono in due scritture: senza TCP_NODELAY ogni
+        # risposta su connessione persistente aspetta l'ACK ritardato (40 ms)
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        body = json.dumps({"success": len(payload["registration_ids"]), "failure": 0}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def main() -> None:
+    sends = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _MockFCM)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/fcm/send"
+    os.environ["FCM_API_URL"] = url
+    os.environ["FCM_SERVER_KEY"] = "bench"
+
+    import requests
+
+    from core import dispatch, push_transport
+    from core.dispatch import NotificationDispatcher, TokenBucket
+    from core.notifications import send_push_to_tokens
+
+    headers = {"Authorization": "key=bench", "Content-Type": "application/json"}
+    payloads = [
+        {"registration_ids": [f"tok-{i}"], "notification": {"title": "t", "body": "b"}}
+        for i in range(sends)
+    ]
+
+    with timed("requests.post, connessione nuova", sends, "invii"):
+        for p in payloads:
+            requests.post(url, headers=headers, json=p, timeout=10)
+
+    for transport in (push_transport.SyncPushTransport(),
+                      push_transport.AsyncPushTransport()):
+        name = type(transport).__name__
+        with timed(f"{name}, una chiamata per invio", sends, "invii"):
+            for p in payloads:
+                transport.post_many(url, headers, [p])
+        with timed(f"{name}, post_many da 100", sends, "invii"):
+            for i in range(0, sends, 100):
+                transport.post_many(url, headers, payloads[i:i + 100])
+
+    # dispatcher completo: accorpamento, limiti (quota globale senza tetto
+    # per misurare il solo invio), gruppi multicast da SEND_CHUNK_TOKENS
+    d = NotificationDispatcher(
+        window=0,
+        sender=send_push_to_tokens,
+        token_loader=lambda db, ids: {uid: [f"tok-{uid}-a", f"tok-{uid}-b"] for uid in ids},
+    )
+    d._global_bucket = TokenBucket(float("inf"), 0)
+    users = range(sends)
+    for uid in users:
+        d.submit([uid], f"Messaggio {uid % 50}", "corpo")
+    with timed("dispatcher.flush, 50 testi diversi", sends, "utenti"):
+        result = d.flush(None, force=True)
+    metrics = d.metrics()
+    print(f"  consegnati {len(result.delivered)}, chiamate {metrics['calls']}, "
+          f"dispositivi {metrics['devices']}, gruppo max {dispatch.SEND_CHUNK_TOKENS}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
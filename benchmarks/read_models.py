@@ -0,0 +1,148 @@
+# benchmarks/read_models.py
+# Una pagina Allenatore con la stagione intera: eventi e presenze come
+# entità ORM (con le relazioni, com'era prima di core/read_models.py)
+# contro i read model a colonne. Per ogni pagina: titoli degli expander,
+# conteggi e righe delle tabelle. Tempo medio per pagina e memoria di
+# picco (tracemalloc, misurata a parte).
+#
+#   python benchmarks/read_models.py [atleti] [eventi] [pagine]
+
+from __future__ import annotations
+
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import _setup  # noqa: F401  (prima di core)
+
+
+def _table(ev_title, is_race, rows):
+    """Quello che la pagina costruisce da ogni evento (ui_coach.py)."""
+    present = sum(1 for a in rows if a["status"] == "present")
+    return ev_title, present, [
+        {
+            "Atleta": a["name"],
+            "Stato": a["status"],
+            "Sci in ski-room": "Sì" if a["skis"] else "—",
+            "Auto": "N/A" if not is_race else (a["seats"] if a["car"] else "—"),
+        }
+        for a in rows
+    ]
+
+
+def main() -> None:
+    athletes = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    events = int(sys.argv[2]) if len(sys.argv) > 2 else 150
+    pages = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    from sqlalchemy import insert, select
+    from sqlalchemy.orm import selectinload
+
+    from core.access import AccessScope
+    from core.attendance import populate_for_events
+    from core.db import SessionLocal
+    from core.models import Athlete, Category, Club, Event, EventAttendance
+    from core.read_models import attendance_by_event, future_events
+    from core.tenancy import set_tenant
+    from seed import init_db_and_seed
+
+    init_db_and_seed()
+    db = SessionLocal()
+    club = Club(slug="bench-read-models", name="Bench read model")
+    db.add(club)
+    db.flush()
+    set_tenant(db, club.id)
+    category = Category(name="Bench")
+    db.add(category)
+    db.flush()
+    db.execute(insert(Athlete), [
+        {"name": f"Atleta {i:03d}", "category_id": category.id, "club_id": club.id}
+        for i in range(athletes)
+    ])
+    today = date.today()
+    db.execute(insert(Event), [
+        {"type": "race" if i % 4 == 0 else "training", "category_id": category.id,
+         "title": f"Evento {i}", "date": today + timedelta(days=1 + i),
+         "club_id": club.id}
+        for i in range(events)
+    ])
+    populate_for_events(db, db.execute(select(Event.id)).scalars().all())
+    club_id, category_id = club.id, category.id
+    db.commit()
+    db.close()
+
+    scope = AccessScope(
+        user_id=0, role="coach", athlete_ids=frozenset(),
+        category_ids=frozenset({category_id}), all_access=False, version=(0, 0),
+    )
+
+    def orm_page():
+        session = SessionLocal()
+        set_tenant(session, club_id)
+        try:
+            evs = session.execute(
+                select(Event)
+                .where(Event.category_id.in_(scope.category_ids), Event.date >= today)
+                .order_by(Event.date, Event.id)
+                .options(
+                    selectinload(Event.category),
+                    selectinload(Event.attendances).selectinload(EventAttendance.athlete),
+                )
+            ).scalars().all()
+            return [
+                _table(
+                    f"{ev.date} · {ev.title} ({ev.category.name})",
+                    ev.type == "race",
+                    [
+                        {"name": a.athlete.name, "status": a.status,
+                         "skis": a.skis_in_skiroom, "car": a.car_available,
+                         "seats": a.car_seats}
+                        for a in sorted(ev.attendances, key=lambda a: a.athlete.name)
+                    ],
+                )
+                for ev in evs
+            ]
+        finally:
+            session.close()
+
+    def read_model_page():
+        session = SessionLocal()
+        set_tenant(session, club_id)
+        try:
+            evs = future_events(session, scope, today)
+            grouped = attendance_by_event(session, [ev.id for ev in evs])
+            return [
+                _table(
+                    f"{ev.date} · {ev.title} (Bench)",
+                    ev.is_race,
+                    [
+                        {"name": a.athlete_name, "status": a.status,
+                         "skis": a.skis_in_skiroom, "car": a.car_available,
+                         "seats": a.car_seats}
+                        for a in grouped[ev.id]
+                    ],
+                )
+                for ev in evs
+            ]
+        finally:
+            session.close()
+
+    assert orm_page() == read_model_page()
+    print(f"\n{events} eventi x {athletes} atleti = {events * athletes} presenze, "
+          f"{pages} pagine\n")
+    print(f"{'':<28} {'ms/pagina':>10} {'picco MB':>10}")
+    for label, page in (("entità ORM", orm_page), ("read model", read_model_page)):
+        start = time.perf_counter()
+        for _ in range(pages):
+            page()
+        per_page = (time.perf_counter() - start) / pages * 1000
+        tracemalloc.start()
+        page()
+        peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+        print(f"{label:<28} {per_page:10.1f} {peak:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
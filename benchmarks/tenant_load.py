@@ -0,0 +1,124 @@
+# benchmarks/tenant_load.py
+# Carico con 20 club nello stesso processo e nello stesso database: pagine
+# Allenatore e Genitore (perimetro in cache + read model) da più thread,
+# utenti di club a caso, con un solo club come riferimento. Ogni risposta
+# viene controllata: nessun evento o presenza di un altro club.
+#
+#   python benchmarks/tenant_load.py [pagine] [thread]
+
+from __future__ import annotations
+
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import _setup  # noqa: F401  (prima di core)
+from _setup import timed
+
+CLUBS = 20
+CATEGORIES = 4
+ATHLETES_PER_CATEGORY = 15
+EVENTS_PER_CATEGORY = 40
+
+
+def _create_club(db, index: int):
+    from core.attendance import populate_for_events
+    from core.models import Athlete, Category, CoachCategory, Event, ParentAthlete, User
+    from core.tenancy import create_club, set_tenant
+
+    club = create_club(db, f"club-{index:02d}", f"Club {index:02d}")
+    set_tenant(db, club.id)
+    start = date.today() - timedelta(days=60)
+    users = []
+    for c in range(CATEGORIES):
+        category = Category(name=f"Categoria {c}")
+        coach = User(name=f"Allenatore {c}", email=f"coach{c}@club.test", role="coach")
+        athletes = [
+            Athlete(name=f"Atleta {c}-{a}", category=category)
+            for a in range(ATHLETES_PER_CATEGORY)
+        ]
+        parents = [
+            User(name=f"Genitore {c}-{a}", email=f"parent{c}-{a}@club.test", role="parent")
+            for a in range(ATHLETES_PER_CATEGORY)
+        ]
+        events = [
+            Event(type="race" if e % 5 == 0 else "training", category=category,
+                  title=f"Evento {e}", date=start + timedelta(days=e * 3))
+            for e in range(EVENTS_PER_CATEGORY)
+        ]
+        db.add_all([category, coach, *athletes, *parents, *events])
+        db.flush()
+        db.add(CoachCategory(coach_id=coach.id, category_id=category.id))
+        db.add_all(
+            ParentAthlete(parent_id=p.id, athlete_id=a.id)
+            for p, a in zip(parents, athletes)
+        )
+        populate_for_events(db, [ev.id for ev in events])
+        users += [(club.id, coach.id)] + [(club.id, p.id) for p in parents]
+    db.commit()
+    set_tenant(db, None)
+    return users
+
+
+def main() -> None:
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    from sqlalchemy import select
+
+    from core.access import get_scope
+    from core.auth import get_principal
+    from core.db import SessionLocal
+    from core.models import Event
+    from core.read_models import attendance_by_event, future_events
+    from core.tenancy import set_tenant
+    from seed import init_db_and_seed
+
+    init_db_and_seed()
+    db = SessionLocal()
+    try:
+        with timed(f"creazione di {CLUBS} club"):
+            users = [u for i in range(CLUBS) for u in _create_club(db, i)]
+        club_of_event = dict(db.execute(select(Event.id, Event.club_id)).all())
+    finally:
+        db.close()
+
+    def render(user) -> float:
+        club_id, user_id = user
+        started = time.perf_counter()
+        session = SessionLocal()
+        try:
+            set_tenant(session, club_id)
+            scope = get_scope(session, get_principal(session, user_id))
+            events = future_events(session, scope)
+            rows = attendance_by_event(session, [ev.id for ev in events])
+        finally:
+            session.close()
+        if any(club_of_event[ev.id] != club_id for ev in events) or any(
+            club_of_event[r.event_id] != club_id for group in rows.values() for r in group
+        ):
+            raise RuntimeError(f"dati di un altro club per l'utente {user_id}")
+        return time.perf_counter() - started
+
+    def run(label: str, sample) -> None:
+        with ThreadPoolExecutor(workers) as pool:
+            with timed(label, len(sample), "pagine"):
+                latencies = sorted(pool.map(render, sample))
+        p95 = latencies[int(len(latencies) * 0.95)]
+        print(f"{'':<48} p50 {statistics.median(latencies) * 1000:.1f} ms"
+              f"  p95 {p95 * 1000:.1f} ms")
+
+    rng = random.Random(1)
+    one_club = [u for u in users if u[0] == users[0][0]]
+    print(f"\n{pages} pagine, {workers} thread, {len(users)} utenti\n")
+    run(f"{CLUBS} club, prima visita (cache vuote)", users)
+    run(f"{CLUBS} club, utenti a caso", [rng.choice(users) for _ in range(pages)])
+    run("1 club, utenti a caso", [rng.choice(one_club) for _ in range(pages)])
+    print("\nnessun dato di altri club nelle risposte")
+
+
+if __name__ == "__main__":
+    main()
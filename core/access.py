@@ -0,0 +1,175 @@
+# core/access.py
+# Perimetro di visibilità per ruolo ("access scope").
+#
+# Per ogni utente si calcolano una volta sola gli atleti e le categorie
+# visibili, salvati come frozenset in cache (spazio dei nomi del club, vedi
+# core/tenancy.py). Ogni voce porta la versione del suo club: il commit di
+# una modifica a ParentAthlete, CoachCategory o alla categoria di un atleta
+# incrementa la versione di quel club e le sue voci vecchie vengono
+# ricalcolate alla prima lettura; gli altri club non ne risentono.
+#
+# Versioni e perimetri stanno in core/shared_cache.py: con più processi
+# (SCICLUB_MULTIPROCESS=1) l'incremento arriva a tutti e un perimetro
+# calcolato da un processo serve anche agli altri.
+
+from __future__ import annotations
+
+import itertools
+from dataclasses import dataclass
+from typing import FrozenSet, Optional, Tuple
+
+from sqlalchemy import and_, event, false, inspect, select, true
+from sqlalchemy.orm import Session
+
+from .auth import Principal
+from .models import Athlete, CoachCategory, Event, EventAttendance, ParentAthlete
+from .shared_cache import SharedTTLCache, bump_generation, generation
+from .tenancy import tenant_key
+
+
+SCOPE_CACHE_TTL = 3600
+
+_scope_cache = SharedTTLCache("scope", ttl=SCOPE_CACHE_TTL, max_size=4096)
+# versione comune (invalida tutti i club) + versione per club
+_GLOBAL_VERSION = "scope"
+_PENDING_KEY = "scope_bumps"
+
+
+@dataclass(frozen=True)
+class AccessScope:
+    """Atleti e categorie visibili da un utente, con filtri pronti per le query."""
+
+    user_id: int
+    role: str
+    athlete_ids: FrozenSet[int]
+    category_ids: FrozenSet[int]
+    all_access: bool  # admin: nessun filtro (il club è già filtrato dalla sessione)
+    version: Tuple[int, int]
+
+    def category_filter(self, column):
+        """Criterio su una colonna category_id (es. Event.category_id)."""
+        if self.all_access:
+            return true()
+        if not self.category_ids:
+            return false()
+        return column.in_(self.category_ids)
+
+    def athlete_filter(self, column):
+        """Criterio su una colonna athlete_id (es. EventAttendance.athlete_id)."""
+        if self.all_access:
+            return true()
+        if not self.athlete_ids:
+            return false()
+        return column.in_(self.athlete_ids)
+
+    def events_filter(self):
+        # gli eventi annullati non si vedono da nessuna parte
+        return and_(self.category_filter(Event.category_id), Event.cancelled_at.is_(None))
+
+    def athletes_filter(self):
+        return self.athlete_filter(Athlete.id)
+
+    def attendance_filter(self):
+        return self.athlete_filter(EventAttendance.athlete_id)
+
+
+def _club_version(club_id: Optional[int]) -> str:
+    return f"scope:club:{club_id}"
+
+
+def current_version(club_id: Optional[int]) -> Tuple[int, int]:
+    return generation(_GLOBAL_VERSION), generation(_club_version(club_id))
+
+
+def bump_scope_version(club_id: Optional[int] = None) -> None:
+    """
+    Invalida i perimetri in cache del club (None = tutti i club). Le
+    modifiche ORM sono intercettate automaticamente; va chiamata a mano
+    dopo il commit di INSERT/UPDATE "bulk" (Core).
+    """
+    bump_generation(_GLOBAL_VERSION if club_id is None else _club_version(club_id))
+
+
+def _compute_scope(
+    db: Session, principal: Principal, version: Tuple[int, int]
+) -> AccessScope:
+    athlete_ids: FrozenSet[int] = frozenset()
+    category_ids: FrozenSet[int] = frozenset()
+
+    if principal.role == "coach":
+        category_ids = frozenset(
+            db.execute(
+                select(CoachCategory.category_id).where(
+                    CoachCategory.coach_id == principal.id
+                )
+            ).scalars()
+        )
+        athlete_ids = frozenset(
+            db.execute(
+                select(Athlete.id).where(Athlete.category_id.in_(category_ids))
+            ).scalars()
+        ) if category_ids else frozenset()
+
+    elif principal.role == "parent":
+        # un'unica query: figli collegati + loro categoria
+        rows = db.execute(
+            select(Athlete.id, Athlete.category_id)
+            .join(ParentAthlete, ParentAthlete.athlete_id == Athlete.id)
+            .where(ParentAthlete.parent_id == principal.id)
+        ).all()
+        athlete_ids = frozenset(r.id for r in rows)
+        category_ids = frozenset(r.category_id for r in rows if r.category_id)
+
+    return AccessScope(
+        user_id=principal.id,
+        role=principal.role,
+        athlete_ids=athlete_ids,
+        category_ids=category_ids,
+        all_access=principal.role == "admin",
+        version=version,
+    )
+
+
+def get_scope(db: Session, principal: Principal) -> AccessScope:
+    """Perimetro dell'utente dalla cache, ricalcolato se la versione è cambiata."""
+    version = current_version(principal.club_id)
+    key = tenant_key(principal.club_id, "scope", principal.id)
+    scope = _scope_cache.get(key)
+    if scope is None or scope.version != version or scope.role != principal.role:
+        scope = _compute_scope(db, principal, version)
+        _scope_cache.set(key, scope)
+    return scope
+
+
+def _touches_links(session) -> bool:
+    for obj in itertools.chain(session.new, session.deleted):
+        if isinstance(obj, (ParentAthlete, CoachCategory, Athlete)):
+            return True
+
+    for obj in session.dirty:
+        if isinstance(obj, (ParentAthlete, CoachCategory)):
+            return True
+        if isinstance(obj, Athlete):
+            if inspect(obj).attrs.category_id.history.has_changes():
+                return True
+    return False
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_on_link_changes(session, flush_context):
+    """Segna il club da invalidare se il flush tocca collegamenti o categorie atleti."""
+    if _touches_links(session):
+        session.info.setdefault(_PENDING_KEY, set()).add(session.info.get("club_id"))
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_after_commit(session):
+    # solo a commit avvenuto: un altro processo che ricalcola il perimetro
+    # con la versione nuova legge già i dati nuovi
+    for club_id in session.info.pop(_PENDING_KEY, ()):
+        bump_scope_version(club_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
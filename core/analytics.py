@@ -0,0 +1,261 @@
+# core/analytics.py
+# Statistiche presenze di stagione, calcolate in modo vettoriale.
+#
+# Le presenze di una stagione (tabelle calde + archivio) vengono lette con
+# un'unica query e caricate in un DataFrame a colonne; tutte le statistiche
+# (percentuale per atleta, serie consecutive, giorno della settimana,
+# andamento per categoria) sono operazioni pandas/NumPy, senza cicli riga
+# per riga sull'ORM.
+#
+# I risultati restano in cache finché la "versione" della stagione
+# (numero di presenze, ultimo aggiornamento, archiviazioni) non cambia.
+# Le query sono testuali: il filtro per club è aggiunto con tenant_sql().
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, select, text
+from sqlalchemy.orm import Session
+
+from .archive import ARCHIVE_SCHEMA, season_bounds, season_of
+from .models import Athlete, Category
+from .shared_cache import SharedTTLCache
+from .tenancy import current_club_id, tenant_key, tenant_sql
+
+
+ANALYTICS_CACHE_TTL = 3600
+
+WEEKDAY_LABELS = ["Lun", "Mar", "Mer", "Gio", "Ven", "Sab", "Dom"]
+
+FRAME_COLUMNS = ["event_id", "date", "category_id", "athlete_id", "status"]
+
+# condivisa tra i processi: la chiave contiene già l'impronta dei dati
+_stats_cache = SharedTTLCache("season_stats", ttl=ANALYTICS_CACHE_TTL, max_size=256)
+
+
+@dataclass(frozen=True)
+class SeasonStats:
+    season: int
+    events: int
+    by_athlete: pd.DataFrame  # una riga per atleta
+    by_weekday: pd.DataFrame  # indice: giorno della settimana
+    category_trend: pd.DataFrame  # indice: mese, colonne: categorie
+
+
+def _season_query(schema: str, category_filter: str) -> str:
+    # solo id e valori: i nomi si aggiungono dopo, dalle tabelle piccole
+    return (
+        "SELECT a.event_id, e.date, e.category_id, a.athlete_id, a.status "
+        f"FROM {schema}.event_attendance a "
+        f"JOIN {schema}.events e ON e.id = a.event_id "
+        f"WHERE e.date BETWEEN :start AND :end{category_filter}"
+    )
+
+
+def _filters(
+    db: Session, category_ids: Optional[Iterable[int]]
+) -> Tuple[str, dict]:
+    """
+    Filtro per club (sulle presenze "a": usa l'indice club_id, event_id)
+    e per categorie, se indicate, sugli eventi "e".
+    """
+    sql, params = tenant_sql(db, "a")
+    if category_ids is not None:
+        sql += " AND e.category_id IN :category_ids"
+        params["category_ids"] = sorted(category_ids) or [-1]
+    return sql, params
+
+
+def load_season_frame(
+    db: Session, season: int, category_ids: Optional[Iterable[int]] = None
+) -> pd.DataFrame:
+    """
+    Tutte le presenze della stagione (calde e archiviate) in un DataFrame,
+    con un'unica query (più i nomi di atleti e categorie).
+    category_ids=None: tutte le categorie.
+    """
+    start, end = season_bounds(season)
+    category_filter, params = _filters(db, category_ids)
+
+    stmt = text(
+        _season_query("main", category_filter)
+        + " UNION ALL "
+        + _season_query(ARCHIVE_SCHEMA, category_filter)
+    )
+    if "category_ids" in params:
+        stmt = stmt.bindparams(bindparam("category_ids", expanding=True))
+
+    result = db.execute(stmt, {"start": start, "end": end, **params})
+    frame = pd.DataFrame.from_records(result.fetchall(), columns=FRAME_COLUMNS)
+    frame["date"] = pd.to_datetime(frame["date"], format="ISO8601")
+
+    athletes = dict(db.execute(select(Athlete.id, Athlete.name)).all())
+    categories = dict(db.execute(select(Category.id, Category.name)).all())
+    frame["athlete"] = frame["athlete_id"].map(athletes).fillna("?")
+    frame["category"] = frame["category_id"].map(categories).fillna("Senza categoria")
+    return frame
+
+
+def season_version(
+    db: Session, season: int, category_ids: Optional[Iterable[int]] = None
+) -> tuple:
+    """
+    Impronta economica dei dati di stagione: cambia a ogni nuova presenza,
+    modifica di stato o archiviazione.
+    """
+    start, end = season_bounds(season)
+    category_filter, params = _filters(db, category_ids)
+
+    stmt = text(
+        "SELECT COUNT(*), MAX(a.updated_at) "
+        "FROM main.event_attendance a "
+        "JOIN main.events e ON e.id = a.event_id "
+        f"WHERE e.date BETWEEN :start AND :end{category_filter}"
+    )
+    if "category_ids" in params:
+        stmt = stmt.bindparams(bindparam("category_ids", expanding=True))
+    hot = db.execute(stmt, {"start": start, "end": end, **params}).one()
+
+    archived = db.execute(
+        text(
+            f"SELECT archived_at FROM {ARCHIVE_SCHEMA}.archived_seasons "
+            "WHERE season = :season"
+        ),
+        {"season": season},
+    ).scalar()
+    return (hot[0], str(hot[1]), str(archived))
+
+
+# --------- CALCOLI ----------
+
+
+def _streaks(past: pd.DataFrame) -> pd.DataFrame:
+    """
+    Serie di presenze consecutive per atleta (massima e in corso).
+    Le sequenze vengono numerate con un cumsum sui cambi di valore.
+    """
+    ordered = past.sort_values(["athlete_id", "date", "event_id"])
+    athletes = ordered["athlete_id"].to_numpy()
+    present = ordered["present"].to_numpy()
+
+    changed = np.ones(len(ordered), dtype=bool)
+    changed[1:] = (athletes[1:] != athletes[:-1]) | (present[1:] != present[:-1])
+    runs = pd.DataFrame(
+        {"athlete_id": athletes, "present": present, "run": np.cumsum(changed)}
+    )
+    lengths = runs.groupby("run", sort=False).agg(
+        athlete_id=("athlete_id", "first"),
+        present=("present", "first"),
+        length=("present", "size"),
+    )
+
+    best = lengths[lengths["present"]].groupby("athlete_id")["length"].max()
+    last = lengths.groupby("athlete_id").tail(1).set_index("athlete_id")
+    current = last["length"].where(last["present"], 0)
+
+    out = pd.DataFrame({"best_streak": best, "current_streak": current})
+    return out.fillna(0).astype(int)
+
+
+def compute_season_stats(
+    frame: pd.DataFrame, season: int, today: Optional[date] = None
+) -> SeasonStats:
+    """Statistiche sugli eventi già svolti (data < oggi)."""
+    today = today or date.today()
+    past = frame[frame["date"] < pd.Timestamp(today)].copy()
+    past["present"] = past["status"].to_numpy() == "present"
+    past["answered"] = past["status"].to_numpy() != "undecided"
+
+    by_athlete = past.groupby(
+        ["athlete_id", "athlete", "category"], sort=False
+    ).agg(
+        events=("present", "size"),
+        present=("present", "sum"),
+        answered=("answered", "sum"),
+    )
+    by_athlete = by_athlete.reset_index().set_index("athlete_id")
+    by_athlete["rate"] = by_athlete["present"] / by_athlete["events"]
+    if not past.empty:
+        by_athlete = by_athlete.join(_streaks(past))
+    else:
+        by_athlete["best_streak"] = 0
+        by_athlete["current_streak"] = 0
+    by_athlete = by_athlete.sort_values(["category", "rate"], ascending=[True, False])
+
+    weekday = past["date"].dt.dayofweek
+    by_weekday = (
+        past.groupby(weekday)["present"]
+        .agg(["mean", "size"])
+        .rename(columns={"mean": "rate", "size": "attendances"})
+        .reindex(range(7))
+    )
+    by_weekday.index = pd.Index(WEEKDAY_LABELS, name="weekday")
+
+    month = past["date"].dt.to_period("M").dt.to_timestamp()
+    category_trend = (
+        past.groupby([month, "category"])["present"].mean().unstack("category")
+    )
+    category_trend.index.name = "month"
+
+    return SeasonStats(
+        season=season,
+        events=int(past["event_id"].nunique()),
+        by_athlete=by_athlete,
+        by_weekday=by_weekday,
+        category_trend=category_trend,
+    )
+
+
+def season_stats(
+    db: Session,
+    season: Optional[int] = None,
+    category_ids: Optional[Iterable[int]] = None,
+    today: Optional[date] = None,
+) -> SeasonStats:
+    """Statistiche di stagione dalla cache, ricalcolate se i dati sono cambiati."""
+    today = today or date.today()
+    season = season if season is not None else season_of(today)
+    categories = None if category_ids is None else frozenset(category_ids)
+
+    key = tenant_key(
+        current_club_id(db),
+        "season_stats",
+        season,
+        categories,
+        today,
+        season_version(db, season, categories),
+    )
+    return _stats_cache.get_or_load(
+        key,
+        lambda: compute_season_stats(
+            load_season_frame(db, season, categories), season, today
+        ),
+    )
+
+
+def available_seasons(db: Session, today: Optional[date] = None) -> List[int]:
+    """Stagioni con almeno un evento, in calde o archivio (più recenti prima)."""
+    today = today or date.today()
+    seasons = {season_of(today)}
+    club_filter, params = tenant_sql(db, "e")
+    for schema in ("main", ARCHIVE_SCHEMA):
+        first, last = db.execute(
+            text(
+                f"SELECT MIN(e.date), MAX(e.date) FROM {schema}.events e "
+                f"WHERE 1 = 1{club_filter}"
+            ),
+            params,
+        ).one()
+        if first is not None:
+            seasons.update(
+                range(
+                    season_of(date.fromisoformat(str(first)[:10])),
+                    season_of(date.fromisoformat(str(last)[:10])) + 1,
+                )
+            )
+    return sorted(seasons, reverse=True)
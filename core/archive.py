@@ -0,0 +1,399 @@
+# core/archive.py
+# Archivio delle stagioni concluse (partizionamento "caldo / freddo").
+#
+# Eventi, presenze, messaggi e report delle stagioni terminate vengono
+# spostati nel file SQLite di archivio (agganciato come schema "archive",
+# vedi core/db.py). Le tabelle calde restano piccole; per le statistiche
+# storiche l'archivio espone viste in sola lettura.
+#
+# Con un club nella sessione (pannello Admin) l'archiviazione sposta solo
+# i dati di quel club; senza (riga di comando) quelli di tutti i club. Le
+# letture sono filtrate per il club della sessione (core/tenancy.py).
+#
+# Lo schema d'archivio lo creano le migrazioni (core/migrations.py) e lo
+# riallinea l'archiviazione: le funzioni di lettura non scrivono.
+#
+# Con WAL (SCICLUB_MULTIPROCESS) una transazione su due file agganciati è
+# atomica per singolo file, non nell'insieme: lo spostamento avviene in due
+# transazioni. Prima si copiano le righe nell'archivio (INSERT OR IGNORE,
+# gli id non vengono riusati) e si fa commit; poi si cancellano dalle
+# tabelle calde solo le righe già presenti nell'archivio. Un'interruzione
+# in mezzo lascia al più righe copiate ma non cancellate, che la prossima
+# esecuzione completa senza doppioni.
+#
+# Uso da riga di comando:
+#   python -m core.archive
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Column, MetaData, Table, func, select, text
+from sqlalchemy.orm import Session
+
+from .models import (
+    AthleteReport,
+    AttendanceHistory,
+    Event,
+    EventAttendance,
+    Message,
+    RaceResult,
+    TeamReport,
+)
+from .tenancy import current_club_id
+
+
+ARCHIVE_SCHEMA = "archive"
+
+# la stagione N va dal 1° luglio N al 30 giugno N+1
+SEASON_START_MONTH = 7
+
+# ordine di spostamento: prima le tabelle figlie, per ultimi gli eventi
+_EVENT_CHILD_TABLES = [
+    EventAttendance.__table__,
+    AttendanceHistory.__table__,
+    RaceResult.__table__,
+    TeamReport.__table__,
+    AthleteReport.__table__,
+]
+_ARCHIVED_TABLES = _EVENT_CHILD_TABLES + [Message.__table__, Event.__table__]
+
+# indici minimi per le letture storiche (statistiche, core/analytics.py)
+_ARCHIVE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS archive.ix_archive_events_date "
+    "ON events (date)",
+    "CREATE INDEX IF NOT EXISTS archive.ix_archive_attendance_event "
+    "ON event_attendance (event_id)",
+    "CREATE INDEX IF NOT EXISTS archive.ix_archive_history_event_athlete_time "
+    "ON attendance_history (event_id, athlete_id, changed_at)",
+    "CREATE INDEX IF NOT EXISTS archive.ix_archive_race_results_event_rank "
+    "ON race_results (event_id, rank)",
+]
+
+_ARCHIVE_VIEWS = {
+    "season_attendance_stats": """
+        CREATE VIEW IF NOT EXISTS archive.season_attendance_stats AS
+        SELECT
+            CAST(strftime('%Y', e.date) AS INTEGER)
+                - (CAST(strftime('%m', e.date) AS INTEGER) < 7) AS season,
+            e.category_id AS category_id,
+            a.athlete_id AS athlete_id,
+            COUNT(*) AS events,
+            SUM(a.status = 'present') AS present,
+            SUM(a.status = 'absent') AS absent,
+            SUM(a.status = 'undecided') AS undecided
+        FROM event_attendance a
+        JOIN events e ON e.id = a.event_id
+        GROUP BY season, e.category_id, a.athlete_id
+    """,
+    "season_event_stats": """
+        CREATE VIEW IF NOT EXISTS archive.season_event_stats AS
+        SELECT
+            CAST(strftime('%Y', date) AS INTEGER)
+                - (CAST(strftime('%m', date) AS INTEGER) < 7) AS season,
+            category_id,
+            type,
+            COUNT(*) AS events
+        FROM events
+        WHERE cancelled_at IS NULL
+        GROUP BY season, category_id, type
+    """,
+}
+
+
+# stesse colonne delle tabelle calde, senza vincoli
+_archive_metadata = MetaData(schema=ARCHIVE_SCHEMA)
+_ARCHIVE_TABLES = {
+    table.name: Table(
+        table.name,
+        _archive_metadata,
+        *[Column(col.name, col.type, primary_key=col.primary_key) for col in table.columns],
+    )
+    for table in _ARCHIVED_TABLES
+}
+
+
+@dataclass
+class ArchiveResult:
+    season: int
+    rows: Dict[str, int]
+
+
+def season_of(d: date) -> int:
+    """Anno di inizio della stagione a cui appartiene la data."""
+    return d.year if d.month >= SEASON_START_MONTH else d.year - 1
+
+
+def season_bounds(season: int) -> tuple:
+    """(primo giorno, ultimo giorno) della stagione."""
+    start = date(season, SEASON_START_MONTH, 1)
+    end = date(season + 1, SEASON_START_MONTH, 1) - timedelta(days=1)
+    return start, end
+
+
+def season_label(season: int) -> str:
+    return f"{season}/{str(season + 1)[-2:]}"
+
+
+def archive_table(table: Table) -> Table:
+    """Tabella d'archivio corrispondente a una tabella calda archiviata."""
+    return _ARCHIVE_TABLES[table.name]
+
+
+def ensure_archive_schema(db: Session) -> None:
+    """
+    Crea (o allinea) le tabelle d'archivio: stesse colonne delle tabelle
+    calde, senza vincoli (solo gli indici per le statistiche). Colonne
+    aggiunte in seguito vengono accodate.
+    """
+    _archive_metadata.create_all(db.connection())
+
+    for table in _ARCHIVED_TABLES:
+        existing = {
+            row[1]
+            for row in db.execute(
+                text(f"PRAGMA {ARCHIVE_SCHEMA}.table_info({table.name})")
+            )
+        }
+        for col in table.columns:
+            if col.name not in existing:
+                col_type = col.type.compile(dialect=db.bind.dialect)
+                db.execute(
+                    text(
+                        f"ALTER TABLE {ARCHIVE_SCHEMA}.{table.name} "
+                        f"ADD COLUMN {col.name} {col_type}"
+                    )
+                )
+
+    db.execute(
+        text(
+            f"""
+            CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.archived_seasons (
+                season INTEGER PRIMARY KEY,
+                archived_at DATETIME NOT NULL,
+                events INTEGER NOT NULL,
+                attendances INTEGER NOT NULL
+            )
+            """
+        )
+    )
+    for ddl in _ARCHIVE_INDEXES + list(_ARCHIVE_VIEWS.values()):
+        db.execute(text(ddl))
+
+
+def _copy(db: Session, table: Table, where: str, params: dict) -> None:
+    cols = ", ".join(c.name for c in table.columns)
+    db.execute(
+        text(
+            f"INSERT OR IGNORE INTO {ARCHIVE_SCHEMA}.{table.name} ({cols}) "
+            f"SELECT {cols} FROM main.{table.name} WHERE {where}"
+        ),
+        params,
+    )
+
+
+def _delete_archived(db: Session, table: Table, where: str, params: dict) -> int:
+    """Cancella dalla tabella calda le righe che l'archivio ha già."""
+    result = db.execute(
+        text(
+            f"DELETE FROM main.{table.name} WHERE {where} "
+            f"AND id IN (SELECT id FROM {ARCHIVE_SCHEMA}.{table.name})"
+        ),
+        params,
+    )
+    return result.rowcount or 0
+
+
+def archive_season(db: Session, season: int) -> ArchiveResult:
+    """
+    Sposta nell'archivio i dati della stagione (del club della sessione,
+    se c'è): copia e commit, poi cancellazione dalle tabelle calde (vedi
+    l'intestazione). Si può rieseguire. La stagione deve essere conclusa.
+    """
+    start, end = season_bounds(season)
+    if end >= date.today():
+        raise ValueError(f"La stagione {season_label(season)} non è ancora conclusa.")
+
+    params = {
+        "start": start,
+        "end": end,
+        "start_dt": datetime.combine(start, datetime.min.time()),
+        "end_dt": datetime.combine(end + timedelta(days=1), datetime.min.time()),
+    }
+    # SQL testuale: il filtro del club va scritto (core/tenancy.py)
+    club = ""
+    club_id = current_club_id(db)
+    if club_id is not None:
+        club, params["club_id"] = " AND club_id = :club_id", club_id
+    events = "date BETWEEN :start AND :end" + club
+    # anche per i report, che non hanno club_id
+    season_events = f"event_id IN (SELECT id FROM main.events WHERE {events})"
+    messages = "created_at >= :start_dt AND created_at < :end_dt" + club
+    # un evento resta nelle tabelle calde finché ha righe figlie non
+    # ancora archiviate (aggiunte tra copia e cancellazione)
+    events_without_children = events + "".join(
+        f" AND id NOT IN (SELECT event_id FROM main.{table.name})"
+        for table in _EVENT_CHILD_TABLES
+    )
+
+    try:
+        ensure_archive_schema(db)
+        for table in _EVENT_CHILD_TABLES:
+            _copy(db, table, season_events, params)
+        _copy(db, Message.__table__, messages, params)
+        _copy(db, Event.__table__, events, params)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    rows: Dict[str, int] = {}
+    try:
+        for table in _EVENT_CHILD_TABLES:
+            rows[table.name] = _delete_archived(db, table, season_events, params)
+        rows["messages"] = _delete_archived(db, Message.__table__, messages, params)
+        # i promemoria servono solo finché l'evento è nel futuro
+        db.execute(text(f"DELETE FROM main.reminder_log WHERE {season_events}"), params)
+        rows["events"] = _delete_archived(
+            db, Event.__table__, events_without_children, params
+        )
+
+        # totali contati sull'archivio: una riesecuzione li rimette a posto
+        archived_events = (
+            f"SELECT id FROM {ARCHIVE_SCHEMA}.events "
+            "WHERE date BETWEEN :start AND :end AND cancelled_at IS NULL"
+        )
+        db.execute(
+            text(
+                f"INSERT INTO {ARCHIVE_SCHEMA}.archived_seasons "
+                "(season, archived_at, events, attendances) "
+                f"SELECT :season, :now, "
+                f"(SELECT COUNT(*) FROM ({archived_events})), "
+                f"(SELECT COUNT(*) FROM {ARCHIVE_SCHEMA}.event_attendance "
+                f" WHERE event_id IN ({archived_events})) "
+                "WHERE true "
+                "ON CONFLICT(season) DO UPDATE SET "
+                "archived_at = excluded.archived_at, "
+                "events = excluded.events, "
+                "attendances = excluded.attendances"
+            ),
+            {**params, "season": season, "now": datetime.utcnow()},
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return ArchiveResult(season=season, rows=rows)
+
+
+def archive_completed_seasons(
+    db: Session, today: Optional[date] = None
+) -> List[ArchiveResult]:
+    """
+    Archivia tutte le stagioni concluse ancora presenti nelle tabelle calde
+    (del club della sessione, se c'è).
+    """
+    today = today or date.today()
+    current = season_of(today)
+
+    oldest = db.execute(select(func.min(Event.date))).scalar()
+    if oldest is None:
+        return []
+
+    results = []
+    for season in range(season_of(oldest), current):
+        start, end = season_bounds(season)
+        has_events = db.execute(
+            select(Event.id).where(Event.date.between(start, end)).limit(1)
+        ).first()
+        if has_events:
+            results.append(archive_season(db, season))
+    return results
+
+
+def _club_categories_sql(db: Session, column: str) -> Tuple[str, dict]:
+    """Filtro sulle categorie del club della sessione (vuoto senza club)."""
+    club_id = current_club_id(db)
+    if club_id is None:
+        return "", {}
+    return (
+        f" AND {column} IN (SELECT id FROM main.categories WHERE club_id = :club_id)",
+        {"club_id": club_id},
+    )
+
+
+def hot_seasons(db: Session, today: Optional[date] = None) -> List[int]:
+    """Stagione corrente e stagioni con eventi nelle tabelle calde (più recenti prima)."""
+    seasons = {season_of(today or date.today())}
+    first, last = db.execute(select(func.min(Event.date), func.max(Event.date))).one()
+    if first is not None:
+        seasons.update(range(season_of(first), season_of(last) + 1))
+    return sorted(seasons, reverse=True)
+
+
+def archived_between(db: Session, start: date, end: date) -> bool:
+    """Vero se almeno una stagione dell'intervallo è stata archiviata."""
+    return db.execute(
+        text(
+            f"SELECT 1 FROM {ARCHIVE_SCHEMA}.archived_seasons "
+            "WHERE season BETWEEN :first AND :last LIMIT 1"
+        ),
+        {"first": season_of(start), "last": season_of(end)},
+    ).first() is not None
+
+
+def archived_seasons(db: Session) -> List[dict]:
+    if current_club_id(db) is None:
+        result = db.execute(
+            text(
+                f"SELECT season, archived_at, events, attendances "
+                f"FROM {ARCHIVE_SCHEMA}.archived_seasons ORDER BY season DESC"
+            )
+        )
+        return [dict(r._mapping) for r in result]
+
+    # i totali di archived_seasons sono di tutti i club: si ricalcolano
+    # dalle viste per le sole categorie del club
+    club_filter, params = _club_categories_sql(db, "v.category_id")
+    result = db.execute(
+        text(
+            f"SELECT s.season, s.archived_at, "
+            f"(SELECT COALESCE(SUM(v.events), 0) "
+            f" FROM {ARCHIVE_SCHEMA}.season_event_stats v "
+            f" WHERE v.season = s.season{club_filter}) AS events, "
+            f"(SELECT COALESCE(SUM(v.events), 0) "
+            f" FROM {ARCHIVE_SCHEMA}.season_attendance_stats v "
+            f" WHERE v.season = s.season{club_filter}) AS attendances "
+            f"FROM {ARCHIVE_SCHEMA}.archived_seasons s ORDER BY s.season DESC"
+        ),
+        params,
+    )
+    return [dict(r._mapping) for r in result if r.events]
+
+
+def season_attendance_stats(db: Session, season: int) -> List[dict]:
+    """Statistiche presenze per atleta di una stagione archiviata."""
+    club_filter, params = _club_categories_sql(db, "category_id")
+    result = db.execute(
+        text(
+            f"SELECT category_id, athlete_id, events, present, absent, undecided "
+            f"FROM {ARCHIVE_SCHEMA}.season_attendance_stats "
+            f"WHERE season = :season{club_filter} ORDER BY category_id, athlete_id"
+        ),
+        {"season": season, **params},
+    )
+    return [dict(r._mapping) for r in result]
+
+
+if __name__ == "__main__":
+    from .db import SessionLocal
+
+    session = SessionLocal()
+    try:
+        for res in archive_completed_seasons(session):
+            print(f"Stagione {season_label(res.season)} archiviata: {res.rows}")
+    finally:
+        session.close()
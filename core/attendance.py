@@ -0,0 +1,156 @@
+# core/attendance.py
+# Pre-popolamento delle presenze (EventAttendance) in modo set-based.
+#
+# Ogni cambiamento (nuovo evento, nuovo atleta, cambio categoria) si
+# traduce in un solo INSERT ... SELECT (più un DELETE per il cambio
+# categoria), invece di un oggetto ORM per ogni coppia evento/atleta.
+# Le funzioni non fanno commit: decide il chiamante.
+
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, exists, insert, literal, select
+from sqlalchemy.orm import Session
+
+from .models import Athlete, Event, EventAttendance
+
+
+_INSERT_COLUMNS = [
+    "club_id",
+    "event_id",
+    "athlete_id",
+    "status",
+    "skis_in_skiroom",
+    "car_available",
+    "updated_at",
+    "version",
+]
+
+
+def _populate(db: Session, *criteria) -> int:
+    """
+    Inserisce una riga "undecided" per ogni coppia (evento, atleta della
+    stessa categoria) che soddisfa i criteri e non ha ancora una presenza.
+    """
+    source = (
+        select(
+            Event.club_id,
+            Event.id,
+            Athlete.id,
+            literal("undecided"),
+            literal(False),
+            literal(False),
+            literal(datetime.utcnow()),
+            literal(1),
+        )
+        .join_from(
+            Event,
+            Athlete,
+            # club_id in testa: usa l'indice (club_id, category_id)
+            (Athlete.club_id == Event.club_id)
+            & (Athlete.category_id == Event.category_id),
+        )
+        .where(*criteria, Event.cancelled_at.is_(None))
+        .where(
+            ~exists().where(
+                EventAttendance.event_id == Event.id,
+                EventAttendance.athlete_id == Athlete.id,
+            )
+        )
+    )
+    result = db.execute(
+        insert(EventAttendance).from_select(_INSERT_COLUMNS, source)
+    )
+    return result.rowcount or 0
+
+
+def populate_for_events(db: Session, event_ids: Iterable[int]) -> int:
+    """Presenze iniziali per uno o più eventi appena creati."""
+    ids = list(event_ids)
+    if not ids:
+        return 0
+    return _populate(db, Event.id.in_(ids))
+
+
+def populate_for_event(db: Session, event_id: int) -> int:
+    return populate_for_events(db, [event_id])
+
+
+def populate_for_series(db: Session, series_id: int, start: date, end: date) -> int:
+    """Presenze per le occorrenze di una serie in [start, end]."""
+    return _populate(
+        db,
+        Event.series_id == series_id,
+        Event.series_date >= start,
+        Event.series_date <= end,
+    )
+
+
+def populate_for_athletes(
+    db: Session,
+    athlete_ids: Iterable[int],
+    today: Optional[date] = None,
+) -> int:
+    """Presenze sugli eventi futuri per atleti nuovi (o appena spostati)."""
+    ids = list(athlete_ids)
+    if not ids:
+        return 0
+    today = today or date.today()
+    return _populate(db, Athlete.id.in_(ids), Event.date >= today)
+
+
+def populate_for_athlete(
+    db: Session,
+    athlete_id: int,
+    today: Optional[date] = None,
+) -> int:
+    return populate_for_athletes(db, [athlete_id], today=today)
+
+
+def remove_future_for_category(
+    db: Session,
+    athlete_id: int,
+    category_id: int,
+    today: Optional[date] = None,
+) -> int:
+    """Cancella le presenze future dell'atleta sugli eventi di una categoria."""
+    today = today or date.today()
+    future_events = select(Event.id).where(
+        Event.category_id == category_id,
+        Event.date >= today,
+    )
+    result = db.execute(
+        delete(EventAttendance)
+        .where(
+            EventAttendance.athlete_id == athlete_id,
+            EventAttendance.event_id.in_(future_events),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount or 0
+
+
+def change_athlete_category(
+    db: Session,
+    athlete: Athlete,
+    new_category_id: Optional[int],
+    today: Optional[date] = None,
+) -> None:
+    """
+    Sposta l'atleta di categoria: pulisce le presenze future della vecchia
+    categoria e crea quelle degli eventi futuri della nuova.
+    """
+    old_category_id = athlete.category_id
+    if old_category_id == new_category_id:
+        return
+
+    if old_category_id is not None:
+        remove_future_for_category(db, athlete.id, old_category_id, today=today)
+
+    athlete.category_id = new_category_id
+    db.flush()
+
+    if new_category_id is not None:
+        populate_for_athlete(db, athlete.id, today=today)
@@ -0,0 +1,328 @@
+# core/auth.py
+# Autenticazione: password con hash scrypt, token di sessione firmati
+# (HMAC) e cache di processo dell'utente autenticato ("principal").
+#
+# A ogni rerun basta verificare la firma del token e leggere la cache,
+# senza query per capire chi è l'utente. Cosa può vedere (atleti e
+# categorie) è calcolato e messo in cache da core/access.py.
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import streamlit as st
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .cache import TTLCache
+from .i18n import DEFAULT_LANGUAGE, normalize_language
+from .models import User
+from .shared_cache import bump_generation, generation
+
+
+# Parametri scrypt (regolabili): N = costo CPU/memoria, r = blocco, p = paralleli.
+# Gli hash salvati riportano i propri parametri, quindi si possono alzare
+# senza invalidare le password esistenti (vengono ricalcolate al login).
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_DKLEN = 32
+
+# durata del token di sessione
+SESSION_TTL_SECONDS = 12 * 3600
+
+# durata in cache del principal
+PRINCIPAL_CACHE_TTL = 300
+
+_principal_cache = TTLCache(ttl=PRINCIPAL_CACHE_TTL, max_size=4096)
+_PRINCIPAL_GENERATION = "principal"
+_fallback_secret: Optional[bytes] = None
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Utente autenticato (solo identità, niente oggetti ORM)."""
+
+    id: int
+    name: str
+    email: Optional[str]
+    role: str
+    club_id: int
+    language: str = DEFAULT_LANGUAGE
+
+
+# --------- PASSWORD ----------
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _unb64(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def hash_password(
+    password: str,
+    n: int = SCRYPT_N,
+    r: int = SCRYPT_R,
+    p: int = SCRYPT_P,
+) -> str:
+    """Ritorna "scrypt$n$r$p$salt$hash" (salt e hash in base64)."""
+    salt = secrets.token_bytes(16)
+    digest = hashlib.scrypt(
+        password.encode("utf-8"),
+        salt=salt,
+        n=n,
+        r=r,
+        p=p,
+        dklen=SCRYPT_DKLEN,
+        maxmem=256 * n * r * p,
+    )
+    return f"scrypt${n}${r}${p}${_b64(salt)}${_b64(digest)}"
+
+
+def verify_password(password: str, stored: Optional[str]) -> bool:
+    if not stored:
+        return False
+    try:
+        algo, n, r, p, salt, expected = stored.split("$")
+        if algo != "scrypt":
+            return False
+        n, r, p = int(n), int(r), int(p)
+        digest = hashlib.scrypt(
+            password.encode("utf-8"),
+            salt=_unb64(salt),
+            n=n,
+            r=r,
+            p=p,
+            dklen=len(_unb64(expected)),
+            maxmem=256 * n * r * p,
+        )
+    except (ValueError, TypeError):
+        return False
+    return hmac.compare_digest(digest, _unb64(expected))
+
+
+def needs_rehash(stored: str) -> bool:
+    """True se l'hash è stato calcolato con parametri diversi da quelli attuali."""
+    try:
+        _, n, r, p, _, _ = stored.split("$")
+        return (int(n), int(r), int(p)) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    except ValueError:
+        return True
+
+
+def set_password(db: Session, user: User, password: str) -> None:
+    """Nuova password; invalida anche il link del feed ICS dell'utente."""
+    user.password_hash = hash_password(password)
+    user.feed_version = (user.feed_version or 0) + 1
+    db.commit()
+
+
+# --------- TOKEN DI SESSIONE ----------
+
+
+def _get_secret_key() -> bytes:
+    """
+    Legge la chiave di firma da:
+    - st.secrets["session_secret"]
+    - oppure variabile d'ambiente SESSION_SECRET (fallback)
+    Se manca, usa una chiave casuale valida solo per questo processo.
+    """
+    global _fallback_secret
+
+    key = ""
+    try:
+        key = st.secrets.get("session_secret", "")
+    except Exception:
+        pass
+
+    if not key:
+        key = os.environ.get("SESSION_SECRET", "")
+
+    if key:
+        return key.encode("utf-8")
+
+    if _fallback_secret is None:
+        logging.warning(
+            "session_secret mancante: uso una chiave temporanea, "
+            "le sessioni scadono al riavvio."
+        )
+        _fallback_secret = secrets.token_bytes(32)
+    return _fallback_secret
+
+
+def _sign(payload: str) -> str:
+    mac = hmac.new(_get_secret_key(), payload.encode("ascii"), hashlib.sha256)
+    return _b64(mac.digest())
+
+
+def issue_session_token(user_id: int, ttl: int = SESSION_TTL_SECONDS) -> str:
+    """Token "user_id.scadenza.nonce.firma"."""
+    expires_at = int(time.time()) + ttl
+    payload = f"{user_id}.{expires_at}.{secrets.token_hex(8)}"
+    return f"{payload}.{_sign(payload)}"
+
+
+def verify_session_token(token: Optional[str]) -> Optional[int]:
+    """Ritorna l'id utente se il token è integro e non scaduto."""
+    # i token emessi sono ASCII: gli altri (es. da un header manomesso)
+    # farebbero fallire encode/compare_digest
+    if not token or not token.isascii():
+        return None
+    try:
+        user_id, expires_at, nonce, signature = token.split(".")
+    except ValueError:
+        return None
+
+    payload = f"{user_id}.{expires_at}.{nonce}"
+    if not hmac.compare_digest(signature, _sign(payload)):
+        return None
+    if int(expires_at) < time.time():
+        return None
+    return int(user_id)
+
+
+def _feed_payload(user_id: int, version: int) -> str:
+    # versione 0: stesso formato dei link emessi prima della versione
+    return f"feed.{user_id}" if not version else f"feed.{user_id}.{version}"
+
+
+def issue_feed_token(user_id: int, version: int = 0) -> str:
+    """
+    Token "user_id[.versione].firma" per il feed ICS (core/calendar_feed.py):
+    i calendari lo tengono nell'URL e non sanno rinnovarlo, quindi non ha
+    scadenza; lo invalida il cambio di User.feed_version (nuova password o
+    rotate_feed_token). Firma separata da quella delle sessioni: i due token
+    non si scambiano.
+    """
+    prefix = f"{user_id}.{version}" if version else f"{user_id}"
+    return f"{prefix}.{_sign(_feed_payload(user_id, version))}"
+
+
+def verify_feed_token(db: Session, token: Optional[str]) -> Optional[int]:
+    """
+    Ritorna l'id utente se il token è integro, della versione attuale e
+    l'utente esiste ancora con l'accesso abilitato.
+    """
+    if not token or not token.isascii():
+        return None
+    parts = token.split(".")
+    if len(parts) == 2:
+        (user_id, signature), version = parts, "0"
+    elif len(parts) == 3:
+        user_id, version, signature = parts
+    else:
+        return None
+    if not (user_id.isdigit() and version.isdigit()) or not hmac.compare_digest(
+        signature, _sign(_feed_payload(int(user_id), int(version)))
+    ):
+        return None
+
+    row = db.execute(
+        select(User.feed_version, User.password_hash).where(User.id == int(user_id))
+    ).first()
+    if row is None or row.password_hash is None or row.feed_version != int(version):
+        return None
+    return int(user_id)
+
+
+def rotate_feed_token(db: Session, user_id: int) -> None:
+    """Nuovo link del feed ICS: quello vecchio smette di funzionare."""
+    user = db.get(User, user_id)
+    if user is None:
+        return
+    user.feed_version = (user.feed_version or 0) + 1
+    db.commit()
+
+
+# --------- PRINCIPAL ----------
+
+
+def _load_principal(db: Session, user_id: int) -> Optional[Principal]:
+    row = db.execute(
+        select(
+            User.id, User.name, User.email, User.role, User.club_id, User.language
+        ).where(User.id == user_id)
+    ).first()
+    if row is None:
+        return None
+
+    return Principal(
+        id=row.id,
+        name=row.name,
+        email=row.email,
+        role=row.role,
+        club_id=row.club_id,
+        language=normalize_language(row.language),
+    )
+
+
+def _user_generation(user_id: int) -> str:
+    return f"{_PRINCIPAL_GENERATION}:{user_id}"
+
+
+def get_principal(db: Session, user_id: int) -> Optional[Principal]:
+    """Principal dalla cache di processo; va sul DB solo se manca o è scaduto."""
+    # la generazione nella chiave rende valide le invalidazioni degli altri
+    # processi (core/shared_cache.py)
+    key = (
+        generation(_PRINCIPAL_GENERATION),
+        generation(_user_generation(user_id)),
+        user_id,
+    )
+    return _principal_cache.get_or_load(key, lambda: _load_principal(db, user_id))
+
+
+def set_language(db: Session, user_id: int, language: str) -> None:
+    """Salva la lingua dell'interfaccia dell'utente e aggiorna il principal."""
+    user = db.get(User, user_id)
+    if user is None:
+        return
+    user.language = normalize_language(language)
+    db.commit()
+    invalidate_principal(user_id)
+
+
+def invalidate_principal(user_id: Optional[int] = None) -> None:
+    """
+    Da chiamare dopo il commit di modifiche ai dati dell'utente (None =
+    tutti). Fa ricaricare i principal in tutti i processi.
+    """
+    if user_id is None:
+        _principal_cache.clear()
+        bump_generation(_PRINCIPAL_GENERATION)
+    else:
+        bump_generation(_user_generation(user_id))
+
+
+def authenticate(db: Session, email: str, password: str) -> Optional[Principal]:
+    """
+    Verifica email e password; ritorna il principal o None.
+    La sessione va prima legata al club scelto (core/tenancy.set_tenant):
+    la stessa email può esistere in più club.
+    """
+    email = (email or "").strip().lower()
+    if not email or not password:
+        return None
+
+    # le email sono salvate in minuscolo: così si usa l'indice (club, email)
+    user = db.query(User).filter(User.email == email).first()
+    if user is None or not verify_password(password, user.password_hash):
+        return None
+
+    if needs_rehash(user.password_hash):
+        # stessa password con parametri nuovi: il link del feed resta valido
+        user.password_hash = hash_password(password)
+        db.commit()
+
+    return get_principal(db, user.id)
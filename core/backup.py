@@ -0,0 +1,297 @@
+# core/backup.py
+# Backup dei file SQLite (database principale e archivio) a caldo.
+#
+# - La copia usa l'API di backup di SQLite (sqlite3.Connection.backup) a
+#   blocchi di pagine, con una pausa tra un blocco e l'altro: chi scrive
+#   resta bloccato al massimo per un blocco, non per tutto il file. In
+#   modalità WAL la copia legge uno snapshot fisso (pagine del -wal
+#   comprese) e chi scrive non viene mai bloccato.
+# - Ogni backup è una cartella (snapshot) con un file per database e un
+#   manifest. Un database che non è cambiato dall'ultimo snapshot (stessa
+#   dimensione e data di modifica di file e -wal) non viene ricopiato: si
+#   collega con un hard link al file dello snapshot precedente.
+# - Si tengono gli ultimi BACKUP_KEEP snapshot.
+# - Il ripristino riscrive i database con la stessa API; va fatto ad app
+#   e worker fermi. Prima del ripristino si salva lo stato attuale.
+#
+# Principale e archivio sono copiati uno dopo l'altro: un'archiviazione
+# di stagione in corso durante il backup può finire in uno solo dei due.
+#
+# Uso da riga di comando:
+#   python -m core.backup             # nuovo snapshot (salta i file invariati)
+#   python -m core.backup list
+#   python -m core.backup restore <cartella snapshot>
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .db import ARCHIVE_DATABASE_PATH, engine
+
+
+BACKUP_DIR = os.environ.get("SCICLUB_BACKUP_DIR", "./backups")
+BACKUP_KEEP = 14
+
+# pagine copiate per blocco (4 MiB con pagine da 4 KiB) e pausa tra i blocchi
+PAGES_PER_STEP = 1024
+STEP_PAUSE_SECONDS = 0.005
+# ripartenze tollerate (journal classico) prima di copiare sotto lock
+MAX_RESTARTS = 50
+
+MANIFEST_NAME = "manifest.json"
+SNAPSHOT_FORMAT = "%Y%m%d-%H%M%S"
+
+
+@dataclass
+class SnapshotResult:
+    path: Path
+    copied: List[str] = field(default_factory=list)  # file copiati
+    linked: List[str] = field(default_factory=list)  # invariati (hard link)
+    seconds: float = 0.0
+
+
+def database_files() -> Dict[str, Path]:
+    """File da salvare, per nome del file nello snapshot."""
+    files = {}
+    for path in (engine.url.database, ARCHIVE_DATABASE_PATH):
+        if path and path != ":memory:":
+            files[Path(path).name] = Path(path)
+    return files
+
+
+def _fingerprint(path: Path) -> List[int]:
+    """Dimensione e data di modifica del file e del suo -wal."""
+    values = []
+    for candidate in (path, path.with_name(path.name + "-wal")):
+        try:
+            stat = candidate.stat()
+            values += [stat.st_size, stat.st_mtime_ns]
+        except FileNotFoundError:
+            values += [0, 0]
+    return values
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def _pause(status, remaining, total):
+    time.sleep(STEP_PAUSE_SECONDS)
+
+
+def _restart_guard():
+    """
+    Callback di avanzamento che interrompe la copia se continua a
+    ripartire (le pagine rimanenti non calano) per le scritture altrui.
+    """
+    state = {"last": None, "restarts": 0}
+
+    def progress(status, remaining, total):
+        if state["last"] is not None and remaining >= state["last"]:
+            state["restarts"] += 1
+            if state["restarts"] > MAX_RESTARTS:
+                raise _TooManyRestarts()
+        state["last"] = remaining
+        time.sleep(STEP_PAUSE_SECONDS)
+
+    return progress
+
+
+def _begin_read(conn: sqlite3.Connection) -> None:
+    conn.execute("BEGIN")
+    conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+
+
+def _copy_database(source: Path, target: Path) -> None:
+    """Copia coerente a blocchi di pagine, scritta prima in un file .part."""
+    partial = target.with_name(target.name + ".part")
+    partial.unlink(missing_ok=True)
+
+    src = sqlite3.connect(f"file:{source}?mode=ro", uri=True, isolation_level=None)
+    dst = sqlite3.connect(partial)
+    try:
+        if src.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+            # WAL: una transazione di lettura aperta per tutta la copia fissa
+            # lo snapshot; chi scrive continua sul -wal e la copia non riparte
+            _begin_read(src)
+            src.backup(dst, pages=PAGES_PER_STEP, progress=_pause)
+        else:
+            # journal classico: ogni scrittura altrui fa ripartire la copia.
+            # Con scritture continue si finisce tenendo il lock di lettura
+            # (chi scrive aspetta al massimo la durata della copia)
+            try:
+                src.backup(dst, pages=PAGES_PER_STEP, progress=_restart_guard())
+            except _TooManyRestarts:
+                _begin_read(src)
+                src.backup(dst)
+        # la copia è un file autonomo, senza -wal
+        dst.execute("PRAGMA journal_mode=DELETE")
+        check = dst.execute("PRAGMA quick_check").fetchone()[0]
+        if check != "ok":
+            raise RuntimeError(f"Backup di {source.name} non valido: {check}")
+    finally:
+        dst.close()
+        src.close()
+    os.replace(partial, target)
+
+
+def _link_or_copy(previous: Path, target: Path) -> None:
+    try:
+        os.link(previous, target)
+    except OSError:
+        shutil.copy2(previous, target)
+
+
+def list_snapshots(backup_dir: str = BACKUP_DIR) -> List[Path]:
+    """Snapshot completi (con manifest), dal più vecchio al più recente."""
+    root = Path(backup_dir)
+    if not root.is_dir():
+        return []
+    return sorted(p for p in root.iterdir() if (p / MANIFEST_NAME).is_file())
+
+
+def _read_manifest(snapshot: Path) -> dict:
+    return json.loads((snapshot / MANIFEST_NAME).read_text())
+
+
+def create_snapshot(
+    backup_dir: str = BACKUP_DIR,
+    keep: int = BACKUP_KEEP,
+    force: bool = False,
+) -> Optional[SnapshotResult]:
+    """
+    Nuovo snapshot di tutti i database. Restituisce None se nessun file è
+    cambiato dall'ultimo snapshot (a meno di force=True).
+    """
+    started = time.monotonic()
+    snapshots = list_snapshots(backup_dir)
+    previous = snapshots[-1] if snapshots else None
+    previous_files = _read_manifest(previous)["files"] if previous else {}
+
+    files = {
+        name: path for name, path in database_files().items() if path.exists()
+    }
+    fingerprints = {name: _fingerprint(path) for name, path in files.items()}
+    unchanged = {
+        name
+        for name in files
+        if name in previous_files
+        and previous_files[name]["fingerprint"] == fingerprints[name]
+    }
+    if not force and previous is not None and unchanged == set(files):
+        return None
+
+    name = datetime.now().strftime(SNAPSHOT_FORMAT)
+    target_dir = Path(backup_dir) / name
+    suffix = 1
+    while target_dir.exists():
+        target_dir = Path(backup_dir) / f"{name}-{suffix}"
+        suffix += 1
+    target_dir.mkdir(parents=True)
+
+    result = SnapshotResult(path=target_dir)
+    manifest_files = {}
+    for file_name, path in files.items():
+        target = target_dir / file_name
+        if file_name in unchanged and not force:
+            _link_or_copy(previous / file_name, target)
+            result.linked.append(file_name)
+        else:
+            _copy_database(path, target)
+            result.copied.append(file_name)
+        manifest_files[file_name] = {
+            "fingerprint": fingerprints[file_name],
+            "bytes": target.stat().st_size,
+        }
+
+    # il manifest per ultimo: senza manifest lo snapshot non è completo
+    (target_dir / MANIFEST_NAME).write_text(
+        json.dumps(
+            {"created_at": datetime.now().isoformat(timespec="seconds"),
+             "files": manifest_files},
+            indent=2,
+        )
+    )
+    prune_snapshots(backup_dir, keep)
+    result.seconds = time.monotonic() - started
+    return result
+
+
+def prune_snapshots(backup_dir: str = BACKUP_DIR, keep: int = BACKUP_KEEP) -> List[Path]:
+    """Elimina gli snapshot più vecchi oltre gli ultimi `keep`."""
+    snapshots = list_snapshots(backup_dir)
+    removed = snapshots[:-keep] if keep > 0 else []
+    for snapshot in removed:
+        shutil.rmtree(snapshot)
+    return removed
+
+
+def restore_snapshot(snapshot: Path, backup_dir: str = BACKUP_DIR) -> List[str]:
+    """
+    Riscrive i database con il contenuto dello snapshot (app e worker
+    fermi). Lo stato attuale viene prima salvato in un nuovo snapshot.
+    """
+    snapshot = Path(snapshot)
+    manifest = _read_manifest(snapshot)
+    targets = database_files()
+    unknown = set(manifest["files"]) - set(targets)
+    if unknown:
+        raise ValueError(f"File non riconosciuti nello snapshot: {sorted(unknown)}")
+
+    # keep=0: niente rotazione, lo snapshot da ripristinare non si tocca
+    create_snapshot(backup_dir, keep=0, force=True)
+
+    restored = []
+    for file_name in manifest["files"]:
+        src = sqlite3.connect(f"file:{snapshot / file_name}?mode=ro", uri=True)
+        dst = sqlite3.connect(targets[file_name])
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
+        restored.append(file_name)
+    return restored
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Backup dei database SQLite")
+    parser.add_argument("command", nargs="?", default="create",
+                        choices=["create", "list", "restore"])
+    parser.add_argument("snapshot", nargs="?", help="cartella da ripristinare")
+    parser.add_argument("--dir", default=BACKUP_DIR)
+    parser.add_argument("--keep", type=int, default=BACKUP_KEEP)
+    parser.add_argument("--force", action="store_true",
+                        help="copia anche se nulla è cambiato")
+    args = parser.parse_args()
+
+    if args.command == "create":
+        res = create_snapshot(args.dir, keep=args.keep, force=args.force)
+        if res is None:
+            print("Nessuna modifica dall'ultimo snapshot.")
+        else:
+            print(
+                f"Snapshot {res.path} in {res.seconds:.1f}s "
+                f"(copiati: {', '.join(res.copied) or '-'}; "
+                f"invariati: {', '.join(res.linked) or '-'})"
+            )
+    elif args.command == "list":
+        for snap in list_snapshots(args.dir):
+            info = _read_manifest(snap)
+            size = sum(f["bytes"] for f in info["files"].values())
+            print(f"{snap.name}  {info['created_at']}  {size / 2**20:.1f} MiB")
+    else:
+        if not args.snapshot:
+            parser.error("indicare la cartella dello snapshot da ripristinare")
+        for file_name in restore_snapshot(Path(args.snapshot), args.dir):
+            print(f"Ripristinato {file_name}")
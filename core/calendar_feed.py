@@ -0,0 +1,279 @@
+# core/calendar_feed.py
+# Calendario degli eventi: griglie mensili per le pagine Streamlit e feed
+# ICS per utente (abbonamento da Google Calendar, Apple Calendar, ...).
+#
+# - La forma di un mese (settimane da lunedì, giorni fuori mese vuoti) non
+#   dipende dai dati: si calcola una volta per (anno, mese) e resta in
+#   cache. Le pagine la riempiono con gli eventi del mese, letti con una
+#   query sola (core/read_models.py).
+# - Il feed si scrive riga per riga mentre si leggono gli eventi (a
+#   blocchi, yield_per), senza costruire la lista degli eventi.
+# - Il feed generato resta in cache per utente insieme al suo "stato":
+#   ultima modifica (MAX(Event.updated_at)) e numero di eventi del
+#   perimetro. I calendari interrogano l'URL ogni pochi minuti: a ogni
+#   richiesta si legge solo lo stato (una query aggregata sull'indice
+#   club/data); se non è cambiato si risponde dalla cache o con un 304
+#   (ETag / Last-Modified) senza rileggere gli eventi.
+#
+# Il conteggio serve per gli eventi cancellati, che non cambiano
+# MAX(updated_at). Un cambio di nome di una categoria arriva nel feed alla
+# scadenza della cache (FEED_CACHE_TTL).
+
+from __future__ import annotations
+
+import calendar
+import hashlib
+import io
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from .access import AccessScope
+from .auth import issue_feed_token
+from .models import Category, Event, User
+from .read_models import EventRow, events_between
+from .shared_cache import SharedTTLCache
+from .tenancy import tenant_key
+
+
+# eventi passati ancora nel feed (i calendari li tengono già)
+FEED_PAST_DAYS = 30
+FEED_CACHE_TTL = 3600
+# righe lette per blocco durante la scrittura del feed
+FEED_BATCH_SIZE = 500
+
+# indirizzo pubblico dell'API (api.py) per i link di abbonamento
+FEED_BASE_URL = os.environ.get("SCICLUB_API_URL", "http://localhost:8502")
+FEED_PATH = "/api/calendar.ics"
+
+# RFC 5545: righe di al massimo 75 ottetti, le successive iniziano con uno spazio
+_FOLD_OCTETS = 75
+_EPOCH = datetime(1970, 1, 1)
+
+# condivisa tra i processi: ogni voce si confronta con lo stato del feed
+_feed_cache = SharedTTLCache("ics_feed", ttl=FEED_CACHE_TTL, max_size=1024)
+
+
+# --------- GRIGLIE MENSILI ----------
+
+
+Week = Tuple[Optional[date], ...]
+
+
+@lru_cache(maxsize=256)
+def month_grid(year: int, month: int) -> Tuple[Week, ...]:
+    """Settimane del mese (lunedì-domenica); None per i giorni fuori mese."""
+    return tuple(
+        tuple(date(year, month, day) if day else None for day in week)
+        for week in calendar.Calendar(firstweekday=0).monthdayscalendar(year, month)
+    )
+
+
+def month_bounds(year: int, month: int) -> Tuple[date, date]:
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def shift_month(year: int, month: int, delta: int) -> Tuple[int, int]:
+    index = year * 12 + (month - 1) + delta
+    return index // 12, index % 12 + 1
+
+
+def month_events(
+    db: Session, scope: AccessScope, year: int, month: int
+) -> Dict[date, List[EventRow]]:
+    """Eventi del mese raggruppati per giorno, in una query."""
+    by_day: Dict[date, List[EventRow]] = {}
+    for ev in events_between(db, scope, *month_bounds(year, month)):
+        by_day.setdefault(ev.date, []).append(ev)
+    return by_day
+
+
+# --------- FEED ICS ----------
+
+
+@dataclass(frozen=True, slots=True)
+class FeedState:
+    start: date
+    category_ids: Optional[Tuple[int, ...]]  # None = tutte (admin)
+    last_modified: Optional[datetime]
+    count: int
+
+
+@dataclass(frozen=True, slots=True)
+class Feed:
+    state: FeedState
+    body: bytes
+    etag: str
+    last_modified: datetime  # UTC, senza tzinfo
+
+
+def feed_url(db: Session, user_id: int) -> str:
+    """URL di abbonamento dell'utente (il token è nell'URL)."""
+    version = db.execute(select(User.feed_version).where(User.id == user_id)).scalar()
+    return f"{FEED_BASE_URL}{FEED_PATH}?token={issue_feed_token(user_id, version or 0)}"
+
+
+def _escape(text: str) -> str:
+    return (
+        text.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line: str) -> bytes:
+    """Riga ICS con CRLF, spezzata a 75 ottetti senza tagliare i caratteri UTF-8."""
+    raw = line.encode("utf-8")
+    if len(raw) <= _FOLD_OCTETS:
+        return raw + b"\r\n"
+
+    parts: List[bytes] = []
+    current = bytearray()
+    for char in line:
+        encoded = char.encode("utf-8")
+        if len(current) + len(encoded) > _FOLD_OCTETS:
+            parts.append(bytes(current))
+            current = bytearray(b" ")
+        current += encoded
+    parts.append(bytes(current))
+    return b"\r\n".join(parts) + b"\r\n"
+
+
+def _utc_stamp(moment: datetime) -> str:
+    return moment.strftime("%Y%m%dT%H%M%SZ")
+
+
+def write_feed(
+    out: BinaryIO,
+    rows: Iterable[tuple],
+    calendar_name: str,
+    uid_domain: str,
+) -> int:
+    """
+    Scrive il calendario su `out` man mano che arrivano le righe
+    (id, data, titolo, tipo, descrizione, località, categoria, updated_at).
+    Restituisce il numero di eventi scritti.
+    """
+    write = out.write
+    for line in (
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Sci Club Val d'Ayas//Calendario eventi//IT",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape(calendar_name)}",
+        "X-WR-TIMEZONE:Europe/Rome",
+    ):
+        write(_fold(line))
+
+    count = 0
+    for ev_id, ev_date, title, ev_type, description, location, category, updated_at in rows:
+        kind = "Gara" if ev_type == "race" else "Allenamento"
+        summary = f"{title} ({category or '-'}) - {kind}"
+        stamp = _utc_stamp(updated_at or _EPOCH)
+        write(b"BEGIN:VEVENT\r\n")
+        write(_fold(f"UID:event-{ev_id}@{uid_domain}"))
+        write(_fold(f"DTSTAMP:{stamp}"))
+        write(_fold(f"LAST-MODIFIED:{stamp}"))
+        # eventi di una giornata intera: DTEND è il giorno dopo (escluso)
+        write(_fold(f"DTSTART;VALUE=DATE:{ev_date:%Y%m%d}"))
+        write(_fold(f"DTEND;VALUE=DATE:{ev_date + timedelta(days=1):%Y%m%d}"))
+        write(_fold(f"SUMMARY:{_escape(summary)}"))
+        if location:
+            write(_fold(f"LOCATION:{_escape(location)}"))
+        if description:
+            write(_fold(f"DESCRIPTION:{_escape(description)}"))
+        write(_fold(f"CATEGORIES:{_escape(kind)}"))
+        write(b"END:VEVENT\r\n")
+        count += 1
+
+    write(b"END:VCALENDAR\r\n")
+    return count
+
+
+def feed_state(db: Session, scope: AccessScope, today: Optional[date] = None) -> FeedState:
+    """Ultima modifica e numero degli eventi del feed: una query aggregata."""
+    start = (today or date.today()) - timedelta(days=FEED_PAST_DAYS)
+    last_modified, count = db.execute(
+        select(func.max(Event.updated_at), func.count(Event.id)).where(
+            scope.events_filter(), Event.date >= start
+        )
+    ).one()
+    return FeedState(
+        start=start,
+        category_ids=None if scope.all_access else tuple(sorted(scope.category_ids)),
+        last_modified=last_modified,
+        count=count,
+    )
+
+
+def _feed_rows(db: Session, scope: AccessScope, start: date):
+    stmt = (
+        select(
+            Event.id,
+            Event.date,
+            Event.title,
+            Event.type,
+            Event.description,
+            Event.location,
+            Category.name,
+            Event.updated_at,
+        )
+        .outerjoin(Category, Category.id == Event.category_id)
+        .where(scope.events_filter(), Event.date >= start)
+        .order_by(Event.date.asc(), Event.id.asc())
+        .execution_options(yield_per=FEED_BATCH_SIZE)
+    )
+    return db.execute(stmt)
+
+
+def _feed_etag(state: FeedState) -> str:
+    digest = hashlib.blake2b(repr(state).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def get_feed(
+    db: Session,
+    scope: AccessScope,
+    club: dict,
+    today: Optional[date] = None,
+) -> Feed:
+    """
+    Feed ICS dell'utente del perimetro: dalla cache se lo stato non è
+    cambiato, altrimenti riscritto. `club` è quello di tenancy.get_club().
+    """
+    state = feed_state(db, scope, today)
+    key = tenant_key(club["id"], "ics", scope.user_id)
+    cached = _feed_cache.get(key)
+    if cached is not None and cached.state == state:
+        return cached
+
+    buffer = io.BytesIO()
+    write_feed(
+        buffer,
+        _feed_rows(db, scope, state.start),
+        calendar_name=club["name"],
+        uid_domain=f"{club['slug']}.sciclub",
+    )
+
+    last_modified = (state.last_modified or _EPOCH).replace(microsecond=0)
+    if cached is not None and last_modified <= cached.last_modified:
+        # evento cancellato (o perimetro cambiato): MAX(updated_at) non si
+        # muove, ma If-Modified-Since non deve rispondere 304
+        last_modified = datetime.utcnow().replace(microsecond=0)
+
+    feed = Feed(
+        state=state,
+        body=buffer.getvalue(),
+        etag=_feed_etag(state),
+        last_modified=last_modified,
+    )
+    _feed_cache.set(key, feed)
+    return feed
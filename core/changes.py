@@ -0,0 +1,109 @@
+# core/changes.py
+# Feed delle modifiche alle presenze ("cosa è cambiato dal cursore X").
+#
+# Il cursore è la coppia (change_seq, id) dell'ultima riga vista. change_seq
+# segue l'ordine di commit (lo calcola l'INSERT/UPDATE sotto il lock di
+# scrittura, vedi core/models.py): una riga scritta dopo la lettura del
+# cursore ha sempre un numero più alto, anche se chi l'ha scritta ha
+# iniziato prima. updated_at invece viene dall'orologio di chi scrive e non
+# va usato come cursore. La query usa l'indice su change_seq e restituisce
+# solo le righe modificate dopo, così un aggiornamento periodico costa
+# pochissimo.
+# Nota: le righe cancellate non compaiono nel feed; chi tiene uno stato
+# se ne accorge confrontando il numero di righe con attendance_count().
+
+from __future__ import annotations
+
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session
+
+from .models import EventAttendance
+
+
+Cursor = Tuple[int, int]
+
+# colonne restituite dal feed, nell'ordine (più change_seq, per il cursore)
+FEED_COLUMNS = (
+    EventAttendance.id,
+    EventAttendance.event_id,
+    EventAttendance.athlete_id,
+    EventAttendance.status,
+    EventAttendance.skis_in_skiroom,
+    EventAttendance.car_available,
+    EventAttendance.car_seats,
+    EventAttendance.updated_at,
+    EventAttendance.version,
+)
+
+
+def _after(cursor: Optional[Cursor]):
+    if cursor is None:
+        return None
+    seq, last_id = cursor
+    return or_(
+        EventAttendance.change_seq > seq,
+        and_(EventAttendance.change_seq == seq, EventAttendance.id > last_id),
+    )
+
+
+def snapshot(db: Session, event_ids: Iterable[int]) -> Tuple[List, Optional[Cursor]]:
+    """Stato iniziale delle presenze degli eventi + cursore da cui ripartire."""
+    ids = list(event_ids)
+    if not ids:
+        return [], None
+
+    rows = db.execute(
+        select(*FEED_COLUMNS, EventAttendance.change_seq).where(
+            EventAttendance.event_id.in_(ids)
+        )
+    ).all()
+
+    latest = db.execute(
+        select(EventAttendance.change_seq, EventAttendance.id)
+        .order_by(EventAttendance.change_seq.desc(), EventAttendance.id.desc())
+        .limit(1)
+    ).first()
+    return rows, (tuple(latest) if latest else None)
+
+
+def attendance_count(db: Session, event_ids: Iterable[int]) -> int:
+    """Righe di presenza attuali degli eventi (una COUNT sull'indice per evento)."""
+    ids = list(event_ids)
+    if not ids:
+        return 0
+    return db.execute(
+        select(func.count(EventAttendance.id)).where(EventAttendance.event_id.in_(ids))
+    ).scalar_one()
+
+
+def changes_since(
+    db: Session,
+    cursor: Optional[Cursor],
+    event_ids: Optional[Iterable[int]] = None,
+    limit: int = 1000,
+    athlete_ids: Optional[Iterable[int]] = None,
+) -> Tuple[List, Optional[Cursor]]:
+    """
+    Righe modificate dopo il cursore (eventualmente solo per alcuni eventi
+    o atleti), in ordine di modifica, e nuovo cursore.
+    """
+    stmt = select(*FEED_COLUMNS, EventAttendance.change_seq).order_by(
+        EventAttendance.change_seq.asc(), EventAttendance.id.asc()
+    )
+    after = _after(cursor)
+    if after is not None:
+        stmt = stmt.where(after)
+    if event_ids is not None:
+        stmt = stmt.where(EventAttendance.event_id.in_(list(event_ids)))
+    if athlete_ids is not None:
+        stmt = stmt.where(EventAttendance.athlete_id.in_(list(athlete_ids)))
+
+    rows = db.execute(stmt.limit(limit)).all()
+    if not rows:
+        return [], cursor
+
+    last = rows[-1]
+    return rows, (last.change_seq, last.id)
+
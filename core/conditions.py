@@ -0,0 +1,186 @@
+# core/conditions.py
+# Condizioni neve/meteo delle località degli eventi.
+#
+# - La fonte è un "provider" intercambiabile (set_provider): di serie un
+#   file JSON locale (SCICLUB_CONDITIONS_FILE), altrimenti nessun dato.
+#   Un provider esterno (servizio meteo, bollettino neve) implementa lo
+#   stesso metodo fetch().
+# - I risultati restano in cache per (località, giorno) con scadenza,
+#   anche quando il provider non ha dati (così non lo si richiama).
+# - Le pagine chiedono le condizioni di tutti gli eventi mostrati con una
+#   sola chiamata (prefetch_conditions): le coppie mancanti in cache
+#   vanno al provider in un unico lotto, mai una richiesta per expander.
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from .cache import TTLCache
+from .i18n import DEFAULT_LANGUAGE, translator
+from .locations import LocationRow, location_rows
+
+
+CONDITIONS_CACHE_TTL = 1800
+# dopo un errore del provider si riprova prima
+CONDITIONS_ERROR_TTL = 60
+
+CONDITIONS_FILE = os.environ.get("SCICLUB_CONDITIONS_FILE", "")
+
+Key = Tuple[int, date]  # (location_id, giorno)
+
+_NO_DATA = object()
+_cache = TTLCache(ttl=CONDITIONS_CACHE_TTL, max_size=4096)
+
+
+@dataclass(frozen=True, slots=True)
+class Conditions:
+    snow_base_cm: Optional[int] = None   # neve al suolo
+    new_snow_cm: Optional[int] = None    # neve fresca
+    temperature_c: Optional[float] = None
+    summary: str = ""                    # es. "Sereno", "Neve debole"
+
+    def label(self, language: str = DEFAULT_LANGUAGE) -> str:
+        t = translator(language)
+        parts = []
+        if self.snow_base_cm is not None:
+            snow = t("conditions.snow", cm=self.snow_base_cm)
+            if self.new_snow_cm:
+                snow += t("conditions.new_snow", cm=self.new_snow_cm)
+            parts.append(snow)
+        if self.temperature_c is not None:
+            parts.append(f"{self.temperature_c:+.0f} °C")
+        if self.summary:
+            parts.append(self.summary)
+        return " · ".join(parts)
+
+
+class NullProvider:
+    """Nessuna fonte configurata: nessun dato."""
+
+    def fetch(self, requests: Sequence[Tuple[LocationRow, date]]) -> Dict[Key, Conditions]:
+        return {}
+
+
+class LocalFileProvider:
+    """
+    File JSON locale (bollettino scaricato a parte, dati di prova):
+
+        [{"resort": "Champoluc", "piste": "Crest", "date": "2026-01-10",
+          "snow_base_cm": 80, "new_snow_cm": 10, "temperature_c": -4,
+          "summary": "Sereno"}, ...]
+
+    "piste" e "date" sono facoltativi: senza pista vale per tutto il
+    comprensorio, senza data per qualsiasi giorno. Vince la voce più
+    precisa. Il file si rilegge solo quando cambia.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._mtime: Optional[int] = None
+        self._entries: Dict[Tuple[str, str, Optional[date]], Conditions] = {}
+
+    def _load(self) -> Dict[Tuple[str, str, Optional[date]], Conditions]:
+        mtime = self.path.stat().st_mtime_ns
+        with self._lock:
+            if mtime != self._mtime:
+                entries = {}
+                for item in json.loads(self.path.read_text(encoding="utf-8")):
+                    day = item.get("date")
+                    key = (
+                        item["resort"].casefold(),
+                        (item.get("piste") or "").casefold(),
+                        date.fromisoformat(day) if day else None,
+                    )
+                    entries[key] = Conditions(
+                        snow_base_cm=item.get("snow_base_cm"),
+                        new_snow_cm=item.get("new_snow_cm"),
+                        temperature_c=item.get("temperature_c"),
+                        summary=item.get("summary", ""),
+                    )
+                self._entries, self._mtime = entries, mtime
+            return self._entries
+
+    def fetch(self, requests: Sequence[Tuple[LocationRow, date]]) -> Dict[Key, Conditions]:
+        entries = self._load()
+        found: Dict[Key, Conditions] = {}
+        for location, day in requests:
+            resort, piste = location.resort.casefold(), location.piste.casefold()
+            for key in ((resort, piste, day), (resort, piste, None),
+                        (resort, "", day), (resort, "", None)):
+                if key in entries:
+                    found[(location.id, day)] = entries[key]
+                    break
+        return found
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider():
+    """Provider del processo: il file locale se configurato, altrimenti nessuno."""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = LocalFileProvider(CONDITIONS_FILE) if CONDITIONS_FILE else NullProvider()
+        return _provider
+
+
+def set_provider(provider) -> None:
+    """Sostituisce la fonte delle condizioni e svuota la cache."""
+    global _provider
+    with _provider_lock:
+        _provider = provider
+    _cache.clear()
+
+
+def prefetch_conditions(db: Session, events: Iterable) -> Dict[int, Conditions]:
+    """
+    Condizioni per evento (id -> Conditions; gli eventi senza dati non ci
+    sono). `events` sono oggetti con id, date e location_id (EventRow o
+    Event). Le coppie non in cache vanno al provider in un solo lotto.
+    """
+    by_key: Dict[Key, list] = {}
+    for ev in events:
+        if ev.location_id is not None:
+            by_key.setdefault((ev.location_id, ev.date), []).append(ev.id)
+
+    found: Dict[Key, object] = {}
+    missing = []
+    for key in by_key:
+        value = _cache.get(key, None)
+        if value is None:
+            missing.append(key)
+        else:
+            found[key] = value
+
+    if missing:
+        locations = location_rows(db, (loc_id for loc_id, _ in missing))
+        requests = [(locations[loc_id], day) for loc_id, day in missing if loc_id in locations]
+        try:
+            fetched = get_provider().fetch(requests)
+            ttl = None
+        except Exception:
+            logging.exception("Condizioni non disponibili per %d località", len(requests))
+            fetched, ttl = {}, CONDITIONS_ERROR_TTL
+        for key in missing:
+            value = fetched.get(key, _NO_DATA)
+            _cache.set(key, value, ttl=ttl)
+            found[key] = value
+
+    return {
+        ev_id: value
+        for key, value in found.items()
+        if value is not _NO_DATA
+        for ev_id in by_key[key]
+    }
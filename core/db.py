@@ -1,12 +1,51 @@
 # core/db.py
-from sqlalchemy import create_engine
+import os
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 # Nuovo file DB per la versione con richieste ski-room / auto
-SQLALCHEMY_DATABASE_URL = "sqlite:///./sci_club_v2.db"
+SQLALCHEMY_DATABASE_URL = os.environ.get(
+    "SCICLUB_DATABASE_URL", "sqlite:///./sci_club_v2.db"
+)
+
+# Stagioni concluse (vedi core/archive.py): file separato, agganciato
+# a ogni connessione come schema "archive"
+ARCHIVE_DATABASE_PATH = os.environ.get("SCICLUB_ARCHIVE_PATH", "./sci_club_archive.db")
+
+# Più processi dell'app (e worker) sugli stessi file (README, "Più
+# processi"): database in WAL, cache condivisa (core/shared_cache.py),
+# lavori in background con un solo esecutore (core/leases.py).
+MULTIPROCESS = os.environ.get("SCICLUB_MULTIPROCESS", "") == "1"
+
+# attesa massima (secondi) quando un altro processo sta scrivendo
+SQLITE_BUSY_TIMEOUT = 10
+
+# Le sessioni delle pagine Streamlit durano un solo render: dopo un commit
+# gli oggetti già caricati restano validi invece di essere riletti uno per
+# uno al primo accesso (vedi core/uow.py). True = comportamento standard.
+UI_EXPIRE_ON_COMMIT = False
 
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT},
 )
+
+
+@event.listens_for(engine, "connect")
+def _attach_archive(dbapi_connection, connection_record):
+    dbapi_connection.execute(
+        "ATTACH DATABASE ? AS archive", (ARCHIVE_DATABASE_PATH,)
+    )
+    if MULTIPROCESS:
+        # WAL: chi legge non blocca chi scrive e viceversa; resta
+        # impostato nel file. Con WAL le transazioni che toccano principale
+        # e archivio insieme sono atomiche per singolo file.
+        for schema in ("main", "archive"):
+            dbapi_connection.execute(f"PRAGMA {schema}.journal_mode=WAL")
+            dbapi_connection.execute(f"PRAGMA {schema}.synchronous=NORMAL")
+
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
 Base = declarative_base()
@@ -0,0 +1,423 @@
+# core/dispatch.py
+# Stadio di invio davanti a send_push_to_tokens.
+#
+# - Accorpamento: i messaggi per lo stesso utente arrivati entro
+#   COALESCE_WINDOW secondi diventano un unico push riassuntivo;
+#   i doppioni identici vengono scartati.
+# - Limiti: token bucket per utente e globale (per restare nelle quote FCM).
+#   Un utente oltre il limite resta in coda e riprova al giro successivo.
+#   La quota dell'utente si consuma solo quando il push parte davvero: un
+#   messaggio fermato dal limite globale o non consegnato non la tocca.
+# - Invio: gli utenti con lo stesso testo finale vengono spediti insieme
+#   in chiamate multicast da al massimo SEND_CHUNK_TOKENS dispositivi.
+#   Un invio non riuscito torna in coda (dopo la finestra di accorpamento)
+#   fino a MAX_SEND_ATTEMPTS tentativi.
+# - Metriche: contatori esposti da metrics() (pannello Admin).
+# - send_now: invio immediato, con gli stessi limiti ma fuori dalla coda
+#   e dall'accorpamento; chi non riceve non resta in coda e lo ripropone il
+#   chiamante (promemoria, core/reminders.py, che tiene lo stato nel DB).
+#
+# La coda è in memoria: i Message restano comunque salvati nel DB, un
+# riavvio perde solo i push non ancora spediti.
+#
+# Con più processi (SCICLUB_MULTIPROCESS=1) il thread di invio accoda
+# invece nella tabella push_outbox e solo il processo che tiene la lease
+# "push-dispatcher" (core/leases.py) la svuota nella propria coda: un
+# solo processo applica accorpamento e limiti di invio.
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from datetime import datetime
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from .db import MULTIPROCESS, engine
+from .leases import acquire_lease
+from .models import DeviceToken, PushOutbox
+from .notifications import send_push_to_tokens
+
+
+COALESCE_WINDOW = 60.0
+
+# per utente: al massimo 3 push di fila, poi uno ogni 10 minuti
+USER_BUCKET_CAPACITY = 3
+USER_BUCKET_REFILL_PER_SEC = 1 / 600
+
+# globale, in dispositivi (token) al secondo
+GLOBAL_BUCKET_CAPACITY = 500
+GLOBAL_BUCKET_REFILL_PER_SEC = 100
+
+# massimo token per singola chiamata multicast
+MAX_TOKENS_PER_CALL = 500
+# dispositivi per chiamata: una chiamata deve poter passare il limite globale
+SEND_CHUNK_TOKENS = min(MAX_TOKENS_PER_CALL, GLOBAL_BUCKET_CAPACITY)
+
+MAX_SEND_ATTEMPTS = 3
+
+FLUSH_INTERVAL = 5.0
+
+DISPATCH_JOB = "push-dispatcher"
+# righe della coda condivisa raccolte per giro
+OUTBOX_BATCH = 5000
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, refill_per_sec: float):
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_sec
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_sec)
+        self.updated_at = now
+
+    def can_take(self, amount: float = 1, now: Optional[float] = None) -> bool:
+        self._refill(now if now is not None else time.monotonic())
+        return self.tokens >= amount
+
+    def take(self, amount: float = 1, now: Optional[float] = None) -> bool:
+        if not self.can_take(amount, now):
+            return False
+        self.tokens -= amount
+        return True
+
+
+@dataclass
+class _Pending:
+    first_at: float
+    messages: List[Tuple[str, str]] = field(default_factory=list)
+    # invii già falliti per questi messaggi
+    attempts: int = 0
+
+
+def _chunks(
+    uids: List[int], tokens: Dict[int, List[str]], limit: int
+) -> Iterable[Tuple[List[int], List[str]]]:
+    """Utenti a gruppi con al massimo `limit` dispositivi per gruppo."""
+    chunk_uids: List[int] = []
+    chunk_tokens: List[str] = []
+    for uid in uids:
+        # un utente con più dispositivi del limite riceve sui primi `limit`
+        user_tokens = tokens[uid][:limit]
+        if chunk_tokens and len(chunk_tokens) + len(user_tokens) > limit:
+            yield chunk_uids, chunk_tokens
+            chunk_uids, chunk_tokens = [], []
+        chunk_uids.append(uid)
+        chunk_tokens.extend(user_tokens)
+    if chunk_uids:
+        yield chunk_uids, chunk_tokens
+
+
+@dataclass
+class FlushResult:
+    delivered: Set[int] = field(default_factory=set)
+    failed: Set[int] = field(default_factory=set)
+    throttled: Set[int] = field(default_factory=set)
+
+
+def _load_tokens(db: Session, user_ids: Iterable[int]) -> Dict[int, List[str]]:
+    tokens: Dict[int, List[str]] = defaultdict(list)
+    for user_id, token in db.execute(
+        select(DeviceToken.user_id, DeviceToken.token).where(
+            DeviceToken.user_id.in_(list(user_ids))
+        )
+    ):
+        tokens[user_id].append(token)
+    return tokens
+
+
+class NotificationDispatcher:
+    def __init__(
+        self,
+        window: float = COALESCE_WINDOW,
+        sender: Callable = send_push_to_tokens,
+        token_loader: Callable = _load_tokens,
+    ):
+        self.window = window
+        self._sender = sender
+        self._token_loader = token_loader
+        self._lock = threading.Lock()
+        self._pending: Dict[int, _Pending] = {}
+        self._user_buckets: Dict[int, TokenBucket] = {}
+        self._global_bucket = TokenBucket(
+            GLOBAL_BUCKET_CAPACITY, GLOBAL_BUCKET_REFILL_PER_SEC
+        )
+        self._started_at = time.monotonic()
+        self._counters: Dict[str, int] = defaultdict(int)
+        self._thread: Optional[threading.Thread] = None
+        # coda condivisa tra processi (start_background in modalità multiprocesso)
+        self._outbox = False
+
+    # --------- CODA ----------
+
+    def submit(self, user_ids: Iterable[int], title: str, body: str) -> int:
+        """Mette in coda il messaggio per gli utenti; ritorna quanti accodati."""
+        if self._outbox:
+            return self._submit_outbox(set(user_ids), title, body)
+        return self._enqueue(user_ids, title, body, time.monotonic())
+
+    def _enqueue(
+        self, user_ids: Iterable[int], title: str, body: str, now: float
+    ) -> int:
+        queued = 0
+        with self._lock:
+            for user_id in set(user_ids):
+                self._counters["submitted"] += 1
+                pending = self._pending.setdefault(user_id, _Pending(first_at=now))
+                if (title, body) in pending.messages:
+                    self._counters["deduplicated"] += 1
+                    continue
+                if pending.messages:
+                    self._counters["coalesced"] += 1
+                pending.messages.append((title, body))
+                queued += 1
+        return queued
+
+    def _submit_outbox(self, user_ids: Set[int], title: str, body: str) -> int:
+        if user_ids:
+            created_at = datetime.utcnow()
+            with engine.begin() as conn:
+                conn.execute(
+                    insert(PushOutbox.__table__),
+                    [
+                        {"user_id": uid, "title": title, "body": body,
+                         "created_at": created_at}
+                        for uid in user_ids
+                    ],
+                )
+        return len(user_ids)
+
+    def drain_outbox(self, db: Session) -> int:
+        """
+        Sposta nella coda in memoria i push accodati dagli altri processi
+        (solo chi tiene la lease). La finestra di accorpamento parte
+        dall'ora in cui erano stati accodati.
+        """
+        rows = db.execute(
+            select(PushOutbox.id, PushOutbox.user_id, PushOutbox.title,
+                   PushOutbox.body, PushOutbox.created_at)
+            .order_by(PushOutbox.id)
+            .limit(OUTBOX_BATCH)
+        ).all()
+        if not rows:
+            return 0
+        db.execute(delete(PushOutbox).where(PushOutbox.id <= rows[-1].id))
+        db.commit()
+
+        now, wall = time.monotonic(), datetime.utcnow()
+        for row in rows:
+            age = max((wall - row.created_at).total_seconds(), 0.0)
+            self._enqueue([row.user_id], row.title, row.body, now - age)
+        return len(rows)
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    @staticmethod
+    def _digest(messages: List[Tuple[str, str]]) -> Tuple[str, str]:
+        if len(messages) == 1:
+            return messages[0]
+        title = f"{len(messages)} nuovi messaggi dallo Sci Club"
+        body = "\n".join(f"• {t}" for t, _ in messages)
+        return title, body
+
+    def _bucket(self, user_id: int) -> TokenBucket:
+        bucket = self._user_buckets.get(user_id)
+        if bucket is None:
+            bucket = TokenBucket(USER_BUCKET_CAPACITY, USER_BUCKET_REFILL_PER_SEC)
+            self._user_buckets[user_id] = bucket
+        return bucket
+
+    # --------- INVIO ----------
+
+    def flush(self, db: Session, force: bool = False) -> FlushResult:
+        """
+        Spedisce i riassunti la cui finestra è scaduta (tutti con force=True),
+        nel rispetto dei limiti per utente e globale.
+        """
+        now = time.monotonic()
+        result = FlushResult()
+
+        with self._lock:
+            due = {
+                uid: p
+                for uid, p in self._pending.items()
+                if force or now - p.first_at >= self.window
+            }
+            ready: Dict[int, Tuple[str, str]] = {}
+            attempts: Dict[int, int] = {}
+            for uid, pending in due.items():
+                # qui si controlla soltanto: la quota si prende all'invio
+                if self._bucket(uid).can_take(1, now):
+                    ready[uid] = self._digest(pending.messages)
+                    attempts[uid] = pending.attempts
+                    del self._pending[uid]
+                else:
+                    result.throttled.add(uid)
+            self._counters["throttled_user"] += len(result.throttled)
+
+        self._deliver(db, ready, attempts, result, requeue=True)
+        return result
+
+    def send_now(self, db: Session, messages: Dict[int, Tuple[str, str]]) -> FlushResult:
+        """
+        Spedisce subito un messaggio per utente, senza passare dalla coda:
+        gli utenti oltre i limiti o con invio fallito tornano in
+        throttled/failed e non restano in memoria.
+        """
+        now = time.monotonic()
+        result = FlushResult()
+        with self._lock:
+            self._counters["submitted"] += len(messages)
+            ready = {}
+            for uid, message in messages.items():
+                if self._bucket(uid).can_take(1, now):
+                    ready[uid] = message
+                else:
+                    result.throttled.add(uid)
+            self._counters["throttled_user"] += len(result.throttled)
+
+        self._deliver(db, ready, dict.fromkeys(ready, 0), result, requeue=False)
+        return result
+
+    def _deliver(self, db: Session, ready: Dict[int, Tuple[str, str]],
+                 attempts: Dict[int, int], result: FlushResult, requeue: bool) -> None:
+        if not ready:
+            return
+
+        tokens = self._token_loader(db, ready.keys())
+
+        # utenti con lo stesso testo -> una chiamata multicast
+        groups: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        for uid, digest in ready.items():
+            if tokens.get(uid):
+                groups[digest].append(uid)
+            else:
+                result.delivered.add(uid)  # nessun dispositivo: niente da fare
+                self._counters["no_device"] += 1
+
+        for (title, body), uids in groups.items():
+            for chunk_uids, chunk_tokens in _chunks(uids, tokens, SEND_CHUNK_TOKENS):
+                self._send_group(title, body, chunk_uids, chunk_tokens, attempts, result,
+                                 requeue)
+
+    def _requeue(self, uid: int, message: Tuple[str, str], first_at: float,
+                 attempts: int) -> None:
+        # con self._lock: davanti agli eventuali messaggi arrivati nel frattempo
+        pending = self._pending.setdefault(uid, _Pending(first_at=first_at))
+        pending.first_at = min(pending.first_at, first_at)
+        pending.attempts = max(pending.attempts, attempts)
+        if message not in pending.messages:
+            pending.messages.insert(0, message)
+
+    def _send_group(self, title, body, uids, group_tokens, attempts,
+                    result: FlushResult, requeue: bool = True) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if not self._global_bucket.take(len(group_tokens), now):
+                # quota globale esaurita: torna in coda per il prossimo giro,
+                # senza consumare la quota degli utenti
+                for uid in uids if requeue else ():
+                    self._requeue(uid, (title, body), now - self.window, attempts[uid])
+                result.throttled.update(uids)
+                self._counters["throttled_global"] += len(uids)
+                return
+            for uid in uids:
+                self._bucket(uid).take(1, now)
+
+        response = self._sender(group_tokens, title=title, body=body)
+        with self._lock:
+            self._counters["calls"] += 1
+            if response.get("ok"):
+                result.delivered.update(uids)
+                self._counters["pushes"] += len(uids)
+                self._counters["devices"] += len(group_tokens)
+                return
+
+            result.failed.update(uids)
+            self._counters["failures"] += len(uids)
+            logging.warning("Invio push fallito: %s", response.get("reason"))
+            for uid in uids:
+                # il push non è partito: la quota dell'utente torna disponibile
+                bucket = self._bucket(uid)
+                bucket.tokens = min(bucket.capacity, bucket.tokens + 1)
+                if not requeue:
+                    continue
+                if attempts[uid] + 1 < MAX_SEND_ATTEMPTS:
+                    # riprova dopo una finestra di accorpamento
+                    self._requeue(uid, (title, body), now, attempts[uid] + 1)
+                else:
+                    self._counters["dropped"] += 1
+                    logging.warning("Push per l'utente %s scartato dopo %d tentativi",
+                                    uid, MAX_SEND_ATTEMPTS)
+
+    # --------- METRICHE ----------
+
+    def metrics(self) -> Dict[str, float]:
+        with self._lock:
+            counters = dict(self._counters)
+            pending = len(self._pending)
+        uptime = max(time.monotonic() - self._started_at, 1e-9)
+        submitted = counters.get("submitted", 0)
+        merged = counters.get("coalesced", 0) + counters.get("deduplicated", 0)
+        return {
+            **counters,
+            "pending_users": pending,
+            "dedup_rate": merged / submitted if submitted else 0.0,
+            "pushes_per_minute": counters.get("pushes", 0) * 60 / uptime,
+        }
+
+    # --------- THREAD DI INVIO ----------
+
+    def start_background(self, interval: float = FLUSH_INTERVAL) -> None:
+        """Avvia (una volta sola) il thread che svuota la coda periodicamente."""
+        with self._lock:
+            self._outbox = MULTIPROCESS
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._loop, args=(interval,), daemon=True, name="push-dispatcher"
+            )
+            self._thread.start()
+
+    def _loop(self, interval: float) -> None:
+        from .db import SessionLocal
+
+        while True:
+            time.sleep(interval)
+            leader = self._outbox and acquire_lease(DISPATCH_JOB)
+            if not leader and not self.pending_count():
+                continue
+            db = SessionLocal()
+            try:
+                if leader:
+                    self.drain_outbox(db)
+                self.flush(db)
+            except Exception:
+                logging.exception("Errore nel dispatcher delle notifiche")
+            finally:
+                db.close()
+
+
+_dispatcher: Optional[NotificationDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher() -> NotificationDispatcher:
+    """Dispatcher unico per processo."""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = NotificationDispatcher()
+        return _dispatcher
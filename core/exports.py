@@ -0,0 +1,230 @@
+# core/exports.py
+# Export CSV / Excel di presenze, ski-room e carpooling.
+#
+# Le righe arrivano dal DB a blocchi (yield_per -> cursore lato server) e
+# vengono scritte da un generatore su un file temporaneo "spooled": la
+# memoria resta costante anche per export di un'intera stagione.
+#
+# Le stagioni archiviate (core/archive.py) si leggono dalle tabelle
+# d'archivio: se l'intervallo ne tocca una si esportano prima le righe
+# archiviate, poi quelle calde (le stagioni archiviate sono le più vecchie).
+
+from __future__ import annotations
+
+import csv
+import io
+import tempfile
+from datetime import date
+from itertools import chain
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .archive import archive_table, archived_between
+from .i18n import DEFAULT_LANGUAGE, status_labels
+from .models import Athlete, Category, Event, EventAttendance
+from .tenancy import current_club_id
+
+try:  # opzionale: senza openpyxl resta disponibile solo il CSV
+    from openpyxl import Workbook
+except ImportError:
+    Workbook = None
+
+
+EXPORT_KINDS = {
+    "attendance": "Presenze",
+    "skiroom": "Ski-room",
+    "carpool": "Auto / carpooling",
+}
+
+# righe lette dal DB per ogni blocco
+BATCH_SIZE = 2000
+
+# oltre questa soglia il file temporaneo passa da RAM a disco
+SPOOL_MAX_BYTES = 5 * 1024 * 1024
+
+# gli export restano in italiano (intestazioni e valori)
+_STATUS_LABELS = status_labels(DEFAULT_LANGUAGE)
+
+
+def _base_query(
+    db: Session,
+    start: date,
+    end: date,
+    category_ids: Optional[Sequence[int]],
+    archived: bool,
+):
+    if archived:
+        # tabelle Core: il filtro automatico per club (core/tenancy.py)
+        # vale solo per i modelli, qui va messo a mano
+        event_source = archive_table(Event.__table__)
+        attendance_source = archive_table(EventAttendance.__table__)
+        events, attendance = event_source.c, attendance_source.c
+    else:
+        event_source, attendance_source = Event, EventAttendance
+        events, attendance = Event, EventAttendance
+
+    stmt = (
+        select(
+            events.date,
+            events.type,
+            events.title,
+            Category.name,
+            Athlete.name,
+            attendance.status,
+            attendance.skis_in_skiroom,
+            attendance.car_available,
+            attendance.car_seats,
+            attendance.updated_at,
+        )
+        .join_from(attendance_source, event_source, attendance.event_id == events.id)
+        .join(Athlete, attendance.athlete_id == Athlete.id)
+        .join(Category, events.category_id == Category.id)
+        .where(events.date >= start, events.date <= end)
+        .order_by(events.date, events.id, Athlete.name)
+    )
+    club_id = current_club_id(db)
+    if archived and club_id is not None:
+        stmt = stmt.where(attendance.club_id == club_id)
+    if category_ids is not None:
+        stmt = stmt.where(events.category_id.in_(list(category_ids)))
+    return stmt, events, attendance
+
+
+def _fetch(
+    db: Session,
+    kind: str,
+    start: date,
+    end: date,
+    category_ids: Optional[Sequence[int]],
+    archived: bool,
+) -> Iterator[tuple]:
+    stmt, events, attendance = _base_query(db, start, end, category_ids, archived)
+    if kind == "skiroom":
+        stmt = stmt.where(
+            events.ask_skiroom.is_(True), attendance.skis_in_skiroom.is_(True)
+        )
+    elif kind == "carpool":
+        stmt = stmt.where(
+            events.type == "race", attendance.car_available.is_(True)
+        )
+    yield from db.execute(stmt.execution_options(yield_per=BATCH_SIZE))
+
+
+def iter_export_rows(
+    db: Session,
+    kind: str,
+    start: date,
+    end: date,
+    category_ids: Optional[Sequence[int]] = None,
+) -> Tuple[List[str], Iterator[tuple]]:
+    """
+    Ritorna (intestazione, generatore di righe) per il tipo di export.
+    category_ids=None significa tutte le categorie (admin).
+    """
+    if kind not in EXPORT_KINDS:
+        raise ValueError(f"Tipo di export sconosciuto: {kind}")
+
+    sources = [True, False] if archived_between(db, start, end) else [False]
+    result = chain.from_iterable(
+        _fetch(db, kind, start, end, category_ids, archived) for archived in sources
+    )
+
+    if kind == "attendance":
+        header = ["Data", "Tipo", "Evento", "Categoria", "Atleta", "Stato",
+                  "Sci in ski-room", "Auto", "Posti auto", "Aggiornato il"]
+
+        def rows():
+            for ev_date, ev_type, title, cat, ath, status, skis, car, seats, upd in result:
+                yield (
+                    ev_date.isoformat(),
+                    "Gara" if ev_type == "race" else "Allenamento",
+                    title,
+                    cat,
+                    ath,
+                    _STATUS_LABELS.get(status, status),
+                    "Sì" if skis else "No",
+                    "Sì" if car else "No",
+                    seats or 0,
+                    upd.strftime("%Y-%m-%d %H:%M") if upd else "",
+                )
+
+    elif kind == "skiroom":
+        header = ["Data", "Evento", "Categoria", "Atleta", "Stato"]
+
+        def rows():
+            for ev_date, _, title, cat, ath, status, *_ in result:
+                yield (
+                    ev_date.isoformat(), title, cat, ath,
+                    _STATUS_LABELS.get(status, status),
+                )
+
+    else:
+        header = ["Data", "Gara", "Categoria", "Atleta", "Posti auto"]
+
+        def rows():
+            for ev_date, _, title, cat, ath, _, _, _, seats, _ in result:
+                yield (ev_date.isoformat(), title, cat, ath, seats or 0)
+
+    return header, rows()
+
+
+def iter_csv(header: Sequence[str], rows: Iterable[Sequence]) -> Iterator[str]:
+    """
+    Generatore di blocchi CSV. Separatore ";" e BOM UTF-8 iniziale così
+    il file si apre direttamente in Excel con le impostazioni italiane.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=";")
+
+    yield "\ufeff"
+    writer.writerow(header)
+    for i, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if i % BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def write_export(
+    db: Session,
+    kind: str,
+    start: date,
+    end: date,
+    category_ids: Optional[Sequence[int]] = None,
+    fmt: str = "csv",
+):
+    """
+    Scrive l'export su un SpooledTemporaryFile (riavvolto, pronto da leggere;
+    chiuderlo dopo l'uso) e lo restituisce.
+    """
+    header, rows = iter_export_rows(db, kind, start, end, category_ids)
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, mode="w+b")
+
+    if fmt == "xlsx":
+        if Workbook is None:
+            raise RuntimeError("Export Excel non disponibile: installa openpyxl.")
+        # write_only: le righe vengono scritte in streaming, non tenute in RAM
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(EXPORT_KINDS[kind])
+        ws.append(header)
+        for row in rows:
+            ws.append(list(row))
+        wb.save(out)
+    else:
+        for chunk in iter_csv(header, rows):
+            out.write(chunk.encode("utf-8"))
+
+    out.seek(0)
+    return out
+
+
+def export_file_name(kind: str, start: date, end: date, fmt: str = "csv") -> str:
+    return f"sciclub_{kind}_{start.isoformat()}_{end.isoformat()}.{fmt}"
+
+
+def available_formats() -> List[str]:
+    return ["csv", "xlsx"] if Workbook is not None else ["csv"]
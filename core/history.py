@@ -0,0 +1,179 @@
+# core/history.py
+# Storico delle modifiche alle presenze ("chi ha segnato Seth assente, e
+# quando?").
+#
+# - Tabella attendance_history, solo in aggiunta: una riga per ogni
+#   modifica, con i valori dopo la modifica e chi l'ha fatta.
+# - Scritta nella stessa transazione del salvataggio: per l'ORM da un
+#   listener after_flush, per gli UPDATE Core (sync dell'app mobile)
+#   chiamando record_changes().
+# - Le righe iniziali "da confermare" create in automatico
+#   (core/attendance.py) non sono modifiche e non vengono registrate.
+# - Le letture (storico di una riga, cronologia di un evento) usano
+#   l'indice (event_id, athlete_id, changed_at).
+
+from __future__ import annotations
+
+import calendar
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+
+from sqlalchemy import event, insert, inspect, select
+from sqlalchemy.orm import Session
+
+from .models import AttendanceHistory, EventAttendance, User
+
+
+STATUS_CODES = {"undecided": 0, "present": 1, "absent": 2}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+# stato non previsto: si registra come "da confermare" (come in lettura),
+# un errore qui farebbe fallire il flush del salvataggio
+UNKNOWN_STATUS_CODE = STATUS_CODES["undecided"]
+
+FLAG_SKIROOM = 1
+FLAG_CAR = 2
+
+SOURCE_APP = 0
+SOURCE_SYNC = 1
+
+# campi che, se cambiano, producono una riga di storico
+TRACKED_FIELDS = ("status", "skis_in_skiroom", "car_available", "car_seats")
+
+
+@dataclass(frozen=True, slots=True)
+class HistoryEntry:
+    event_id: int
+    athlete_id: int
+    status: str
+    skis_in_skiroom: bool
+    car_available: bool
+    car_seats: int
+    changed_by: Optional[str]  # nome utente
+    changed_at: datetime
+    source: int
+
+
+def _epoch(moment: datetime) -> int:
+    return calendar.timegm(moment.utctimetuple())
+
+
+def history_row(
+    club_id: int,
+    event_id: int,
+    athlete_id: int,
+    status: str,
+    skis_in_skiroom: bool,
+    car_available: bool,
+    car_seats: Optional[int],
+    changed_by: Optional[int],
+    changed_at: datetime,
+    source: int = SOURCE_APP,
+) -> dict:
+    """Valori di una riga di storico nel formato compatto."""
+    code = STATUS_CODES.get(status)
+    if code is None:
+        logging.warning("Storico presenze: stato sconosciuto %r", status)
+        code = UNKNOWN_STATUS_CODE
+    return {
+        "club_id": club_id,
+        "event_id": event_id,
+        "athlete_id": athlete_id,
+        "status": code,
+        "flags": (FLAG_SKIROOM if skis_in_skiroom else 0)
+        | (FLAG_CAR if car_available else 0),
+        "car_seats": car_seats or 0,
+        "changed_by": changed_by,
+        "changed_at": _epoch(changed_at),
+        "source": source,
+    }
+
+
+def record_changes(db: Session, rows: Iterable[dict]) -> int:
+    """Accoda righe di storico (history_row) nella transazione corrente."""
+    rows = list(rows)
+    if rows:
+        db.execute(insert(AttendanceHistory), rows)
+    return len(rows)
+
+
+def _orm_row(obj: EventAttendance) -> dict:
+    return history_row(
+        obj.club_id,
+        obj.event_id,
+        obj.athlete_id,
+        obj.status,
+        obj.skis_in_skiroom,
+        obj.car_available,
+        obj.car_seats,
+        obj.updated_by,
+        obj.updated_at or datetime.utcnow(),
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _record_orm_changes(session, flush_context):
+    rows = []
+    for obj in session.dirty:
+        if isinstance(obj, EventAttendance):
+            attrs = inspect(obj).attrs
+            if any(attrs[name].history.has_changes() for name in TRACKED_FIELDS):
+                rows.append(_orm_row(obj))
+    for obj in session.new:
+        # righe create a mano (non dal pre-popolamento) già con una risposta
+        if isinstance(obj, EventAttendance) and obj.status != "undecided":
+            rows.append(_orm_row(obj))
+    record_changes(session, rows)
+
+
+# --------- LETTURE ----------
+
+
+def _entries(db: Session, *criteria, limit: Optional[int] = None) -> List[HistoryEntry]:
+    stmt = (
+        select(
+            AttendanceHistory.event_id,
+            AttendanceHistory.athlete_id,
+            AttendanceHistory.status,
+            AttendanceHistory.flags,
+            AttendanceHistory.car_seats,
+            User.name,
+            AttendanceHistory.changed_at,
+            AttendanceHistory.source,
+        )
+        .outerjoin(User, User.id == AttendanceHistory.changed_by)
+        .where(*criteria)
+        .order_by(AttendanceHistory.changed_at.desc(), AttendanceHistory.id.desc())
+    )
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return [
+        HistoryEntry(
+            event_id=event_id,
+            athlete_id=athlete_id,
+            status=STATUS_NAMES.get(status, "undecided"),
+            skis_in_skiroom=bool(flags & FLAG_SKIROOM),
+            car_available=bool(flags & FLAG_CAR),
+            car_seats=car_seats,
+            changed_by=user_name,
+            changed_at=datetime.fromtimestamp(changed_at, timezone.utc).replace(tzinfo=None),
+            source=source,
+        )
+        for event_id, athlete_id, status, flags, car_seats, user_name, changed_at, source
+        in db.execute(stmt)
+    ]
+
+
+def attendance_history(db: Session, event_id: int, athlete_id: int) -> List[HistoryEntry]:
+    """Tutte le modifiche di una presenza, dalla più recente."""
+    return _entries(
+        db,
+        AttendanceHistory.event_id == event_id,
+        AttendanceHistory.athlete_id == athlete_id,
+    )
+
+
+def event_timeline(db: Session, event_id: int, limit: int = 200) -> List[HistoryEntry]:
+    """Ultime modifiche alle presenze di un evento, dalla più recente."""
+    return _entries(db, AttendanceHistory.event_id == event_id, limit=limit)
@@ -0,0 +1,961 @@
+# core/i18n.py
+# Testi dell'interfaccia in più lingue (italiano, francese, inglese).
+#
+# - I cataloghi sono dizionari chiave -> testo per lingua, tutti con le
+#   stesse chiavi (tests/test_i18n.py); l'italiano fa comunque da riserva
+#   se una chiave manca.
+# - Ogni catalogo si compila una volta per processo (lru_cache) in una
+#   tabella immutabile (MappingProxyType): le pagine la leggono a ogni
+#   rerun senza ricostruire dizionari, tanto meno dentro i cicli per riga.
+# - Un testo tradotto con segnaposto ({name}, ...) diversi dall'italiano
+#   viene scartato alla compilazione (resta l'italiano, con un avviso nel
+#   log) invece di fallire a metà pagina.
+#
+# La lingua è quella dell'utente (User.language, core/auth.set_language);
+# prima del login quella scelta nella schermata di accesso.
+
+from __future__ import annotations
+
+import logging
+from functools import lru_cache
+from string import Formatter
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+
+
+DEFAULT_LANGUAGE = "it"
+
+LANGUAGES: Mapping[str, str] = MappingProxyType(
+    {"it": "Italiano", "fr": "Français", "en": "English"}
+)
+
+# stati di presenza nell'ordine in cui si mostrano
+STATUS_KEYS = ("undecided", "present", "absent")
+
+
+_CATALOGUES: Dict[str, Dict[str, str]] = {
+    "it": {
+        # accesso e barra laterale
+        "language": "Lingua",
+        "login.heading": "Accesso",
+        "login.club": "Club",
+        "login.email": "Email",
+        "login.password": "Password",
+        "login.submit": "Entra",
+        "login.failed": "Email o password non corretti.",
+        "login.no_club": "Nessun club configurato.",
+        "sidebar.signed_in_as": "Accesso come **{name}** ({role})",
+        "sidebar.logout": "Logout",
+        "role.admin": "Admin",
+        "role.coach": "Allenatore",
+        "role.parent": "Genitore",
+        "role.unknown": "Ruolo sconosciuto.",
+        # eventi
+        "event.race": "Gara",
+        "event.training": "Allenamento",
+        "event.location": "Località: {location}",
+        "event.conditions": "Condizioni: {conditions}",
+        "events.none": "Nessun evento futuro.",
+        "view.label": "Vista",
+        "view.list": "Elenco",
+        "view.calendar": "Calendario",
+        "conditions.snow": "Neve {cm} cm",
+        "conditions.new_snow": " (+{cm} fresca)",
+        # presenze
+        "status.undecided": "Da confermare",
+        "status.present": "Presente",
+        "status.absent": "Assente",
+        "attendance.label": "Presenza",
+        "attendance.skiroom": "Sci in ski-room",
+        "attendance.car": "Automunito (per questa gara)",
+        "attendance.seats": "Posti liberi auto",
+        "attendance.car_not_needed": "Automunito non richiesto per gli allenamenti.",
+        "attendance.saved": "Dati aggiornati per questo atleta.",
+        "save": "Salva",
+        # pannello genitore
+        "parent.header": "Pannello Genitore",
+        "parent.no_athletes": "Nessun atleta collegato a questo genitore.",
+        "parent.your_athletes": "I tuoi atleti",
+        "parent.no_categories": "Nessuna categoria collegata ai tuoi atleti.",
+        "parent.upcoming": "Prossimi eventi per i tuoi figli",
+        "parent.tab.events": "Eventi",
+        "parent.tab.messages": "Messaggi",
+        "parent.tab.reports": "Report",
+        "parent.tab.settings": "Impostazioni",
+        "parent.messages": "Messaggi dallo staff",
+        "parent.messages_placeholder": (
+            "In questa versione demo i messaggi sono ancora in sola lettura / placeholder."
+        ),
+        "parent.reports": "Report personali atleta",
+        "parent.reports_placeholder": (
+            "In questa versione demo i report sono ancora in sola lettura / placeholder."
+        ),
+        "settings.header": "Impostazioni notifiche",
+        "settings.intro": (
+            "Incolla qui il **device token FCM** che hai ottenuto dalla pagina "
+            "`token.html`. Questo collega il tuo telefono alle notifiche dello Sci Club."
+        ),
+        "settings.token": "FCM device token",
+        "settings.save_token": "Salva token",
+        "settings.token_missing": "Inserisci un token valido prima di salvare.",
+        "settings.token_saved": (
+            "Token salvato. Questo dispositivo ora può ricevere notifiche push."
+        ),
+        # calendario
+        "calendar.empty": "Nessun evento in questo mese.",
+        "calendar.subscribe_rotate": "Genera un nuovo link",
+        "calendar.subscribe_rotated": "Nuovo link generato: quello vecchio non funziona più.",
+        "calendar.subscribe": "Abbonati al calendario",
+        "calendar.subscribe_help": (
+            "Aggiungi questo indirizzo al tuo calendario (Google, Apple, "
+            "Outlook: \"aggiungi da URL\") per vedere gli eventi e le loro "
+            "modifiche. È personale: non condividerlo."
+        ),
+        "weekday.0": "Lun", "weekday.1": "Mar", "weekday.2": "Mer",
+        "weekday.3": "Gio", "weekday.4": "Ven", "weekday.5": "Sab",
+        "weekday.6": "Dom",
+        "month.1": "Gennaio", "month.2": "Febbraio", "month.3": "Marzo",
+        "month.4": "Aprile", "month.5": "Maggio", "month.6": "Giugno",
+        "month.7": "Luglio", "month.8": "Agosto", "month.9": "Settembre",
+        "month.10": "Ottobre", "month.11": "Novembre", "month.12": "Dicembre",
+        # campi e colonne comuni
+        "yes": "Sì",
+        "not_applicable": "N/A",
+        "field.category": "Categoria",
+        "field.title": "Titolo",
+        "field.location": "Località",
+        "field.description": "Descrizione",
+        "field.season": "Stagione",
+        "field.from": "Dal",
+        "field.to": "Al",
+        "col.event": "Evento",
+        "col.athlete": "Atleta",
+        "col.status": "Stato",
+        "col.car": "Auto",
+        # pannello allenatore
+        "coach.header": "Pannello Allenatore",
+        "coach.tab.events": "Eventi",
+        "coach.tab.messages": "Comunicazioni",
+        "coach.tab.reports": "Report",
+        "coach.tab.stats": "Statistiche",
+        "coach.tab.export": "Export",
+        "coach.no_categories": "Non sei assegnato a nessuna categoria.",
+        "coach.categories": "Categorie seguite",
+        "coach.upcoming": "Prossimi eventi delle tue categorie",
+        "coach.no_events": "Nessun evento futuro per le tue categorie.",
+        "coach.series.header": "Nuova serie ricorrente di allenamenti",
+        "coach.series.weekdays": "Giorni della settimana",
+        "coach.series.ask_skiroom": "Chiedi sci in ski-room",
+        "coach.series.create": "Crea serie",
+        "coach.series.missing": "Inserisci titolo e almeno un giorno della settimana.",
+        "coach.series.created": "Serie creata. Le date vengono generate man mano.",
+        "coach.live.header": "Riepilogo presenze in tempo reale",
+        "coach.live.present": "Presenti",
+        "coach.live.absent": "Assenti",
+        "coach.live.seats": "Posti auto",
+        "coach.live.refresh": "Aggiornamento automatico ogni {seconds} secondi.",
+        "coach.cancel_occurrence": "Annulla questa data",
+        "coach.no_athletes_event": "Nessun atleta collegato a questo evento.",
+        "coach.metric.expected": "Presenze previste",
+        "coach.metric.drivers": "Automuniti",
+        "coach.metric.seats": "Posti auto totali",
+        "coach.athletes_detail": "Dettaglio atleti:",
+        "coach.car_seats": "Sì ({seats} posti)",
+        "coach.show_history": "Mostra storico modifiche",
+        "coach.read_only_note": (
+            "_Nota: in questa versione l'allenatore vede ma non modifica; "
+            "le modifiche vengono dal genitore._"
+        ),
+        "coach.messages.header": "Nuova comunicazione ai genitori",
+        "coach.messages.recipients": "Destinatari",
+        "coach.messages.to_all": "Tutti i genitori delle mie categorie",
+        "coach.messages.to_category": "Solo una categoria",
+        "coach.messages.to_athlete": "Per atleta",
+        "coach.messages.no_athletes": "Nessun atleta collegato alle tue categorie.",
+        "coach.messages.content": "Contenuto",
+        "coach.messages.send": "Invia comunicazione",
+        "coach.messages.missing": "Inserisci titolo e contenuto.",
+        "coach.messages.bad_recipients": "Seleziona correttamente i destinatari.",
+        "coach.messages.sent": (
+            "Messaggio salvato. Notifica in coda per {queued} genitori "
+            "(invio entro {seconds} secondi)."
+        ),
+        # storico modifiche delle presenze
+        "history.none": "Nessuna modifica registrata.",
+        "history.when": "Quando (UTC)",
+        "history.by": "Da",
+        "history.source": "Origine",
+        "history.source_app": "App mobile",
+        "history.source_web": "Web",
+        # risultati e classifiche
+        "results.header": "Risultati gare e classifiche",
+        "results.no_categories": "Nessuna categoria.",
+        "results.race_header": "Risultati gara",
+        "results.standings_header": "Classifica di stagione",
+        "results.no_races": "Nessuna gara già corsa.",
+        "results.count": " · {count} risultati",
+        "results.file_help": (
+            "Export del cronometraggio in CSV o XML. Colonne (o tag): pettorale, "
+            "nome, manche1, manche2, totale, stato (DNF/DSQ/DNS). Un nuovo "
+            "caricamento sostituisce i risultati della gara."
+        ),
+        "results.file": "File risultati",
+        "results.upload": "Carica risultati",
+        "results.failed": "Import non riuscito: {error}",
+        "results.imported": "Righe lette: {rows}, risultati importati: {imported}.",
+        "results.unmatched": "Concorrenti non del club ({count}): ",
+        "results.row_error": "Riga {line}: {message}",
+        "results.none": "Nessun risultato caricato per questa gara.",
+        "results.club_athletes": "⭐ atleti del club",
+        "results.no_points": "Nessun punto assegnato in questa stagione.",
+        "results.col.rank": "Pos.",
+        "results.col.bib": "Pett.",
+        "results.col.name": "Concorrente",
+        "results.col.run1": "1ª manche",
+        "results.col.run2": "2ª manche",
+        "results.col.total": "Totale",
+        "results.col.points": "Punti",
+        "results.col.races": "Gare",
+        "results.col.wins": "Vittorie",
+        "results.col.podiums": "Podi",
+        # statistiche
+        "stats.header": "Statistiche presenze",
+        "stats.season_header": "Statistiche presenze di stagione",
+        "stats.none": "Nessun evento svolto in questa stagione.",
+        "stats.events": "Eventi svolti",
+        "stats.athletes": "Atleti",
+        "stats.average": "Presenza media",
+        "stats.by_athlete": "Presenze per atleta",
+        "stats.rate": "% presenze",
+        "stats.by_weekday": "Presenza per giorno della settimana",
+        "stats.trend": "Andamento mensile per categoria",
+        "stats.col.events": "Eventi",
+        "stats.col.present": "Presenze",
+        "stats.col.best_streak": "Serie migliore",
+        "stats.col.current_streak": "Serie in corso",
+        # export
+        "exports.header": "Export presenze e logistica",
+        "exports.kind": "Dati da esportare",
+        "exports.kind.attendance": "Presenze",
+        "exports.kind.skiroom": "Ski-room",
+        "exports.kind.carpool": "Auto / carpooling",
+        "exports.period": "Periodo",
+        "exports.period.range": "Intervallo di date",
+        "exports.format": "Formato",
+        "exports.download": "Scarica",
+        # pannello admin
+        "admin.header": "Pannello Admin",
+        "admin.metric.users": "Utenti",
+        "admin.metric.categories": "Categorie",
+        "admin.metric.athletes": "Atleti",
+        "admin.metric.events": "Eventi",
+        "admin.upcoming": "Prossimi eventi del club",
+        "admin.ask_skiroom": "Richiesta sci in ski-room: {mark}",
+        "admin.ask_carpool": "Richiesta auto/carpooling: {mark}",
+        "admin.calendar": "Calendario eventi",
+        "admin.locations": "Località",
+        "admin.locations.none": "Nessuna località: vengono create insieme agli eventi.",
+        "admin.locations.help": "Coordinate e quota servono per le condizioni neve/meteo.",
+        "admin.locations.resort": "Comprensorio",
+        "admin.locations.piste": "Pista",
+        "admin.locations.latitude": "Latitudine",
+        "admin.locations.longitude": "Longitudine",
+        "admin.locations.altitude": "Quota (m)",
+        "admin.locations.save": "Salva località",
+        "admin.locations.saved": "Località aggiornate: {count}.",
+        "admin.credentials": "Credenziali di accesso",
+        "admin.credentials.email": "Email utente",
+        "admin.credentials.password": "Nuova password",
+        "admin.credentials.save": "Imposta password",
+        "admin.credentials.unknown": "Nessun utente con questa email.",
+        "admin.credentials.too_short": "La password deve avere almeno 8 caratteri.",
+        "admin.credentials.saved": "Password aggiornata per {name}.",
+        "admin.import": "Import rosa da CSV / Excel",
+        "admin.import.help": (
+            "Una riga per atleta (o per coppia atleta-genitore). Colonne: {columns}. "
+            "Obbligatorie: `atleta`, `categoria`. Gli utenti esistenti vengono "
+            "riconosciuti dall'email."
+        ),
+        "admin.import.file": "File rosa",
+        "admin.import.dry_run": "Simula import",
+        "admin.import.run": "Importa",
+        "admin.import.no_changes": "Nessuna modifica: la rosa è già allineata.",
+        "admin.import.done": "Import completato.",
+        "admin.import.rows": "Righe lette",
+        "admin.import.rejected": "{count} righe scartate:",
+        "admin.import.new_categories": "Nuove categorie",
+        "admin.import.new_users": "Nuovi utenti",
+        "admin.import.new_athletes": "Nuovi atleti",
+        "admin.import.moved_athletes": "Atleti che cambiano categoria",
+        "admin.import.new_parent_links": "Nuovi collegamenti genitore-atleta",
+        "admin.import.new_coach_links": "Nuovi collegamenti allenatore-categoria",
+        "admin.import.col.row": "Riga",
+        "admin.import.col.error": "Errore",
+        "admin.import.col.name": "Nome",
+        "admin.import.col.role": "Ruolo",
+        "admin.import.col.year": "Anno",
+        "admin.import.col.from": "Da",
+        "admin.import.col.to": "A",
+        "admin.archive": "Archivio stagioni concluse",
+        "admin.archive.help": (
+            "Sposta eventi, presenze, messaggi e report delle stagioni concluse "
+            "nel database di archivio. Le statistiche restano consultabili qui."
+        ),
+        "admin.archive.run": "Archivia stagioni concluse",
+        "admin.archive.done": "Archiviazione completata: {count} eventi spostati.",
+        "admin.archive.none": "Nessuna stagione archiviata.",
+        "admin.archive.col.absent": "Assenze",
+        "admin.notifications": "Metriche invio notifiche",
+        "admin.notifications.submitted": "Messaggi ricevuti",
+        "admin.notifications.pushes": "Push inviati",
+        "admin.notifications.dedup": "Accorpati / doppioni",
+        "admin.notifications.per_minute": "Push al minuto",
+        "admin.notifications.pending": "In coda",
+        "admin.notifications.throttled_user": "Limitati (utente)",
+        "admin.notifications.throttled_global": "Limitati (globale)",
+        "admin.notifications.failures": "Errori",
+        "admin.fcm": "Test notifiche push (FCM)",
+        "admin.fcm.help": (
+            "Per ora test manuale: incolla un token FCM ottenuto dalla pagina "
+            "token.html e invia una notifica di prova al tuo telefono."
+        ),
+        "admin.fcm.token": "Token dispositivo FCM",
+        "admin.fcm.default_title": "Test notifica Sci Club",
+        "admin.fcm.default_body": "Questa è una notifica di prova dall'app {club}.",
+        "admin.fcm.title": "Titolo notifica",
+        "admin.fcm.body": "Messaggio",
+        "admin.fcm.send": "Invia notifica di test",
+        "admin.fcm.missing": "Inserisci prima un token FCM valido.",
+        "admin.fcm.sent": "Notifica inviata correttamente ({success}/{total}).",
+        "admin.fcm.failed": "Nessuna notifica inviata. Controlla token e configurazione FCM.",
+    },
+    "fr": {
+        "language": "Langue",
+        "login.heading": "Connexion",
+        "login.club": "Club",
+        "login.email": "Email",
+        "login.password": "Mot de passe",
+        "login.submit": "Se connecter",
+        "login.failed": "Email ou mot de passe incorrect.",
+        "login.no_club": "Aucun club configuré.",
+        "sidebar.signed_in_as": "Connecté en tant que **{name}** ({role})",
+        "sidebar.logout": "Déconnexion",
+        "role.admin": "Administrateur",
+        "role.coach": "Entraîneur",
+        "role.parent": "Parent",
+        "role.unknown": "Rôle inconnu.",
+        "event.race": "Course",
+        "event.training": "Entraînement",
+        "event.location": "Lieu : {location}",
+        "event.conditions": "Conditions : {conditions}",
+        "events.none": "Aucun événement à venir.",
+        "view.label": "Affichage",
+        "view.list": "Liste",
+        "view.calendar": "Calendrier",
+        "conditions.snow": "Neige {cm} cm",
+        "conditions.new_snow": " (+{cm} fraîche)",
+        "status.undecided": "À confirmer",
+        "status.present": "Présent",
+        "status.absent": "Absent",
+        "attendance.label": "Présence",
+        "attendance.skiroom": "Skis au local à skis",
+        "attendance.car": "En voiture (pour cette course)",
+        "attendance.seats": "Places libres en voiture",
+        "attendance.car_not_needed": "Voiture non demandée pour les entraînements.",
+        "attendance.saved": "Données mises à jour pour cet athlète.",
+        "save": "Enregistrer",
+        "parent.header": "Espace parents",
+        "parent.no_athletes": "Aucun athlète lié à ce parent.",
+        "parent.your_athletes": "Vos athlètes",
+        "parent.no_categories": "Aucune catégorie liée à vos athlètes.",
+        "parent.upcoming": "Prochains événements de vos enfants",
+        "parent.tab.events": "Événements",
+        "parent.tab.messages": "Messages",
+        "parent.tab.reports": "Rapports",
+        "parent.tab.settings": "Paramètres",
+        "parent.messages": "Messages de l'équipe",
+        "parent.messages_placeholder": (
+            "Dans cette version de démonstration, les messages sont en lecture seule."
+        ),
+        "parent.reports": "Rapports de l'athlète",
+        "parent.reports_placeholder": (
+            "Dans cette version de démonstration, les rapports sont en lecture seule."
+        ),
+        "settings.header": "Notifications",
+        "settings.intro": (
+            "Collez ici le **device token FCM** obtenu sur la page `token.html`. "
+            "Il relie votre téléphone aux notifications du Ski Club."
+        ),
+        "settings.token": "Token FCM de l'appareil",
+        "settings.save_token": "Enregistrer le token",
+        "settings.token_missing": "Saisissez un token valide avant d'enregistrer.",
+        "settings.token_saved": (
+            "Token enregistré. Cet appareil peut maintenant recevoir des notifications."
+        ),
+        "calendar.empty": "Aucun événement ce mois-ci.",
+        "calendar.subscribe_rotate": "Générer un nouveau lien",
+        "calendar.subscribe_rotated": "Nouveau lien généré : l'ancien ne fonctionne plus.",
+        "calendar.subscribe": "S'abonner au calendrier",
+        "calendar.subscribe_help": (
+            "Ajoutez cette adresse à votre agenda (Google, Apple, Outlook : "
+            "« ajouter depuis une URL ») pour suivre les événements et leurs "
+            "modifications. Elle est personnelle : ne la partagez pas."
+        ),
+        "weekday.0": "Lun", "weekday.1": "Mar", "weekday.2": "Mer",
+        "weekday.3": "Jeu", "weekday.4": "Ven", "weekday.5": "Sam",
+        "weekday.6": "Dim",
+        "month.1": "Janvier", "month.2": "Février", "month.3": "Mars",
+        "month.4": "Avril", "month.5": "Mai", "month.6": "Juin",
+        "month.7": "Juillet", "month.8": "Août", "month.9": "Septembre",
+        "month.10": "Octobre", "month.11": "Novembre", "month.12": "Décembre",
+        "yes": "Oui",
+        "not_applicable": "N/A",
+        "field.category": "Catégorie",
+        "field.title": "Titre",
+        "field.location": "Lieu",
+        "field.description": "Description",
+        "field.season": "Saison",
+        "field.from": "Du",
+        "field.to": "Au",
+        "col.event": "Événement",
+        "col.athlete": "Athlète",
+        "col.status": "Statut",
+        "col.car": "Voiture",
+        "coach.header": "Espace entraîneur",
+        "coach.tab.events": "Événements",
+        "coach.tab.messages": "Communications",
+        "coach.tab.reports": "Rapports",
+        "coach.tab.stats": "Statistiques",
+        "coach.tab.export": "Export",
+        "coach.no_categories": "Vous n'êtes affecté à aucune catégorie.",
+        "coach.categories": "Catégories suivies",
+        "coach.upcoming": "Prochains événements de vos catégories",
+        "coach.no_events": "Aucun événement à venir pour vos catégories.",
+        "coach.series.header": "Nouvelle série d'entraînements récurrents",
+        "coach.series.weekdays": "Jours de la semaine",
+        "coach.series.ask_skiroom": "Demander les skis au local à skis",
+        "coach.series.create": "Créer la série",
+        "coach.series.missing": "Saisissez un titre et au moins un jour de la semaine.",
+        "coach.series.created": "Série créée. Les dates sont générées au fur et à mesure.",
+        "coach.live.header": "Présences en temps réel",
+        "coach.live.present": "Présents",
+        "coach.live.absent": "Absents",
+        "coach.live.seats": "Places en voiture",
+        "coach.live.refresh": "Mise à jour automatique toutes les {seconds} secondes.",
+        "coach.cancel_occurrence": "Annuler cette date",
+        "coach.no_athletes_event": "Aucun athlète lié à cet événement.",
+        "coach.metric.expected": "Présences prévues",
+        "coach.metric.drivers": "En voiture",
+        "coach.metric.seats": "Places en voiture au total",
+        "coach.athletes_detail": "Détail des athlètes :",
+        "coach.car_seats": "Oui ({seats} places)",
+        "coach.show_history": "Afficher l'historique des modifications",
+        "coach.read_only_note": (
+            "_Note : dans cette version, l'entraîneur consulte sans modifier ; "
+            "les modifications viennent des parents._"
+        ),
+        "coach.messages.header": "Nouvelle communication aux parents",
+        "coach.messages.recipients": "Destinataires",
+        "coach.messages.to_all": "Tous les parents de mes catégories",
+        "coach.messages.to_category": "Une seule catégorie",
+        "coach.messages.to_athlete": "Par athlète",
+        "coach.messages.no_athletes": "Aucun athlète lié à vos catégories.",
+        "coach.messages.content": "Contenu",
+        "coach.messages.send": "Envoyer la communication",
+        "coach.messages.missing": "Saisissez un titre et un contenu.",
+        "coach.messages.bad_recipients": "Sélectionnez correctement les destinataires.",
+        "coach.messages.sent": (
+            "Message enregistré. Notification en attente pour {queued} parents "
+            "(envoi sous {seconds} secondes)."
+        ),
+        "history.none": "Aucune modification enregistrée.",
+        "history.when": "Quand (UTC)",
+        "history.by": "Par",
+        "history.source": "Origine",
+        "history.source_app": "Application mobile",
+        "history.source_web": "Web",
+        "results.header": "Résultats des courses et classements",
+        "results.no_categories": "Aucune catégorie.",
+        "results.race_header": "Résultats de la course",
+        "results.standings_header": "Classement de la saison",
+        "results.no_races": "Aucune course disputée.",
+        "results.count": " · {count} résultats",
+        "results.file_help": (
+            "Export du chronométrage en CSV ou XML. Colonnes (ou balises) : pettorale, "
+            "nome, manche1, manche2, totale, stato (DNF/DSQ/DNS). Un nouveau "
+            "chargement remplace les résultats de la course."
+        ),
+        "results.file": "Fichier des résultats",
+        "results.upload": "Charger les résultats",
+        "results.failed": "Échec de l'import : {error}",
+        "results.imported": "Lignes lues : {rows}, résultats importés : {imported}.",
+        "results.unmatched": "Concurrents hors club ({count}) : ",
+        "results.row_error": "Ligne {line} : {message}",
+        "results.none": "Aucun résultat chargé pour cette course.",
+        "results.club_athletes": "⭐ athlètes du club",
+        "results.no_points": "Aucun point attribué cette saison.",
+        "results.col.rank": "Pos.",
+        "results.col.bib": "Dos.",
+        "results.col.name": "Concurrent",
+        "results.col.run1": "1re manche",
+        "results.col.run2": "2e manche",
+        "results.col.total": "Total",
+        "results.col.points": "Points",
+        "results.col.races": "Courses",
+        "results.col.wins": "Victoires",
+        "results.col.podiums": "Podiums",
+        "stats.header": "Statistiques de présence",
+        "stats.season_header": "Statistiques de présence de la saison",
+        "stats.none": "Aucun événement disputé cette saison.",
+        "stats.events": "Événements disputés",
+        "stats.athletes": "Athlètes",
+        "stats.average": "Présence moyenne",
+        "stats.by_athlete": "Présences par athlète",
+        "stats.rate": "% présences",
+        "stats.by_weekday": "Présence par jour de la semaine",
+        "stats.trend": "Évolution mensuelle par catégorie",
+        "stats.col.events": "Événements",
+        "stats.col.present": "Présences",
+        "stats.col.best_streak": "Meilleure série",
+        "stats.col.current_streak": "Série en cours",
+        "exports.header": "Export des présences et de la logistique",
+        "exports.kind": "Données à exporter",
+        "exports.kind.attendance": "Présences",
+        "exports.kind.skiroom": "Local à skis",
+        "exports.kind.carpool": "Voiture / covoiturage",
+        "exports.period": "Période",
+        "exports.period.range": "Plage de dates",
+        "exports.format": "Format",
+        "exports.download": "Télécharger",
+        "admin.header": "Espace administrateur",
+        "admin.metric.users": "Utilisateurs",
+        "admin.metric.categories": "Catégories",
+        "admin.metric.athletes": "Athlètes",
+        "admin.metric.events": "Événements",
+        "admin.upcoming": "Prochains événements du club",
+        "admin.ask_skiroom": "Skis au local à skis demandés : {mark}",
+        "admin.ask_carpool": "Voiture/covoiturage demandé : {mark}",
+        "admin.calendar": "Calendrier des événements",
+        "admin.locations": "Lieux",
+        "admin.locations.none": "Aucun lieu : ils sont créés avec les événements.",
+        "admin.locations.help": (
+            "Les coordonnées et l'altitude servent aux conditions de neige et météo."
+        ),
+        "admin.locations.resort": "Domaine",
+        "admin.locations.piste": "Piste",
+        "admin.locations.latitude": "Latitude",
+        "admin.locations.longitude": "Longitude",
+        "admin.locations.altitude": "Altitude (m)",
+        "admin.locations.save": "Enregistrer les lieux",
+        "admin.locations.saved": "Lieux mis à jour : {count}.",
+        "admin.credentials": "Identifiants de connexion",
+        "admin.credentials.email": "Email de l'utilisateur",
+        "admin.credentials.password": "Nouveau mot de passe",
+        "admin.credentials.save": "Définir le mot de passe",
+        "admin.credentials.unknown": "Aucun utilisateur avec cet email.",
+        "admin.credentials.too_short": "Le mot de passe doit contenir au moins 8 caractères.",
+        "admin.credentials.saved": "Mot de passe mis à jour pour {name}.",
+        "admin.import": "Import de l'effectif depuis CSV / Excel",
+        "admin.import.help": (
+            "Une ligne par athlète (ou par couple athlète-parent). Colonnes : {columns}. "
+            "Obligatoires : `atleta`, `categoria`. Les utilisateurs existants sont "
+            "reconnus par leur email."
+        ),
+        "admin.import.file": "Fichier de l'effectif",
+        "admin.import.dry_run": "Simuler l'import",
+        "admin.import.run": "Importer",
+        "admin.import.no_changes": "Aucune modification : l'effectif est déjà à jour.",
+        "admin.import.done": "Import terminé.",
+        "admin.import.rows": "Lignes lues",
+        "admin.import.rejected": "{count} lignes rejetées :",
+        "admin.import.new_categories": "Nouvelles catégories",
+        "admin.import.new_users": "Nouveaux utilisateurs",
+        "admin.import.new_athletes": "Nouveaux athlètes",
+        "admin.import.moved_athletes": "Athlètes qui changent de catégorie",
+        "admin.import.new_parent_links": "Nouveaux liens parent-athlète",
+        "admin.import.new_coach_links": "Nouveaux liens entraîneur-catégorie",
+        "admin.import.col.row": "Ligne",
+        "admin.import.col.error": "Erreur",
+        "admin.import.col.name": "Nom",
+        "admin.import.col.role": "Rôle",
+        "admin.import.col.year": "Année",
+        "admin.import.col.from": "De",
+        "admin.import.col.to": "À",
+        "admin.archive": "Archive des saisons terminées",
+        "admin.archive.help": (
+            "Déplace les événements, présences, messages et rapports des saisons "
+            "terminées vers la base d'archive. Les statistiques restent consultables ici."
+        ),
+        "admin.archive.run": "Archiver les saisons terminées",
+        "admin.archive.done": "Archivage terminé : {count} événements déplacés.",
+        "admin.archive.none": "Aucune saison archivée.",
+        "admin.archive.col.absent": "Absences",
+        "admin.notifications": "Statistiques d'envoi des notifications",
+        "admin.notifications.submitted": "Messages reçus",
+        "admin.notifications.pushes": "Push envoyés",
+        "admin.notifications.dedup": "Regroupés / doublons",
+        "admin.notifications.per_minute": "Push par minute",
+        "admin.notifications.pending": "En attente",
+        "admin.notifications.throttled_user": "Limités (utilisateur)",
+        "admin.notifications.throttled_global": "Limités (global)",
+        "admin.notifications.failures": "Erreurs",
+        "admin.fcm": "Test des notifications push (FCM)",
+        "admin.fcm.help": (
+            "Test manuel pour l'instant : collez un token FCM obtenu sur la page "
+            "token.html et envoyez une notification d'essai à votre téléphone."
+        ),
+        "admin.fcm.token": "Token FCM de l'appareil",
+        "admin.fcm.default_title": "Test de notification Ski Club",
+        "admin.fcm.default_body": "Ceci est une notification d'essai de l'application {club}.",
+        "admin.fcm.title": "Titre de la notification",
+        "admin.fcm.body": "Message",
+        "admin.fcm.send": "Envoyer une notification d'essai",
+        "admin.fcm.missing": "Saisissez d'abord un token FCM valide.",
+        "admin.fcm.sent": "Notification envoyée ({success}/{total}).",
+        "admin.fcm.failed": (
+            "Aucune notification envoyée. Vérifiez le token et la configuration FCM."
+        ),
+    },
+    "en": {
+        "language": "Language",
+        "login.heading": "Sign in",
+        "login.club": "Club",
+        "login.email": "Email",
+        "login.password": "Password",
+        "login.submit": "Sign in",
+        "login.failed": "Incorrect email or password.",
+        "login.no_club": "No club configured.",
+        "sidebar.signed_in_as": "Signed in as **{name}** ({role})",
+        "sidebar.logout": "Log out",
+        "role.admin": "Admin",
+        "role.coach": "Coach",
+        "role.parent": "Parent",
+        "role.unknown": "Unknown role.",
+        "event.race": "Race",
+        "event.training": "Training",
+        "event.location": "Location: {location}",
+        "event.conditions": "Conditions: {conditions}",
+        "events.none": "No upcoming events.",
+        "view.label": "View",
+        "view.list": "List",
+        "view.calendar": "Calendar",
+        "conditions.snow": "Snow {cm} cm",
+        "conditions.new_snow": " (+{cm} fresh)",
+        "status.undecided": "To be confirmed",
+        "status.present": "Present",
+        "status.absent": "Absent",
+        "attendance.label": "Attendance",
+        "attendance.skiroom": "Skis in the ski room",
+        "attendance.car": "Driving (for this race)",
+        "attendance.seats": "Free car seats",
+        "attendance.car_not_needed": "No car needed for training sessions.",
+        "attendance.saved": "Details updated for this athlete.",
+        "save": "Save",
+        "parent.header": "Parent dashboard",
+        "parent.no_athletes": "No athletes linked to this parent.",
+        "parent.your_athletes": "Your athletes",
+        "parent.no_categories": "No categories linked to your athletes.",
+        "parent.upcoming": "Upcoming events for your children",
+        "parent.tab.events": "Events",
+        "parent.tab.messages": "Messages",
+        "parent.tab.reports": "Reports",
+        "parent.tab.settings": "Settings",
+        "parent.messages": "Messages from the staff",
+        "parent.messages_placeholder": "In this demo version messages are read-only.",
+        "parent.reports": "Athlete reports",
+        "parent.reports_placeholder": "In this demo version reports are read-only.",
+        "settings.header": "Notification settings",
+        "settings.intro": (
+            "Paste the **FCM device token** you got from the `token.html` page. "
+            "It links your phone to the Ski Club notifications."
+        ),
+        "settings.token": "FCM device token",
+        "settings.save_token": "Save token",
+        "settings.token_missing": "Enter a valid token before saving.",
+        "settings.token_saved": "Token saved. This device can now receive push notifications.",
+        "calendar.empty": "No events this month.",
+        "calendar.subscribe_rotate": "Generate a new link",
+        "calendar.subscribe_rotated": "New link generated: the old one no longer works.",
+        "calendar.subscribe": "Subscribe to the calendar",
+        "calendar.subscribe_help": (
+            "Add this address to your calendar (Google, Apple, Outlook: "
+            "\"add from URL\") to follow events and their changes. It is "
+            "personal: do not share it."
+        ),
+        "weekday.0": "Mon", "weekday.1": "Tue", "weekday.2": "Wed",
+        "weekday.3": "Thu", "weekday.4": "Fri", "weekday.5": "Sat",
+        "weekday.6": "Sun",
+        "month.1": "January", "month.2": "February", "month.3": "March",
+        "month.4": "April", "month.5": "May", "month.6": "June",
+        "month.7": "July", "month.8": "August", "month.9": "September",
+        "month.10": "October", "month.11": "November", "month.12": "December",
+        "yes": "Yes",
+        "not_applicable": "N/A",
+        "field.category": "Category",
+        "field.title": "Title",
+        "field.location": "Location",
+        "field.description": "Description",
+        "field.season": "Season",
+        "field.from": "From",
+        "field.to": "To",
+        "col.event": "Event",
+        "col.athlete": "Athlete",
+        "col.status": "Status",
+        "col.car": "Car",
+        "coach.header": "Coach dashboard",
+        "coach.tab.events": "Events",
+        "coach.tab.messages": "Messages",
+        "coach.tab.reports": "Reports",
+        "coach.tab.stats": "Statistics",
+        "coach.tab.export": "Export",
+        "coach.no_categories": "You are not assigned to any category.",
+        "coach.categories": "Your categories",
+        "coach.upcoming": "Upcoming events in your categories",
+        "coach.no_events": "No upcoming events in your categories.",
+        "coach.series.header": "New recurring training series",
+        "coach.series.weekdays": "Days of the week",
+        "coach.series.ask_skiroom": "Ask for skis in the ski room",
+        "coach.series.create": "Create series",
+        "coach.series.missing": "Enter a title and at least one day of the week.",
+        "coach.series.created": "Series created. Dates are generated as time goes by.",
+        "coach.live.header": "Live attendance summary",
+        "coach.live.present": "Present",
+        "coach.live.absent": "Absent",
+        "coach.live.seats": "Car seats",
+        "coach.live.refresh": "Refreshes automatically every {seconds} seconds.",
+        "coach.cancel_occurrence": "Cancel this date",
+        "coach.no_athletes_event": "No athletes linked to this event.",
+        "coach.metric.expected": "Expected",
+        "coach.metric.drivers": "Drivers",
+        "coach.metric.seats": "Total car seats",
+        "coach.athletes_detail": "Athletes:",
+        "coach.car_seats": "Yes ({seats} seats)",
+        "coach.show_history": "Show change history",
+        "coach.read_only_note": (
+            "_Note: in this version coaches can view but not edit; "
+            "changes come from parents._"
+        ),
+        "coach.messages.header": "New message to parents",
+        "coach.messages.recipients": "Recipients",
+        "coach.messages.to_all": "All parents in my categories",
+        "coach.messages.to_category": "One category only",
+        "coach.messages.to_athlete": "By athlete",
+        "coach.messages.no_athletes": "No athletes linked to your categories.",
+        "coach.messages.content": "Content",
+        "coach.messages.send": "Send message",
+        "coach.messages.missing": "Enter a title and some content.",
+        "coach.messages.bad_recipients": "Select the recipients correctly.",
+        "coach.messages.sent": (
+            "Message saved. Notification queued for {queued} parents "
+            "(sent within {seconds} seconds)."
+        ),
+        "history.none": "No changes recorded.",
+        "history.when": "When (UTC)",
+        "history.by": "By",
+        "history.source": "Source",
+        "history.source_app": "Mobile app",
+        "history.source_web": "Web",
+        "results.header": "Race results and standings",
+        "results.no_categories": "No categories.",
+        "results.race_header": "Race results",
+        "results.standings_header": "Season standings",
+        "results.no_races": "No races run yet.",
+        "results.count": " · {count} results",
+        "results.file_help": (
+            "Timing export as CSV or XML. Columns (or tags): pettorale, nome, "
+            "manche1, manche2, totale, stato (DNF/DSQ/DNS). A new upload "
+            "replaces the results of the race."
+        ),
+        "results.file": "Results file",
+        "results.upload": "Upload results",
+        "results.failed": "Import failed: {error}",
+        "results.imported": "Rows read: {rows}, results imported: {imported}.",
+        "results.unmatched": "Competitors not in the club ({count}): ",
+        "results.row_error": "Row {line}: {message}",
+        "results.none": "No results uploaded for this race.",
+        "results.club_athletes": "⭐ club athletes",
+        "results.no_points": "No points awarded this season.",
+        "results.col.rank": "Pos.",
+        "results.col.bib": "Bib",
+        "results.col.name": "Competitor",
+        "results.col.run1": "Run 1",
+        "results.col.run2": "Run 2",
+        "results.col.total": "Total",
+        "results.col.points": "Points",
+        "results.col.races": "Races",
+        "results.col.wins": "Wins",
+        "results.col.podiums": "Podiums",
+        "stats.header": "Attendance statistics",
+        "stats.season_header": "Season attendance statistics",
+        "stats.none": "No events held this season.",
+        "stats.events": "Events held",
+        "stats.athletes": "Athletes",
+        "stats.average": "Average attendance",
+        "stats.by_athlete": "Attendance by athlete",
+        "stats.rate": "% attendance",
+        "stats.by_weekday": "Attendance by day of the week",
+        "stats.trend": "Monthly trend by category",
+        "stats.col.events": "Events",
+        "stats.col.present": "Attended",
+        "stats.col.best_streak": "Best streak",
+        "stats.col.current_streak": "Current streak",
+        "exports.header": "Attendance and logistics export",
+        "exports.kind": "Data to export",
+        "exports.kind.attendance": "Attendance",
+        "exports.kind.skiroom": "Ski room",
+        "exports.kind.carpool": "Car / carpooling",
+        "exports.period": "Period",
+        "exports.period.range": "Date range",
+        "exports.format": "Format",
+        "exports.download": "Download",
+        "admin.header": "Admin dashboard",
+        "admin.metric.users": "Users",
+        "admin.metric.categories": "Categories",
+        "admin.metric.athletes": "Athletes",
+        "admin.metric.events": "Events",
+        "admin.upcoming": "Upcoming club events",
+        "admin.ask_skiroom": "Skis in the ski room requested: {mark}",
+        "admin.ask_carpool": "Car/carpooling requested: {mark}",
+        "admin.calendar": "Event calendar",
+        "admin.locations": "Locations",
+        "admin.locations.none": "No locations: they are created together with events.",
+        "admin.locations.help": "Coordinates and altitude are used for snow and weather conditions.",
+        "admin.locations.resort": "Resort",
+        "admin.locations.piste": "Piste",
+        "admin.locations.latitude": "Latitude",
+        "admin.locations.longitude": "Longitude",
+        "admin.locations.altitude": "Altitude (m)",
+        "admin.locations.save": "Save locations",
+        "admin.locations.saved": "Locations updated: {count}.",
+        "admin.credentials": "Sign-in credentials",
+        "admin.credentials.email": "User email",
+        "admin.credentials.password": "New password",
+        "admin.credentials.save": "Set password",
+        "admin.credentials.unknown": "No user with this email.",
+        "admin.credentials.too_short": "The password must be at least 8 characters long.",
+        "admin.credentials.saved": "Password updated for {name}.",
+        "admin.import": "Roster import from CSV / Excel",
+        "admin.import.help": (
+            "One row per athlete (or per athlete-parent pair). Columns: {columns}. "
+            "Required: `atleta`, `categoria`. Existing users are matched by email."
+        ),
+        "admin.import.file": "Roster file",
+        "admin.import.dry_run": "Simulate import",
+        "admin.import.run": "Import",
+        "admin.import.no_changes": "No changes: the roster is already up to date.",
+        "admin.import.done": "Import completed.",
+        "admin.import.rows": "Rows read",
+        "admin.import.rejected": "{count} rows rejected:",
+        "admin.import.new_categories": "New categories",
+        "admin.import.new_users": "New users",
+        "admin.import.new_athletes": "New athletes",
+        "admin.import.moved_athletes": "Athletes changing category",
+        "admin.import.new_parent_links": "New parent-athlete links",
+        "admin.import.new_coach_links": "New coach-category links",
+        "admin.import.col.row": "Row",
+        "admin.import.col.error": "Error",
+        "admin.import.col.name": "Name",
+        "admin.import.col.role": "Role",
+        "admin.import.col.year": "Year",
+        "admin.import.col.from": "From",
+        "admin.import.col.to": "To",
+        "admin.archive": "Archive of completed seasons",
+        "admin.archive.help": (
+            "Moves events, attendance, messages and reports of completed seasons "
+            "to the archive database. Statistics remain available here."
+        ),
+        "admin.archive.run": "Archive completed seasons",
+        "admin.archive.done": "Archiving completed: {count} events moved.",
+        "admin.archive.none": "No archived seasons.",
+        "admin.archive.col.absent": "Absences",
+        "admin.notifications": "Notification delivery metrics",
+        "admin.notifications.submitted": "Messages received",
+        "admin.notifications.pushes": "Pushes sent",
+        "admin.notifications.dedup": "Merged / duplicates",
+        "admin.notifications.per_minute": "Pushes per minute",
+        "admin.notifications.pending": "Queued",
+        "admin.notifications.throttled_user": "Throttled (user)",
+        "admin.notifications.throttled_global": "Throttled (global)",
+        "admin.notifications.failures": "Errors",
+        "admin.fcm": "Push notification test (FCM)",
+        "admin.fcm.help": (
+            "Manual test for now: paste an FCM token from the token.html page "
+            "and send a test notification to your phone."
+        ),
+        "admin.fcm.token": "FCM device token",
+        "admin.fcm.default_title": "Sci Club test notification",
+        "admin.fcm.default_body": "This is a test notification from the {club} app.",
+        "admin.fcm.title": "Notification title",
+        "admin.fcm.body": "Message",
+        "admin.fcm.send": "Send test notification",
+        "admin.fcm.missing": "Enter a valid FCM token first.",
+        "admin.fcm.sent": "Notification sent ({success}/{total}).",
+        "admin.fcm.failed": "No notification sent. Check the token and the FCM configuration.",
+    },
+}
+
+
+def normalize_language(language: Optional[str]) -> str:
+    """Codice di una lingua disponibile (la predefinita se sconosciuta)."""
+    language = (language or "").strip().lower()[:2]
+    return language if language in LANGUAGES else DEFAULT_LANGUAGE
+
+
+def _fields(text: str) -> frozenset:
+    return frozenset(name for _, name, _, _ in Formatter().parse(text) if name)
+
+
+@lru_cache(maxsize=None)
+def catalogue(language: str) -> Mapping[str, str]:
+    """Testi della lingua (con riserva italiana), compilati una volta."""
+    language = normalize_language(language)
+    base = _CATALOGUES[DEFAULT_LANGUAGE]
+    compiled = dict(base)
+    for key, text in _CATALOGUES[language].items():
+        if key not in base:
+            logging.warning("i18n: chiave %s sconosciuta (%s)", key, language)
+        elif _fields(text) != _fields(base[key]):
+            logging.warning("i18n: segnaposto diversi in %s (%s)", key, language)
+        else:
+            compiled[key] = text
+    return MappingProxyType(compiled)
+
+
+class Translator:
+    """t("chiave", nome=valore) -> testo nella lingua; la chiave se manca."""
+
+    __slots__ = ("language", "messages")
+
+    def __init__(self, language: str):
+        self.language = normalize_language(language)
+        self.messages = catalogue(self.language)
+
+    def __call__(self, key: str, **values) -> str:
+        text = self.messages.get(key, key)
+        return text.format(**values) if values else text
+
+
+@lru_cache(maxsize=None)
+def translator(language: Optional[str]) -> Translator:
+    return Translator(normalize_language(language))
+
+
+@lru_cache(maxsize=None)
+def status_labels(language: Optional[str]) -> Mapping[str, str]:
+    """Stato di presenza -> etichetta, in ordine di visualizzazione."""
+    messages = catalogue(normalize_language(language))
+    return MappingProxyType({s: messages[f"status.{s}"] for s in STATUS_KEYS})
+
+
+@lru_cache(maxsize=None)
+def weekday_labels(language: Optional[str]) -> Tuple[str, ...]:
+    """Giorni della settimana abbreviati, da lunedì."""
+    messages = catalogue(normalize_language(language))
+    return tuple(messages[f"weekday.{i}"] for i in range(7))
+
+
+@lru_cache(maxsize=None)
+def month_names(language: Optional[str]) -> Tuple[str, ...]:
+    """Nomi dei mesi; indice 0 vuoto per usare direttamente il numero del mese."""
+    messages = catalogue(normalize_language(language))
+    return ("",) + tuple(messages[f"month.{m}"] for m in range(1, 13))
@@ -0,0 +1,86 @@
+# core/leases.py
+# Elezione del "leader" per i lavori in background con più processi.
+#
+# Ogni lavoro (promemoria, svuotamento della coda push, avanzamento delle
+# serie) ha una riga in worker_leases: la esegue solo il processo che
+# tiene la lease non scaduta. Chi la tiene la rinnova a ogni giro; se il
+# processo si ferma, alla scadenza la prende un altro.
+#
+# Acquisire è un solo upsert condizionato (prende la riga solo se è
+# scaduta o è già sua), atomico anche tra processi. Fino a metà durata
+# chi tiene la lease non torna sul database, e chi non la tiene non ci
+# riprova prima della scadenza vista l'ultima volta.
+#
+# Con un solo processo (SCICLUB_MULTIPROCESS non impostato, core/db.py) non
+# c'è nessuno con cui contendersi i lavori: la lease è sempre nostra e non
+# si tocca il database.
+
+from __future__ import annotations
+
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .db import MULTIPROCESS, engine
+from .models import WorkerLease
+
+
+LEASE_SECONDS = 60
+
+# identifica il processo (host, pid e un suffisso casuale per i pid riusati)
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+_lock = threading.Lock()
+# job -> (nostra?, scadenza vista)
+_known: Dict[str, tuple] = {}
+
+
+def acquire_lease(job: str, seconds: float = LEASE_SECONDS) -> bool:
+    """True se questo processo deve eseguire il lavoro (lease presa o rinnovata)."""
+    if not MULTIPROCESS:
+        return True
+    now = datetime.utcnow()
+    with _lock:
+        known = _known.get(job)
+        if known is not None:
+            mine, expires_at = known
+            if mine and now < expires_at - timedelta(seconds=seconds / 2):
+                return True
+            if not mine and now < expires_at:
+                return False
+
+    table = WorkerLease.__table__
+    expires_at = now + timedelta(seconds=seconds)
+    stmt = sqlite_insert(table).values(job=job, holder=INSTANCE_ID, expires_at=expires_at)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["job"],
+        set_={"holder": stmt.excluded.holder, "expires_at": stmt.excluded.expires_at},
+        where=(table.c.holder == INSTANCE_ID) | (table.c.expires_at < now),
+    )
+    with engine.begin() as conn:
+        conn.execute(stmt)
+        holder, current_expiry = conn.execute(
+            select(table.c.holder, table.c.expires_at).where(table.c.job == job)
+        ).one()
+
+    mine = holder == INSTANCE_ID
+    with _lock:
+        _known[job] = (mine, current_expiry)
+    return mine
+
+
+def release_lease(job: str) -> None:
+    """Lascia il lavoro (es. all'arresto): un altro processo lo prende subito."""
+    if not MULTIPROCESS:
+        return
+    with _lock:
+        _known.pop(job, None)
+    table = WorkerLease.__table__
+    with engine.begin() as conn:
+        conn.execute(delete(table).where(table.c.job == job, table.c.holder == INSTANCE_ID))
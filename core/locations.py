@@ -0,0 +1,84 @@
+# core/locations.py
+# Catalogo delle località (comprensorio + pista) a cui puntano eventi e
+# serie. Il testo libero di una volta ("Champoluc – Crest") si divide in
+# comprensorio e pista; la stessa coppia è sempre la stessa riga.
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .models import Location
+
+
+_LOCATION_COLUMNS = (
+    Location.id,
+    Location.resort,
+    Location.piste,
+    Location.latitude,
+    Location.longitude,
+    Location.altitude,
+)
+
+# "Antagnod – Boudin", "Antagnod - Boudin", "Antagnod, Boudin"
+_SEPARATOR = re.compile(r"\s+[–—-]\s+|\s*,\s*")
+
+
+@dataclass(frozen=True, slots=True)
+class LocationRow:
+    id: int
+    resort: str
+    piste: str
+    latitude: Optional[float]
+    longitude: Optional[float]
+    altitude: Optional[int]
+
+    @property
+    def label(self) -> str:
+        return f"{self.resort} – {self.piste}" if self.piste else self.resort
+
+
+def split_label(label: Optional[str]) -> Tuple[str, str]:
+    """(comprensorio, pista) da un'etichetta libera; ("", "") se vuota."""
+    text = " ".join((label or "").split())
+    if not text:
+        return "", ""
+    parts = _SEPARATOR.split(text, maxsplit=1)
+    return parts[0], parts[1] if len(parts) > 1 else ""
+
+
+def get_or_create_location(db: Session, label: Optional[str]) -> Optional[Location]:
+    """Località dell'etichetta nel club della sessione, creata se manca. Non fa commit."""
+    resort, piste = split_label(label)
+    if not resort:
+        return None
+    location = db.execute(
+        select(Location).where(Location.resort == resort, Location.piste == piste)
+    ).scalar_one_or_none()
+    if location is None:
+        location = Location(resort=resort, piste=piste)
+        db.add(location)
+        db.flush()
+    return location
+
+
+def location_rows(db: Session, location_ids: Iterable[int]) -> Dict[int, LocationRow]:
+    ids = list(set(location_ids))
+    if not ids:
+        return {}
+    rows = db.execute(
+        select(*_LOCATION_COLUMNS).where(Location.id.in_(ids))
+    )
+    return {row[0]: LocationRow(*row) for row in rows}
+
+
+def list_locations(db: Session) -> List[LocationRow]:
+    """Località del club, in ordine alfabetico."""
+    rows = db.execute(
+        select(*_LOCATION_COLUMNS).order_by(Location.resort, Location.piste)
+    )
+    return [LocationRow(*row) for row in rows]
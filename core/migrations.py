@@ -0,0 +1,867 @@
+# core/migrations.py
+# Migrazioni di schema versionate, al posto di create_all a ogni avvio.
+#
+# - Le versioni applicate sono nella tabella schema_migrations.
+# - Database nuovo: create_all con lo schema attuale e tutte le versioni
+#   segnate come applicate. Database esistente: si applicano in ordine le
+#   versioni mancanti; ogni passo controlla lo stato reale (colonna o
+#   indice già presente, ecc.), quindi rieseguirlo non fa danni.
+# - Ogni migrazione fissa il proprio DDL (tabelle, colonne, indici) com'era
+#   alla sua versione e non legge il modello attuale: tests/test_migrations.py
+#   controlla che aggiornare un database vecchio dia lo stesso schema di
+#   uno nuovo.
+# - Le operazioni su tabelle grandi non tengono il database bloccato a
+#   lungo: i riempimenti di colonne vanno a lotti di BATCH_SIZE righe, una
+#   transazione per lotto, e ogni indice è una transazione a sé.
+# - Le modifiche che SQLite non sa fare con ALTER TABLE (vincoli UNIQUE,
+#   NOT NULL, AUTOINCREMENT) ricostruiscono la tabella: copia a lotti in
+#   una nuova tabella, poi DROP e RENAME, tutto in una transazione (le
+#   scritture degli altri processi aspettano la fine della copia).
+#
+# ensure_schema() fa il controllo una volta per processo.
+#
+# Uso da riga di comando:
+#   python -m core.migrations            # applica le versioni mancanti
+#   python -m core.migrations status
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from . import models  # noqa: F401  (registra le tabelle per create_all)
+from .archive import ARCHIVE_SCHEMA, ensure_archive_schema
+from .db import Base, engine
+from .locations import split_label
+from .tenancy import DEFAULT_CLUB_NAME, DEFAULT_CLUB_SLUG
+
+
+BATCH_SIZE = 20000
+# pausa tra un lotto e l'altro (>= attesa massima del busy handler di
+# SQLite, 100 ms): lascia passare le scritture dell'app
+BATCH_PAUSE_SECONDS = 0.1
+
+_MIGRATIONS_DDL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name VARCHAR(200) NOT NULL,
+        applied_at DATETIME NOT NULL
+    )
+"""
+
+_lock = threading.Lock()
+_checked = False
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    run: Callable[[Connection], None]
+
+
+# --------- UTILS ----------
+
+
+@contextmanager
+def _transaction(conn: Connection) -> Iterator[None]:
+    # connessione in autocommit: transazioni esplicite, DDL comprese
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        conn.exec_driver_sql("ROLLBACK")
+        raise
+    conn.exec_driver_sql("COMMIT")
+
+
+def _has_table(conn: Connection, name: str, schema: str = "main") -> bool:
+    return (
+        conn.execute(
+            text(f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = :n"),
+            {"n": name},
+        ).first()
+        is not None
+    )
+
+
+def _columns(conn: Connection, table: str, schema: str = "main") -> dict:
+    """Nome colonna -> notnull, dal database."""
+    return {
+        row[1]: bool(row[3])
+        for row in conn.execute(text(f"PRAGMA {schema}.table_info({table})"))
+    }
+
+
+def _default_club_id(conn: Connection) -> Optional[int]:
+    return conn.execute(
+        text("SELECT id FROM clubs WHERE slug = :slug"), {"slug": DEFAULT_CLUB_SLUG}
+    ).scalar()
+
+
+def add_column(conn: Connection, table: str, column_ddl: str) -> bool:
+    """
+    Aggiunge la colonna se manca, con la definizione fissata nella
+    migrazione (es. "version INTEGER NOT NULL DEFAULT 1"): con un default
+    costante SQLite la riempie senza riscrivere la tabella.
+    """
+    name = column_ddl.split()[0]
+    if name in _columns(conn, table):
+        return False
+    conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column_ddl}")
+    return True
+
+
+def backfill(conn: Connection, table: str, assignment: str, where: str, params: dict,
+             schema: str = "main") -> int:
+    """
+    UPDATE a intervalli di BATCH_SIZE rowid, una transazione per
+    intervallo (ogni lotto legge solo le sue righe, via chiave primaria).
+    """
+    top = conn.execute(text(f"SELECT MAX(rowid) FROM {schema}.{table}")).scalar() or 0
+    total = 0
+    for start in range(0, top, BATCH_SIZE):
+        with _transaction(conn):
+            total += conn.execute(
+                text(
+                    f"UPDATE {schema}.{table} SET {assignment} "
+                    f"WHERE rowid > :start AND rowid <= :end AND ({where})"
+                ),
+                {**params, "start": start, "end": start + BATCH_SIZE},
+            ).rowcount
+        time.sleep(BATCH_PAUSE_SECONDS)
+    return total
+
+
+def create_indexes(conn: Connection, statements: Sequence[str]) -> List[str]:
+    """
+    Indici che mancano nel database, uno per transazione, dagli statement
+    fissati nella migrazione ("CREATE INDEX <nome> ON <tabella> (...)").
+    """
+    created = []
+    for ddl in statements:
+        name, table = ddl.split()[2], ddl.split()[4]
+        existing = {
+            row[1] for row in conn.execute(text(f"PRAGMA main.index_list({table})"))
+        }
+        if name in existing:
+            continue
+        with _transaction(conn):
+            conn.exec_driver_sql(ddl)
+        created.append(name)
+        time.sleep(BATCH_PAUSE_SECONDS)
+    return created
+
+
+def _shape(query: Callable[[str], list], table: str) -> Tuple[bool, Set[str], Set[tuple]]:
+    """(AUTOINCREMENT, colonne NOT NULL, vincoli UNIQUE) della tabella."""
+    sql = query(
+        f"SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = '{table}'"
+    )[0][0]
+    not_null = {
+        row[1] for row in query(f"PRAGMA main.table_info({table})") if row[3] and not row[5]
+    }
+    unique = {
+        tuple(r[2] for r in query(f"PRAGMA main.index_info({row[1]})"))
+        for row in query(f"PRAGMA main.index_list({table})")
+        if row[3] == "u"  # origine: vincolo UNIQUE della tabella
+    }
+    return "AUTOINCREMENT" in sql.upper(), not_null, unique
+
+
+def rebuild_table(conn: Connection, table: str, ddl: str) -> bool:
+    """
+    Ricrea la tabella con il DDL fissato nella migrazione mantenendo i dati
+    (le colonne devono già esistere), se il database non ha ancora i suoi
+    AUTOINCREMENT, NOT NULL e vincoli UNIQUE. Gli indici si ricreano dopo,
+    con create_indexes().
+    """
+    scratch = sqlite3.connect(":memory:")
+    try:
+        scratch.execute(ddl)
+        target_autoinc, target_not_null, target_unique = _shape(
+            lambda sql: scratch.execute(sql).fetchall(), table
+        )
+        target_columns = [row[1] for row in scratch.execute(f"PRAGMA table_info({table})")]
+    finally:
+        scratch.close()
+
+    autoinc, not_null, unique = _shape(
+        lambda sql: conn.exec_driver_sql(sql).fetchall(), table
+    )
+    if (
+        (autoinc or not target_autoinc)
+        and target_not_null <= not_null
+        and unique <= target_unique
+    ):
+        return False
+
+    new_name = f"_new_{table}"
+    new_ddl = ddl.replace(f"CREATE TABLE {table} (", f"CREATE TABLE {new_name} (", 1)
+    existing = _columns(conn, table)
+    cols = ", ".join(c for c in target_columns if c in existing)
+
+    with _transaction(conn):
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {new_name}")
+        conn.exec_driver_sql(new_ddl)
+        last = 0
+        while True:
+            copied = conn.execute(
+                text(
+                    f"INSERT INTO {new_name} ({cols}) SELECT {cols} FROM {table} "
+                    f"WHERE id > :last ORDER BY id LIMIT :batch"
+                ),
+                {"last": last, "batch": BATCH_SIZE},
+            ).rowcount
+            if copied < BATCH_SIZE:
+                break
+            last = conn.execute(text(f"SELECT MAX(id) FROM {new_name}")).scalar()
+        conn.exec_driver_sql(f"DROP TABLE {table}")
+        conn.exec_driver_sql(f"ALTER TABLE {new_name} RENAME TO {table}")
+    return True
+
+
+# --------- MIGRAZIONI ----------
+
+
+# Ogni migrazione fissa il proprio DDL com'era alla sua versione: il
+# modello attuale cambia, un database vecchio passa comunque da tutti i
+# passi. Solo l'archivio segue il modello (ensure_archive_schema aggiunge
+# quello che manca, senza togliere nulla).
+
+_CLUB_SCOPED = ("users", "categories", "athletes", "events", "event_attendance", "messages")
+
+_V1_TABLES = (
+    """
+    CREATE TABLE IF NOT EXISTS clubs (
+        id INTEGER NOT NULL,
+        slug VARCHAR(100) NOT NULL,
+        name VARCHAR(200) NOT NULL,
+        created_at DATETIME NOT NULL,
+        PRIMARY KEY (id),
+        UNIQUE (slug)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_clubs_id ON clubs (id)",
+    """
+    CREATE TABLE IF NOT EXISTS event_series (
+        id INTEGER NOT NULL,
+        type VARCHAR(50) NOT NULL,
+        category_id INTEGER NOT NULL,
+        title VARCHAR(200) NOT NULL,
+        description TEXT,
+        location VARCHAR(200),
+        ask_skiroom BOOLEAN,
+        ask_carpool BOOLEAN,
+        rrule VARCHAR(500) NOT NULL,
+        start_date DATE NOT NULL,
+        end_date DATE NOT NULL,
+        materialized_until DATE,
+        created_by INTEGER,
+        created_at DATETIME NOT NULL,
+        club_id INTEGER NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(category_id) REFERENCES categories (id),
+        FOREIGN KEY(created_by) REFERENCES users (id),
+        FOREIGN KEY(club_id) REFERENCES clubs (id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_event_series_club_end ON event_series (club_id, end_date)",
+    "CREATE INDEX IF NOT EXISTS ix_event_series_id ON event_series (id)",
+    """
+    CREATE TABLE IF NOT EXISTS event_series_exceptions (
+        id INTEGER NOT NULL,
+        series_id INTEGER NOT NULL,
+        occurrence_date DATE NOT NULL,
+        created_at DATETIME NOT NULL,
+        PRIMARY KEY (id),
+        CONSTRAINT uq_series_exception_date UNIQUE (series_id, occurrence_date),
+        FOREIGN KEY(series_id) REFERENCES event_series (id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_event_series_exceptions_id ON event_series_exceptions (id)",
+    """
+    CREATE TABLE IF NOT EXISTS reminder_log (
+        id INTEGER NOT NULL,
+        parent_id INTEGER NOT NULL,
+        event_id INTEGER NOT NULL,
+        kind VARCHAR(20) NOT NULL,
+        queued_at DATETIME NOT NULL,
+        sent_at DATETIME,
+        PRIMARY KEY (id),
+        CONSTRAINT uq_reminder_once UNIQUE (parent_id, event_id, kind),
+        FOREIGN KEY(parent_id) REFERENCES users (id),
+        FOREIGN KEY(event_id) REFERENCES events (id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_reminder_log_id ON reminder_log (id)",
+    "CREATE INDEX IF NOT EXISTS ix_reminder_log_pending ON reminder_log (sent_at, parent_id)",
+)
+
+
+def _m1_clubs(conn: Connection) -> None:
+    """Club, serie ricorrenti e log dei promemoria; club di default per i dati esistenti."""
+    with _transaction(conn):
+        for ddl in _V1_TABLES:
+            conn.exec_driver_sql(ddl)
+        has_users = conn.execute(text("SELECT 1 FROM users LIMIT 1")).first() is not None
+        if has_users and _default_club_id(conn) is None:
+            conn.execute(
+                text(
+                    "INSERT INTO clubs (slug, name, created_at) "
+                    "VALUES (:slug, :name, :now)"
+                ),
+                {
+                    "slug": DEFAULT_CLUB_SLUG,
+                    "name": DEFAULT_CLUB_NAME,
+                    "now": datetime.utcnow(),
+                },
+            )
+
+
+def _m2_columns(conn: Connection) -> None:
+    """Colonne aggiunte dopo lo schema iniziale."""
+    with _transaction(conn):
+        for table in _CLUB_SCOPED:
+            add_column(conn, table, "club_id INTEGER REFERENCES clubs (id)")
+        add_column(conn, "users", "password_hash VARCHAR(255)")
+        add_column(conn, "events", "series_id INTEGER REFERENCES event_series (id)")
+        add_column(conn, "events", "series_date DATE")
+        add_column(conn, "events", "updated_at DATETIME")
+        add_column(conn, "event_attendance", "version INTEGER NOT NULL DEFAULT 1")
+
+
+def _m3_backfill(conn: Connection) -> None:
+    """I dati esistenti appartengono al club di default; updated_at degli eventi."""
+    club_id = _default_club_id(conn)
+    if club_id is not None:
+        for table in _CLUB_SCOPED:
+            backfill(conn, table, "club_id = :club", "club_id IS NULL", {"club": club_id})
+    backfill(
+        conn, "events", "updated_at = :now", "updated_at IS NULL", {"now": datetime.utcnow()}
+    )
+
+    # archivio: le stesse colonne (ensure_archive_schema le accoda) e lo stesso club
+    with _transaction(conn):
+        ensure_archive_schema(Session(bind=conn))
+    if club_id is not None:
+        for name in ("events", "event_attendance", "messages"):
+            backfill(conn, name, "club_id = :club", "club_id IS NULL",
+                     {"club": club_id}, schema=ARCHIVE_SCHEMA)
+    backfill(conn, "event_attendance", "version = 1", "version IS NULL", {},
+             schema=ARCHIVE_SCHEMA)
+
+
+_V4_TABLES = {
+    "users": """
+        CREATE TABLE users (
+            id INTEGER NOT NULL,
+            name VARCHAR(200) NOT NULL,
+            email VARCHAR(200),
+            role VARCHAR(50) NOT NULL,
+            password_hash VARCHAR(255),
+            club_id INTEGER NOT NULL,
+            PRIMARY KEY (id),
+            CONSTRAINT uq_users_club_email UNIQUE (club_id, email),
+            FOREIGN KEY(club_id) REFERENCES clubs (id)
+        )
+    """,
+    "categories": """
+        CREATE TABLE categories (
+            id INTEGER NOT NULL,
+            name VARCHAR(100) NOT NULL,
+            description TEXT,
+            club_id INTEGER NOT NULL,
+            PRIMARY KEY (id),
+            CONSTRAINT uq_categories_club_name UNIQUE (club_id, name),
+            FOREIGN KEY(club_id) REFERENCES clubs (id)
+        )
+    """,
+    "athletes": """
+        CREATE TABLE athletes (
+            id INTEGER NOT NULL,
+            name VARCHAR(200) NOT NULL,
+            birth_year INTEGER,
+            category_id INTEGER,
+            club_id INTEGER NOT NULL,
+            PRIMARY KEY (id),
+            FOREIGN KEY(category_id) REFERENCES categories (id),
+            FOREIGN KEY(club_id) REFERENCES clubs (id)
+        )
+    """,
+    "events": """
+        CREATE TABLE events (
+            id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+            type VARCHAR(50) NOT NULL,
+            category_id INTEGER NOT NULL,
+            title VARCHAR(200) NOT NULL,
+            description TEXT,
+            location VARCHAR(200),
+            date DATE NOT NULL,
+            ask_skiroom BOOLEAN,
+            ask_carpool BOOLEAN,
+            series_id INTEGER,
+            series_date DATE,
+            updated_at DATETIME NOT NULL,
+            club_id INTEGER NOT NULL,
+            CONSTRAINT uq_events_series_date UNIQUE (series_id, series_date),
+            FOREIGN KEY(category_id) REFERENCES categories (id),
+            FOREIGN KEY(series_id) REFERENCES event_series (id),
+            FOREIGN KEY(club_id) REFERENCES clubs (id)
+        )
+    """,
+    "event_attendance": """
+        CREATE TABLE event_attendance (
+            id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+            event_id INTEGER NOT NULL,
+            athlete_id INTEGER NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            skis_in_skiroom BOOLEAN,
+            car_available BOOLEAN,
+            car_seats INTEGER,
+            updated_by INTEGER,
+            updated_at DATETIME NOT NULL,
+            version INTEGER NOT NULL,
+            club_id INTEGER NOT NULL,
+            FOREIGN KEY(event_id) REFERENCES events (id),
+            FOREIGN KEY(athlete_id) REFERENCES athletes (id),
+            FOREIGN KEY(updated_by) REFERENCES users (id),
+            FOREIGN KEY(club_id) REFERENCES clubs (id)
+        )
+    """,
+    "messages": """
+        CREATE TABLE messages (
+            id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+            sender_id INTEGER NOT NULL,
+            category_id INTEGER,
+            athlete_id INTEGER,
+            title VARCHAR(200) NOT NULL,
+            content TEXT NOT NULL,
+            created_at DATETIME NOT NULL,
+            club_id INTEGER NOT NULL,
+            FOREIGN KEY(sender_id) REFERENCES users (id),
+            FOREIGN KEY(category_id) REFERENCES categories (id),
+            FOREIGN KEY(athlete_id) REFERENCES athletes (id),
+            FOREIGN KEY(club_id) REFERENCES clubs (id)
+        )
+    """,
+    "team_reports": """
+        CREATE TABLE team_reports (
+            id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+            event_id INTEGER NOT NULL,
+            coach_id INTEGER NOT NULL,
+            content TEXT,
+            created_at DATETIME NOT NULL,
+            FOREIGN KEY(event_id) REFERENCES events (id),
+            FOREIGN KEY(coach_id) REFERENCES users (id)
+        )
+    """,
+    "athlete_reports": """
+        CREATE TABLE athlete_reports (
+            id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+            event_id INTEGER NOT NULL,
+            athlete_id INTEGER NOT NULL,
+            coach_id INTEGER NOT NULL,
+            content TEXT,
+            created_at DATETIME NOT NULL,
+            FOREIGN KEY(event_id) REFERENCES events (id),
+            FOREIGN KEY(athlete_id) REFERENCES athletes (id),
+            FOREIGN KEY(coach_id) REFERENCES users (id)
+        )
+    """,
+}
+
+
+def _m4_rebuild(conn: Connection) -> None:
+    """
+    Vincoli per club (email e nome categoria non più unici in assoluto),
+    club_id NOT NULL e AUTOINCREMENT sulle tabelle che finiscono in archivio.
+    """
+    for table, ddl in _V4_TABLES.items():
+        rebuild_table(conn, table, ddl)
+
+
+# indici del modello alla versione 5: una migrazione già rilasciata non
+# legge il modello attuale (le tabelle arrivate dopo non esistono ancora)
+_V5_INDEXES = (
+    "CREATE INDEX ix_clubs_id ON clubs (id)",
+    "CREATE INDEX ix_categories_id ON categories (id)",
+    "CREATE INDEX ix_users_club_role ON users (club_id, role)",
+    "CREATE INDEX ix_users_id ON users (id)",
+    "CREATE INDEX ix_athletes_club_category ON athletes (club_id, category_id)",
+    "CREATE INDEX ix_athletes_id ON athletes (id)",
+    "CREATE INDEX ix_coach_category_id ON coach_category (id)",
+    "CREATE INDEX ix_device_tokens_id ON device_tokens (id)",
+    "CREATE INDEX ix_event_series_club_end ON event_series (club_id, end_date)",
+    "CREATE INDEX ix_event_series_id ON event_series (id)",
+    "CREATE INDEX ix_event_series_exceptions_id ON event_series_exceptions (id)",
+    "CREATE INDEX ix_events_club_date ON events (club_id, date)",
+    "CREATE INDEX ix_events_date ON events (date)",
+    "CREATE INDEX ix_events_id ON events (id)",
+    "CREATE INDEX ix_events_series_id ON events (series_id)",
+    "CREATE INDEX ix_messages_club_created ON messages (club_id, created_at)",
+    "CREATE INDEX ix_messages_id ON messages (id)",
+    "CREATE INDEX ix_parent_athlete_id ON parent_athlete (id)",
+    "CREATE INDEX ix_athlete_reports_id ON athlete_reports (id)",
+    "CREATE INDEX ix_event_attendance_athlete_updated ON event_attendance (athlete_id, updated_at)",
+    "CREATE INDEX ix_event_attendance_club_event ON event_attendance (club_id, event_id)",
+    "CREATE INDEX ix_event_attendance_event_athlete ON event_attendance (event_id, athlete_id)",
+    "CREATE INDEX ix_event_attendance_id ON event_attendance (id)",
+    "CREATE INDEX ix_event_attendance_status_event ON event_attendance (status, event_id)",
+    "CREATE INDEX ix_event_attendance_updated_at ON event_attendance (updated_at)",
+    "CREATE INDEX ix_reminder_log_id ON reminder_log (id)",
+    "CREATE INDEX ix_reminder_log_pending ON reminder_log (sent_at, parent_id)",
+    "CREATE INDEX ix_team_reports_id ON team_reports (id)",
+)
+
+
+def _m5_indexes(conn: Connection) -> None:
+    """Indici aggiunti dopo lo schema iniziale (e quelli persi ricostruendo)."""
+    create_indexes(conn, _V5_INDEXES)
+
+
+_V6_TABLES = (
+    """
+    CREATE TABLE IF NOT EXISTS attendance_history (
+        id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+        event_id INTEGER NOT NULL,
+        athlete_id INTEGER NOT NULL,
+        status SMALLINT NOT NULL,
+        flags SMALLINT NOT NULL,
+        car_seats SMALLINT NOT NULL,
+        changed_by INTEGER,
+        changed_at INTEGER NOT NULL,
+        source SMALLINT NOT NULL,
+        club_id INTEGER NOT NULL,
+        FOREIGN KEY(event_id) REFERENCES events (id),
+        FOREIGN KEY(athlete_id) REFERENCES athletes (id),
+        FOREIGN KEY(changed_by) REFERENCES users (id),
+        FOREIGN KEY(club_id) REFERENCES clubs (id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_attendance_history_event_athlete_time "
+    "ON attendance_history (event_id, athlete_id, changed_at)",
+)
+
+
+def _m6_attendance_history(conn: Connection) -> None:
+    """Storico delle presenze (core/history.py), anche nell'archivio."""
+    with _transaction(conn):
+        for ddl in _V6_TABLES:
+            conn.exec_driver_sql(ddl)
+    with _transaction(conn):
+        ensure_archive_schema(Session(bind=conn))
+
+
+def _link_locations(conn: Connection) -> None:
+    """
+    Una località per ogni (club, comprensorio, pista) tra le etichette
+    libere già usate, poi location_id sulle righe a lotti (anche in archivio).
+    """
+    labels = conn.execute(
+        text(
+            "SELECT club_id, location FROM events WHERE location IS NOT NULL "
+            "UNION SELECT club_id, location FROM event_series WHERE location IS NOT NULL "
+            f"UNION SELECT club_id, location FROM {ARCHIVE_SCHEMA}.events "
+            "WHERE location IS NOT NULL AND club_id IS NOT NULL"
+        )
+    ).all()
+
+    conn.exec_driver_sql(
+        "CREATE TEMP TABLE IF NOT EXISTS _location_labels ("
+        "club_id INTEGER, label VARCHAR(200), location_id INTEGER, "
+        "PRIMARY KEY (club_id, label))"
+    )
+    with _transaction(conn):
+        for club_id, label in labels:
+            resort, piste = split_label(label)
+            if not resort:
+                continue
+            params = {"club": club_id, "resort": resort, "piste": piste}
+            conn.execute(
+                text(
+                    "INSERT OR IGNORE INTO locations (club_id, resort, piste) "
+                    "VALUES (:club, :resort, :piste)"
+                ),
+                params,
+            )
+            conn.execute(
+                text(
+                    "INSERT OR REPLACE INTO temp._location_labels "
+                    "SELECT :club, :label, id FROM locations "
+                    "WHERE club_id = :club AND resort = :resort AND piste = :piste"
+                ),
+                {**params, "label": label},
+            )
+
+    for schema, table in (("main", "events"), ("main", "event_series"),
+                          (ARCHIVE_SCHEMA, "events")):
+        backfill(
+            conn,
+            table,
+            "location_id = (SELECT m.location_id FROM temp._location_labels m "
+            f"WHERE m.club_id = {table}.club_id AND m.label = {table}.location)",
+            "location_id IS NULL AND location IS NOT NULL",
+            {},
+            schema=schema,
+        )
+    conn.exec_driver_sql("DROP TABLE temp._location_labels")
+
+
+_V7_LOCATIONS = """
+    CREATE TABLE IF NOT EXISTS locations (
+        id INTEGER NOT NULL,
+        resort VARCHAR(100) NOT NULL,
+        piste VARCHAR(100) NOT NULL,
+        latitude FLOAT,
+        longitude FLOAT,
+        altitude INTEGER,
+        club_id INTEGER NOT NULL,
+        PRIMARY KEY (id),
+        CONSTRAINT uq_locations_club_resort_piste UNIQUE (club_id, resort, piste),
+        FOREIGN KEY(club_id) REFERENCES clubs (id)
+    )
+"""
+
+_V7_INDEXES = (
+    "CREATE INDEX ix_locations_id ON locations (id)",
+    "CREATE INDEX ix_events_location_id ON events (location_id)",
+)
+
+
+def _m7_locations(conn: Connection) -> None:
+    """Catalogo delle località (core/locations.py) al posto del testo libero."""
+    with _transaction(conn):
+        conn.exec_driver_sql(_V7_LOCATIONS)
+        add_column(conn, "events", "location_id INTEGER REFERENCES locations (id)")
+        add_column(conn, "event_series", "location_id INTEGER REFERENCES locations (id)")
+    with _transaction(conn):
+        ensure_archive_schema(Session(bind=conn))
+    _link_locations(conn)
+    create_indexes(conn, _V7_INDEXES)
+
+
+_V8_TABLES = (
+    """
+    CREATE TABLE IF NOT EXISTS race_results (
+        id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+        event_id INTEGER NOT NULL,
+        athlete_id INTEGER,
+        bib INTEGER NOT NULL,
+        name VARCHAR(200) NOT NULL,
+        run1_ms INTEGER,
+        run2_ms INTEGER,
+        total_ms INTEGER,
+        status VARCHAR(3) NOT NULL,
+        rank INTEGER,
+        points INTEGER NOT NULL,
+        club_id INTEGER NOT NULL,
+        CONSTRAINT uq_race_results_event_bib UNIQUE (event_id, bib),
+        FOREIGN KEY(event_id) REFERENCES events (id),
+        FOREIGN KEY(athlete_id) REFERENCES athletes (id),
+        FOREIGN KEY(club_id) REFERENCES clubs (id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_race_results_event_rank ON race_results (event_id, rank)",
+    """
+    CREATE TABLE IF NOT EXISTS season_standings (
+        id INTEGER NOT NULL,
+        season INTEGER NOT NULL,
+        category_id INTEGER NOT NULL,
+        athlete_id INTEGER NOT NULL,
+        points INTEGER NOT NULL,
+        races INTEGER NOT NULL,
+        wins INTEGER NOT NULL,
+        podiums INTEGER NOT NULL,
+        club_id INTEGER NOT NULL,
+        PRIMARY KEY (id),
+        CONSTRAINT uq_season_standings_athlete UNIQUE (club_id, season, category_id, athlete_id),
+        FOREIGN KEY(category_id) REFERENCES categories (id),
+        FOREIGN KEY(athlete_id) REFERENCES athletes (id),
+        FOREIGN KEY(club_id) REFERENCES clubs (id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_season_standings_table "
+    "ON season_standings (club_id, season, category_id, points)",
+)
+
+
+def _m8_race_results(conn: Connection) -> None:
+    """Risultati delle gare e classifica di stagione (core/results.py), risultati anche in archivio."""
+    with _transaction(conn):
+        for ddl in _V8_TABLES:
+            conn.exec_driver_sql(ddl)
+    with _transaction(conn):
+        ensure_archive_schema(Session(bind=conn))
+
+
+def _m9_user_language(conn: Connection) -> None:
+    """Lingua dell'interfaccia per utente (core/i18n.py); NULL = predefinita."""
+    with _transaction(conn):
+        add_column(conn, "users", "language VARCHAR(2)")
+
+
+_V10_TABLES = (
+    """
+    CREATE TABLE IF NOT EXISTS worker_leases (
+        job VARCHAR(100) NOT NULL,
+        holder VARCHAR(200) NOT NULL,
+        expires_at DATETIME NOT NULL,
+        PRIMARY KEY (job)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS push_outbox (
+        id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        title VARCHAR(200) NOT NULL,
+        body TEXT NOT NULL,
+        created_at DATETIME NOT NULL,
+        FOREIGN KEY(user_id) REFERENCES users (id)
+    )
+    """,
+)
+
+
+def _m10_worker_coordination(conn: Connection) -> None:
+    """Lease dei lavori in background e coda push condivisa (più processi)."""
+    with _transaction(conn):
+        for ddl in _V10_TABLES:
+            conn.exec_driver_sql(ddl)
+
+
+_V11_INDEXES = (
+    "CREATE INDEX ix_event_attendance_change_seq ON event_attendance (change_seq)",
+    "CREATE INDEX ix_event_attendance_athlete_seq ON event_attendance (athlete_id, change_seq)",
+)
+
+
+def _m11_change_seq(conn: Connection) -> None:
+    """
+    Numero di modifica delle presenze in ordine di commit, cursore del feed
+    (core/changes.py). Le righe esistenti prendono il loro id: l'ordine tra
+    di loro non conta, le modifiche successive hanno numeri più alti.
+    """
+    with _transaction(conn):
+        add_column(conn, "event_attendance", "change_seq INTEGER NOT NULL DEFAULT 0")
+    with _transaction(conn):
+        ensure_archive_schema(Session(bind=conn))
+    backfill(conn, "event_attendance", "change_seq = id", "change_seq = 0", {})
+    create_indexes(conn, _V11_INDEXES)
+    with _transaction(conn):
+        conn.exec_driver_sql("DROP INDEX IF EXISTS ix_event_attendance_athlete_updated")
+
+
+def _m12_feed_version(conn: Connection) -> None:
+    """Versione del link del feed ICS per utente; 0 = i link emessi finora."""
+    with _transaction(conn):
+        add_column(conn, "users", "feed_version INTEGER NOT NULL DEFAULT 0")
+
+
+def _m13_event_cancellation(conn: Connection) -> None:
+    """
+    Eventi annullati tenuti per lo storico delle presenze; la vista delle
+    statistiche d'archivio si ricrea per escluderli.
+    """
+    with _transaction(conn):
+        add_column(conn, "events", "cancelled_at DATETIME")
+    with _transaction(conn):
+        conn.exec_driver_sql(f"DROP VIEW IF EXISTS {ARCHIVE_SCHEMA}.season_event_stats")
+        ensure_archive_schema(Session(bind=conn))
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "club, serie ricorrenti, log promemoria", _m1_clubs),
+    Migration(2, "colonne nuove", _m2_columns),
+    Migration(3, "riempimento club_id e updated_at", _m3_backfill),
+    Migration(4, "ricostruzione tabelle con i vincoli attuali", _m4_rebuild),
+    Migration(5, "indici", _m5_indexes),
+    Migration(6, "storico presenze", _m6_attendance_history),
+    Migration(7, "catalogo località", _m7_locations),
+    Migration(8, "risultati gare e classifiche", _m8_race_results),
+    Migration(9, "lingua utente", _m9_user_language),
+    Migration(10, "coordinamento processi", _m10_worker_coordination),
+    Migration(11, "ordine delle modifiche alle presenze", _m11_change_seq),
+    Migration(12, "versione del link del calendario", _m12_feed_version),
+    Migration(13, "eventi annullati", _m13_event_cancellation),
+]
+
+
+# --------- RUNNER ----------
+
+
+def applied_versions(conn: Connection) -> Set[int]:
+    conn.exec_driver_sql(_MIGRATIONS_DDL)
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def _record(conn: Connection, migration: Migration) -> None:
+    conn.execute(
+        text(
+            "INSERT OR IGNORE INTO schema_migrations (version, name, applied_at) "
+            "VALUES (:v, :n, :at)"
+        ),
+        {"v": migration.version, "n": migration.name, "at": datetime.utcnow()},
+    )
+
+
+def migrate(bind: Engine = engine) -> List[int]:
+    """Applica le migrazioni mancanti; restituisce le versioni applicate."""
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if not _has_table(conn, "archived_seasons", ARCHIVE_SCHEMA):
+            # file d'archivio nuovo (anche con lo schema principale già
+            # aggiornato): le letture non lo creano più da sole
+            with _transaction(conn):
+                ensure_archive_schema(Session(bind=conn))
+
+        done = applied_versions(conn)
+        pending = [m for m in MIGRATIONS if m.version not in done]
+        if not pending:
+            return []
+
+        if not _has_table(conn, "users"):
+            # database nuovo: schema attuale in un colpo solo
+            with _transaction(conn):
+                Base.metadata.create_all(conn)
+                for migration in MIGRATIONS:
+                    _record(conn, migration)
+            return [m.version for m in MIGRATIONS]
+
+        for migration in pending:
+            migration.run(conn)
+            _record(conn, migration)
+        return [m.version for m in pending]
+
+
+def ensure_schema() -> None:
+    """migrate() una sola volta per processo."""
+    global _checked
+    if _checked:
+        return
+    with _lock:
+        if not _checked:
+            migrate()
+            _checked = True
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] == ["status"]:
+        with engine.connect() as connection:
+            done = applied_versions(connection)
+            connection.commit()
+        for m in MIGRATIONS:
+            print(f"{m.version:>3}  {'applicata' if m.version in done else 'mancante':<10} {m.name}")
+    else:
+        versions = migrate()
+        print(f"Applicate: {versions}" if versions else "Schema già aggiornato.")
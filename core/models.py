@@ -10,22 +10,69 @@ from sqlalchemy import (
     Date,
     DateTime,
     Boolean,
+    Float,
     ForeignKey,
     Text,
+    UniqueConstraint,
+    Index,
+    SmallInteger,
+    literal_column,
 )
 from sqlalchemy.orm import relationship
 
 from .db import Base
 
 
-class User(Base):
+# prossimo numero di modifica delle presenze (EventAttendance.change_seq)
+NEXT_CHANGE_SEQ = literal_column(
+    "(SELECT COALESCE(MAX(change_seq), 0) + 1 FROM event_attendance)"
+)
+
+
+class Club(Base):
+    """Società sportiva (tenant): ogni dato "radice" appartiene a un club."""
+
+    __tablename__ = "clubs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    slug = Column(String(100), nullable=False, unique=True)  # es. "val-dayas"
+    name = Column(String(200), nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class ClubScoped:
+    """
+    Mixin dei modelli filtrati per club. Le query ORM vengono ristrette
+    automaticamente al club della sessione (vedi core/tenancy.py).
+    """
+
+    club_id = Column(Integer, ForeignKey("clubs.id"), nullable=False)
+
+
+class User(ClubScoped, Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # la stessa email può esistere in club diversi
+        UniqueConstraint("club_id", "email", name="uq_users_club_email"),
+        Index("ix_users_club_role", "club_id", "role"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(200), nullable=False)
-    email = Column(String(200), nullable=True, unique=True)
+    email = Column(String(200), nullable=True)
     role = Column(String(50), nullable=False)  # "admin", "coach", "parent"
 
+    # "scrypt$n$r$p$salt$hash" (vedi core/auth.py); None = accesso non abilitato
+    password_hash = Column(String(255), nullable=True)
+
+    # lingua dell'interfaccia ("it", "fr", "en"; vedi core/i18n.py)
+    language = Column(String(2), nullable=True)
+
+    # versione del link del feed ICS (core/auth.py): aumentarla invalida i
+    # link già distribuiti
+    feed_version = Column(Integer, nullable=False, default=0)
+
     # relazioni
     coached_categories = relationship("CoachCategory", back_populates="coach")
     parent_links = relationship("ParentAthlete", back_populates="parent")
@@ -35,19 +82,25 @@ class User(Base):
     device_tokens = relationship("DeviceToken", back_populates="user")
 
 
-class Category(Base):
+class Category(ClubScoped, Base):
     __tablename__ = "categories"
+    __table_args__ = (
+        UniqueConstraint("club_id", "name", name="uq_categories_club_name"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String(100), nullable=False, unique=True)
+    name = Column(String(100), nullable=False)
     description = Column(Text, nullable=True)
 
     athletes = relationship("Athlete", back_populates="category")
     events = relationship("Event", back_populates="category")
 
 
-class Athlete(Base):
+class Athlete(ClubScoped, Base):
     __tablename__ = "athletes"
+    __table_args__ = (
+        Index("ix_athletes_club_category", "club_id", "category_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(200), nullable=False)
@@ -82,7 +135,31 @@ class CoachCategory(Base):
     category = relationship("Category")
 
 
-class Event(Base):
+class Location(ClubScoped, Base):
+    """
+    Località degli eventi (comprensorio + pista), una riga per club.
+    Le condizioni neve/meteo si leggono per località (core/conditions.py).
+    """
+
+    __tablename__ = "locations"
+    __table_args__ = (
+        UniqueConstraint("club_id", "resort", "piste", name="uq_locations_club_resort_piste"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    resort = Column(String(100), nullable=False)             # es. "Champoluc"
+    piste = Column(String(100), nullable=False, default="")  # es. "Crest" ("" = tutto il comprensorio)
+
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    altitude = Column(Integer, nullable=True)  # metri s.l.m.
+
+    @property
+    def label(self) -> str:
+        return f"{self.resort} – {self.piste}" if self.piste else self.resort
+
+
+class Event(ClubScoped, Base):
     __tablename__ = "events"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -93,21 +170,111 @@ class Event(Base):
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
     title = Column(String(200), nullable=False)
     description = Column(Text, nullable=True)
+    # etichetta della località (Location.label), copiata per liste, feed e archivio
     location = Column(String(200), nullable=True)
-    date = Column(Date, nullable=False)
+    location_id = Column(Integer, ForeignKey("locations.id"), nullable=True, index=True)
+    date = Column(Date, nullable=False, index=True)
 
     # richieste logistiche decise dal coach
     ask_skiroom = Column(Boolean, default=False)   # chiedo sci in ski-room?
     ask_carpool = Column(Boolean, default=False)   # chiedo auto (solo gare)?
 
+    # occorrenza di una serie ricorrente (None = evento singolo).
+    # series_date è la data originale dell'occorrenza: resta fissa anche
+    # se il coach sposta l'evento, così la serie non lo rigenera.
+    series_id = Column(Integer, ForeignKey("event_series.id"), nullable=True, index=True)
+    series_date = Column(Date, nullable=True)
+
+    # data annullata dal coach (core/series.cancel_occurrence): l'evento resta
+    # per lo storico delle presenze ma sparisce da liste, feed e statistiche
+    cancelled_at = Column(DateTime, nullable=True)
+
+    # ultima modifica: base degli ETag dell'API (api.py)
+    updated_at = Column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
+
+    # AUTOINCREMENT: gli id non vengono riusati dopo l'archiviazione
+    # (core/archive.py), altrimenti collidono con quelli già archiviati
+    __table_args__ = (
+        UniqueConstraint("series_id", "series_date", name="uq_events_series_date"),
+        Index("ix_events_club_date", "club_id", "date"),
+        {"sqlite_autoincrement": True},
+    )
+
     category = relationship("Category", back_populates="events")
+    series = relationship("EventSeries", back_populates="events")
     attendances = relationship("EventAttendance", back_populates="event")
     team_reports = relationship("TeamReport", back_populates="event")
     athlete_reports = relationship("AthleteReport", back_populates="event")
 
 
-class EventAttendance(Base):
+class EventSeries(ClubScoped, Base):
+    __tablename__ = "event_series"
+    __table_args__ = (
+        Index("ix_event_series_club_end", "club_id", "end_date"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # stessi campi "modello" di Event, copiati su ogni occorrenza
+    type = Column(String(50), nullable=False, default="training")
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
+    title = Column(String(200), nullable=False)
+    description = Column(Text, nullable=True)
+    location = Column(String(200), nullable=True)
+    location_id = Column(Integer, ForeignKey("locations.id"), nullable=True)
+    ask_skiroom = Column(Boolean, default=False)
+    ask_carpool = Column(Boolean, default=False)
+
+    # regola di ricorrenza RFC 5545, es. "FREQ=WEEKLY;BYDAY=TU,TH,SA"
+    rrule = Column(String(500), nullable=False)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+
+    # ultima data già trasformata in righe Event (orizzonte mobile)
+    materialized_until = Column(Date, nullable=True)
+
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    category = relationship("Category")
+    events = relationship("Event", back_populates="series")
+    exceptions = relationship("EventSeriesException", back_populates="series")
+
+
+class EventSeriesException(Base):
+    """Occorrenza annullata di una serie: non va più generata."""
+
+    __tablename__ = "event_series_exceptions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    series_id = Column(Integer, ForeignKey("event_series.id"), nullable=False)
+    occurrence_date = Column(Date, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "series_id", "occurrence_date", name="uq_series_exception_date"
+        ),
+    )
+
+    series = relationship("EventSeries", back_populates="exceptions")
+
+
+class EventAttendance(ClubScoped, Base):
     __tablename__ = "event_attendance"
+    __table_args__ = (
+        # promemoria: "righe ancora da confermare per questi eventi"
+        Index("ix_event_attendance_status_event", "status", "event_id"),
+        Index("ix_event_attendance_club_event", "club_id", "event_id"),
+        # controllo "presenza già esistente" nel pre-popolamento
+        Index("ix_event_attendance_event_athlete", "event_id", "athlete_id"),
+        # delta della sync per le famiglie (core/sync.py)
+        Index("ix_event_attendance_athlete_seq", "athlete_id", "change_seq"),
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     event_id = Column(Integer, ForeignKey("events.id"), nullable=False)
@@ -125,6 +292,26 @@ class EventAttendance(Base):
     updated_at = Column(
         DateTime,
         default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        nullable=False,
+        index=True,
+    )
+    # ordine di commit delle modifiche, cursore del feed (core/changes.py):
+    # calcolato dentro l'INSERT/UPDATE, che tiene già il lock di scrittura
+    # di SQLite, quindi chi scrive dopo prende un numero più alto
+    change_seq = Column(
+        Integer,
+        default=NEXT_CHANGE_SEQ,
+        onupdate=NEXT_CHANGE_SEQ,
+        nullable=False,
+        index=True,
+    )
+
+    # versione della riga: +1 a ogni UPDATE (ORM o Core), per ETag e sync
+    version = Column(
+        Integer,
+        default=1,
+        onupdate=literal_column("event_attendance.version + 1"),
         nullable=False,
     )
 
@@ -132,8 +319,99 @@ class EventAttendance(Base):
     athlete = relationship("Athlete", back_populates="attendances")
 
 
-class Message(Base):
+class AttendanceHistory(ClubScoped, Base):
+    """
+    Storico delle modifiche alle presenze, solo in aggiunta (core/history.py).
+    Formato compatto: stato e flag come piccoli interi, data in secondi.
+    """
+
+    __tablename__ = "attendance_history"
+    __table_args__ = (
+        # storico di una riga e cronologia di un evento
+        Index(
+            "ix_attendance_history_event_athlete_time",
+            "event_id",
+            "athlete_id",
+            "changed_at",
+        ),
+        {"sqlite_autoincrement": True},
+    )
+
+    id = Column(Integer, primary_key=True)
+    event_id = Column(Integer, ForeignKey("events.id"), nullable=False)
+    athlete_id = Column(Integer, ForeignKey("athletes.id"), nullable=False)
+
+    status = Column(SmallInteger, nullable=False)  # vedi history.STATUS_CODES
+    flags = Column(SmallInteger, nullable=False, default=0)  # bit: ski-room, auto
+    car_seats = Column(SmallInteger, nullable=False, default=0)
+
+    changed_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    changed_at = Column(Integer, nullable=False)  # secondi UTC (epoch)
+    source = Column(SmallInteger, nullable=False, default=0)  # app, sync, ...
+
+
+class RaceResult(ClubScoped, Base):
+    """
+    Risultato di un concorrente in una gara, dall'export del cronometraggio
+    (core/results.py). athlete_id è None per i concorrenti di altri club.
+    """
+
+    __tablename__ = "race_results"
+    __table_args__ = (
+        UniqueConstraint("event_id", "bib", name="uq_race_results_event_bib"),
+        # classifica della gara
+        Index("ix_race_results_event_rank", "event_id", "rank"),
+        {"sqlite_autoincrement": True},
+    )
+
+    id = Column(Integer, primary_key=True)
+    event_id = Column(Integer, ForeignKey("events.id"), nullable=False)
+    athlete_id = Column(Integer, ForeignKey("athletes.id"), nullable=True)
+
+    bib = Column(Integer, nullable=False)          # pettorale
+    name = Column(String(200), nullable=False)     # come nel file del cronometraggio
+    run1_ms = Column(Integer, nullable=True)
+    run2_ms = Column(Integer, nullable=True)
+    total_ms = Column(Integer, nullable=True)
+    status = Column(String(3), nullable=False, default="OK")  # OK, DNF, DSQ, DNS
+
+    # calcolati dopo l'import (solo per status OK)
+    rank = Column(Integer, nullable=True)
+    points = Column(Integer, nullable=False, default=0)
+
+
+class SeasonStanding(ClubScoped, Base):
+    """
+    Classifica a punti di stagione per categoria, aggiornata a ogni import
+    di risultati sommando la differenza (core/results.py).
+    """
+
+    __tablename__ = "season_standings"
+    __table_args__ = (
+        UniqueConstraint(
+            "club_id", "season", "category_id", "athlete_id",
+            name="uq_season_standings_athlete",
+        ),
+        Index("ix_season_standings_table", "club_id", "season", "category_id", "points"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    season = Column(Integer, nullable=False)  # anno di inizio (core/archive.season_of)
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
+    athlete_id = Column(Integer, ForeignKey("athletes.id"), nullable=False)
+
+    points = Column(Integer, nullable=False, default=0)
+    races = Column(Integer, nullable=False, default=0)  # gare con un risultato
+    wins = Column(Integer, nullable=False, default=0)
+    podiums = Column(Integer, nullable=False, default=0)
+
+
+class Message(ClubScoped, Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_club_created", "club_id", "created_at"),
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     sender_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -154,6 +432,7 @@ class Message(Base):
 
 class TeamReport(Base):
     __tablename__ = "team_reports"
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     event_id = Column(Integer, ForeignKey("events.id"), nullable=False)
@@ -168,6 +447,7 @@ class TeamReport(Base):
 
 class AthleteReport(Base):
     __tablename__ = "athlete_reports"
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     event_id = Column(Integer, ForeignKey("events.id"), nullable=False)
@@ -194,3 +474,54 @@ class DeviceToken(Base):
     last_used_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     user = relationship("User", back_populates="device_tokens")
+
+
+class ReminderLog(Base):
+    """
+    Promemoria accodati/inviati (uno per genitore ed evento): rende il
+    worker dei promemoria idempotente anche dopo un riavvio.
+    """
+
+    __tablename__ = "reminder_log"
+
+    id = Column(Integer, primary_key=True, index=True)
+    parent_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    event_id = Column(Integer, ForeignKey("events.id"), nullable=False)
+    kind = Column(String(20), nullable=False, default="undecided")
+
+    queued_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("parent_id", "event_id", "kind", name="uq_reminder_once"),
+        Index("ix_reminder_log_pending", "sent_at", "parent_id"),
+    )
+
+
+class WorkerLease(Base):
+    """
+    Lavoro in background con un solo esecutore tra più processi (vedi
+    core/leases.py): chi tiene la riga non scaduta lo esegue.
+    """
+
+    __tablename__ = "worker_leases"
+
+    job = Column(String(100), primary_key=True)
+    holder = Column(String(200), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+
+class PushOutbox(Base):
+    """
+    Push in attesa del dispatcher con più processi (core/dispatch.py): i
+    processi dell'app accodano qui, uno solo li raccoglie e li spedisce.
+    """
+
+    __tablename__ = "push_outbox"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    title = Column(String(200), nullable=False)
+    body = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
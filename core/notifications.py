@@ -7,11 +7,16 @@ import os
 import logging
 from typing import List, Dict, Any
 
-import requests
 import streamlit as st
 
+from .push_transport import get_transport
 
-FCM_API_URL = "https://fcm.googleapis.com/fcm/send"
+
+# sovrascrivibile (es. server FCM finto in locale per i test di carico)
+FCM_API_URL = os.environ.get("FCM_API_URL", "https://fcm.googleapis.com/fcm/send")
+
+# limite FCM di registration_ids per singola richiesta
+MAX_TOKENS_PER_REQUEST = 1000
 
 
 def _get_server_key() -> str:
@@ -54,28 +59,35 @@ def send_push_to_tokens(
         "Content-Type": "application/json",
     }
 
-    payload = {
-        "registration_ids": tokens,
-        "notification": {
-            "title": title,
-            "body": body,
-        },
-    }
+    # blocchi da MAX_TOKENS_PER_REQUEST, spediti in parallelo su connessioni
+    # persistenti (vedi core/push_transport.py)
+    payloads = [
+        {
+            "registration_ids": tokens[i:i + MAX_TOKENS_PER_REQUEST],
+            "notification": {
+                "title": title,
+                "body": body,
+            },
+        }
+        for i in range(0, len(tokens), MAX_TOKENS_PER_REQUEST)
+    ]
 
     try:
-        resp = requests.post(FCM_API_URL, headers=headers, json=payload, timeout=10)
-        try:
-            data = resp.json()
-        except Exception:
-            data = {"raw": resp.text[:500]}
-
-        logging.info("FCM response: %s", data)
-
-        return {
-            "ok": resp.ok,
-            "status_code": resp.status_code,
-            "response": data,
-        }
+        results = get_transport().post_many(FCM_API_URL, headers, payloads)
     except Exception as exc:
         logging.exception("Errore nell'invio FCM: %s", exc)
         return {"ok": False, "reason": "exception", "error": str(exc)}
+
+    logging.info("FCM response: %s", [r.get("response") for r in results])
+
+    if len(results) == 1:
+        return results[0]
+
+    failed = [r for r in results if not r.get("ok")]
+    return {
+        "ok": not failed,
+        "status_code": failed[0].get("status_code") if failed else 200,
+        "reason": failed[0].get("reason") if failed else None,
+        "response": [r.get("response") for r in results],
+        "batches": len(results),
+    }
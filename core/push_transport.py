@@ -0,0 +1,145 @@
+# core/push_transport.py
+# Trasporto HTTP per l'endpoint FCM con connessioni persistenti.
+#
+# - AsyncPushTransport: client httpx asincrono (HTTP/2 se disponibile il
+#   pacchetto "h2") su un event loop dedicato in un thread di background.
+#   Client e connessioni restano vivi tra una chiamata e l'altra e i
+#   blocchi di token partono in parallelo (MAX_CONCURRENT_REQUESTS).
+# - SyncPushTransport: fallback senza httpx, requests.Session con pool di
+#   connessioni keep-alive e un ThreadPoolExecutor per i blocchi.
+#
+# get_transport() restituisce l'istanza unica del processo.
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:  # opzionale: senza httpx si usa il trasporto sincrono
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401  (abilita HTTP/2 in httpx)
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+
+MAX_CONCURRENT_REQUESTS = 8
+REQUEST_TIMEOUT = 10
+
+
+def _result(status_code: int, ok: bool, data: Any) -> Dict[str, Any]:
+    return {"ok": ok, "status_code": status_code, "response": data}
+
+
+def _error(exc: Exception) -> Dict[str, Any]:
+    return {"ok": False, "reason": "exception", "error": str(exc)}
+
+
+class SyncPushTransport:
+    """requests.Session condivisa: niente handshake TLS a ogni invio."""
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_REQUESTS):
+        self.max_concurrent = max_concurrent
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=max_concurrent,
+            max_retries=2,
+        )
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrent, thread_name_prefix="push-http"
+        )
+
+    def _post(self, url: str, headers: dict, payload: dict) -> Dict[str, Any]:
+        try:
+            resp = self._session.post(
+                url, headers=headers, json=payload, timeout=REQUEST_TIMEOUT
+            )
+        except requests.RequestException as exc:
+            return _error(exc)
+        try:
+            data = resp.json()
+        except ValueError:
+            data = {"raw": resp.text[:500]}
+        return _result(resp.status_code, resp.ok, data)
+
+    def post_many(self, url: str, headers: dict, payloads: List[dict]) -> List[Dict[str, Any]]:
+        if len(payloads) == 1:
+            return [self._post(url, headers, payloads[0])]
+        futures = [self._executor.submit(self._post, url, headers, p) for p in payloads]
+        return [f.result() for f in futures]
+
+
+class AsyncPushTransport:
+    """Client httpx persistente su un event loop dedicato."""
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_REQUESTS):
+        self.max_concurrent = max_concurrent
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, daemon=True, name="push-transport"
+        )
+        self._thread.start()
+        self._client = asyncio.run_coroutine_threadsafe(
+            self._make_client(), self._loop
+        ).result()
+
+    async def _make_client(self):
+        return httpx.AsyncClient(
+            http2=_HTTP2,
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=self.max_concurrent,
+                max_keepalive_connections=self.max_concurrent,
+            ),
+        )
+
+    async def _post(self, sem, url: str, headers: dict, payload: dict) -> Dict[str, Any]:
+        try:
+            async with sem:
+                resp = await self._client.post(url, headers=headers, json=payload)
+        except httpx.HTTPError as exc:
+            return _error(exc)
+        try:
+            data = resp.json()
+        except ValueError:
+            data = {"raw": resp.text[:500]}
+        return _result(resp.status_code, resp.is_success, data)
+
+    async def _post_many_async(
+        self, url: str, headers: dict, payloads: List[dict]
+    ) -> List[Dict[str, Any]]:
+        sem = asyncio.Semaphore(self.max_concurrent)
+        return await asyncio.gather(
+            *[self._post(sem, url, headers, p) for p in payloads]
+        )
+
+    def post_many(self, url: str, headers: dict, payloads: List[dict]) -> List[Dict[str, Any]]:
+        """Versione bloccante, utilizzabile da codice sincrono (Streamlit, worker)."""
+        return asyncio.run_coroutine_threadsafe(
+            self._post_many_async(url, headers, payloads), self._loop
+        ).result()
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """Trasporto unico per processo: asincrono se c'è httpx, altrimenti sincrono."""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = AsyncPushTransport() if httpx is not None else SyncPushTransport()
+        return _transport
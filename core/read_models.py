@@ -0,0 +1,192 @@
+# core/read_models.py
+# Modelli di sola lettura per i pannelli Streamlit.
+#
+# Le pagine leggono poche colonne per titoli degli expander e tabelle:
+# qui le query selezionano solo quelle colonne e le righe diventano
+# piccole dataclass con __slots__, senza passare da identity map e
+# tracciamento delle modifiche dell'ORM. Gli oggetti ORM restano per le
+# scritture (salvataggi, annullamenti).
+#
+# Il filtro per club si applica anche a queste select (core/tenancy.py).
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .access import AccessScope
+from .i18n import DEFAULT_LANGUAGE, catalogue
+from .models import Athlete, Category, Event, EventAttendance
+
+
+@dataclass(frozen=True, slots=True)
+class CategoryRow:
+    id: int
+    name: str
+
+
+@dataclass(frozen=True, slots=True)
+class AthleteRow:
+    id: int
+    name: str
+    category_id: Optional[int]
+
+
+@dataclass(frozen=True, slots=True)
+class EventRow:
+    id: int
+    date: date
+    title: str
+    type: str
+    category_id: int
+    description: Optional[str]
+    location: Optional[str]
+    location_id: Optional[int]
+    series_id: Optional[int]
+
+    @property
+    def is_race(self) -> bool:
+        return self.type == "race"
+
+
+@dataclass(frozen=True, slots=True)
+class AttendanceRow:
+    id: int
+    event_id: int
+    athlete_id: int
+    athlete_name: str
+    status: str
+    skis_in_skiroom: bool
+    car_available: bool
+    car_seats: Optional[int]
+
+
+_EVENT_COLUMNS = (
+    Event.id,
+    Event.date,
+    Event.title,
+    Event.type,
+    Event.category_id,
+    Event.description,
+    Event.location,
+    Event.location_id,
+    Event.series_id,
+)
+
+
+def scope_categories(db: Session, scope: AccessScope) -> List[CategoryRow]:
+    """Categorie del perimetro, in ordine alfabetico."""
+    if not scope.all_access and not scope.category_ids:
+        return []
+    rows = db.execute(
+        select(Category.id, Category.name)
+        .where(scope.category_filter(Category.id))
+        .order_by(Category.name.asc())
+    )
+    return [CategoryRow(*row) for row in rows]
+
+
+def scope_athletes(db: Session, scope: AccessScope) -> List[AthleteRow]:
+    """Atleti del perimetro, in ordine alfabetico."""
+    if not scope.all_access and not scope.athlete_ids:
+        return []
+    rows = db.execute(
+        select(Athlete.id, Athlete.name, Athlete.category_id)
+        .where(scope.athletes_filter())
+        .order_by(Athlete.name.asc())
+    )
+    return [AthleteRow(*row) for row in rows]
+
+
+def future_events(
+    db: Session, scope: AccessScope, today: Optional[date] = None
+) -> List[EventRow]:
+    """Eventi del perimetro da oggi in avanti, in ordine di data."""
+    today = today or date.today()
+    rows = db.execute(
+        select(*_EVENT_COLUMNS)
+        .where(scope.events_filter(), Event.date >= today)
+        .order_by(Event.date.asc(), Event.id.asc())
+    )
+    return [EventRow(*row) for row in rows]
+
+
+def events_between(
+    db: Session, scope: AccessScope, start: date, end: date
+) -> List[EventRow]:
+    """Eventi del perimetro con data in [start, end], in ordine di data."""
+    rows = db.execute(
+        select(*_EVENT_COLUMNS)
+        .where(scope.events_filter(), Event.date >= start, Event.date <= end)
+        .order_by(Event.date.asc(), Event.id.asc())
+    )
+    return [EventRow(*row) for row in rows]
+
+
+def attendance_by_event(
+    db: Session, event_ids: Iterable[int]
+) -> Dict[int, List[AttendanceRow]]:
+    """
+    Presenze (con nome atleta) di più eventi in una query, raggruppate per
+    evento e ordinate per nome: evita una query per ogni expander.
+    """
+    event_ids = list(event_ids)
+    grouped: Dict[int, List[AttendanceRow]] = {ev_id: [] for ev_id in event_ids}
+    if not event_ids:
+        return grouped
+
+    rows = db.execute(
+        select(
+            EventAttendance.id,
+            EventAttendance.event_id,
+            EventAttendance.athlete_id,
+            Athlete.name,
+            EventAttendance.status,
+            EventAttendance.skis_in_skiroom,
+            EventAttendance.car_available,
+            EventAttendance.car_seats,
+        )
+        .join(Athlete, EventAttendance.athlete_id == Athlete.id)
+        .where(EventAttendance.event_id.in_(event_ids))
+        .order_by(Athlete.name.asc(), EventAttendance.id.asc())
+    )
+    for row in rows:
+        grouped[row[1]].append(AttendanceRow(*row))
+    return grouped
+
+
+def category_names(categories: Iterable[CategoryRow]) -> Dict[int, str]:
+    return {c.id: c.name for c in categories}
+
+
+def event_title(
+    ev: EventRow, category_name: Optional[str], language: str = DEFAULT_LANGUAGE
+) -> str:
+    """Titolo dell'expander di un evento, uguale per allenatore e genitore."""
+    kind = catalogue(language)["event.race" if ev.is_race else "event.training"]
+    return f"{ev.date} · {ev.title} ({category_name or '-'}) - {kind}"
+
+
+def family_rows(
+    db: Session, scope: AccessScope
+) -> Tuple[List[AthleteRow], Dict[int, str]]:
+    """Figli del genitore e nomi delle loro categorie, in una query."""
+    if not scope.athlete_ids:
+        return [], {}
+    rows = db.execute(
+        select(Athlete.id, Athlete.name, Athlete.category_id, Category.name)
+        .outerjoin(Category, Athlete.category_id == Category.id)
+        .where(scope.athletes_filter())
+        .order_by(Athlete.name.asc())
+    )
+    athletes: List[AthleteRow] = []
+    names: Dict[int, str] = {}
+    for ath_id, name, category_id, category_name in rows:
+        athletes.append(AthleteRow(ath_id, name, category_id))
+        if category_name is not None:
+            names[category_id] = category_name
+    return athletes, names
@@ -0,0 +1,199 @@
+# core/reminders.py
+# Promemoria automatici per le presenze "Da confermare".
+#
+# Un giro del worker:
+#  1. accoda con un solo INSERT ... SELECT (idempotente grazie al vincolo
+#     unico su reminder_log) una riga per ogni coppia genitore/evento nei
+#     prossimi REMINDER_DAYS_AHEAD giorni con atleti ancora "undecided";
+#  2. legge i promemoria in sospeso, li raggruppa per genitore e invia un
+#     solo push riassuntivo per genitore con l'invio immediato del
+#     dispatcher (core/dispatch.py: stessi limiti, fuori dalla coda);
+#  3. segna come inviati solo quelli andati a buon fine. Chi è oltre il
+#     limite o non ha ricevuto resta in sospeso solo in reminder_log
+#     (sent_at vuoto) e riprova al giro successivo.
+# Durante le ore di silenzio (fuso Europe/Rome) accoda ma non invia.
+
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+
+import pytz
+from sqlalchemy import literal, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from .dispatch import get_dispatcher
+from .models import (
+    Athlete,
+    Event,
+    EventAttendance,
+    ParentAthlete,
+    ReminderLog,
+)
+
+
+REMINDER_DAYS_AHEAD = 2
+
+TIMEZONE = pytz.timezone("Europe/Rome")
+
+# nessun push tra le 21:00 e le 8:00 (ora locale)
+QUIET_HOURS_START = 21
+QUIET_HOURS_END = 8
+
+
+@dataclass
+class ReminderRun:
+    queued: int = 0
+    parents: int = 0
+    sent: int = 0
+    failed: int = 0
+    quiet_hours: bool = False
+
+
+def in_quiet_hours(now_utc: Optional[datetime] = None) -> bool:
+    now_utc = now_utc or datetime.utcnow()
+    local = pytz.utc.localize(now_utc).astimezone(TIMEZONE)
+    return local.hour >= QUIET_HOURS_START or local.hour < QUIET_HOURS_END
+
+
+def queue_reminders(
+    db: Session,
+    today: Optional[date] = None,
+    days_ahead: int = REMINDER_DAYS_AHEAD,
+) -> int:
+    """Accoda i promemoria mancanti con un'unica istruzione set-based."""
+    today = today or date.today()
+
+    candidates = (
+        select(
+            ParentAthlete.parent_id,
+            EventAttendance.event_id,
+            literal("undecided"),
+            literal(datetime.utcnow()),
+        )
+        .join_from(EventAttendance, Event, EventAttendance.event_id == Event.id)
+        .join(ParentAthlete, ParentAthlete.athlete_id == EventAttendance.athlete_id)
+        .where(
+            EventAttendance.status == "undecided",
+            Event.date >= today,
+            Event.date <= today + timedelta(days=days_ahead),
+        )
+        .distinct()
+    )
+    stmt = (
+        sqlite_insert(ReminderLog)
+        .from_select(["parent_id", "event_id", "kind", "queued_at"], candidates)
+        .on_conflict_do_nothing(index_elements=["parent_id", "event_id", "kind"])
+    )
+    result = db.execute(stmt)
+    db.commit()
+    return result.rowcount or 0
+
+
+def _pending_digests(db: Session, today: date) -> Dict[int, dict]:
+    """
+    Promemoria in sospeso raggruppati per genitore. Si considerano solo gli
+    atleti ancora "undecided": chi ha già risposto non viene sollecitato.
+    """
+    rows = db.execute(
+        select(
+            ReminderLog.id,
+            ReminderLog.parent_id,
+            Event.date,
+            Event.title,
+            Athlete.name,
+        )
+        .join(Event, Event.id == ReminderLog.event_id)
+        .join(ParentAthlete, ParentAthlete.parent_id == ReminderLog.parent_id)
+        .join(
+            EventAttendance,
+            (EventAttendance.event_id == Event.id)
+            & (EventAttendance.athlete_id == ParentAthlete.athlete_id),
+        )
+        .join(Athlete, Athlete.id == ParentAthlete.athlete_id)
+        .where(
+            ReminderLog.sent_at.is_(None),
+            ReminderLog.kind == "undecided",
+            EventAttendance.status == "undecided",
+            Event.date >= today,
+        )
+        .order_by(ReminderLog.parent_id, Event.date)
+    ).all()
+
+    digests: Dict[int, dict] = defaultdict(lambda: {"log_ids": set(), "lines": []})
+    for log_id, parent_id, ev_date, title, athlete_name in rows:
+        digest = digests[parent_id]
+        digest["log_ids"].add(log_id)
+        digest["lines"].append(f"{ev_date.strftime('%d/%m')} {title}: {athlete_name}")
+    return digests
+
+
+def _mark_sent(db: Session, log_ids) -> None:
+    db.execute(
+        update(ReminderLog)
+        .where(ReminderLog.id.in_(list(log_ids)))
+        .values(sent_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def send_pending_reminders(db: Session, today: Optional[date] = None) -> ReminderRun:
+    today = today or date.today()
+    run = ReminderRun()
+
+    digests = _pending_digests(db, today)
+    if not digests:
+        return run
+    run.parents = len(digests)
+
+    # un riassunto per genitore, spedito subito (limiti di invio del
+    # dispatcher); lo stato resta in reminder_log, non nella coda in memoria
+    messages = {}
+    by_user = {}
+    for parent_id, digest in digests.items():
+        lines = digest["lines"]
+        title = (
+            "Presenza da confermare"
+            if len(lines) == 1
+            else f"{len(lines)} presenze da confermare"
+        )
+        messages[parent_id] = (title, "\n".join(lines))
+        by_user[parent_id] = digest["log_ids"]
+
+    result = get_dispatcher().send_now(db, messages)
+    run.sent = len(result.delivered)
+    run.failed = len(result.failed) + len(result.throttled)
+
+    done = set()
+    for parent_id in result.delivered:
+        done |= by_user.get(parent_id, set())
+
+    if done:
+        _mark_sent(db, done)
+    return run
+
+
+def run_once(
+    db: Session,
+    now_utc: Optional[datetime] = None,
+    days_ahead: int = REMINDER_DAYS_AHEAD,
+) -> ReminderRun:
+    """Un giro completo: accoda e, fuori dalle ore di silenzio, invia."""
+    now_utc = now_utc or datetime.utcnow()
+    today = pytz.utc.localize(now_utc).astimezone(TIMEZONE).date()
+
+    queued = queue_reminders(db, today=today, days_ahead=days_ahead)
+
+    if in_quiet_hours(now_utc):
+        run = ReminderRun(quiet_hours=True)
+    else:
+        run = send_pending_reminders(db, today=today)
+
+    run.queued = queued
+    logging.info("Promemoria: %s", run)
+    return run
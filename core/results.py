@@ -0,0 +1,523 @@
+# core/results.py
+# Risultati delle gare dagli export del cronometraggio (CSV o XML) e
+# classifiche.
+#
+# - Il file si legge in streaming (csv.reader / iterparse) e i risultati
+#   si scrivono a blocchi di CHUNK_SIZE righe con INSERT multipli; il
+#   nuovo import di una gara sostituisce i suoi risultati, tutto in una
+#   transazione.
+# - Posizione e punti della gara si calcolano nel database con RANK()
+#   sui tempi totali (le gare sono per categoria: è la classifica di
+#   categoria). Pari tempo, pari posizione e pari punti.
+# - La classifica di stagione è una tabella mantenuta (season_standings):
+#   a ogni import si tolgono i punti dei vecchi risultati della gara e si
+#   aggiungono i nuovi con un upsert per atleta, senza ricalcolare la
+#   stagione. Leggerla è una select sull'indice (club, stagione, categoria).
+#
+# I concorrenti si collegano agli atleti del club dal nome (ordine di nome
+# e cognome indifferente); gli altri restano in classifica gara senza punti
+# di stagione.
+#
+# Uso da riga di comando (file grandi letti dal disco):
+#   python -m core.results <slug club> <id gara> <file.csv|file.xml>
+
+from __future__ import annotations
+
+import csv
+import io
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from datetime import date
+from itertools import chain, islice
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from .archive import season_of
+from .models import Athlete, Event, RaceResult, SeasonStanding
+from .tenancy import require_club_id
+
+
+CHUNK_SIZE = 1000
+
+# punti per posizione (tabella Coppa del Mondo, primi 30)
+POINTS_TABLE = (
+    100, 80, 60, 50, 45, 40, 36, 32, 29, 26,
+    24, 22, 20, 18, 16, 15, 14, 13, 12, 11,
+    10, 9, 8, 7, 6, 5, 4, 3, 2, 1,
+)
+
+STATUS_OK = "OK"
+# sigle dei cronometraggi -> stato
+STATUS_ALIASES = {
+    "": STATUS_OK, "OK": STATUS_OK,
+    "DNF": "DNF", "RIT": "DNF",
+    "DSQ": "DSQ", "DQ": "DSQ", "SQ": "DSQ",
+    "DNS": "DNS", "NP": "DNS", "NPS": "DNS",
+}
+
+# intestazioni (o tag XML) riconosciute, maiuscole/minuscole indifferenti
+FIELD_ALIASES = {
+    "bib": {"bib", "pettorale", "dorsale", "pett"},
+    "name": {"name", "nome", "atleta", "concorrente", "cognome_nome"},
+    "run1": {"run1", "manche1", "1a_manche", "time1", "tempo1"},
+    "run2": {"run2", "manche2", "2a_manche", "time2", "tempo2"},
+    "total": {"total", "totale", "tempo", "time"},
+    "status": {"status", "stato", "esito"},
+}
+REQUIRED_FIELDS = {"bib", "name"}
+
+_ALIAS_TO_FIELD = {alias: name for name, aliases in FIELD_ALIASES.items() for alias in aliases}
+# elementi XML che rappresentano un concorrente
+_XML_RECORDS = {"result", "competitor", "racer", "concorrente"}
+
+
+@dataclass
+class ResultsReport:
+    rows: int = 0
+    imported: int = 0
+    unmatched: List[str] = field(default_factory=list)  # concorrenti non del club
+    errors: List[Tuple[int, str]] = field(default_factory=list)  # riga, messaggio
+
+
+@dataclass(frozen=True, slots=True)
+class ResultRow:
+    rank: Optional[int]
+    bib: int
+    name: str
+    athlete_id: Optional[int]
+    run1_ms: Optional[int]
+    run2_ms: Optional[int]
+    total_ms: Optional[int]
+    status: str
+    points: int
+
+
+@dataclass(frozen=True, slots=True)
+class StandingRow:
+    rank: int
+    athlete_id: int
+    athlete_name: str
+    points: int
+    races: int
+    wins: int
+    podiums: int
+
+
+@dataclass(frozen=True, slots=True)
+class RaceRow:
+    id: int
+    date: date
+    title: str
+    category_id: int
+    results: int
+
+
+# --------- LETTURA FILE ----------
+
+
+def _field(key: str) -> str:
+    key = str(key or "").strip().lower().replace(" ", "_")
+    return _ALIAS_TO_FIELD.get(key, key)
+
+
+def iter_csv_results(stream: BinaryIO) -> Iterator[Dict[str, str]]:
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+
+    reader = csv.reader(text, dialect)
+    header = [_field(h) for h in next(reader, [])]
+    for values in reader:
+        yield dict(zip(header, values))
+
+
+def iter_xml_results(stream: BinaryIO) -> Iterator[Dict[str, str]]:
+    """
+    Un record per elemento <Result>/<Competitor>/<Racer>, con i campi come
+    attributi o come elementi figli. Gli elementi letti vengono liberati.
+    """
+    for _, elem in ET.iterparse(stream, events=("end",)):
+        if elem.tag.rsplit("}", 1)[-1].lower() not in _XML_RECORDS:
+            continue
+        record = {_field(k): v for k, v in elem.attrib.items()}
+        for child in elem:
+            record[_field(child.tag.rsplit("}", 1)[-1])] = (child.text or "").strip()
+        yield record
+        elem.clear()
+
+
+def iter_results_file(file_name: str, stream: BinaryIO) -> Iterator[Dict[str, str]]:
+    if file_name.lower().endswith(".xml"):
+        return iter_xml_results(stream)
+    return iter_csv_results(stream)
+
+
+# --------- TEMPI ----------
+
+
+def parse_time(value: str) -> Optional[int]:
+    """Tempo in millisecondi da "1:02.35", "62.35" o "62,35"; None se vuoto."""
+    text = (value or "").strip().replace(",", ".")
+    if not text:
+        return None
+    seconds = 0.0
+    for part in text.split(":"):
+        seconds = seconds * 60 + float(part)
+    if seconds < 0:
+        raise ValueError(text)
+    return round(seconds * 1000)
+
+
+def format_time(ms: Optional[int]) -> str:
+    if ms is None:
+        return ""
+    minutes, rest = divmod(ms, 60000)
+    seconds = f"{rest / 1000:05.2f}"
+    return f"{minutes}:{seconds}" if minutes else seconds
+
+
+# --------- IMPORT ----------
+
+
+def _name_key(name: str) -> Tuple[str, ...]:
+    return tuple(sorted(name.casefold().split()))
+
+
+def _athlete_index(db: Session) -> Dict[Tuple[str, ...], Optional[int]]:
+    """Atleti del club per nome; None se il nome è ambiguo."""
+    index: Dict[Tuple[str, ...], Optional[int]] = {}
+    for athlete_id, name in db.execute(select(Athlete.id, Athlete.name)):
+        key = _name_key(name)
+        index[key] = None if key in index else athlete_id
+    return index
+
+
+def _parse_row(row: Dict[str, str]) -> Optional[dict]:
+    """Valori di un risultato; None per le righe vuote, ValueError se non valida."""
+    values = {k: (v or "").strip() for k, v in row.items() if k}
+    if not any(values.values()):
+        return None
+    try:
+        bib = int(values.get("bib", ""))
+    except ValueError:
+        raise ValueError("Pettorale mancante o non numerico.")
+    name = " ".join(values.get("name", "").split())
+    if not name:
+        raise ValueError("Nome del concorrente mancante.")
+
+    status = STATUS_ALIASES.get(values.get("status", "").upper())
+    if status is None:
+        raise ValueError(f"Stato non riconosciuto: {values['status']}")
+
+    times = {}
+    for key in ("run1", "run2", "total"):
+        text = values.get(key, "")
+        if text and text.upper() in STATUS_ALIASES:
+            # sigla al posto del tempo (es. "DNF" nella seconda manche)
+            if status == STATUS_OK:
+                status = STATUS_ALIASES[text.upper()]
+            times[key] = None
+            continue
+        try:
+            times[key] = parse_time(text)
+        except ValueError:
+            raise ValueError(f"Tempo non valido: {text}")
+
+    total = times["total"]
+    if total is None and status == STATUS_OK:
+        runs = [t for t in (times["run1"], times["run2"]) if t is not None]
+        total = sum(runs) if runs else None
+    if status == STATUS_OK and total is None:
+        raise ValueError("Nessun tempo per un concorrente classificato.")
+
+    return {
+        "bib": bib,
+        "name": name,
+        "run1_ms": times["run1"],
+        "run2_ms": times["run2"],
+        "total_ms": total if status == STATUS_OK else None,
+        "status": status,
+    }
+
+
+def _rank_race(db: Session, event_id: int) -> None:
+    """Posizione (RANK sul tempo totale) e punti dei classificati della gara."""
+    ranked = (
+        select(
+            RaceResult.id.label("id"),
+            func.rank().over(order_by=RaceResult.total_ms).label("position"),
+        )
+        .where(
+            RaceResult.event_id == event_id,
+            RaceResult.status == STATUS_OK,
+            RaceResult.total_ms.is_not(None),
+        )
+        .subquery()
+    )
+    points = case(
+        {position: value for position, value in enumerate(POINTS_TABLE, start=1)},
+        value=ranked.c.position,
+        else_=0,
+    )
+    db.execute(
+        update(RaceResult.__table__)
+        .where(RaceResult.__table__.c.id == ranked.c.id)
+        .values(rank=ranked.c.position, points=points)
+    )
+
+
+def _apply_standings(db: Session, club_id: int, event, sign: int) -> None:
+    """
+    Somma (sign=1) o toglie (sign=-1) i risultati della gara dalla
+    classifica di stagione, con un upsert per atleta.
+    """
+    rows = db.execute(
+        select(RaceResult.athlete_id, RaceResult.rank, RaceResult.points).where(
+            RaceResult.event_id == event.id, RaceResult.athlete_id.is_not(None)
+        )
+    ).all()
+    if not rows:
+        return
+
+    table = SeasonStanding.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["club_id", "season", "category_id", "athlete_id"],
+        set_={
+            name: table.c[name] + stmt.excluded[name]
+            for name in ("points", "races", "wins", "podiums")
+        },
+    )
+    season = season_of(event.date)
+    db.execute(
+        stmt,
+        [
+            {
+                "club_id": club_id,
+                "season": season,
+                "category_id": event.category_id,
+                "athlete_id": athlete_id,
+                "points": sign * points,
+                "races": sign,
+                "wins": sign * (rank == 1),
+                "podiums": sign * (rank is not None and rank <= 3),
+            }
+            for athlete_id, rank, points in rows
+        ],
+    )
+    if sign < 0:
+        db.execute(
+            delete(table).where(
+                table.c.club_id == club_id,
+                table.c.season == season,
+                table.c.category_id == event.category_id,
+                table.c.races <= 0,
+            )
+        )
+
+
+def _chunks(rows: Iterable, size: int) -> Iterator[list]:
+    it = iter(rows)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def import_race_results(
+    db: Session,
+    event_id: int,
+    rows: Iterable[Dict[str, str]],
+    chunk_size: int = CHUNK_SIZE,
+) -> ResultsReport:
+    """
+    Sostituisce i risultati della gara con quelli del file e aggiorna la
+    classifica di stagione, in una transazione. Le righe non valide sono
+    riportate in report.errors e saltate.
+    """
+    club_id = require_club_id(db)
+    event = db.execute(
+        select(Event.id, Event.date, Event.type, Event.category_id).where(
+            Event.id == event_id
+        )
+    ).first()
+    if event is None or event.type != "race":
+        raise ValueError("Gara non trovata.")
+
+    report = ResultsReport()
+    chunks = _chunks(enumerate(rows, start=2), chunk_size)  # riga 1 = intestazione
+    first = next(chunks, [])
+    if first:
+        missing = REQUIRED_FIELDS - set(first[0][1])
+        if missing:
+            report.errors.append((1, f"Colonne mancanti: {', '.join(sorted(missing))}"))
+            return report
+
+    athletes = _athlete_index(db)
+    seen_bibs = set()
+    try:
+        _apply_standings(db, club_id, event, -1)
+        db.execute(delete(RaceResult).where(RaceResult.event_id == event_id))
+
+        for chunk in chain([first], chunks):
+            values = []
+            for line, row in chunk:
+                report.rows += 1
+                try:
+                    result = _parse_row(row)
+                except ValueError as exc:
+                    report.errors.append((line, str(exc)))
+                    continue
+                if result is None:
+                    continue
+                if result["bib"] in seen_bibs:
+                    report.errors.append((line, f"Pettorale {result['bib']} ripetuto."))
+                    continue
+                seen_bibs.add(result["bib"])
+
+                athlete_id = athletes.get(_name_key(result["name"]))
+                if athlete_id is None:
+                    report.unmatched.append(result["name"])
+                values.append(
+                    {**result, "club_id": club_id, "event_id": event_id,
+                     "athlete_id": athlete_id}
+                )
+            if values:
+                # insert Core: executemany senza il giro dell'ORM per riga
+                db.execute(insert(RaceResult.__table__), values)
+                report.imported += len(values)
+
+        _rank_race(db, event_id)
+        _apply_standings(db, club_id, event, 1)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return report
+
+
+def delete_race_results(db: Session, event) -> None:
+    """
+    Toglie i risultati della gara e il loro contributo alla classifica di
+    stagione (es. gara annullata), senza commit.
+    """
+    _apply_standings(db, event.club_id, event, -1)
+    db.execute(delete(RaceResult).where(RaceResult.event_id == event.id))
+
+
+def move_race_results(db: Session, event, new_date) -> None:
+    """
+    Cambia la data della gara spostando il contributo dei risultati nella
+    classifica della stagione della nuova data, senza commit.
+    """
+    _apply_standings(db, event.club_id, event, -1)
+    event.date = new_date
+    _apply_standings(db, event.club_id, event, 1)
+
+
+# --------- LETTURE ----------
+
+
+def race_results(db: Session, event_id: int) -> List[ResultRow]:
+    """Classifica della gara: classificati per posizione, poi gli altri."""
+    rows = db.execute(
+        select(
+            RaceResult.rank,
+            RaceResult.bib,
+            RaceResult.name,
+            RaceResult.athlete_id,
+            RaceResult.run1_ms,
+            RaceResult.run2_ms,
+            RaceResult.total_ms,
+            RaceResult.status,
+            RaceResult.points,
+        )
+        .where(RaceResult.event_id == event_id)
+        .order_by(
+            RaceResult.rank.is_(None), RaceResult.rank, RaceResult.status, RaceResult.bib
+        )
+    )
+    return [ResultRow(*row) for row in rows]
+
+
+def season_standings(db: Session, season: int, category_id: int) -> List[StandingRow]:
+    """Classifica a punti della categoria, dalla tabella mantenuta."""
+    rows = db.execute(
+        select(
+            func.rank().over(order_by=SeasonStanding.points.desc()),
+            SeasonStanding.athlete_id,
+            Athlete.name,
+            SeasonStanding.points,
+            SeasonStanding.races,
+            SeasonStanding.wins,
+            SeasonStanding.podiums,
+        )
+        .join(Athlete, Athlete.id == SeasonStanding.athlete_id)
+        .where(
+            SeasonStanding.season == season,
+            SeasonStanding.category_id == category_id,
+        )
+        .order_by(SeasonStanding.points.desc(), Athlete.name)
+    )
+    return [StandingRow(*row) for row in rows]
+
+
+def past_races(
+    db: Session,
+    category_ids: Optional[Sequence[int]],
+    today: Optional[date] = None,
+    limit: int = 50,
+) -> List[RaceRow]:
+    """Gare già corse (più recenti prima) con il numero di risultati caricati."""
+    today = today or date.today()
+    results = (
+        select(func.count(RaceResult.id))
+        .where(RaceResult.event_id == Event.id)
+        .correlate(Event)
+        .scalar_subquery()
+    )
+    stmt = (
+        select(Event.id, Event.date, Event.title, Event.category_id, results)
+        .where(Event.type == "race", Event.date <= today, Event.cancelled_at.is_(None))
+        .order_by(Event.date.desc(), Event.id.desc())
+        .limit(limit)
+    )
+    if category_ids is not None:
+        stmt = stmt.where(Event.category_id.in_(list(category_ids) or [-1]))
+    return [RaceRow(*row) for row in db.execute(stmt)]
+
+
+if __name__ == "__main__":
+    import sys
+
+    from .db import SessionLocal
+    from .tenancy import get_club_by_slug, set_tenant
+
+    if len(sys.argv) != 4:
+        sys.exit("Uso: python -m core.results <slug club> <id gara> <file.csv|file.xml>")
+    slug, race_id, path = sys.argv[1], int(sys.argv[2]), sys.argv[3]
+
+    session = SessionLocal()
+    try:
+        club = get_club_by_slug(session, slug)
+        if club is None:
+            sys.exit(f"Club sconosciuto: {slug}")
+        set_tenant(session, club.id)
+        with open(path, "rb") as fh:
+            res = import_race_results(session, race_id, iter_results_file(path, fh))
+    finally:
+        session.close()
+
+    print(f"Righe lette: {res.rows}, risultati importati: {res.imported}")
+    if res.unmatched:
+        print(f"Concorrenti non del club: {len(res.unmatched)}")
+    for line, message in res.errors[:50]:
+        print(f"  riga {line}: {message}")
@@ -0,0 +1,466 @@
+# core/roster_import.py
+# Import massivo della rosa (atleti, genitori, allenatori e collegamenti)
+# da CSV o XLSX.
+#
+# Il file viene letto a blocchi (CHUNK_SIZE righe). Utenti, categorie,
+# atleti e collegamenti esistenti vengono caricati una volta sola in indici
+# in memoria, quindi nessuna query per riga; ogni blocco viene scritto con
+# INSERT/UPDATE multipli in una singola transazione. L'import avviene nel
+# club della sessione (core/tenancy.py).
+#
+# Un'email già registrata con un altro ruolo (es. un allenatore indicato
+# come genitore) non viene riusata: la riga finisce tra gli errori.
+#
+# Colonne riconosciute (intestazione, maiuscole/minuscole indifferenti):
+#   atleta*, categoria*, anno_nascita, genitore, email_genitore,
+#   allenatore, email_allenatore          (* obbligatorie)
+
+from __future__ import annotations
+
+import csv
+import io
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from .access import bump_scope_version
+from .attendance import populate_for_athletes, remove_future_for_category
+from .i18n import DEFAULT_LANGUAGE, translator
+from .models import Athlete, Category, CoachCategory, ParentAthlete, User
+from .tenancy import require_club_id
+
+try:  # opzionale: senza openpyxl si importano solo file CSV
+    from openpyxl import load_workbook
+except ImportError:
+    load_workbook = None
+
+
+CHUNK_SIZE = 500
+
+COLUMNS = [
+    "atleta",
+    "anno_nascita",
+    "categoria",
+    "genitore",
+    "email_genitore",
+    "allenatore",
+    "email_allenatore",
+]
+REQUIRED_COLUMNS = {"atleta", "categoria"}
+
+# i messaggi del report restano in italiano
+_t = translator(DEFAULT_LANGUAGE)
+
+
+@dataclass
+class ImportReport:
+    """Differenze (applicate o simulate) prodotte dall'import."""
+
+    dry_run: bool
+    rows: int = 0
+    new_categories: List[str] = field(default_factory=list)
+    new_users: List[Tuple[str, str, str]] = field(default_factory=list)  # nome, email, ruolo
+    new_athletes: List[Tuple[str, Optional[int], str]] = field(default_factory=list)
+    moved_athletes: List[Tuple[str, str, str]] = field(default_factory=list)  # nome, da, a
+    new_parent_links: List[Tuple[str, str]] = field(default_factory=list)  # email, atleta
+    new_coach_links: List[Tuple[str, str]] = field(default_factory=list)  # email, categoria
+    errors: List[Tuple[int, str]] = field(default_factory=list)  # riga, messaggio
+
+    @property
+    def has_changes(self) -> bool:
+        return any(
+            [
+                self.new_categories,
+                self.new_users,
+                self.new_athletes,
+                self.moved_athletes,
+                self.new_parent_links,
+                self.new_coach_links,
+            ]
+        )
+
+
+@dataclass
+class _Indexes:
+    """Stato esistente in memoria; gli id negativi sono provvisori (dry-run)."""
+
+    users: Dict[str, Tuple[int, str]]  # email -> (id, ruolo)
+    categories: Dict[str, Tuple[int, str]]  # nome minuscolo -> (id, nome)
+    athletes: Dict[Tuple[str, Optional[int]], Tuple[int, Optional[int]]]  # (nome, anno) -> (id, cat)
+    parent_links: Set[Tuple[int, int]]
+    coach_links: Set[Tuple[int, int]]
+    next_temp_id: int = -1
+
+    def temp_id(self) -> int:
+        value = self.next_temp_id
+        self.next_temp_id -= 1
+        return value
+
+
+def _load_indexes(db: Session) -> _Indexes:
+    return _Indexes(
+        users={
+            email.lower(): (uid, role)
+            for uid, email, role in db.execute(select(User.id, User.email, User.role))
+            if email
+        },
+        categories={
+            name.lower(): (cid, name)
+            for cid, name in db.execute(select(Category.id, Category.name))
+        },
+        athletes={
+            (name.lower(), year): (aid, cat_id)
+            for aid, name, year, cat_id in db.execute(
+                select(Athlete.id, Athlete.name, Athlete.birth_year, Athlete.category_id)
+            )
+        },
+        # i collegamenti non hanno club_id: il join li limita al club corrente
+        parent_links=set(
+            db.execute(
+                select(ParentAthlete.parent_id, ParentAthlete.athlete_id).join(
+                    Athlete, Athlete.id == ParentAthlete.athlete_id
+                )
+            )
+        ),
+        coach_links=set(
+            db.execute(
+                select(CoachCategory.coach_id, CoachCategory.category_id).join(
+                    Category, Category.id == CoachCategory.category_id
+                )
+            )
+        ),
+    )
+
+
+# --------- LETTURA FILE ----------
+
+
+def _normalize_header(header: Iterable) -> List[str]:
+    return [str(h or "").strip().lower().replace(" ", "_") for h in header]
+
+
+def iter_csv_rows(data: bytes) -> Iterator[Dict[str, str]]:
+    text = io.TextIOWrapper(io.BytesIO(data), encoding="utf-8-sig", newline="")
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+
+    reader = csv.reader(text, dialect)
+    header = _normalize_header(next(reader, []))
+    for values in reader:
+        yield dict(zip(header, values))
+
+
+def iter_xlsx_rows(data: bytes) -> Iterator[Dict[str, str]]:
+    if load_workbook is None:
+        raise RuntimeError("Import Excel non disponibile: installa openpyxl.")
+    # read_only: le righe vengono lette in streaming dal file
+    wb = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = _normalize_header(next(rows, []))
+        for values in rows:
+            yield {
+                h: "" if v is None else str(v)
+                for h, v in zip(header, values)
+            }
+    finally:
+        wb.close()
+
+
+def iter_file_rows(file_name: str, data: bytes) -> Iterator[Dict[str, str]]:
+    if file_name.lower().endswith(".xlsx"):
+        return iter_xlsx_rows(data)
+    return iter_csv_rows(data)
+
+
+def _chunks(rows: Iterable, size: int) -> Iterator[list]:
+    it = iter(rows)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# --------- IMPORT ----------
+
+
+def _clean(row: Dict[str, str], key: str) -> str:
+    return (row.get(key) or "").strip()
+
+
+def _validate(line: int, row: Dict[str, str], report: ImportReport) -> Optional[dict]:
+    athlete = _clean(row, "atleta")
+    category = _clean(row, "categoria")
+    if not athlete and not category and not any(row.values()):
+        return None  # riga vuota
+    if not athlete or not category:
+        report.errors.append((line, "Atleta e categoria sono obbligatori."))
+        return None
+
+    birth_year = None
+    raw_year = _clean(row, "anno_nascita")
+    if raw_year:
+        try:
+            birth_year = int(float(raw_year))
+        except ValueError:
+            report.errors.append((line, f"Anno di nascita non valido: {raw_year}"))
+            return None
+
+    parent_email = _clean(row, "email_genitore").lower()
+    coach_email = _clean(row, "email_allenatore").lower()
+    for email in (parent_email, coach_email):
+        if email and "@" not in email:
+            report.errors.append((line, f"Email non valida: {email}"))
+            return None
+
+    return {
+        "athlete": athlete,
+        "birth_year": birth_year,
+        "category": category,
+        "parent_name": _clean(row, "genitore") or parent_email,
+        "parent_email": parent_email,
+        "coach_name": _clean(row, "allenatore") or coach_email,
+        "coach_email": coach_email,
+    }
+
+
+def _row_users(r: dict) -> List[Tuple[str, str, str]]:
+    """(email, nome, ruolo) degli utenti indicati nella riga."""
+    return [
+        (email, name, role)
+        for email, name, role in (
+            (r["parent_email"], r["parent_name"], "parent"),
+            (r["coach_email"], r["coach_name"], "coach"),
+        )
+        if email
+    ]
+
+
+def _reject_role_conflicts(
+    rows: List[Tuple[int, dict]], idx: _Indexes, report: ImportReport
+) -> List[Tuple[int, dict]]:
+    """Scarta le righe che userebbero un utente con un ruolo diverso dal suo."""
+    # ruolo degli utenti nuovi già visti nel blocco
+    new_roles: Dict[str, str] = {}
+    accepted = []
+    for line, r in rows:
+        conflict = None
+        roles = dict(new_roles)
+        for email, _, role in _row_users(r):
+            current = idx.users[email][1] if email in idx.users else roles.get(email)
+            if current is not None and current != role:
+                conflict = (email, current, role)
+                break
+            roles[email] = role
+        if conflict is None:
+            new_roles = roles
+            accepted.append((line, r))
+            continue
+        email, current, role = conflict
+        report.errors.append(
+            (
+                line,
+                f"{email} è già registrato come {_t(f'role.{current}').lower()}, "
+                f"non come {_t(f'role.{role}').lower()}: riga non importata.",
+            )
+        )
+    return accepted
+
+
+def _import_chunk(
+    db: Session,
+    rows: List[Tuple[int, dict]],
+    idx: _Indexes,
+    report: ImportReport,
+    club_id: int,
+) -> None:
+    rows = _reject_role_conflicts(rows, idx, report)
+    if not rows:
+        return
+
+    # 1. categorie mancanti
+    new_cats = []
+    for _, r in rows:
+        key = r["category"].lower()
+        if key not in idx.categories and key not in {c.lower() for c in new_cats}:
+            new_cats.append(r["category"])
+    if new_cats:
+        if report.dry_run:
+            ids = [(idx.temp_id(), name) for name in new_cats]
+        else:
+            ids = db.execute(
+                insert(Category).returning(
+                    Category.id, Category.name, sort_by_parameter_order=True
+                ),
+                [{"club_id": club_id, "name": name} for name in new_cats],
+            ).all()
+        for cid, name in ids:
+            idx.categories[name.lower()] = (cid, name)
+        report.new_categories.extend(new_cats)
+
+    # 2. utenti (genitori e allenatori) risolti per email
+    new_users: Dict[str, dict] = {}
+    for _, r in rows:
+        for email, name, role in _row_users(r):
+            if email not in idx.users and email not in new_users:
+                new_users[email] = {
+                    "club_id": club_id,
+                    "name": name,
+                    "email": email,
+                    "role": role,
+                }
+    if new_users:
+        values = list(new_users.values())
+        if report.dry_run:
+            ids = [(idx.temp_id(), v["email"]) for v in values]
+        else:
+            ids = db.execute(
+                insert(User).returning(User.id, User.email, sort_by_parameter_order=True),
+                values,
+            ).all()
+        for uid, email in ids:
+            idx.users[email] = (uid, new_users[email]["role"])
+        report.new_users.extend((v["name"], v["email"], v["role"]) for v in values)
+
+    # 3. atleti: nuovi o spostati di categoria
+    new_athletes: Dict[Tuple[str, Optional[int]], dict] = {}
+    # chiave atleta -> (id, vecchia cat, nuova cat)
+    moved: Dict[Tuple[str, Optional[int]], Tuple[int, Optional[int], int]] = {}
+    for _, r in rows:
+        key = (r["athlete"].lower(), r["birth_year"])
+        cat_id, cat_name = idx.categories[r["category"].lower()]
+        if key in idx.athletes:
+            aid, old_cat = idx.athletes[key]
+            if old_cat != cat_id and key not in moved:
+                moved[key] = (aid, old_cat, cat_id)
+                old_name = next(
+                    (n for c, n in idx.categories.values() if c == old_cat), "-"
+                )
+                report.moved_athletes.append((r["athlete"], old_name, cat_name))
+        elif key not in new_athletes:
+            new_athletes[key] = {
+                "club_id": club_id,
+                "name": r["athlete"],
+                "birth_year": r["birth_year"],
+                "category_id": cat_id,
+            }
+            report.new_athletes.append((r["athlete"], r["birth_year"], cat_name))
+
+    if new_athletes:
+        values = list(new_athletes.values())
+        if report.dry_run:
+            ids = [idx.temp_id() for _ in values]
+        else:
+            ids = db.execute(
+                insert(Athlete).returning(Athlete.id, sort_by_parameter_order=True),
+                values,
+            ).scalars().all()
+        for aid, v in zip(ids, values):
+            idx.athletes[(v["name"].lower(), v["birth_year"])] = (aid, v["category_id"])
+
+    if moved:
+        for key, (aid, _, new_cat) in moved.items():
+            idx.athletes[key] = (aid, new_cat)
+        if not report.dry_run:
+            for aid, old_cat, _ in moved.values():
+                if old_cat is not None:
+                    remove_future_for_category(db, aid, old_cat)
+            db.execute(
+                update(Athlete),
+                [
+                    {"id": aid, "category_id": new_cat}
+                    for aid, _, new_cat in moved.values()
+                ],
+            )
+
+    # 4. collegamenti genitore-atleta e allenatore-categoria
+    parent_links = []
+    coach_links = []
+    for _, r in rows:
+        aid, _ = idx.athletes[(r["athlete"].lower(), r["birth_year"])]
+        cat_id, cat_name = idx.categories[r["category"].lower()]
+        if r["parent_email"]:
+            pair = (idx.users[r["parent_email"]][0], aid)
+            if pair not in idx.parent_links:
+                idx.parent_links.add(pair)
+                parent_links.append(pair)
+                report.new_parent_links.append((r["parent_email"], r["athlete"]))
+        if r["coach_email"]:
+            pair = (idx.users[r["coach_email"]][0], cat_id)
+            if pair not in idx.coach_links:
+                idx.coach_links.add(pair)
+                coach_links.append(pair)
+                report.new_coach_links.append((r["coach_email"], cat_name))
+
+    if report.dry_run:
+        return
+
+    if parent_links:
+        db.execute(
+            insert(ParentAthlete),
+            [{"parent_id": p, "athlete_id": a} for p, a in parent_links],
+        )
+    if coach_links:
+        db.execute(
+            insert(CoachCategory),
+            [{"coach_id": c, "category_id": cat} for c, cat in coach_links],
+        )
+
+    # presenze sugli eventi futuri per atleti nuovi e spostati
+    touched = [idx.athletes[k][0] for k in new_athletes]
+    touched += [aid for aid, _, _ in moved.values()]
+    populate_for_athletes(db, touched)
+
+
+def import_roster(
+    db: Session,
+    rows: Iterable[Dict[str, str]],
+    dry_run: bool = True,
+    chunk_size: int = CHUNK_SIZE,
+) -> ImportReport:
+    """
+    Importa (o simula, con dry_run=True) le righe della rosa.
+    Ogni blocco viene scritto in una transazione separata.
+    """
+    report = ImportReport(dry_run=dry_run)
+    club_id = require_club_id(db)
+    idx = _load_indexes(db)
+
+    numbered = enumerate(rows, start=2)  # riga 1 = intestazione
+    for chunk in _chunks(numbered, chunk_size):
+        missing = REQUIRED_COLUMNS - set(chunk[0][1])
+        if missing:
+            report.errors.append(
+                (1, f"Colonne mancanti: {', '.join(sorted(missing))}")
+            )
+            return report
+
+        valid = []
+        for line, row in chunk:
+            report.rows += 1
+            cleaned = _validate(line, row, report)
+            if cleaned:
+                valid.append((line, cleaned))
+
+        if not valid:
+            continue
+
+        try:
+            _import_chunk(db, valid, idx, report, club_id)
+            if not dry_run:
+                db.commit()
+                # collegamenti scritti in bulk: i perimetri in cache sono vecchi
+                bump_scope_version(club_id)
+        except Exception:
+            db.rollback()
+            raise
+
+    return report
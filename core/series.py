@@ -0,0 +1,307 @@
+# core/series.py
+# Serie ricorrenti di eventi (es. "ogni mar/gio/sab da dicembre ad aprile").
+#
+# Le occorrenze vengono materializzate in righe Event solo dentro un
+# orizzonte mobile (HORIZON_DAYS): ogni giro genera le date nuove con un
+# unico INSERT multiplo per gli eventi e un unico INSERT ... SELECT per le
+# presenze iniziali degli atleti della categoria.
+#
+# L'avanzamento dell'orizzonte gira in un thread di processo
+# (start_materializer), non nei rerun delle pagine: con più processi lo
+# esegue solo chi tiene la lease SERIES_JOB (core/leases.py).
+
+from __future__ import annotations
+
+import logging
+import threading
+from datetime import date, datetime, time, timedelta
+from time import sleep
+from typing import Iterable, List, Optional
+
+from dateutil.rrule import rrulestr
+from sqlalchemy import insert, select, delete
+from sqlalchemy.orm import Session
+
+from .attendance import populate_for_series
+from .db import SessionLocal
+from .leases import acquire_lease
+from .locations import get_or_create_location
+from .models import (
+    Event,
+    EventAttendance,
+    EventSeries,
+    EventSeriesException,
+    ReminderLog,
+)
+from .results import delete_race_results, move_race_results
+
+
+# quanti giorni in avanti tenere materializzati
+HORIZON_DAYS = 28
+
+SERIES_JOB = "series-materializer"
+# secondi tra un giro e l'altro: l'orizzonte si sposta di un giorno al giorno
+MATERIALIZE_INTERVAL = 3600
+
+# codici RFC 5545 in ordine lun..dom (come date.weekday())
+WEEKDAY_CODES = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+
+# campi modificabili su una singola occorrenza
+EDITABLE_FIELDS = {
+    "title",
+    "description",
+    "location",
+    "date",
+    "ask_skiroom",
+    "ask_carpool",
+}
+
+
+def weekly_rule(weekdays: Iterable[int]) -> str:
+    """Costruisce la regola settimanale a partire da indici 0=lun .. 6=dom."""
+    days = sorted(set(weekdays))
+    if not days:
+        raise ValueError("Seleziona almeno un giorno della settimana.")
+    return "FREQ=WEEKLY;BYDAY=" + ",".join(WEEKDAY_CODES[d] for d in days)
+
+
+def occurrences_between(series: EventSeries, start: date, end: date) -> List[date]:
+    """Date della serie comprese in [start, end], estremi inclusi."""
+    start = max(start, series.start_date)
+    end = min(end, series.end_date)
+    if start > end:
+        return []
+
+    rule = rrulestr(
+        series.rrule,
+        dtstart=datetime.combine(series.start_date, time()),
+    )
+    return [
+        dt.date()
+        for dt in rule.between(
+            datetime.combine(start, time()),
+            datetime.combine(end, time()),
+            inc=True,
+        )
+    ]
+
+
+def create_series(
+    db: Session,
+    *,
+    category_id: int,
+    title: str,
+    rrule: str,
+    start_date: date,
+    end_date: date,
+    type: str = "training",
+    description: Optional[str] = None,
+    location: Optional[str] = None,
+    ask_skiroom: bool = False,
+    ask_carpool: bool = False,
+    created_by: Optional[int] = None,
+    today: Optional[date] = None,
+) -> EventSeries:
+    """Crea la serie e materializza subito le occorrenze dell'orizzonte."""
+    if end_date < start_date:
+        raise ValueError("La data di fine serie è precedente a quella di inizio.")
+
+    place = get_or_create_location(db, location)
+    series = EventSeries(
+        category_id=category_id,
+        type=type,
+        title=title,
+        description=description,
+        location=place.label if place else None,
+        location_id=place.id if place else None,
+        ask_skiroom=ask_skiroom,
+        ask_carpool=ask_carpool,
+        rrule=rrule,
+        start_date=start_date,
+        end_date=end_date,
+        created_by=created_by,
+    )
+    db.add(series)
+    db.flush()
+
+    materialize_series(db, series, today=today)
+    db.commit()
+    return series
+
+
+def materialize_series(
+    db: Session,
+    series: EventSeries,
+    today: Optional[date] = None,
+    horizon_days: int = HORIZON_DAYS,
+) -> int:
+    """
+    Genera le occorrenze mancanti fino a today + horizon_days.
+    Ritorna il numero di eventi inseriti. Non fa commit.
+    """
+    today = today or date.today()
+    horizon_end = min(series.end_date, today + timedelta(days=horizon_days))
+
+    window_start = series.start_date
+    if series.materialized_until is not None:
+        window_start = series.materialized_until + timedelta(days=1)
+    # le date già passate non si generano più
+    window_start = max(window_start, today)
+
+    if window_start > horizon_end:
+        return 0
+
+    cancelled = set(
+        db.execute(
+            select(EventSeriesException.occurrence_date).where(
+                EventSeriesException.series_id == series.id,
+                EventSeriesException.occurrence_date >= window_start,
+                EventSeriesException.occurrence_date <= horizon_end,
+            )
+        ).scalars()
+    )
+
+    dates = [
+        d
+        for d in occurrences_between(series, window_start, horizon_end)
+        if d not in cancelled
+    ]
+
+    if dates:
+        db.execute(
+            insert(Event),
+            [
+                {
+                    "club_id": series.club_id,
+                    "type": series.type,
+                    "category_id": series.category_id,
+                    "title": series.title,
+                    "description": series.description,
+                    "location": series.location,
+                    "location_id": series.location_id,
+                    "date": d,
+                    "ask_skiroom": bool(series.ask_skiroom),
+                    "ask_carpool": bool(series.ask_carpool),
+                    "series_id": series.id,
+                    "series_date": d,
+                }
+                for d in dates
+            ],
+        )
+
+        # presenze iniziali: un solo INSERT ... SELECT per tutta la finestra
+        populate_for_series(db, series.id, window_start, horizon_end)
+
+    series.materialized_until = horizon_end
+    return len(dates)
+
+
+def materialize_due_series(
+    db: Session,
+    today: Optional[date] = None,
+    horizon_days: int = HORIZON_DAYS,
+) -> int:
+    """Fa avanzare l'orizzonte di tutte le serie ancora attive."""
+    today = today or date.today()
+    horizon_end = today + timedelta(days=horizon_days)
+
+    due = (
+        db.query(EventSeries)
+        .filter(
+            EventSeries.end_date >= today,
+            (EventSeries.materialized_until.is_(None))
+            | (
+                (EventSeries.materialized_until < horizon_end)
+                & (EventSeries.materialized_until < EventSeries.end_date)
+            ),
+        )
+        .all()
+    )
+
+    created = 0
+    for series in due:
+        created += materialize_series(db, series, today=today, horizon_days=horizon_days)
+
+    if due:
+        db.commit()
+    return created
+
+
+_materializer: Optional[threading.Thread] = None
+_materializer_lock = threading.Lock()
+
+
+def start_materializer(interval: float = MATERIALIZE_INTERVAL) -> None:
+    """Avvia (una volta per processo) il thread che fa avanzare le serie."""
+    global _materializer
+    with _materializer_lock:
+        if _materializer is not None and _materializer.is_alive():
+            return
+        _materializer = threading.Thread(
+            target=_materialize_loop, args=(interval,), daemon=True, name=SERIES_JOB
+        )
+        _materializer.start()
+
+
+def _materialize_loop(interval: float) -> None:
+    # la lease copre due intervalli: un giro in ritardo non la fa perdere
+    lease_seconds = max(interval * 2, 60)
+    while True:
+        if acquire_lease(SERIES_JOB, seconds=lease_seconds):
+            db = SessionLocal()
+            try:
+                materialize_due_series(db)
+            except Exception:
+                logging.exception("Errore nell'avanzamento delle serie")
+            finally:
+                db.close()
+        sleep(interval)
+
+
+def edit_occurrence(db: Session, event: Event, **changes) -> Event:
+    """
+    Modifica una singola occorrenza. La serie non viene toccata:
+    series_date resta quella originale, quindi la data non viene rigenerata.
+    Se la gara ha già risultati, i punti seguono la data nella classifica
+    della sua stagione.
+    """
+    unknown = set(changes) - EDITABLE_FIELDS
+    if unknown:
+        raise ValueError(f"Campi non modificabili: {', '.join(sorted(unknown))}")
+
+    if "location" in changes:
+        place = get_or_create_location(db, changes.pop("location"))
+        event.location = place.label if place else None
+        event.location_id = place.id if place else None
+
+    if "date" in changes:
+        move_race_results(db, event, changes.pop("date"))
+
+    for field, value in changes.items():
+        setattr(event, field, value)
+
+    db.commit()
+    return event
+
+
+def cancel_occurrence(db: Session, event: Event) -> None:
+    """
+    Annulla una singola occorrenza: elimina presenze, risultati (e punti in
+    classifica) e promemoria inviati e segna l'evento come annullato, che
+    resta con il suo storico delle presenze (core/history.py, solo in
+    aggiunta). Registra anche l'eccezione, così la data non torna se
+    l'orizzonte della serie viene ricalcolato.
+    """
+    if event.series_id is not None:
+        db.add(
+            EventSeriesException(
+                series_id=event.series_id,
+                occurrence_date=event.series_date or event.date,
+            )
+        )
+
+    delete_race_results(db, event)
+    for model in (EventAttendance, ReminderLog):
+        db.execute(delete(model).where(model.event_id == event.id))
+    event.cancelled_at = datetime.utcnow()
+    db.commit()
@@ -0,0 +1,210 @@
+# core/shared_cache.py
+# Cache condivisa tra i processi dell'app (modalità multiprocesso,
+# SCICLUB_MULTIPROCESS=1; vedi core/db.py).
+#
+# Un file SQLite a parte (SCICLUB_CACHE_PATH, in WAL) fa da "Redis
+# locale", separato dal database principale: scrivere in cache non
+# aspetta mai le transazioni dell'app.
+#
+# - Contatori di generazione (generation / bump_generation): invalidare
+#   vuol dire incrementare un contatore; le voci in cache portano nella
+#   chiave o nel valore la generazione con cui sono state calcolate. Ogni
+#   processo rilegge i contatori (una query su una tabella di poche righe)
+#   al massimo ogni GENERATION_POLL_SECONDS: un'invalidazione arriva agli
+#   altri processi entro quel tempo, a quello che la fa subito.
+# - SharedTTLCache: TTLCache con un secondo livello nel file condiviso. Un
+#   valore calcolato da un processo (statistiche di stagione, perimetro di
+#   un utente, feed ICS) serve anche agli altri. Va usata solo per valori
+#   "versionati" (generazione o impronta dei dati nella chiave o nel
+#   valore), perché pop() / clear() non raggiungono le copie in memoria
+#   degli altri processi.
+#
+# Con un solo processo (modalità predefinita) i contatori restano in
+# memoria e SharedTTLCache si comporta come TTLCache: nessun file, nessuna
+# query in più.
+
+from __future__ import annotations
+
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Hashable, Optional
+
+from .cache import TTLCache
+from .db import MULTIPROCESS
+
+
+CACHE_DATABASE_PATH = os.environ.get("SCICLUB_CACHE_PATH", "./sci_club_cache.db")
+
+GENERATION_POLL_SECONDS = 1.0
+# le scritture in cache rinunciano invece di aspettare a lungo
+CACHE_WRITE_TIMEOUT = 0.5
+# ogni quante scritture si eliminano le voci scadute
+PURGE_EVERY = 500
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS cache_entries ("
+    " name TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL,"
+    " expires_at REAL NOT NULL, PRIMARY KEY (name, key)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS cache_generations ("
+    " name TEXT PRIMARY KEY, value INTEGER NOT NULL) WITHOUT ROWID",
+)
+
+_MISSING = object()
+# una connessione per processo (autocommit), usata sotto lock: le
+# operazioni sono singole istruzioni brevi
+_conn: Optional[sqlite3.Connection] = None
+_conn_lock = threading.Lock()
+
+
+def _execute(sql: str, params: tuple = ()) -> list:
+    global _conn
+    with _conn_lock:
+        if _conn is None:
+            conn = sqlite3.connect(
+                CACHE_DATABASE_PATH,
+                timeout=CACHE_WRITE_TIMEOUT,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for ddl in _SCHEMA:
+                conn.execute(ddl)
+            _conn = conn
+        return _conn.execute(sql, params).fetchall()
+
+
+# --------- CONTATORI DI GENERAZIONE ----------
+
+
+_generations_lock = threading.Lock()
+_generations: Dict[str, int] = defaultdict(int)
+_generations_read_at = float("-inf")
+
+
+def generation(name: str) -> int:
+    """Valore attuale del contatore (0 se mai incrementato)."""
+    global _generations_read_at
+    if MULTIPROCESS:
+        now = time.monotonic()
+        if now - _generations_read_at >= GENERATION_POLL_SECONDS:
+            try:
+                rows = _execute("SELECT name, value FROM cache_generations")
+            except sqlite3.Error:
+                logging.exception("Cache condivisa: contatori non leggibili")
+            else:
+                with _generations_lock:
+                    _generations.clear()
+                    _generations.update(rows)
+                    _generations_read_at = now
+    with _generations_lock:
+        return _generations[name]
+
+
+def bump_generation(name: str) -> None:
+    """Incrementa il contatore: le voci calcolate con il valore precedente non valgono più."""
+    if not MULTIPROCESS:
+        with _generations_lock:
+            _generations[name] += 1
+        return
+
+    try:
+        value = _execute(
+            "INSERT INTO cache_generations (name, value) VALUES (?, 1) "
+            "ON CONFLICT (name) DO UPDATE SET value = value + 1 RETURNING value",
+            (name,),
+        )[0][0]
+    except sqlite3.Error:
+        # gli altri processi vedranno la modifica alla scadenza delle voci
+        logging.exception("Cache condivisa: invalidazione di %s non propagata", name)
+        with _generations_lock:
+            _generations[name] += 1
+        return
+    with _generations_lock:
+        _generations[name] = value
+
+
+# --------- VALORI CONDIVISI ----------
+
+
+class SharedTTLCache(TTLCache):
+    """
+    TTLCache locale con secondo livello nel file condiviso. Le chiavi si
+    confrontano per repr() e i valori si salvano con pickle.
+    """
+
+    def __init__(self, name: str, ttl: float, max_size: int = 1024):
+        super().__init__(ttl=ttl, max_size=max_size)
+        self.name = name
+        self._writes = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        value = super().get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if not MULTIPROCESS:
+            return default
+
+        try:
+            rows = _execute(
+                "SELECT value, expires_at FROM cache_entries WHERE name = ? AND key = ?",
+                (self.name, repr(key)),
+            )
+        except sqlite3.Error:
+            logging.exception("Cache condivisa %s non leggibile", self.name)
+            return default
+        if not rows:
+            return default
+        data, expires_at = rows[0]
+        remaining = expires_at - time.time()
+        if remaining <= 0:
+            return default
+        value = pickle.loads(data)
+        super().set(key, value, ttl=remaining)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        super().set(key, value, ttl=ttl)
+        if not MULTIPROCESS:
+            return
+
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        try:
+            _execute(
+                "INSERT OR REPLACE INTO cache_entries (name, key, value, expires_at) "
+                "VALUES (?, ?, ?, ?)",
+                (self.name, repr(key), pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                 expires_at),
+            )
+            self._writes += 1
+            if self._writes % PURGE_EVERY == 0:
+                _execute(
+                    "DELETE FROM cache_entries WHERE name = ? AND expires_at < ?",
+                    (self.name, now),
+                )
+        except sqlite3.Error:
+            # la cache condivisa è un di più: il valore resta in quella locale
+            logging.warning("Cache condivisa %s: scrittura saltata", self.name)
+
+    def pop(self, key: Hashable) -> None:
+        super().pop(key)
+        if MULTIPROCESS:
+            self._delete("DELETE FROM cache_entries WHERE name = ? AND key = ?",
+                         (self.name, repr(key)))
+
+    def clear(self) -> None:
+        super().clear()
+        if MULTIPROCESS:
+            self._delete("DELETE FROM cache_entries WHERE name = ?", (self.name,))
+
+    def _delete(self, sql: str, params: tuple) -> None:
+        try:
+            _execute(sql, params)
+        except sqlite3.Error:
+            logging.exception("Cache condivisa %s: eliminazione non riuscita", self.name)
@@ -0,0 +1,283 @@
+# core/sync.py
+# Sincronizzazione "offline first" delle presenze per l'app mobile (api.py).
+#
+# Un solo giro: il client manda le modifiche fatte senza rete, ognuna con
+# la versione della riga da cui è partito (base_version), e riceve le
+# modifiche del server successive al suo cursore (core/changes.py).
+#
+# - Conflitti: una modifica si applica solo se la riga è ancora alla
+#   base_version (UPDATE condizionato, un solo executemany per il batch).
+#   Se nel frattempo è cambiata il client riceve la riga del server; se il
+#   server ha però già gli stessi valori (invio ripetuto dopo una risposta
+#   persa) la modifica risulta applicata.
+# - Più modifiche alla stessa riga nello stesso batch: vale quella con il
+#   client_ts più recente (ISO 8601; senza fuso orario vale come UTC).
+# - Stesse regole del pannello Genitore: solo atleti visibili ed eventi non
+#   ancora passati, auto e posti solo per le gare.
+# - Ogni modifica applicata finisce nello storico (core/history.py) nella
+#   stessa transazione.
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import Session
+
+from .access import AccessScope
+from .changes import FEED_COLUMNS, Cursor, changes_since
+from .history import SOURCE_SYNC, history_row, record_changes
+from .models import Event, EventAttendance
+
+
+MAX_BATCH = 500
+DELTA_LIMIT = 500
+
+STATUSES = ("undecided", "present", "absent")
+MAX_CAR_SEATS = 8
+
+# campi modificabili dal client
+_FIELDS = ("status", "skis_in_skiroom", "car_available", "car_seats")
+
+
+class SyncError(ValueError):
+    """Batch non valido nel suo insieme (la richiesta va rifiutata)."""
+
+
+@dataclass
+class SyncResult:
+    applied: List[dict] = field(default_factory=list)  # {"id", "version"}
+    conflicts: List[dict] = field(default_factory=list)  # righe del server
+    rejected: List[dict] = field(default_factory=list)  # {"id", "reason"}
+    changes: List[dict] = field(default_factory=list)
+    cursor: Optional[Cursor] = None
+    has_more: bool = False
+
+
+def _parse_client_ts(value) -> Optional[datetime]:
+    """client_ts in UTC senza tzinfo, confrontabile con e senza fuso."""
+    if not value:
+        return None
+    ts = datetime.fromisoformat(value)
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def _parse_change(raw) -> dict:
+    """Controlla tipi e valori di una modifica; ValueError se non valida."""
+    if not isinstance(raw, dict):
+        raise ValueError("formato")
+    change = {"id": int(raw["id"]), "base_version": int(raw["base_version"])}
+    change["client_ts"] = _parse_client_ts(raw.get("client_ts"))
+
+    for name in _FIELDS:
+        if name in raw:
+            change[name] = raw[name]
+    if "status" in change and change["status"] not in STATUSES:
+        raise ValueError("status")
+    for flag in ("skis_in_skiroom", "car_available"):
+        if flag in change and not isinstance(change[flag], bool):
+            raise ValueError(flag)
+    if "car_seats" in change:
+        seats = change["car_seats"]
+        if seats is not None and (
+            not isinstance(seats, int) or not 0 <= seats <= MAX_CAR_SEATS
+        ):
+            raise ValueError("car_seats")
+    return change
+
+
+def _latest_per_row(changes: List[dict]) -> Dict[int, dict]:
+    """Una modifica per riga: la più recente per client_ts (o l'ultima inviata)."""
+    latest: Dict[int, dict] = {}
+    for change in changes:
+        current = latest.get(change["id"])
+        if (
+            current is None
+            or change["client_ts"] is None
+            or current["client_ts"] is None
+            or change["client_ts"] >= current["client_ts"]
+        ):
+            latest[change["id"]] = change
+    return latest
+
+
+def _target_values(row, change: dict) -> dict:
+    values = {name: change.get(name, getattr(row, name)) for name in _FIELDS}
+    if row.type != "race":
+        # auto e posti valgono solo per le gare
+        values["car_available"] = False
+        values["car_seats"] = 0
+    elif not values["car_available"]:
+        values["car_seats"] = 0
+    return values
+
+
+def _row_payload(row) -> dict:
+    return {col.key: getattr(row, col.key) for col in FEED_COLUMNS}
+
+
+def apply_changes(
+    db: Session,
+    scope: AccessScope,
+    user_id: int,
+    raw_changes: Iterable,
+    today: Optional[date] = None,
+) -> SyncResult:
+    """Applica il batch in una transazione; non calcola i delta."""
+    today = today or date.today()
+    raw_changes = list(raw_changes)
+    if len(raw_changes) > MAX_BATCH:
+        raise SyncError(f"Al massimo {MAX_BATCH} modifiche per richiesta")
+
+    result = SyncResult()
+    parsed = []
+    for raw in raw_changes:
+        try:
+            parsed.append(_parse_change(raw))
+        except (KeyError, TypeError, ValueError):
+            row_id = raw.get("id") if isinstance(raw, dict) else None
+            result.rejected.append({"id": row_id, "reason": "invalid"})
+    latest = _latest_per_row(parsed)
+    if not latest:
+        return result
+
+    # righe correnti del batch, solo se visibili all'utente: una query
+    rows = {
+        row.id: row
+        for row in db.execute(
+            select(*FEED_COLUMNS, EventAttendance.club_id, Event.date, Event.type)
+            .join(Event, Event.id == EventAttendance.event_id)
+            .where(EventAttendance.id.in_(list(latest)), scope.attendance_filter())
+        )
+    }
+
+    pending: List[dict] = []
+    for row_id, change in latest.items():
+        row = rows.get(row_id)
+        if row is None:
+            result.rejected.append({"id": row_id, "reason": "not_found"})
+            continue
+        if row.date < today:
+            result.rejected.append({"id": row_id, "reason": "event_past"})
+            continue
+
+        values = _target_values(row, change)
+        if all(values[name] == getattr(row, name) for name in _FIELDS):
+            # niente da scrivere: già allineata (anche un invio ripetuto)
+            result.applied.append({"id": row_id, "version": row.version})
+        elif change["base_version"] != row.version:
+            result.conflicts.append(_row_payload(row))
+        else:
+            params = {f"b_{name}": value for name, value in values.items()}
+            pending.append({"b_id": row_id, "b_version": row.version, **params})
+
+    if pending:
+        _write(db, user_id, pending, rows, result)
+    db.commit()
+    return result
+
+
+def _write(
+    db: Session, user_id: int, pending: List[dict], rows: dict, result: SyncResult
+) -> None:
+    table = EventAttendance.__table__
+    now = datetime.utcnow()
+    # version e change_seq li calcola l'UPDATE (onupdate delle colonne):
+    # change_seq è il cursore del feed e segue l'ordine di commit anche se
+    # il batch arriva lento. updated_at è esplicito per avere lo stesso
+    # istante nello storico, ma non fa da cursore
+    stmt = (
+        update(table)
+        .where(
+            table.c.id == bindparam("b_id"),
+            table.c.version == bindparam("b_version"),
+        )
+        .values(
+            status=bindparam("b_status"),
+            skis_in_skiroom=bindparam("b_skis_in_skiroom"),
+            car_available=bindparam("b_car_available"),
+            car_seats=bindparam("b_car_seats"),
+            updated_by=user_id,
+            updated_at=now,
+        )
+    )
+    written = db.execute(stmt, pending).rowcount
+
+    if written == len(pending):
+        ours = pending
+        result.applied.extend(
+            {"id": p["b_id"], "version": p["b_version"] + 1} for p in pending
+        )
+    else:
+        # qualcuno ha scritto tra la lettura e l'UPDATE: si rilegge per capire
+        fresh = {
+            row.id: row
+            for row in db.execute(
+                select(*FEED_COLUMNS).where(
+                    EventAttendance.id.in_([p["b_id"] for p in pending])
+                )
+            )
+        }
+        ours = []
+        for p in pending:
+            row = fresh.get(p["b_id"])
+            if row is None:
+                # cancellata nel frattempo (es. evento annullato)
+                result.rejected.append({"id": p["b_id"], "reason": "not_found"})
+            elif row.version == p["b_version"] + 1 and all(
+                getattr(row, name) == p[f"b_{name}"] for name in _FIELDS
+            ):
+                ours.append(p)
+                result.applied.append({"id": row.id, "version": row.version})
+            else:
+                result.conflicts.append(_row_payload(row))
+
+    # storico nella stessa transazione dell'UPDATE
+    record_changes(
+        db,
+        (
+            history_row(
+                rows[p["b_id"]].club_id,
+                rows[p["b_id"]].event_id,
+                rows[p["b_id"]].athlete_id,
+                p["b_status"],
+                p["b_skis_in_skiroom"],
+                p["b_car_available"],
+                p["b_car_seats"],
+                user_id,
+                now,
+                SOURCE_SYNC,
+            )
+            for p in ours
+        ),
+    )
+
+
+def sync_attendance(
+    db: Session,
+    scope: AccessScope,
+    user_id: int,
+    raw_changes: Iterable,
+    cursor: Optional[Cursor],
+    today: Optional[date] = None,
+) -> SyncResult:
+    """Upload del batch e delta del server dal cursore, in un solo giro."""
+    result = apply_changes(db, scope, user_id, raw_changes, today=today)
+
+    athlete_ids = None if scope.all_access else scope.athlete_ids
+    rows, new_cursor = changes_since(
+        db, cursor, athlete_ids=athlete_ids, limit=DELTA_LIMIT + 1
+    )
+    if len(rows) > DELTA_LIMIT:
+        rows = rows[:DELTA_LIMIT]
+        last = rows[-1]
+        new_cursor = (last.change_seq, last.id)
+        result.has_more = True
+
+    result.changes = [_row_payload(r) for r in rows]
+    result.cursor = new_cursor
+    return result
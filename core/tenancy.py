@@ -0,0 +1,166 @@
+# core/tenancy.py
+# Più club (tenant) nello stesso processo e nello stesso database.
+#
+# - Il club corrente è salvato in session.info["club_id"] (set_tenant).
+# - Ogni query ORM (SELECT, UPDATE, DELETE) eseguita da quella sessione
+#   viene ristretta al club con with_loader_criteria sui modelli ClubScoped:
+#   i moduli esistenti non devono filtrare a mano.
+# - Gli oggetti ClubScoped aggiunti alla sessione ricevono il club al flush;
+#   gli INSERT "bulk" (Core) devono invece passare club_id esplicitamente.
+# - Una sessione senza club (worker, manutenzione, CLI) vede tutti i club.
+#
+# Le query testuali (text()) non passano da qui: usano tenant_sql().
+# Le cache di processo usano tenant_key() come spazio dei nomi per club.
+
+from __future__ import annotations
+
+from typing import Hashable, List, Optional, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, with_loader_criteria
+
+from .cache import TTLCache
+from .models import Club, ClubScoped
+
+
+DEFAULT_CLUB_SLUG = "val-dayas"
+DEFAULT_CLUB_NAME = "Sci Club Val d'Ayas"
+
+CLUB_CACHE_TTL = 3600
+
+_club_cache = TTLCache(ttl=CLUB_CACHE_TTL, max_size=1024)
+
+
+def set_tenant(db: Session, club_id: Optional[int]) -> None:
+    """Restringe la sessione al club (None = nessun filtro)."""
+    if club_id is None:
+        db.info.pop("club_id", None)
+    else:
+        db.info["club_id"] = club_id
+
+
+def current_club_id(db: Session) -> Optional[int]:
+    return db.info.get("club_id")
+
+
+def require_club_id(db: Session) -> int:
+    club_id = current_club_id(db)
+    if club_id is None:
+        raise ValueError("Operazione possibile solo all'interno di un club.")
+    return club_id
+
+
+def tenant_key(club_id: Optional[int], *parts: Hashable) -> tuple:
+    """Chiave di cache nello spazio dei nomi del club."""
+    return ("club", club_id) + parts
+
+
+def tenant_sql(db: Session, alias: str) -> Tuple[str, dict]:
+    """
+    Condizione " AND <alias>.club_id = :club_id" per le query testuali,
+    vuota se la sessione non è legata a un club.
+    """
+    club_id = current_club_id(db)
+    if club_id is None:
+        return "", {}
+    return f" AND {alias}.club_id = :club_id", {"club_id": club_id}
+
+
+# --------- CLUB ----------
+
+
+def list_clubs(db: Session) -> List[Club]:
+    return db.execute(select(Club).order_by(Club.name)).scalars().all()
+
+
+def get_club(db: Session, club_id: int) -> Optional[dict]:
+    """Dati del club (id, slug, nome) dalla cache di processo."""
+
+    def load():
+        club = db.get(Club, club_id)
+        if club is None:
+            return None
+        return {"id": club.id, "slug": club.slug, "name": club.name}
+
+    return _club_cache.get_or_load(tenant_key(club_id, "club"), load)
+
+
+def get_club_by_slug(db: Session, slug: str) -> Optional[Club]:
+    return db.execute(select(Club).where(Club.slug == slug)).scalar_one_or_none()
+
+
+def create_club(db: Session, slug: str, name: str) -> Club:
+    club = Club(slug=slug.strip().lower(), name=name.strip())
+    db.add(club)
+    db.commit()
+    return club
+
+
+# --------- FILTRO AUTOMATICO ----------
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _filter_by_tenant(state):
+    club_id = state.session.info.get("club_id")
+    if club_id is None:
+        return
+    if state.is_select:
+        # i caricamenti di colonne/relazioni ereditano il filtro dalla query madre
+        if state.is_column_load or state.is_relationship_load:
+            return
+    elif not (state.is_update or state.is_delete) or state.is_executemany:
+        # INSERT e UPDATE "bulk" per chiave primaria: nessun criterio aggiuntivo
+        return
+
+    state.statement = state.statement.options(
+        with_loader_criteria(
+            ClubScoped,
+            lambda cls: cls.club_id == club_id,
+            include_aliases=True,
+        )
+    )
+
+
+@event.listens_for(Session, "before_flush")
+def _assign_tenant(session, flush_context, instances):
+    club_id = session.info.get("club_id")
+    if club_id is None:
+        return
+    for obj in session.new:
+        if isinstance(obj, ClubScoped) and obj.club_id is None:
+            obj.club_id = club_id
+
+
+if __name__ == "__main__":
+    # python -m core.tenancy <slug> "<nome club>" <email admin>
+    import argparse
+    import secrets
+
+    from .auth import hash_password
+    from .db import SessionLocal
+    from .models import User
+
+    parser = argparse.ArgumentParser(description="Crea un nuovo club con il suo admin")
+    parser.add_argument("slug")
+    parser.add_argument("name")
+    parser.add_argument("admin_email")
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        new_club = create_club(session, args.slug, args.name)
+        set_tenant(session, new_club.id)
+        password = secrets.token_urlsafe(9)
+        session.add(
+            User(
+                name=f"Admin {new_club.name}",
+                email=args.admin_email.strip().lower(),
+                role="admin",
+                password_hash=hash_password(password),
+            )
+        )
+        session.commit()
+        print(f"Club '{new_club.name}' creato (?club={new_club.slug}).")
+        print(f"Admin: {args.admin_email} / password temporanea: {password}")
+    finally:
+        session.close()
@@ -0,0 +1,43 @@
+# core/uow.py
+# Salvataggi dalle pagine Streamlit ("unit of work").
+#
+# Le sessioni delle pagine non scadono gli oggetti al commit
+# (UI_EXPIRE_ON_COMMIT in core/db.py): il resto del render continua a
+# usare quello che ha già caricato invece di rileggerlo riga per riga.
+# Qui, dopo il commit, si rileggono solo gli oggetti salvati nel blocco e
+# solo gli attributi che il database ha calcolato (es. version).
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from typing import Iterator
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+
+from . import history  # noqa: F401  (storico presenze: listener after_flush)
+
+
+@contextmanager
+def unit_of_work(db: Session) -> Iterator[Session]:
+    """
+    Commit alla fine del blocco, rollback se il blocco solleva.
+
+        with unit_of_work(db):
+            att.status = "present"
+    """
+    try:
+        yield db
+        changed = list(db.new) + list(db.dirty)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    for obj in changed:
+        state = inspect(obj)
+        if state.expired:
+            # sessione con expire_on_commit=True: tutto l'oggetto è scaduto
+            db.refresh(obj)
+        elif state.expired_attributes:
+            db.refresh(obj, attribute_names=list(state.expired_attributes))
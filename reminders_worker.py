@@ -0,0 +1,65 @@
+# reminders_worker.py
+# Worker dei promemoria "Da confermare", da avviare a parte rispetto
+# all'app Streamlit:
+#
+#   python reminders_worker.py            # gira ogni --interval secondi
+#   python reminders_worker.py --once     # un solo giro (es. da cron)
+#
+# Se ne possono avviare più copie (più macchine o processi): un giro lo
+# esegue solo chi tiene la lease "reminders" (core/leases.py), le altre
+# restano di riserva e subentrano se il leader si ferma. Serve
+# SCICLUB_MULTIPROCESS=1 (core/db.py): senza, ogni copia si considera sola.
+
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+
+from core.db import SessionLocal
+from core.leases import acquire_lease, release_lease
+from core.reminders import REMINDER_DAYS_AHEAD, run_once
+from seed import init_db_and_seed
+
+
+REMINDERS_JOB = "reminders"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Promemoria presenze da confermare")
+    parser.add_argument("--once", action="store_true", help="esegue un solo giro")
+    parser.add_argument(
+        "--interval", type=int, default=900, help="secondi tra un giro e l'altro"
+    )
+    parser.add_argument(
+        "--days", type=int, default=REMINDER_DAYS_AHEAD, help="giorni di anticipo"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    init_db_and_seed()
+
+    # la lease copre due intervalli: un giro saltato non la fa perdere
+    lease_seconds = max(args.interval * 2, 60)
+    try:
+        while True:
+            if acquire_lease(REMINDERS_JOB, seconds=lease_seconds):
+                db = SessionLocal()
+                try:
+                    run_once(db, days_ahead=args.days)
+                except Exception:
+                    logging.exception("Errore nel giro dei promemoria")
+                finally:
+                    db.close()
+            else:
+                logging.info("Promemoria: giro eseguito da un altro processo")
+
+            if args.once:
+                break
+            time.sleep(args.interval)
+    finally:
+        release_lease(REMINDERS_JOB)
+
+
+if __name__ == "__main__":
+    main()
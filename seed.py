@@ -3,32 +3,57 @@ from datetime import date, timedelta
 
 from sqlalchemy.orm import Session
 
-from core.db import Base, engine, SessionLocal
+from core.db import SessionLocal, UI_EXPIRE_ON_COMMIT
 from core.models import (
+    Club,
     User,
     Category,
     Athlete,
     ParentAthlete,
     CoachCategory,
     Event,
-    EventAttendance,
+    Location,
 )
+from core.attendance import populate_for_events
+from core.auth import hash_password
+from core.migrations import ensure_schema
+from core.tenancy import DEFAULT_CLUB_NAME, DEFAULT_CLUB_SLUG, set_tenant
+
+
+# password dei profili demo (cambiala dal pannello Admin)
+DEMO_PASSWORD = "valdayas"
 
 
 def get_db() -> Session:
-    """Crea una nuova sessione DB."""
-    return SessionLocal()
+    """Crea una nuova sessione DB per un render delle pagine."""
+    return SessionLocal(expire_on_commit=UI_EXPIRE_ON_COMMIT)
+
+
+_initialized = False
 
 
 def init_db_and_seed() -> None:
-    """Crea le tabelle e inserisce dati di esempio se il DB è vuoto."""
-    Base.metadata.create_all(bind=engine)
+    """
+    Allinea lo schema (core/migrations.py) e inserisce dati di esempio se
+    il DB è vuoto. Dopo la prima chiamata del processo non fa più query.
+    """
+    global _initialized
+    if _initialized:
+        return
+    ensure_schema()
 
     db = get_db()
     try:
         if db.query(User).count() > 0:
+            _initialized = True
             return
 
+        # --- Club (tenant) di default: tutti i dati demo gli appartengono ---
+        club = Club(slug=DEFAULT_CLUB_SLUG, name=DEFAULT_CLUB_NAME)
+        db.add(club)
+        db.flush()
+        set_tenant(db, club.id)
+
         # --- Utenti ---
         admin = User(name="Admin Sci Club", email="admin@club.test", role="admin")
         coach1 = User(name="Luca Coach", email="luca@club.test", role="coach")
@@ -36,6 +61,10 @@ def init_db_and_seed() -> None:
         parent1 = User(name="Genitore Noah", email="noah@club.test", role="parent")
         parent2 = User(name="Genitore Juno", email="juno@club.test", role="parent")
 
+        demo_hash = hash_password(DEMO_PASSWORD)
+        for u in (admin, coach1, coach2, parent1, parent2):
+            u.password_hash = demo_hash
+
         db.add_all([admin, coach1, coach2, parent1, parent2])
         db.flush()
 
@@ -75,6 +104,22 @@ def init_db_and_seed() -> None:
             ]
         )
 
+        # --- Località ---
+        loc_antagnod = Location(
+            resort="Antagnod", piste="Boudin",
+            latitude=45.8222, longitude=7.6877, altitude=1710,
+        )
+        loc_champoluc = Location(
+            resort="Champoluc", piste="Crest",
+            latitude=45.8371, longitude=7.7307, altitude=1975,
+        )
+        loc_gressoney = Location(
+            resort="Gressoney", piste="Weissmatten",
+            latitude=45.7869, longitude=7.8263, altitude=2000,
+        )
+        db.add_all([loc_antagnod, loc_champoluc, loc_gressoney])
+        db.flush()
+
         # --- Eventi ---
         today = date.today()
         ev1 = Event(
@@ -82,7 +127,8 @@ def init_db_and_seed() -> None:
             category_id=cat_cuccioli.id,
             title="Allenamento GS Antagnod",
             description="Lavoro su curva media.",
-            location="Antagnod – Boudin",
+            location=loc_antagnod.label,
+            location_id=loc_antagnod.id,
             date=today + timedelta(days=1),
         )
         ev2 = Event(
@@ -90,7 +136,8 @@ def init_db_and_seed() -> None:
             category_id=cat_cuccioli.id,
             title="Allenamento SL Champoluc",
             description="Pali corti.",
-            location="Champoluc – Crest",
+            location=loc_champoluc.label,
+            location_id=loc_champoluc.id,
             date=today + timedelta(days=3),
         )
         ev3 = Event(
@@ -98,29 +145,18 @@ def init_db_and_seed() -> None:
             category_id=cat_ragazzi.id,
             title="Gara Regionale SL",
             description="Selezione U14.",
-            location="Gressoney – Weissmatten",
+            location=loc_gressoney.label,
+            location_id=loc_gressoney.id,
             date=today + timedelta(days=5),
         )
         db.add_all([ev1, ev2, ev3])
         db.flush()
 
-        # --- Presenze iniziali ---
-        events = [ev1, ev2, ev3]
-        athletes = [athlete_noah, athlete_juno, athlete_seth]
-
-        for ev in events:
-            for ath in athletes:
-                if ath.category_id != ev.category_id:
-                    continue
-                db.add(
-                    EventAttendance(
-                        event_id=ev.id,
-                        athlete_id=ath.id,
-                        status="undecided",
-                    )
-                )
+        # --- Presenze iniziali (un INSERT ... SELECT per tutti gli eventi) ---
+        populate_for_events(db, [ev.id for ev in (ev1, ev2, ev3)])
 
         db.commit()
+        _initialized = True
 
     finally:
         db.close()
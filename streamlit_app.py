@@ -1,12 +1,24 @@
 # streamlit_app.py
 # Sci Club Val d'Ayas · main con pagina login + ruoli
+# Più club nella stessa installazione: il club si sceglie al login
+# (o con ?club=<slug> nell'URL) e filtra tutta la sessione DB.
 
 from __future__ import annotations
 
 import streamlit as st
 
 from seed import init_db_and_seed, get_db
-from core.models import User
+from core.auth import (
+    Principal,
+    authenticate,
+    get_principal,
+    issue_session_token,
+    set_language,
+    verify_session_token,
+)
+from core.i18n import DEFAULT_LANGUAGE, LANGUAGES, normalize_language, translator
+from core.series import start_materializer
+from core.tenancy import get_club, list_clubs, set_tenant
 from ui_admin import render_admin_dashboard
 from ui_coach import render_coach_dashboard
 from ui_parent import render_parent_dashboard
@@ -14,48 +26,85 @@ from ui_parent import render_parent_dashboard
 
 # ---------- UTILS ----------
 
-def get_role_label(role: str) -> str:
-    return {
-        "admin": "Admin",
-        "coach": "Allenatore",
-        "parent": "Genitore",
-    }.get(role, role)
+def get_role_label(role: str, language: str) -> str:
+    return translator(language)(f"role.{role}")
 
 
-def get_current_user(db) -> User:
+def _login_language() -> str:
+    """Lingua della schermata di accesso: ?lang=<codice> o scelta dall'utente."""
+    default = normalize_language(st.query_params.get("lang"))
+    options = list(LANGUAGES)
+    return st.selectbox(
+        "🌐",
+        options=options,
+        index=options.index(default),
+        format_func=LANGUAGES.get,
+        key="login_language",
+    )
+
+
+def _select_club(clubs, label: str):
+    """Club del login: da ?club=<slug>, unico disponibile o scelto dall'utente."""
+    by_slug = {c.slug: c for c in clubs}
+    slug = st.query_params.get("club")
+    if slug in by_slug:
+        return by_slug[slug]
+    if len(clubs) == 1:
+        return clubs[0]
+
+    names = {c.id: c.name for c in clubs}
+    club_id = st.selectbox(label, options=list(names), format_func=names.get)
+    return next(c for c in clubs if c.id == club_id)
+
+
+def get_current_user(db) -> Principal:
     """
     Gestisce il login:
-    - se c'è current_user_id in session_state, restituisce l'utente
-    - altrimenti mostra la schermata di login
+    - se c'è un token di sessione valido, restituisce il principal (dalla
+      cache di processo, senza query) e lega la sessione DB al suo club
+    - altrimenti mostra la schermata di login (club + email + password)
     """
 
     # Utente già loggato?
-    if "current_user_id" in st.session_state:
-        user = db.query(User).get(st.session_state["current_user_id"])
-        if user:
-            return user
-        # se non esiste più, azzero la sessione
-        st.session_state.pop("current_user_id", None)
+    user_id = verify_session_token(st.session_state.get("session_token"))
+    if user_id is not None:
+        principal = get_principal(db, user_id)
+        if principal:
+            set_tenant(db, principal.club_id)
+            return principal
+    # token scaduto o utente non più esistente: azzero la sessione
+    st.session_state.pop("session_token", None)
 
     # --- Schermata di login ---
-    st.title("Sci Club Val d'Ayas")
-    st.subheader("Accesso")
-
-    users = db.query(User).order_by(User.role, User.name).all()
-    if not users:
-        st.error("Nessun utente definito. Accedi come admin e crea gli utenti.")
+    language = _login_language()
+    t = translator(language)
+    clubs = list_clubs(db)
+    if not clubs:
+        st.error(t("login.no_club"))
         st.stop()
 
-    options = {f"{u.name} ({get_role_label(u.role)})": u.id for u in users}
-    labels = list(options.keys())
-
-    selected_label = st.selectbox("Seleziona utente (demo login)", labels)
-
-    if st.button("Entra"):
-        st.session_state["current_user_id"] = options[selected_label]
-        st.rerun()  # nuova API, niente experimental
-
-    # finché non clicchi Entra, non c'è un utente corrente
+    st.title(clubs[0].name if len(clubs) == 1 else "Sci Club")
+    st.subheader(t("login.heading"))
+    club = _select_club(clubs, t("login.club"))
+
+    with st.form("login"):
+        email = st.text_input(t("login.email"))
+        password = st.text_input(t("login.password"), type="password")
+        submitted = st.form_submit_button(t("login.submit"))
+
+    if submitted:
+        set_tenant(db, club.id)
+        principal = authenticate(db, email, password)
+        if principal is None:
+            st.error(t("login.failed"))
+        else:
+            if language not in (DEFAULT_LANGUAGE, principal.language):
+                # lingua scelta all'accesso diversa da quella salvata
+                set_language(db, principal.id, language)
+            st.session_state["session_token"] = issue_session_token(principal.id)
+            st.rerun()  # nuova API, niente experimental
+
+    # finché non accedi, non c'è un utente corrente
     st.stop()
 
 
@@ -63,7 +112,7 @@ def get_current_user(db) -> User:
 
 def main() -> None:
     st.set_page_config(
-        page_title="Sci Club Val d'Ayas",
+        page_title="Sci Club",
         page_icon="🎿",
         layout="wide",
     )
@@ -72,18 +121,37 @@ def main() -> None:
     init_db_and_seed()
     db = get_db()
 
+    # Serie ricorrenti: le occorrenze che entrano nell'orizzonte le genera
+    # un thread del processo, non ogni rerun (core/series.py)
+    start_materializer()
+
     # Login / selezione utente
     current_user = get_current_user(db)
 
-    # Sidebar con info utente + logout
+    # Sidebar con info utente, lingua e logout
+    t = translator(current_user.language)
     with st.sidebar:
-        st.title("Sci Club Val d'Ayas")
+        st.title(get_club(db, current_user.club_id)["name"])
         st.caption(
-            f"Accesso come **{current_user.name}** "
-            f"({get_role_label(current_user.role)})"
+            t(
+                "sidebar.signed_in_as",
+                name=current_user.name,
+                role=get_role_label(current_user.role, current_user.language),
+            )
+        )
+        languages = list(LANGUAGES)
+        language = st.selectbox(
+            t("language"),
+            options=languages,
+            index=languages.index(current_user.language),
+            format_func=LANGUAGES.get,
+            key=f"user_language_{current_user.id}",
         )
-        if st.button("Logout"):
-            st.session_state.pop("current_user_id", None)
+        if language != current_user.language:
+            set_language(db, current_user.id, language)
+            st.rerun()
+        if st.button(t("sidebar.logout")):
+            st.session_state.pop("session_token", None)
             st.rerun()
 
     # Contenuto principale per ruolo
@@ -94,7 +162,7 @@ def main() -> None:
     elif current_user.role == "parent":
         render_parent_dashboard(db, current_user)
     else:
-        st.error("Ruolo sconosciuto.")
+        st.error(t("role.unknown"))
 
     db.close()
 
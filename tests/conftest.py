@@ -0,0 +1,108 @@
+# tests/conftest.py
+# I test usano file SQLite in una cartella temporanea: le variabili
+# d'ambiente vanno impostate prima di importare core.db.
+
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, event
+
+ROOT = Path(__file__).resolve().parent.parent
+DATA = Path(__file__).resolve().parent / "data"
+
+_WORKDIR = Path(tempfile.mkdtemp(prefix="sciclub-tests-"))
+os.environ["SCICLUB_DATABASE_URL"] = f"sqlite:///{_WORKDIR / 'sci_club_v2.db'}"
+os.environ["SCICLUB_ARCHIVE_PATH"] = str(_WORKDIR / "sci_club_archive.db")
+os.environ["SCICLUB_CACHE_PATH"] = str(_WORKDIR / "sci_club_cache.db")
+os.environ["SCICLUB_BACKUP_DIR"] = str(_WORKDIR / "backups")
+os.environ["SESSION_SECRET"] = "test-secret"
+os.environ.pop("SCICLUB_MULTIPROCESS", None)
+
+sys.path.insert(0, str(ROOT))
+
+
+def make_engine(directory: Path):
+    """Engine su un database a sé, con l'archivio agganciato come in core/db.py."""
+    engine = create_engine(f"sqlite:///{directory / 'main.db'}")
+
+    @event.listens_for(engine, "connect")
+    def _attach_archive(dbapi_connection, connection_record):
+        dbapi_connection.execute(
+            "ATTACH DATABASE ? AS archive", (str(directory / "archive.db"),)
+        )
+
+    return engine
+
+
+@pytest.fixture
+def no_batch_pause(monkeypatch):
+    from core import migrations
+
+    monkeypatch.setattr(migrations, "BATCH_PAUSE_SECONDS", 0)
+
+
+@pytest.fixture(scope="session")
+def seeded():
+    """Database di prova con i dati demo di seed.py; restituisce l'id del club."""
+    from core.db import SessionLocal
+    from core.tenancy import DEFAULT_CLUB_SLUG, get_club_by_slug
+    from seed import init_db_and_seed
+
+    init_db_and_seed()
+    db = SessionLocal()
+    try:
+        return get_club_by_slug(db, DEFAULT_CLUB_SLUG).id
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def db(seeded):
+    """Sessione sul club demo."""
+    from core.db import SessionLocal
+    from core.tenancy import set_tenant
+
+    session = SessionLocal()
+    set_tenant(session, seeded)
+    yield session
+    session.close()
+
+
+def user_by_email(db, email: str):
+    from core.models import User
+
+    return db.query(User).filter(User.email == email).one()
+
+
+def call_api(method: str, path: str, headers=(), body: bytes = b"", query: str = ""):
+    """Una richiesta all'app ASGI di api.py; ritorna (status, header, corpo)."""
+    import asyncio
+
+    from api import app
+
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": query.encode(),
+        "headers": [
+            (k.encode(), v if isinstance(v, bytes) else v.encode()) for k, v in headers
+        ],
+    }
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start = sent[0]
+    response_headers = {k.decode(): v.decode() for k, v in start["headers"]}
+    return start["status"], response_headers, b"".join(m.get("body", b"") for m in sent[1:])
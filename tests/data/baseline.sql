@@ -0,0 +1,149 @@
+BEGIN TRANSACTION;
+CREATE TABLE athlete_reports (
+	id INTEGER NOT NULL,
+	event_id INTEGER NOT NULL,
+	athlete_id INTEGER NOT NULL,
+	coach_id INTEGER NOT NULL,
+	content TEXT,
+	created_at DATETIME NOT NULL,
+	PRIMARY KEY (id),
+	FOREIGN KEY(event_id) REFERENCES events (id),
+	FOREIGN KEY(athlete_id) REFERENCES athletes (id),
+	FOREIGN KEY(coach_id) REFERENCES users (id)
+);
+CREATE TABLE athletes (
+	id INTEGER NOT NULL,
+	name VARCHAR(200) NOT NULL,
+	birth_year INTEGER,
+	category_id INTEGER,
+	PRIMARY KEY (id),
+	FOREIGN KEY(category_id) REFERENCES categories (id)
+);
+INSERT INTO "athletes" VALUES(1,'Noah Favre',2014,1);
+INSERT INTO "athletes" VALUES(2,'Juno Favre',2020,1);
+INSERT INTO "athletes" VALUES(3,'Seth Favre',2014,2);
+CREATE TABLE categories (
+	id INTEGER NOT NULL,
+	name VARCHAR(100) NOT NULL,
+	description TEXT,
+	PRIMARY KEY (id),
+	UNIQUE (name)
+);
+INSERT INTO "categories" VALUES(1,'U10 – Cuccioli','Atleti U10');
+INSERT INTO "categories" VALUES(2,'U14 – Ragazzi','Atleti U14');
+CREATE TABLE coach_category (
+	id INTEGER NOT NULL,
+	coach_id INTEGER NOT NULL,
+	category_id INTEGER NOT NULL,
+	PRIMARY KEY (id),
+	FOREIGN KEY(coach_id) REFERENCES users (id),
+	FOREIGN KEY(category_id) REFERENCES categories (id)
+);
+INSERT INTO "coach_category" VALUES(1,2,1);
+INSERT INTO "coach_category" VALUES(2,3,2);
+CREATE TABLE device_tokens (
+	id INTEGER NOT NULL,
+	user_id INTEGER NOT NULL,
+	platform VARCHAR(50) NOT NULL,
+	token VARCHAR(512) NOT NULL,
+	created_at DATETIME NOT NULL,
+	last_used_at DATETIME NOT NULL,
+	PRIMARY KEY (id),
+	FOREIGN KEY(user_id) REFERENCES users (id),
+	UNIQUE (token)
+);
+CREATE TABLE event_attendance (
+	id INTEGER NOT NULL,
+	event_id INTEGER NOT NULL,
+	athlete_id INTEGER NOT NULL,
+	status VARCHAR(20) NOT NULL,
+	skis_in_skiroom BOOLEAN,
+	car_available BOOLEAN,
+	car_seats INTEGER,
+	updated_by INTEGER,
+	updated_at DATETIME NOT NULL,
+	PRIMARY KEY (id),
+	FOREIGN KEY(event_id) REFERENCES events (id),
+	FOREIGN KEY(athlete_id) REFERENCES athletes (id),
+	FOREIGN KEY(updated_by) REFERENCES users (id)
+);
+INSERT INTO "event_attendance" VALUES(1,1,1,'undecided',0,0,NULL,NULL,'2026-10-19 02:06:05.288923');
+INSERT INTO "event_attendance" VALUES(2,1,2,'undecided',0,0,NULL,NULL,'2026-10-19 02:06:05.288938');
+INSERT INTO "event_attendance" VALUES(3,2,1,'undecided',0,0,NULL,NULL,'2026-10-19 02:06:05.288942');
+INSERT INTO "event_attendance" VALUES(4,2,2,'undecided',0,0,NULL,NULL,'2026-10-19 02:06:05.288944');
+INSERT INTO "event_attendance" VALUES(5,3,3,'undecided',0,0,NULL,NULL,'2026-10-19 02:06:05.288945');
+CREATE TABLE events (
+	id INTEGER NOT NULL,
+	type VARCHAR(50) NOT NULL,
+	category_id INTEGER NOT NULL,
+	title VARCHAR(200) NOT NULL,
+	description TEXT,
+	location VARCHAR(200),
+	date DATE NOT NULL,
+	ask_skiroom BOOLEAN,
+	ask_carpool BOOLEAN,
+	PRIMARY KEY (id),
+	FOREIGN KEY(category_id) REFERENCES categories (id)
+);
+INSERT INTO "events" VALUES(1,'training',1,'Allenamento GS Antagnod','Lavoro su curva media.','Antagnod – Boudin','2026-10-20',0,0);
+INSERT INTO "events" VALUES(2,'training',1,'Allenamento SL Champoluc','Pali corti.','Champoluc – Crest','2026-10-22',0,0);
+INSERT INTO "events" VALUES(3,'race',2,'Gara Regionale SL','Selezione U14.','Gressoney – Weissmatten','2026-10-24',0,0);
+CREATE TABLE messages (
+	id INTEGER NOT NULL,
+	sender_id INTEGER NOT NULL,
+	category_id INTEGER,
+	athlete_id INTEGER,
+	title VARCHAR(200) NOT NULL,
+	content TEXT NOT NULL,
+	created_at DATETIME NOT NULL,
+	PRIMARY KEY (id),
+	FOREIGN KEY(sender_id) REFERENCES users (id),
+	FOREIGN KEY(category_id) REFERENCES categories (id),
+	FOREIGN KEY(athlete_id) REFERENCES athletes (id)
+);
+CREATE TABLE parent_athlete (
+	id INTEGER NOT NULL,
+	parent_id INTEGER NOT NULL,
+	athlete_id INTEGER NOT NULL,
+	PRIMARY KEY (id),
+	FOREIGN KEY(parent_id) REFERENCES users (id),
+	FOREIGN KEY(athlete_id) REFERENCES athletes (id)
+);
+INSERT INTO "parent_athlete" VALUES(1,4,1);
+INSERT INTO "parent_athlete" VALUES(2,4,3);
+INSERT INTO "parent_athlete" VALUES(3,5,2);
+CREATE TABLE team_reports (
+	id INTEGER NOT NULL,
+	event_id INTEGER NOT NULL,
+	coach_id INTEGER NOT NULL,
+	content TEXT,
+	created_at DATETIME NOT NULL,
+	PRIMARY KEY (id),
+	FOREIGN KEY(event_id) REFERENCES events (id),
+	FOREIGN KEY(coach_id) REFERENCES users (id)
+);
+CREATE TABLE users (
+	id INTEGER NOT NULL,
+	name VARCHAR(200) NOT NULL,
+	email VARCHAR(200),
+	role VARCHAR(50) NOT NULL,
+	PRIMARY KEY (id),
+	UNIQUE (email)
+);
+INSERT INTO "users" VALUES(1,'Admin Sci Club','admin@club.test','admin');
+INSERT INTO "users" VALUES(2,'Luca Coach','luca@club.test','coach');
+INSERT INTO "users" VALUES(3,'Sara Coach','sara@club.test','coach');
+INSERT INTO "users" VALUES(4,'Genitore Noah','noah@club.test','parent');
+INSERT INTO "users" VALUES(5,'Genitore Juno','juno@club.test','parent');
+CREATE INDEX ix_users_id ON users (id);
+CREATE INDEX ix_categories_id ON categories (id);
+CREATE INDEX ix_athletes_id ON athletes (id);
+CREATE INDEX ix_coach_category_id ON coach_category (id);
+CREATE INDEX ix_events_id ON events (id);
+CREATE INDEX ix_device_tokens_id ON device_tokens (id);
+CREATE INDEX ix_parent_athlete_id ON parent_athlete (id);
+CREATE INDEX ix_event_attendance_id ON event_attendance (id);
+CREATE INDEX ix_messages_id ON messages (id);
+CREATE INDEX ix_team_reports_id ON team_reports (id);
+CREATE INDEX ix_athlete_reports_id ON athlete_reports (id);
+COMMIT;
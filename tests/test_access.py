@@ -0,0 +1,103 @@
+# tests/test_access.py
+from __future__ import annotations
+
+import uuid
+
+import pytest
+from sqlalchemy import delete, insert
+
+from core.access import bump_scope_version, current_version, get_scope
+from core.auth import get_principal
+from core.db import SessionLocal
+from core.models import Athlete, Category, CoachCategory, ParentAthlete, User
+from core.tenancy import create_club, set_tenant
+
+
+@pytest.fixture
+def club(seeded):
+    """Club nuovo: allenatore delle Cuccioli, genitore di Anna, Bruno nei Ragazzi."""
+    db = SessionLocal()
+    club = create_club(db, f"test-access-{uuid.uuid4().hex[:6]}", "Club perimetro")
+    set_tenant(db, club.id)
+    cuccioli, ragazzi = Category(name="Cuccioli"), Category(name="Ragazzi")
+    coach = User(name="Allenatore", email="coach@perimetro.test", role="coach")
+    parent = User(name="Genitore", email="genitore@perimetro.test", role="parent")
+    db.add_all([cuccioli, ragazzi, coach, parent])
+    db.flush()
+    anna = Athlete(name="Anna", category_id=cuccioli.id)
+    bruno = Athlete(name="Bruno", category_id=ragazzi.id)
+    db.add_all([anna, bruno, CoachCategory(coach_id=coach.id, category_id=cuccioli.id)])
+    db.flush()
+    db.add(ParentAthlete(parent_id=parent.id, athlete_id=anna.id))
+    db.commit()
+    ids = {
+        "club": club.id, "coach": coach.id, "parent": parent.id, "anna": anna.id,
+        "bruno": bruno.id, "cuccioli": cuccioli.id, "ragazzi": ragazzi.id,
+    }
+    yield db, ids
+    db.close()
+
+
+def _scope(db, user_id):
+    return get_scope(db, get_principal(db, user_id))
+
+
+def test_new_coach_category_is_visible_after_commit(club):
+    db, ids = club
+    assert _scope(db, ids["coach"]).athlete_ids == {ids["anna"]}
+    version = current_version(ids["club"])
+
+    db.add(CoachCategory(coach_id=ids["coach"], category_id=ids["ragazzi"]))
+    db.flush()
+    # solo flush: gli altri continuano a leggere il perimetro in cache
+    assert current_version(ids["club"]) == version
+    db.commit()
+
+    assert current_version(ids["club"]) != version
+    scope = _scope(db, ids["coach"])
+    assert scope.category_ids == {ids["cuccioli"], ids["ragazzi"]}
+    assert scope.athlete_ids == {ids["anna"], ids["bruno"]}
+
+
+def test_athlete_moving_category_changes_coach_and_parent_scopes(club):
+    db, ids = club
+    assert _scope(db, ids["parent"]).category_ids == {ids["cuccioli"]}
+
+    anna = db.get(Athlete, ids["anna"])
+    anna.category_id = ids["ragazzi"]
+    db.commit()
+
+    assert _scope(db, ids["coach"]).athlete_ids == frozenset()
+    assert _scope(db, ids["parent"]).category_ids == {ids["ragazzi"]}
+
+
+def test_removed_parent_link_and_rollback(club):
+    db, ids = club
+    assert _scope(db, ids["parent"]).athlete_ids == {ids["anna"]}
+
+    # annullata: nessuna invalidazione
+    version = current_version(ids["club"])
+    db.add(ParentAthlete(parent_id=ids["parent"], athlete_id=ids["bruno"]))
+    db.flush()
+    db.rollback()
+    assert current_version(ids["club"]) == version
+
+    db.delete(db.query(ParentAthlete).filter_by(parent_id=ids["parent"]).one())
+    db.commit()
+    assert _scope(db, ids["parent"]).athlete_ids == frozenset()
+
+
+def test_core_statements_need_a_manual_bump(club):
+    db, ids = club
+    assert _scope(db, ids["parent"]).athlete_ids == {ids["anna"]}
+
+    db.execute(insert(ParentAthlete), [{"parent_id": ids["parent"], "athlete_id": ids["bruno"]}])
+    db.commit()
+    # INSERT Core: il listener non lo vede, la cache resta quella di prima
+    assert _scope(db, ids["parent"]).athlete_ids == {ids["anna"]}
+
+    bump_scope_version(ids["club"])
+    assert _scope(db, ids["parent"]).athlete_ids == {ids["anna"], ids["bruno"]}
+    db.execute(delete(ParentAthlete).where(ParentAthlete.athlete_id == ids["bruno"]))
+    db.commit()
+    bump_scope_version(ids["club"])
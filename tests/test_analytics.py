@@ -0,0 +1,144 @@
+# tests/test_analytics.py
+from __future__ import annotations
+
+import math
+from datetime import date
+
+import pandas as pd
+import pytest
+from sqlalchemy.orm import Session
+
+from conftest import make_engine
+from core.analytics import compute_season_stats, load_season_frame, season_stats
+from core.archive import archive_season
+from core.migrations import migrate
+from core.models import Athlete, Category, Club, Event, EventAttendance
+from core.tenancy import set_tenant
+
+SEASON = 2019
+TODAY = date(2020, 1, 20)
+
+# (giorno, categoria, {atleta: stato}); lunedì 16/12, 6/1, 13/1, 3/2,
+# mercoledì 8/1 e 15/1. L'ultimo è dopo TODAY e non conta.
+EVENTS = [
+    (date(2019, 12, 16), "Cuccioli", {"Anna": "present", "Bruno": "absent"}),
+    (date(2020, 1, 6), "Cuccioli", {"Anna": "present", "Bruno": "present"}),
+    (date(2020, 1, 8), "Cuccioli", {"Anna": "absent", "Bruno": "present"}),
+    (date(2020, 1, 13), "Cuccioli", {"Anna": "present", "Bruno": "present"}),
+    (date(2020, 1, 15), "Ragazzi", {"Carla": "undecided"}),
+    (date(2020, 2, 3), "Cuccioli", {"Anna": "present", "Bruno": "absent"}),
+]
+ATHLETE_CATEGORY = {"Anna": "Cuccioli", "Bruno": "Cuccioli", "Carla": "Ragazzi"}
+
+
+def _hand_frame() -> pd.DataFrame:
+    ids = {"Anna": 1, "Bruno": 2, "Carla": 3, "Cuccioli": 10, "Ragazzi": 20}
+    return pd.DataFrame.from_records(
+        [
+            (event_id, pd.Timestamp(day), ids[category], ids[name], status, name, category)
+            for event_id, (day, category, statuses) in enumerate(EVENTS, start=1)
+            for name, status in statuses.items()
+        ],
+        columns=["event_id", "date", "category_id", "athlete_id", "status",
+                 "athlete", "category"],
+    )
+
+
+def _by_name(stats):
+    table = stats.by_athlete.set_index("athlete")
+    return {
+        name: tuple(row[c] for c in ("events", "present", "answered", "rate",
+                                     "best_streak", "current_streak"))
+        for name, row in table.iterrows()
+    }
+
+
+# calcolati a mano dalla tabella EVENTS
+EXPECTED_ATHLETES = {
+    # P P A P: 3 su 4, serie migliore 2, in corso 1
+    "Anna": (4, 3, 4, 0.75, 2, 1),
+    # A P P P: 3 su 4, serie migliore e in corso 3
+    "Bruno": (4, 3, 4, 0.75, 3, 3),
+    "Carla": (1, 0, 0, 0.0, 0, 0),
+}
+
+
+def _check(stats):
+    assert stats.events == 5
+    assert _by_name(stats) == EXPECTED_ATHLETES
+    # categorie in ordine alfabetico
+    assert list(stats.by_athlete["category"]) == ["Cuccioli", "Cuccioli", "Ragazzi"]
+
+    # lunedì: 5 presenti su 6 righe; mercoledì: 1 su 3
+    weekday = stats.by_weekday
+    assert weekday.loc["Lun", "attendances"] == 6
+    assert weekday.loc["Lun", "rate"] == pytest.approx(5 / 6)
+    assert weekday.loc["Mer", "attendances"] == 3
+    assert weekday.loc["Mer", "rate"] == pytest.approx(1 / 3)
+    assert weekday.loc[["Mar", "Gio", "Ven", "Sab", "Dom"], "rate"].isna().all()
+
+    trend = stats.category_trend
+    december, january = pd.Timestamp(2019, 12, 1), pd.Timestamp(2020, 1, 1)
+    assert list(trend.index) == [december, january]
+    assert trend.loc[december, "Cuccioli"] == pytest.approx(0.5)
+    assert math.isnan(trend.loc[december, "Ragazzi"])
+    assert trend.loc[january, "Cuccioli"] == pytest.approx(5 / 6)
+    assert trend.loc[january, "Ragazzi"] == 0
+
+
+def test_statistics_match_the_hand_computed_values():
+    _check(compute_season_stats(_hand_frame(), SEASON, TODAY))
+
+
+def test_season_without_past_events():
+    stats = compute_season_stats(_hand_frame(), SEASON, date(2019, 12, 1))
+    assert stats.events == 0 and stats.by_athlete.empty
+    assert stats.by_weekday["attendances"].isna().all()
+
+
+@pytest.fixture
+def club(tmp_path):
+    engine = make_engine(tmp_path)
+    migrate(engine)
+    db = Session(bind=engine)
+    club = Club(slug="statistiche", name="Statistiche")
+    db.add(club)
+    db.flush()
+    set_tenant(db, club.id)
+    categories = {name: Category(name=name) for name in ("Cuccioli", "Ragazzi")}
+    db.add_all(categories.values())
+    db.flush()
+    athletes = {
+        name: Athlete(name=name, category_id=categories[category].id)
+        for name, category in ATHLETE_CATEGORY.items()
+    }
+    db.add_all(athletes.values())
+    db.flush()
+    for day, category, statuses in EVENTS:
+        event = Event(type="training", category_id=categories[category].id,
+                      title=f"Allenamento {day}", date=day)
+        db.add(event)
+        db.flush()
+        db.add_all([
+            EventAttendance(event_id=event.id, athlete_id=athletes[name].id, status=status)
+            for name, status in statuses.items()
+        ])
+    db.commit()
+    yield db, {name: c.id for name, c in categories.items()}
+    db.close()
+
+
+def test_stats_from_the_database_and_from_the_archive(club):
+    db, categories = club
+    frame = load_season_frame(db, SEASON)
+    assert len(frame) == 11
+    _check(season_stats(db, SEASON, today=TODAY))
+
+    only_ragazzi = season_stats(db, SEASON, [categories["Ragazzi"]], today=TODAY)
+    assert list(_by_name(only_ragazzi)) == ["Carla"]
+
+    # stagione spostata nell'archivio: stessi numeri, cache rinnovata
+    archive_season(db, SEASON)
+    assert db.query(EventAttendance).count() == 0
+    assert len(load_season_frame(db, SEASON)) == 11
+    _check(season_stats(db, SEASON, today=TODAY))
@@ -0,0 +1,111 @@
+# tests/test_api.py
+from __future__ import annotations
+
+import json
+
+import pytest
+from sqlalchemy import event
+
+from conftest import call_api, user_by_email
+from core.auth import issue_session_token
+from core.db import engine
+from core.models import Athlete, Category, Message
+from core.tenancy import DEFAULT_CLUB_SLUG
+
+
+@pytest.fixture
+def coach_auth(db):
+    token = issue_session_token(user_by_email(db, "luca@club.test").id)
+    return ("authorization", f"Bearer {token}")
+
+
+@pytest.fixture
+def club_message(db):
+    admin = user_by_email(db, "admin@club.test")
+    message = Message(sender_id=admin.id, title="Avviso", content="Skipass in segreteria")
+    db.add(message)
+    db.commit()
+    yield message
+    db.delete(message)
+    db.commit()
+
+
+def _get(path, auth, etag=None, query=""):
+    headers = [auth] + ([("if-none-match", etag)] if etag else [])
+    status, response_headers, body = call_api("GET", path, headers=headers, query=query)
+    return status, response_headers.get("etag"), json.loads(body) if body else None
+
+
+def _statements(fn):
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return seen
+
+
+@pytest.mark.parametrize("path", ["/api/events", "/api/attendance", "/api/messages"])
+def test_matching_etag_answers_304_without_the_full_query(coach_auth, club_message, path):
+    status, etag, body = _get(path, coach_auth)
+    assert status == 200 and etag and body["items"]
+
+    result = {}
+    statements = _statements(lambda: result.update(zip("seb", _get(path, coach_auth, etag))))
+    assert result["s"] == 304 and result["e"] == etag and result["b"] is None
+    # solo la query ridotta: nessuna colonna del payload (titoli, stati, testi)
+    assert not [s for s in statements if "title" in s or ".status" in s]
+
+
+def _rename(db, model, row_id, name):
+    obj = db.get(model, row_id)
+    old, obj.name = obj.name, name
+    db.commit()
+    return old
+
+
+def test_category_rename_changes_events_etag(db, coach_auth):
+    _, etag, body = _get("/api/events", coach_auth)
+    category_id = body["items"][0]["category_id"]
+    old = _rename(db, Category, category_id, "Rinominata")
+    try:
+        status, new_etag, body = _get("/api/events", coach_auth, etag)
+        assert status == 200 and new_etag != etag
+        assert "Rinominata" in {item["category"] for item in body["items"]}
+    finally:
+        _rename(db, Category, category_id, old)
+
+
+def test_athlete_rename_changes_attendance_etag(db, coach_auth):
+    _, etag, body = _get("/api/attendance", coach_auth)
+    athlete_id = body["items"][0]["athlete_id"]
+    old = _rename(db, Athlete, athlete_id, "Nome Nuovo")
+    try:
+        status, new_etag, body = _get("/api/attendance", coach_auth, etag)
+        assert status == 200 and new_etag != etag
+        assert "Nome Nuovo" in {item["athlete"] for item in body["items"]}
+    finally:
+        _rename(db, Athlete, athlete_id, old)
+
+
+@pytest.mark.parametrize("body", [
+    {"email": ["luca@club.test"], "password": "valdayas"},
+    {"email": "luca@club.test", "password": 12345},
+    {"email": "luca@club.test", "password": None},
+    {"club": {"slug": "val-dayas"}, "email": "luca@club.test", "password": "valdayas"},
+])
+def test_login_rejects_fields_that_are_not_strings(seeded, body):
+    status, _, payload = call_api("POST", "/api/login", body=json.dumps(body).encode())
+    assert status == 400
+    assert "stringhe" in json.loads(payload)["error"]
+
+
+def test_login_with_strings_still_works(seeded):
+    body = {"club": DEFAULT_CLUB_SLUG, "email": "luca@club.test", "password": "valdayas"}
+    status, _, payload = call_api("POST", "/api/login", body=json.dumps(body).encode())
+    assert status == 200 and json.loads(payload)["token"]
@@ -0,0 +1,220 @@
+# tests/test_archive.py
+from __future__ import annotations
+
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import event, func, select, text
+from sqlalchemy.orm import Session
+
+from conftest import make_engine
+from core import archive
+from core.archive import (
+    archive_completed_seasons,
+    archive_season,
+    archived_seasons,
+    season_attendance_stats,
+)
+from core.migrations import migrate
+from core.models import (
+    AttendanceHistory,
+    Athlete,
+    Category,
+    Club,
+    Event,
+    EventAttendance,
+    Message,
+    User,
+)
+from core.tenancy import set_tenant
+
+OLD_SEASON = 2019
+
+
+def _add_club(db: Session, slug: str):
+    """Club con due eventi di una stagione conclusa e uno di oggi."""
+    club = Club(slug=slug, name=slug)
+    db.add(club)
+    db.flush()
+    set_tenant(db, club.id)
+    category = Category(name="Giovani")
+    db.add(category)
+    db.flush()
+    anna, bruno = Athlete(name="Anna", category_id=category.id), Athlete(
+        name="Bruno", category_id=category.id
+    )
+    coach = User(name="Allenatore", email=f"coach@{slug}.test", role="coach")
+    db.add_all([anna, bruno, coach])
+    db.flush()
+    statuses = {
+        date(OLD_SEASON, 12, 20): ("present", "absent"),
+        date(OLD_SEASON + 1, 2, 10): ("present", "present"),
+        date.today(): ("undecided", "undecided"),
+    }
+    for day, (first, second) in statuses.items():
+        ev = Event(type="training", category_id=category.id, title=f"Allenamento {day}",
+                   date=day)
+        db.add(ev)
+        db.flush()
+        db.add_all([
+            EventAttendance(event_id=ev.id, athlete_id=anna.id, status=first),
+            EventAttendance(event_id=ev.id, athlete_id=bruno.id, status=second),
+        ])
+    db.add(Message(sender_id=coach.id, title="Fine stagione", content="Grazie a tutti",
+                   created_at=datetime(OLD_SEASON + 1, 3, 1)))
+    db.commit()
+    set_tenant(db, None)
+    return club.id, (anna.id, bruno.id)
+
+
+@pytest.fixture(params=["delete", "wal"])
+def club(tmp_path, request):
+    engine = make_engine(tmp_path)
+
+    @event.listens_for(engine, "connect")
+    def _journal(dbapi_connection, connection_record):
+        for schema in ("main", "archive"):
+            dbapi_connection.execute(f"PRAGMA {schema}.journal_mode={request.param}")
+
+    migrate(engine)
+    db = Session(bind=engine)
+    yield (db, *_add_club(db, "archivio"))
+    db.close()
+
+
+def _count(db, table: str, schema: str = "main") -> int:
+    return db.execute(text(f"SELECT COUNT(*) FROM {schema}.{table}")).scalar()
+
+
+def _totals(db):
+    return db.execute(
+        text("SELECT events, attendances FROM archive.archived_seasons WHERE season = :s"),
+        {"s": OLD_SEASON},
+    ).one()
+
+
+def test_season_moves_to_the_archive(club):
+    db, _, _ = club
+    result = archive_season(db, OLD_SEASON)
+
+    assert result.rows["events"] == 2
+    assert result.rows["event_attendance"] == 4
+    assert result.rows["messages"] == 1
+    assert db.execute(select(Event.title)).scalars().all() == [f"Allenamento {date.today()}"]
+    assert _count(db, "event_attendance") == 2
+    assert (_count(db, "events", "archive"), _count(db, "event_attendance", "archive")) == (2, 4)
+    assert _count(db, "messages", "archive") == 1
+    assert tuple(_totals(db)) == (2, 4)
+
+
+def test_rerun_moves_nothing_and_keeps_the_totals(club):
+    db, _, _ = club
+    archive_season(db, OLD_SEASON)
+    again = archive_season(db, OLD_SEASON)
+
+    assert set(again.rows.values()) == {0}
+    assert _count(db, "event_attendance", "archive") == 4
+    assert tuple(_totals(db)) == (2, 4)
+
+
+def test_interrupted_move_is_completed_by_a_rerun(club, monkeypatch):
+    db, _, _ = club
+
+    def fail(*args):
+        raise RuntimeError("interrotto dopo la copia")
+
+    monkeypatch.setattr(archive, "_delete_archived", fail)
+    with pytest.raises(RuntimeError):
+        archive_season(db, OLD_SEASON)
+    # copia confermata, tabelle calde intatte
+    assert _count(db, "event_attendance", "archive") == 4
+    assert _count(db, "event_attendance") == 6
+    monkeypatch.undo()
+
+    result = archive_season(db, OLD_SEASON)
+    assert (result.rows["events"], result.rows["event_attendance"]) == (2, 4)
+    assert _count(db, "event_attendance", "archive") == 4
+    assert _count(db, "event_attendance") == 2
+    assert tuple(_totals(db)) == (2, 4)
+
+
+def test_event_with_rows_added_after_the_copy_stays_hot(club, monkeypatch):
+    db, club_id, (anna, _) = club
+    copy = archive._copy
+
+    late = []
+
+    def copy_then_write(db_, table, where, params):
+        copy(db_, table, where, params)
+        if table.name == "events":
+            # un'altra sessione registra una modifica dopo la copia
+            ev_id = db_.execute(select(func.min(Event.id))).scalar()
+            row = AttendanceHistory(event_id=ev_id, athlete_id=anna, status=1,
+                                    changed_at=0, club_id=club_id)
+            db_.add(row)
+            db_.flush()
+            late.append(row.id)
+
+    monkeypatch.setattr(archive, "_copy", copy_then_write)
+    first = archive_season(db, OLD_SEASON)
+    # l'evento con la riga nuova resta nelle tabelle calde fino al prossimo giro
+    assert first.rows["events"] == 1
+    assert _count(db, "events") == 2
+    hot_history = (
+        "SELECT id FROM main.attendance_history "
+        "WHERE event_id IN (SELECT id FROM main.events WHERE date < :today)"
+    )
+    assert db.execute(text(hot_history), {"today": date.today()}).scalars().all() == late
+
+    monkeypatch.undo()
+    second = archive_season(db, OLD_SEASON)
+    assert (second.rows["events"], second.rows["attendance_history"]) == (1, 1)
+    assert _count(db, "events") == 1
+    assert db.execute(text(hot_history), {"today": date.today()}).scalars().all() == []
+    assert tuple(_totals(db)) == (2, 4)
+
+
+def test_statistics_views_read_the_archive(club):
+    db, club_id, (anna, bruno) = club
+    archive_season(db, OLD_SEASON)
+
+    set_tenant(db, club_id)
+    stats = {row["athlete_id"]: row for row in season_attendance_stats(db, OLD_SEASON)}
+    assert {a: (s["events"], s["present"], s["absent"]) for a, s in stats.items()} == {
+        anna: (2, 2, 0),
+        bruno: (2, 1, 1),
+    }
+    assert [(s["season"], s["events"], s["attendances"]) for s in archived_seasons(db)] == [
+        (OLD_SEASON, 2, 4)
+    ]
+    event_stats = db.execute(
+        text("SELECT season, type, events FROM archive.season_event_stats")
+    ).all()
+    assert [tuple(r) for r in event_stats] == [(OLD_SEASON, "training", 2)]
+
+    # un altro club non vede le statistiche
+    set_tenant(db, club_id + 1)
+    assert season_attendance_stats(db, OLD_SEASON) == []
+    assert archived_seasons(db) == []
+
+
+def test_admin_archives_only_the_club_of_the_session(club):
+    db, club_id, _ = club
+    other_id, _ = _add_club(db, "altro")
+
+    set_tenant(db, club_id)
+    results = archive_completed_seasons(db)
+    assert [(r.season, r.rows["events"], r.rows["messages"]) for r in results] == [
+        (OLD_SEASON, 2, 1)
+    ]
+
+    set_tenant(db, None)
+    hot = db.execute(
+        select(Event.club_id, func.count()).group_by(Event.club_id).order_by(Event.club_id)
+    ).all()
+    assert [tuple(r) for r in hot] == [(club_id, 1), (other_id, 3)]
+    assert _count(db, "messages") == 1
+    # l'altro club si archivia a parte (o dalla riga di comando, senza club)
+    archive_completed_seasons(db)
+    assert _count(db, "events") == 2
+    assert tuple(_totals(db)) == (4, 8)
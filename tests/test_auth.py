@@ -0,0 +1,109 @@
+# tests/test_auth.py
+from __future__ import annotations
+
+import pytest
+
+from conftest import call_api, user_by_email
+from core import auth
+from core.auth import (
+    get_principal,
+    invalidate_principal,
+    issue_feed_token,
+    issue_session_token,
+    rotate_feed_token,
+    set_password,
+    verify_feed_token,
+    verify_session_token,
+)
+from core.calendar_feed import feed_url
+
+
+@pytest.mark.parametrize("token", ["1.2.3.àèì", "ü", "1.9999999999.abcd.firmα"])
+def test_non_ascii_session_token_is_rejected(token):
+    assert verify_session_token(token) is None
+
+
+@pytest.mark.parametrize("token", ["1.ßignature", "1.", "é.abc"])
+def test_non_ascii_feed_token_is_rejected(db, token):
+    assert verify_feed_token(db, token) is None
+
+
+def test_valid_tokens_still_verify(db):
+    noah = user_by_email(db, "noah@club.test")
+    feed_token = issue_feed_token(noah.id, noah.feed_version)
+    assert verify_session_token(issue_session_token(42)) == 42
+    assert verify_feed_token(db, feed_token) == noah.id
+    # un token di feed non vale come sessione e viceversa
+    assert verify_session_token(feed_token) is None
+    assert verify_feed_token(db, issue_session_token(noah.id)) is None
+    # utente inesistente
+    assert verify_feed_token(db, issue_feed_token(10 ** 6)) is None
+
+
+def _feed_status(token: str) -> int:
+    status, _, _ = call_api("GET", "/api/calendar.ics", query=f"token={token}")
+    return status
+
+
+def _token(db, user_id: int) -> str:
+    return feed_url(db, user_id).rpartition("token=")[2]
+
+
+def test_feed_link_changes_on_rotation_and_new_password(db):
+    noah = user_by_email(db, "noah@club.test")
+    first = _token(db, noah.id)
+    assert _feed_status(first) == 200
+
+    rotate_feed_token(db, noah.id)
+    second = _token(db, noah.id)
+    assert second != first
+    assert (_feed_status(first), _feed_status(second)) == (401, 200)
+
+    set_password(db, noah, "valdayas")
+    assert (_feed_status(second), _feed_status(_token(db, noah.id))) == (401, 200)
+
+
+def test_feed_link_stops_working_when_access_is_disabled(db):
+    noah = user_by_email(db, "noah@club.test")
+    token, password_hash = _token(db, noah.id), noah.password_hash
+    noah.password_hash = None
+    db.commit()
+    try:
+        assert _feed_status(token) == 401
+    finally:
+        noah.password_hash = password_hash
+        db.commit()
+    assert _feed_status(token) == 200
+
+
+def test_api_answers_401_to_non_ascii_bearer(seeded):
+    status, _, _ = call_api(
+        "GET", "/api/me", headers=[("authorization", "Bearer 1.2.3.àé".encode())]
+    )
+    assert status == 401
+
+    status, _, _ = call_api("GET", "/api/calendar.ics", query="token=1.%C3%A0")
+    assert status == 401
+
+
+def test_invalidate_principal_reloads_only_that_user(db, monkeypatch):
+    luca = user_by_email(db, "luca@club.test").id
+    noah = user_by_email(db, "noah@club.test").id
+    get_principal(db, luca)
+    get_principal(db, noah)
+
+    loads = []
+    original = auth._load_principal
+    monkeypatch.setattr(
+        auth, "_load_principal", lambda db, uid: loads.append(uid) or original(db, uid)
+    )
+
+    invalidate_principal(luca)
+    get_principal(db, luca)
+    get_principal(db, noah)
+    assert loads == [luca]
+
+    invalidate_principal()
+    get_principal(db, luca)
+    get_principal(db, noah)
+    assert loads == [luca, luca, noah]
@@ -0,0 +1,101 @@
+# tests/test_backup.py
+from __future__ import annotations
+
+import json
+import sqlite3
+
+import pytest
+
+from core import backup
+
+
+@pytest.fixture
+def files(tmp_path, monkeypatch):
+    """Due database a sé al posto di principale e archivio."""
+    paths = {name: tmp_path / name for name in ("main.db", "archive.db")}
+    for path in paths.values():
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE t (v TEXT)")
+        conn.execute("INSERT INTO t VALUES ('prima')")
+        conn.commit()
+        conn.close()
+    monkeypatch.setattr(backup, "database_files", lambda: dict(paths))
+    monkeypatch.setattr(backup, "STEP_PAUSE_SECONDS", 0)
+    return paths
+
+
+def _values(path):
+    conn = sqlite3.connect(path)
+    try:
+        return [v for (v,) in conn.execute("SELECT v FROM t ORDER BY rowid")]
+    finally:
+        conn.close()
+
+
+def _write(path, value):
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO t VALUES (?)", (value,))
+    conn.commit()
+    conn.close()
+
+
+def test_unchanged_files_are_linked_not_copied(tmp_path, files):
+    backup_dir = str(tmp_path / "backups")
+    first = backup.create_snapshot(backup_dir)
+    assert sorted(first.copied) == ["archive.db", "main.db"]
+    assert backup.create_snapshot(backup_dir) is None
+
+    _write(files["main.db"], "dopo")
+    second = backup.create_snapshot(backup_dir)
+    assert second.copied == ["main.db"] and second.linked == ["archive.db"]
+    assert (second.path / "archive.db").stat().st_ino == (
+        first.path / "archive.db"
+    ).stat().st_ino
+    assert _values(second.path / "main.db") == ["prima", "dopo"]
+    manifest = json.loads((second.path / backup.MANIFEST_NAME).read_text())
+    assert set(manifest["files"]) == {"main.db", "archive.db"}
+
+
+def test_wal_pages_are_in_the_snapshot(tmp_path, files):
+    writer = sqlite3.connect(files["main.db"])
+    writer.execute("PRAGMA journal_mode=WAL")
+    writer.execute("PRAGMA wal_autocheckpoint=0")
+    writer.execute("INSERT INTO t VALUES ('nel wal')")
+    writer.commit()
+    try:
+        result = backup.create_snapshot(str(tmp_path / "backups"))
+    finally:
+        writer.close()
+
+    copy = sqlite3.connect(result.path / "main.db")
+    try:
+        assert copy.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    finally:
+        copy.close()
+    assert _values(result.path / "main.db") == ["prima", "nel wal"]
+
+
+def test_only_the_last_snapshots_are_kept(tmp_path, files):
+    backup_dir = str(tmp_path / "backups")
+    created = [backup.create_snapshot(backup_dir, keep=2, force=True).path for _ in range(3)]
+    assert backup.list_snapshots(backup_dir) == created[1:]
+
+
+def test_restore_saves_the_current_state_first(tmp_path, files):
+    backup_dir = str(tmp_path / "backups")
+    snapshot = backup.create_snapshot(backup_dir).path
+    _write(files["main.db"], "da annullare")
+
+    assert sorted(backup.restore_snapshot(snapshot, backup_dir)) == ["archive.db", "main.db"]
+    assert _values(files["main.db"]) == ["prima"]
+    saved = backup.list_snapshots(backup_dir)[-1]
+    assert saved != snapshot
+    assert _values(saved / "main.db") == ["prima", "da annullare"]
+
+
+def test_restore_rejects_unknown_files(tmp_path, files, monkeypatch):
+    backup_dir = str(tmp_path / "backups")
+    snapshot = backup.create_snapshot(backup_dir).path
+    monkeypatch.setattr(backup, "database_files", lambda: {"main.db": files["main.db"]})
+    with pytest.raises(ValueError):
+        backup.restore_snapshot(snapshot, backup_dir)
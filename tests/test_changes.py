@@ -0,0 +1,126 @@
+# tests/test_changes.py
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from core.attendance import populate_for_events
+from core.changes import attendance_count, changes_since, snapshot
+from core.db import SessionLocal
+from core.models import Athlete, Event, EventAttendance
+from core.tenancy import set_tenant
+
+
+@pytest.fixture
+def training(db):
+    """Allenamento nuovo della categoria di Noah Favre (due atleti), con presenze."""
+    noah = db.execute(select(Athlete).where(Athlete.name == "Noah Favre")).scalar_one()
+    ev = Event(type="training", category_id=noah.category_id, title="Allenamento feed",
+               date=date.today() + timedelta(days=3))
+    db.add(ev)
+    db.flush()
+    populate_for_events(db, [ev.id])
+    db.commit()
+    rows = db.execute(
+        select(EventAttendance.id).where(EventAttendance.event_id == ev.id)
+        .order_by(EventAttendance.id)
+    ).scalars().all()
+    assert len(rows) == 2
+    return ev.id, rows
+
+
+def _set_status(db, row_id, status, **values):
+    db.execute(
+        update(EventAttendance).where(EventAttendance.id == row_id)
+        .values(status=status, **values)
+    )
+
+
+def test_feed_returns_rows_changed_after_the_cursor(db, training):
+    event_id, (first, second) = training
+    rows, cursor = snapshot(db, [event_id])
+    assert {r.id for r in rows} == {first, second}
+    assert changes_since(db, cursor, [event_id]) == ([], cursor)
+
+    _set_status(db, second, "present")
+    db.commit()
+    _set_status(db, first, "absent")
+    db.commit()
+
+    rows, new_cursor = changes_since(db, cursor, [event_id])
+    # in ordine di commit, con la versione nuova
+    assert [(r.id, r.status, r.version) for r in rows] == [
+        (second, "present", 2), (first, "absent", 2)
+    ]
+    assert new_cursor > cursor
+    assert changes_since(db, new_cursor, [event_id]) == ([], new_cursor)
+
+
+def test_writer_that_commits_late_is_not_skipped(db, training):
+    event_id, (first, second) = training
+    _, cursor = snapshot(db, [event_id])
+
+    # A ha preso l'ora prima di B ma fa commit dopo: updated_at di A è più
+    # vecchio di quello già visto dal lettore
+    stamped_early = datetime.utcnow() - timedelta(seconds=5)
+    _set_status(db, second, "present", updated_at=datetime.utcnow())
+    db.commit()
+    seen, cursor = changes_since(db, cursor, [event_id])
+    assert [r.id for r in seen] == [second]
+
+    _set_status(db, first, "absent", updated_at=stamped_early)
+    db.commit()
+    late, _ = changes_since(db, cursor, [event_id])
+    assert [(r.id, r.status) for r in late] == [(first, "absent")]
+
+
+def test_sequence_follows_commit_order_across_sessions(seeded, training):
+    event_id, (first, second) = training
+    writer, other = SessionLocal(), SessionLocal()
+    set_tenant(writer, seeded)
+    set_tenant(other, seeded)
+    try:
+        _, cursor = snapshot(other, [event_id])
+        other.close()
+        # il numero si calcola nell'UPDATE: la transazione aperta tiene il lock
+        _set_status(writer, first, "present")
+        writer.commit()
+        _set_status(writer, second, "absent")
+        writer.commit()
+        rows, _ = changes_since(other, cursor, [event_id])
+        assert [r.id for r in rows] == [first, second]
+        assert rows[0].change_seq < rows[1].change_seq
+    finally:
+        writer.close()
+        other.close()
+
+
+def test_pages_and_filters(db, training):
+    event_id, (first, second) = training
+    _, cursor = snapshot(db, [event_id])
+    _set_status(db, first, "present")
+    _set_status(db, second, "present")
+    db.commit()
+
+    seen = []
+    while True:
+        rows, cursor = changes_since(db, cursor, [event_id], limit=1)
+        if not rows:
+            break
+        seen += [r.id for r in rows]
+    assert sorted(seen) == [first, second]
+
+    athlete = db.get(EventAttendance, first).athlete_id
+    rows, _ = changes_since(db, None, [event_id], athlete_ids=[athlete])
+    assert [r.id for r in rows] == [first]
+
+
+def test_count_spots_deleted_rows(db, training):
+    event_id, (first, _) = training
+    assert attendance_count(db, [event_id]) == 2
+    db.delete(db.get(EventAttendance, first))
+    db.commit()
+    assert attendance_count(db, [event_id]) == 1
+    assert attendance_count(db, []) == 0
@@ -0,0 +1,161 @@
+# tests/test_dispatch.py
+from __future__ import annotations
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from core import dispatch
+from core.dispatch import (
+    GLOBAL_BUCKET_CAPACITY,
+    GLOBAL_BUCKET_REFILL_PER_SEC,
+    MAX_SEND_ATTEMPTS,
+    USER_BUCKET_CAPACITY,
+    NotificationDispatcher,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class FakeSender:
+    def __init__(self, ok: bool = True):
+        self.ok = ok
+        self.calls = []
+
+    def __call__(self, tokens, title, body):
+        self.calls.append((list(tokens), title, body))
+        return {"ok": self.ok, "reason": None if self.ok else "unavailable"}
+
+    @property
+    def devices(self) -> int:
+        return sum(len(tokens) for tokens, _, _ in self.calls)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(dispatch, "time", SimpleNamespace(monotonic=fake, sleep=time.sleep))
+    return fake
+
+
+def _dispatcher(sender, devices_per_user: int = 1, window: float = 60.0):
+    def load_tokens(db, user_ids):
+        return {uid: [f"tok-{uid}-{i}" for i in range(devices_per_user)] for uid in user_ids}
+
+    return NotificationDispatcher(window=window, sender=sender, token_loader=load_tokens)
+
+
+def test_messages_within_window_become_one_digest(clock):
+    sender = FakeSender()
+    d = _dispatcher(sender)
+    d.submit([1], "Allenamento", "spostato alle 9")
+    d.submit([1], "Allenamento", "spostato alle 9")  # doppione
+    d.submit([1], "Gara", "iscrizioni aperte")
+
+    assert d.flush(None).delivered == set()  # finestra non ancora scaduta
+    clock.advance(60)
+    result = d.flush(None)
+
+    assert result.delivered == {1}
+    assert len(sender.calls) == 1
+    _, title, body = sender.calls[0]
+    assert title == "2 nuovi messaggi dallo Sci Club"
+    assert body == "• Allenamento\n• Gara"
+    metrics = d.metrics()
+    assert metrics["deduplicated"] == 1 and metrics["coalesced"] == 1
+
+
+def test_same_digest_for_many_users_is_one_multicast(clock):
+    sender = FakeSender()
+    d = _dispatcher(sender)
+    d.submit(range(1, 51), "Gara", "domani")
+    d.flush(None, force=True)
+    assert len(sender.calls) == 1
+    assert sender.devices == 50
+
+
+def test_user_bucket_limits_consecutive_pushes(clock):
+    sender = FakeSender()
+    d = _dispatcher(sender)
+    for i in range(USER_BUCKET_CAPACITY + 1):
+        d.submit([7], f"Messaggio {i}", "")
+        result = d.flush(None, force=True)
+    assert result.throttled == {7}
+    assert len(sender.calls) == USER_BUCKET_CAPACITY
+    assert d.pending_count() == 1
+
+    clock.advance(1 / dispatch.USER_BUCKET_REFILL_PER_SEC)
+    assert d.flush(None, force=True).delivered == {7}
+
+
+def test_global_bucket_splits_by_device_count(clock):
+    # più dispositivi che utenti: ogni chiamata deve stare nella quota globale
+    sender = FakeSender()
+    d = _dispatcher(sender, devices_per_user=3)
+    users = range(1, 401)  # 1200 dispositivi
+    d.submit(users, "Gara", "domani")
+
+    first = d.flush(None, force=True)
+    assert first.delivered and first.throttled
+    assert all(len(tokens) <= GLOBAL_BUCKET_CAPACITY for tokens, _, _ in sender.calls)
+
+    delivered = set(first.delivered)
+    for _ in range(10):
+        if len(delivered) == len(users):
+            break
+        clock.advance(GLOBAL_BUCKET_CAPACITY / GLOBAL_BUCKET_REFILL_PER_SEC)
+        delivered |= d.flush(None).delivered
+    assert delivered == set(users)
+    assert sender.devices == 1200
+    assert d.pending_count() == 0
+
+
+def test_global_throttling_does_not_consume_user_quota(clock):
+    sender = FakeSender()
+    d = _dispatcher(sender)
+    d.submit([3], "Avviso", "")
+    d._global_bucket.tokens = 0
+    for _ in range(USER_BUCKET_CAPACITY + 2):
+        assert d.flush(None, force=True).throttled == {3}
+    assert sender.calls == []
+
+    d._global_bucket.tokens = GLOBAL_BUCKET_CAPACITY
+    assert d.flush(None, force=True).delivered == {3}
+    assert d._bucket(3).tokens == pytest.approx(USER_BUCKET_CAPACITY - 1, abs=0.01)
+
+
+def test_failed_send_is_retried_then_dropped(clock):
+    sender = FakeSender(ok=False)
+    d = _dispatcher(sender)
+    d.submit([5], "Avviso", "neve fresca")
+
+    for attempt in range(MAX_SEND_ATTEMPTS):
+        result = d.flush(None, force=True)
+        assert result.failed == {5}
+    assert d.pending_count() == 0
+    assert d.metrics()["dropped"] == 1
+    # i tentativi falliti non hanno consumato la quota dell'utente
+    assert d._bucket(5).tokens == pytest.approx(USER_BUCKET_CAPACITY, abs=0.01)
+
+
+def test_failed_send_is_delivered_on_retry(clock):
+    sender = FakeSender(ok=False)
+    d = _dispatcher(sender)
+    d.submit([5], "Avviso", "neve fresca")
+    assert d.flush(None, force=True).failed == {5}
+
+    sender.ok = True
+    assert d.flush(None).delivered == set()  # riprova dopo la finestra
+    clock.advance(60)
+    assert d.flush(None).delivered == {5}
+    assert sender.calls[-1][1:] == ("Avviso", "neve fresca")
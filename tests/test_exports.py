@@ -0,0 +1,77 @@
+# tests/test_exports.py
+from __future__ import annotations
+
+import csv
+import io
+from datetime import date
+
+import pytest
+from sqlalchemy.orm import Session
+
+from conftest import make_engine
+from core.archive import archive_season, archived_seasons, hot_seasons, season_bounds, season_of
+from core.exports import write_export
+from core.migrations import migrate
+from core.models import Athlete, Category, Club, Event, EventAttendance
+from core.tenancy import set_tenant
+
+OLD_SEASON = 2020
+
+
+def _add_club(db: Session, slug: str, athlete: str) -> int:
+    club = Club(slug=slug, name=slug)
+    db.add(club)
+    db.flush()
+    set_tenant(db, club.id)
+    category = Category(name="Giovani")
+    db.add(category)
+    db.flush()
+    ath = Athlete(name=athlete, category_id=category.id)
+    db.add(ath)
+    db.flush()
+    for day, title in ((date(OLD_SEASON, 12, 20), "Vecchio allenamento"),
+                       (date.today(), "Allenamento di oggi")):
+        ev = Event(type="training", category_id=category.id, title=title, date=day)
+        db.add(ev)
+        db.flush()
+        db.add(EventAttendance(event_id=ev.id, athlete_id=ath.id, status="present"))
+    db.commit()
+    set_tenant(db, None)
+    return club.id
+
+
+@pytest.fixture
+def clubs(tmp_path):
+    engine = make_engine(tmp_path)
+    migrate(engine)
+    db = Session(bind=engine)
+    first = _add_club(db, "primo", "Anna Primo")
+    second = _add_club(db, "secondo", "Bruno Secondo")
+    archive_season(db, OLD_SEASON)
+    yield db, first, second
+    db.close()
+
+
+def _rows(db, start, end):
+    data = write_export(db, "attendance", start, end).read().decode("utf-8-sig")
+    return list(csv.reader(io.StringIO(data), delimiter=";"))[1:]
+
+
+def test_archived_season_is_offered_and_exported(clubs):
+    db, first, _ = clubs
+    set_tenant(db, first)
+
+    assert OLD_SEASON in {s["season"] for s in archived_seasons(db)}
+    assert season_of(date.today()) in hot_seasons(db)
+
+    rows = _rows(db, *season_bounds(OLD_SEASON))
+    # solo il club della sessione, anche leggendo l'archivio
+    assert [(r[2], r[4]) for r in rows] == [("Vecchio allenamento", "Anna Primo")]
+
+
+def test_range_spanning_archive_and_hot_tables(clubs):
+    db, _, second = clubs
+    set_tenant(db, second)
+    rows = _rows(db, date(OLD_SEASON, 7, 1), date.today())
+    assert [r[2] for r in rows] == ["Vecchio allenamento", "Allenamento di oggi"]
+    assert {r[4] for r in rows} == {"Bruno Secondo"}
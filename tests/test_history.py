@@ -0,0 +1,130 @@
+# tests/test_history.py
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from conftest import make_engine
+from core.access import AccessScope
+from core.attendance import populate_for_events
+from core.history import (
+    SOURCE_SYNC,
+    attendance_history,
+    event_timeline,
+    history_row,
+    record_changes,
+)
+from core.migrations import migrate
+from core.models import (
+    AttendanceHistory,
+    Athlete,
+    Category,
+    Club,
+    Event,
+    EventAttendance,
+    User,
+)
+from core.read_models import future_events
+from core.series import cancel_occurrence
+from core.tenancy import set_tenant
+
+
+@pytest.fixture
+def training(tmp_path):
+    """Allenamento di domani con due atleti, presenze iniziali "da confermare"."""
+    engine = make_engine(tmp_path)
+    migrate(engine)
+    db = Session(bind=engine)
+    club = Club(slug="storico", name="Storico")
+    db.add(club)
+    db.flush()
+    set_tenant(db, club.id)
+    category = Category(name="Giovani")
+    coach = User(name="Luca", email="luca@storico.test", role="coach")
+    db.add_all([category, coach])
+    db.flush()
+    anna = Athlete(name="Anna", category_id=category.id)
+    bruno = Athlete(name="Bruno", category_id=category.id)
+    event = Event(type="training", category_id=category.id, title="Allenamento",
+                  date=date.today() + timedelta(days=1))
+    db.add_all([anna, bruno, event])
+    db.flush()
+    populate_for_events(db, [event.id])
+    db.commit()
+    yield db, event, coach.id, anna.id, bruno.id
+    db.close()
+
+
+def _row(db, event_id, athlete_id) -> EventAttendance:
+    return db.execute(
+        select(EventAttendance).where(
+            EventAttendance.event_id == event_id, EventAttendance.athlete_id == athlete_id
+        )
+    ).scalar_one()
+
+
+def test_initial_rows_are_not_changes(training):
+    db, event, _, _, _ = training
+    assert db.query(EventAttendance).count() == 2
+    assert event_timeline(db, event.id) == []
+
+
+def test_each_change_is_recorded_with_who_made_it(training):
+    db, event, coach_id, anna, _ = training
+    row = _row(db, event.id, anna)
+    row.status, row.updated_by = "present", coach_id
+    db.commit()
+    row.skis_in_skiroom = True
+    db.commit()
+    row.updated_at = datetime.utcnow()  # campo non tracciato
+    db.commit()
+
+    entries = attendance_history(db, event.id, anna)
+    assert [(e.status, e.skis_in_skiroom, e.changed_by) for e in entries] == [
+        ("present", True, "Luca"),
+        ("present", False, "Luca"),
+    ]
+
+
+def test_core_updates_are_recorded_with_their_source(training):
+    db, event, _, anna, bruno = training
+    club_id = event.club_id
+    moment = datetime(2030, 1, 5, 8, 30)
+    record_changes(db, [
+        history_row(club_id, event.id, anna, "absent", False, False, None, None, moment,
+                    source=SOURCE_SYNC),
+        history_row(club_id, event.id, bruno, "present", False, True, 3, None,
+                    moment + timedelta(minutes=1), source=SOURCE_SYNC),
+    ])
+    db.commit()
+
+    timeline = event_timeline(db, event.id)
+    # dalla più recente, data in UTC senza tzinfo
+    assert [(e.athlete_id, e.status, e.car_available, e.car_seats) for e in timeline] == [
+        (bruno, "present", True, 3),
+        (anna, "absent", False, 0),
+    ]
+    assert [e.changed_at for e in timeline] == [moment + timedelta(minutes=1), moment]
+    assert {e.source for e in timeline} == {SOURCE_SYNC}
+    assert [e.athlete_id for e in event_timeline(db, event.id, limit=1)] == [bruno]
+
+
+def test_cancelled_event_keeps_its_history(training):
+    db, event, coach_id, anna, _ = training
+    row = _row(db, event.id, anna)
+    row.status, row.updated_by = "absent", coach_id
+    db.commit()
+
+    cancel_occurrence(db, event)
+
+    assert db.query(EventAttendance).filter(EventAttendance.event_id == event.id).count() == 0
+    assert [e.status for e in attendance_history(db, event.id, anna)] == ["absent"]
+    assert db.get(Event, event.id).cancelled_at is not None
+    # l'evento non compare più negli elenchi
+    admin = AccessScope(user_id=coach_id, role="admin", athlete_ids=frozenset(),
+                        category_ids=frozenset(), all_access=True, version=(0, 0))
+    assert future_events(db, admin) == []
+    assert db.query(AttendanceHistory).count() == 1
@@ -0,0 +1,56 @@
+# tests/test_i18n.py
+from __future__ import annotations
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from conftest import ROOT, user_by_email
+from core.auth import set_language
+from core.i18n import _CATALOGUES, _fields, catalogue, translator
+from core.tenancy import DEFAULT_CLUB_SLUG
+
+
+@pytest.mark.parametrize("language", sorted(set(_CATALOGUES) - {"it"}))
+def test_catalogues_have_the_same_keys_and_placeholders(language):
+    base, other = _CATALOGUES["it"], _CATALOGUES[language]
+    assert set(other) == set(base)
+    assert [k for k in base if _fields(other[k]) != _fields(base[k])] == []
+
+
+def test_translator_formats_and_falls_back():
+    t = translator("en")
+    assert t("coach.live.refresh", seconds=10) == "Refreshes automatically every 10 seconds."
+    assert t("chiave.inesistente") == "chiave.inesistente"
+    # lingua sconosciuta: italiano
+    assert translator("de")("coach.header") == "Pannello Allenatore"
+    assert catalogue("fr")["admin.header"] == _CATALOGUES["fr"]["admin.header"]
+
+
+@pytest.fixture
+def coach_in_english(db):
+    at = AppTest.from_file(str(ROOT / "streamlit_app.py"), default_timeout=60)
+    at.query_params["club"] = DEFAULT_CLUB_SLUG
+    at.query_params["lang"] = "en"
+    at.run()
+    at.text_input[0].input("luca@club.test")
+    at.text_input[1].input("valdayas")
+    at.button[0].click()
+    at.run()
+    yield at
+    set_language(db, user_by_email(db, "luca@club.test").id, "it")
+
+
+def test_coach_page_follows_the_user_language(coach_in_english):
+    at = coach_in_english
+    assert not at.exception
+    assert [h.value for h in at.header] == ["Coach dashboard"]
+    assert [tab.label for tab in at.tabs] == [
+        "Events", "Messages", "Reports", "Statistics", "Export"
+    ]
+    italian = {text for text in _CATALOGUES["it"].values()} - {
+        text for text in _CATALOGUES["en"].values()
+    }
+    shown = [w.label for w in at.button] + [w.label for w in at.radio] + [
+        w.value for w in at.subheader
+    ]
+    assert [text for text in shown if text in italian] == []
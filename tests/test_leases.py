@@ -0,0 +1,73 @@
+# tests/test_leases.py
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, select
+
+from core import leases
+from core.db import SessionLocal, engine
+from core.leases import acquire_lease, release_lease
+from core.models import WorkerLease
+
+
+@pytest.fixture
+def multiprocess(seeded, monkeypatch):
+    monkeypatch.setattr(leases, "MULTIPROCESS", True)
+    monkeypatch.setattr(leases, "_known", {})
+
+
+def _count_queries():
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    return statements, lambda: event.remove(engine, "before_cursor_execute", count)
+
+
+def test_single_process_always_holds_the_lease(seeded):
+    statements, stop = _count_queries()
+    try:
+        assert acquire_lease("test-single")
+        release_lease("test-single")
+    finally:
+        stop()
+    assert statements == []
+
+
+def test_lease_held_by_another_process_is_not_taken(multiprocess):
+    db = SessionLocal()
+    db.add(WorkerLease(
+        job="test-other", holder="altro:1:abc",
+        expires_at=datetime.utcnow() + timedelta(seconds=60),
+    ))
+    db.commit()
+    try:
+        assert not acquire_lease("test-other")
+    finally:
+        db.delete(db.get(WorkerLease, "test-other"))
+        db.commit()
+        db.close()
+
+    # scaduta per chi l'ha vista: al giro dopo la prende
+    leases._known.clear()
+    assert acquire_lease("test-other")
+    release_lease("test-other")
+
+
+def test_lease_is_renewed_without_queries_until_half_life(multiprocess):
+    assert acquire_lease("test-renew", seconds=60)
+    statements, stop = _count_queries()
+    try:
+        assert acquire_lease("test-renew", seconds=60)
+    finally:
+        stop()
+    assert statements == []
+    release_lease("test-renew")
+    with engine.connect() as conn:
+        assert conn.execute(
+            select(WorkerLease.job).where(WorkerLease.job == "test-renew")
+        ).first() is None
@@ -0,0 +1,123 @@
+# tests/test_locations.py
+from __future__ import annotations
+
+import json
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.orm import Session
+
+from conftest import make_engine
+from core import conditions
+from core.conditions import Conditions, LocalFileProvider, prefetch_conditions, set_provider
+from core.locations import get_or_create_location, list_locations, location_rows, split_label
+from core.migrations import migrate
+from core.models import Club
+from core.tenancy import set_tenant
+
+DAY = date(2030, 1, 12)
+
+
+class CountingProvider:
+    def __init__(self, data, fail=False):
+        self.data, self.fail, self.calls = data, fail, []
+
+    def fetch(self, requests):
+        self.calls.append(sorted((loc.id, day) for loc, day in requests))
+        if self.fail:
+            raise RuntimeError("servizio meteo non raggiungibile")
+        return {(loc.id, day): self.data[loc.resort] for loc, day in requests
+                if loc.resort in self.data}
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = make_engine(tmp_path)
+    migrate(engine)
+    session = Session(bind=engine)
+    club = Club(slug="localita", name="Località")
+    session.add(club)
+    session.flush()
+    set_tenant(session, club.id)
+    yield session
+    session.close()
+    set_provider(None)
+
+
+def _event(event_id, location, day=DAY):
+    return SimpleNamespace(id=event_id, date=day, location_id=location.id if location else None)
+
+
+@pytest.mark.parametrize("label, expected", [
+    ("Champoluc – Crest", ("Champoluc", "Crest")),
+    ("  Antagnod -  Boudin ", ("Antagnod", "Boudin")),
+    ("Gressoney, Weissmatten", ("Gressoney", "Weissmatten")),
+    ("Frachey", ("Frachey", "")),
+    ("", ("", "")),
+    (None, ("", "")),
+])
+def test_split_label(label, expected):
+    assert split_label(label) == expected
+
+
+def test_same_label_is_the_same_location(db):
+    crest = get_or_create_location(db, "Champoluc – Crest")
+    assert get_or_create_location(db, "Champoluc - Crest").id == crest.id
+    assert get_or_create_location(db, "  ") is None
+    frachey = get_or_create_location(db, "Frachey")
+
+    assert [row.label for row in list_locations(db)] == ["Champoluc – Crest", "Frachey"]
+    assert set(location_rows(db, [crest.id, crest.id, frachey.id])) == {crest.id, frachey.id}
+    assert location_rows(db, []) == {}
+
+
+def test_conditions_are_fetched_in_one_batch_then_cached(db):
+    crest = get_or_create_location(db, "Champoluc – Crest")
+    frachey = get_or_create_location(db, "Frachey")
+    sunny = Conditions(snow_base_cm=80, summary="Sereno")
+    provider = CountingProvider({"Champoluc": sunny})
+    set_provider(provider)
+
+    events = [_event(1, crest), _event(2, crest), _event(3, frachey), _event(4, None)]
+    assert prefetch_conditions(db, events) == {1: sunny, 2: sunny}
+    assert provider.calls == [sorted([(crest.id, DAY), (frachey.id, DAY)])]
+
+    # seconda pagina: tutto dalla cache, anche la località senza dati
+    assert prefetch_conditions(db, events) == {1: sunny, 2: sunny}
+    assert len(provider.calls) == 1
+
+    # solo la coppia nuova va al provider
+    prefetch_conditions(db, events + [_event(5, crest, date(2030, 1, 13))])
+    assert provider.calls[1] == [(crest.id, date(2030, 1, 13))]
+
+
+def test_provider_errors_are_cached_briefly(db, monkeypatch):
+    crest = get_or_create_location(db, "Champoluc – Crest")
+    provider = CountingProvider({}, fail=True)
+    set_provider(provider)
+    ttls = []
+    original = conditions._cache.set
+    monkeypatch.setattr(conditions._cache, "set",
+                        lambda key, value, ttl=None: ttls.append(ttl) or original(key, value, ttl))
+
+    assert prefetch_conditions(db, [_event(1, crest)]) == {}
+    assert ttls == [conditions.CONDITIONS_ERROR_TTL]
+    assert prefetch_conditions(db, [_event(1, crest)]) == {}
+    assert len(provider.calls) == 1
+
+
+def test_local_file_prefers_the_most_precise_entry(db, tmp_path):
+    crest = get_or_create_location(db, "Champoluc – Crest")
+    frachey = get_or_create_location(db, "Frachey")
+    path = tmp_path / "condizioni.json"
+    path.write_text(json.dumps([
+        {"resort": "Champoluc", "snow_base_cm": 50},
+        {"resort": "champoluc", "piste": "crest", "date": DAY.isoformat(), "snow_base_cm": 90},
+    ]), encoding="utf-8")
+    set_provider(LocalFileProvider(str(path)))
+
+    found = prefetch_conditions(db, [
+        _event(1, crest), _event(2, crest, date(2030, 1, 20)), _event(3, frachey)
+    ])
+    assert {ev_id: c.snow_base_cm for ev_id, c in found.items()} == {1: 90, 2: 50}
@@ -0,0 +1,142 @@
+# tests/test_migrations.py
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+from sqlalchemy import text
+
+from conftest import DATA, make_engine
+from core import migrations
+from core.migrations import MIGRATIONS, applied_versions, migrate
+
+
+def _schema(path):
+    """Tabelle del database principale: colonne, indici, chiavi esterne, AUTOINCREMENT."""
+    conn = sqlite3.connect(path)
+    tables = {}
+    for (name, sql) in conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'table' "
+        "AND name NOT LIKE 'sqlite_%'"
+    ):
+        # l'ordine delle colonne aggiunte con ALTER TABLE non conta
+        columns = {r[1]: (r[2], r[3], r[5]) for r in conn.execute(f"PRAGMA table_info({name})")}
+        indexes = set()
+        for row in conn.execute(f"PRAGMA index_list({name})"):
+            cols = tuple(r[2] for r in conn.execute(f"PRAGMA index_info('{row[1]}')"))
+            label = "unique" if row[1].startswith("sqlite_autoindex") else row[1]
+            indexes.add((label, row[2], cols))
+        fks = {(r[2], r[3], r[4]) for r in conn.execute(f"PRAGMA foreign_key_list({name})")}
+        tables[name] = (columns, indexes, fks, "AUTOINCREMENT" in sql.upper())
+    conn.close()
+    return tables
+
+
+def _baseline(directory):
+    """Database creato dal codice iniziale (schema senza versioni, dati di esempio)."""
+    conn = sqlite3.connect(directory / "main.db")
+    conn.executescript((DATA / "baseline.sql").read_text())
+    conn.close()
+    return make_engine(directory)
+
+
+def test_baseline_upgrade_matches_fresh_schema(tmp_path, no_batch_pause):
+    (tmp_path / "old").mkdir()
+    (tmp_path / "new").mkdir()
+    old = _baseline(tmp_path / "old")
+    new = make_engine(tmp_path / "new")
+
+    assert migrate(old) == [m.version for m in MIGRATIONS]
+    assert migrate(new) == [m.version for m in MIGRATIONS]
+
+    upgraded, fresh = _schema(tmp_path / "old" / "main.db"), _schema(tmp_path / "new" / "main.db")
+    assert upgraded.keys() == fresh.keys()
+    for name in fresh:
+        assert upgraded[name] == fresh[name], name
+
+
+def test_baseline_upgrade_keeps_data_and_links_locations(tmp_path, no_batch_pause):
+    engine = _baseline(tmp_path)
+    migrate(engine)
+
+    with engine.connect() as conn:
+        club_ids = conn.execute(text("SELECT DISTINCT club_id FROM events")).scalars().all()
+        assert len(club_ids) == 1 and club_ids[0] is not None
+        assert conn.execute(text("SELECT COUNT(*) FROM event_attendance")).scalar() == 5
+
+        locations = conn.execute(
+            text("SELECT resort, piste FROM locations ORDER BY resort")
+        ).all()
+        assert [tuple(r) for r in locations] == [
+            ("Antagnod", "Boudin"), ("Champoluc", "Crest"), ("Gressoney", "Weissmatten"),
+        ]
+        unlinked = conn.execute(
+            text("SELECT COUNT(*) FROM events WHERE location_id IS NULL")
+        ).scalar()
+        assert unlinked == 0
+
+        indexes = {row[1] for row in conn.execute(text("PRAGMA index_list(locations)"))}
+        assert "ix_locations_id" in indexes
+        indexes = {row[1] for row in conn.execute(text("PRAGMA index_list(events)"))}
+        assert "ix_events_location_id" in indexes
+
+    assert migrate(engine) == []
+
+
+def test_fresh_database_records_every_version(tmp_path):
+    engine = make_engine(tmp_path)
+    assert migrate(engine) == [m.version for m in MIGRATIONS]
+    with engine.connect() as conn:
+        assert applied_versions(conn) == {m.version for m in MIGRATIONS}
+    assert migrate(engine) == []
+
+
+@pytest.mark.parametrize("stop", range(1, len(MIGRATIONS)))
+def test_upgrade_from_every_intermediate_version(tmp_path, monkeypatch, no_batch_pause, stop):
+    # database lasciato a metà da una versione precedente del codice
+    (tmp_path / "old").mkdir()
+    (tmp_path / "new").mkdir()
+    old = _baseline(tmp_path / "old")
+    monkeypatch.setattr(migrations, "MIGRATIONS", MIGRATIONS[:stop])
+    migrate(old)
+    monkeypatch.setattr(migrations, "MIGRATIONS", MIGRATIONS)
+
+    assert migrate(old) == [m.version for m in MIGRATIONS[stop:]]
+    migrate(make_engine(tmp_path / "new"))
+    assert _schema(tmp_path / "old" / "main.db") == _schema(tmp_path / "new" / "main.db")
+
+
+def test_every_migration_can_run_again(tmp_path, no_batch_pause):
+    # un passo interrotto a metà viene rieseguito per intero al giro dopo
+    engine = _baseline(tmp_path)
+    migrate(engine)
+    before = _schema(tmp_path / "main.db")
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for migration in MIGRATIONS:
+            migration.run(conn)
+        assert conn.execute(text("SELECT COUNT(*) FROM users")).scalar() == 5
+        assert conn.execute(text("SELECT COUNT(*) FROM locations")).scalar() == 3
+
+    assert _schema(tmp_path / "main.db") == before
+
+
+def _archive_tables(engine):
+    with engine.connect() as conn:
+        return set(conn.execute(
+            text("SELECT name FROM archive.sqlite_master WHERE type IN ('table', 'view')")
+        ).scalars())
+
+
+def test_migrate_creates_archive_schema(tmp_path, no_batch_pause):
+    (tmp_path / "fresh").mkdir()
+    fresh = make_engine(tmp_path / "fresh")
+    migrate(fresh)
+    expected = {"events", "event_attendance", "archived_seasons", "season_attendance_stats"}
+    assert expected <= _archive_tables(fresh)
+
+    # schema principale aggiornato, file d'archivio nuovo (es. percorso cambiato)
+    (tmp_path / "fresh" / "archive.db").unlink()
+    moved = make_engine(tmp_path / "fresh")
+    assert migrate(moved) == []
+    assert expected <= _archive_tables(moved)
@@ -0,0 +1,84 @@
+# tests/test_read_models.py
+from __future__ import annotations
+
+from sqlalchemy import select
+
+from conftest import user_by_email
+from core.access import get_scope
+from core.auth import get_principal
+from core.models import Athlete, Category, Event, EventAttendance
+from core.read_models import (
+    attendance_by_event,
+    event_title,
+    family_rows,
+    future_events,
+    scope_athletes,
+    scope_categories,
+)
+
+
+def _scope(db, email):
+    return get_scope(db, get_principal(db, user_by_email(db, email).id))
+
+
+def test_rows_are_slotted_and_skip_the_identity_map(db):
+    scope = _scope(db, "luca@club.test")
+    db.expunge_all()
+
+    events = future_events(db, scope)
+    attendance = attendance_by_event(db, [ev.id for ev in events])
+    athletes = scope_athletes(db, scope)
+
+    assert events and athletes and any(attendance.values())
+    rows = [events[0], athletes[0], next(r for rs in attendance.values() for r in rs)]
+    assert all(not hasattr(row, "__dict__") for row in rows)
+    # nessuna entità ORM caricata nella sessione
+    assert len(db.identity_map) == 0
+
+
+def test_coach_view_matches_the_orm_entities(db):
+    scope = _scope(db, "luca@club.test")
+    events = future_events(db, scope)
+
+    orm_events = db.execute(
+        select(Event)
+        .where(Event.category_id.in_(scope.category_ids), Event.date >= events[0].date)
+        .order_by(Event.date, Event.id)
+    ).scalars().all()
+    assert [(e.id, e.title, e.type, e.location) for e in events] == [
+        (e.id, e.title, e.type, e.location) for e in orm_events
+    ]
+
+    grouped = attendance_by_event(db, [ev.id for ev in events])
+    for ev in events:
+        rows = grouped[ev.id]
+        orm_rows = db.execute(
+            select(EventAttendance).where(EventAttendance.event_id == ev.id)
+        ).scalars().all()
+        assert {(r.id, r.status, r.athlete_name) for r in rows} == {
+            (r.id, r.status, r.athlete.name) for r in orm_rows
+        }
+        assert [r.athlete_name for r in rows] == sorted(r.athlete_name for r in rows)
+
+    assert {c.id for c in scope_categories(db, scope)} == set(scope.category_ids)
+
+
+def test_parent_sees_only_linked_children(db):
+    scope = _scope(db, "noah@club.test")
+    athletes, names = family_rows(db, scope)
+
+    assert {a.name for a in athletes} == {"Noah Favre", "Seth Favre"}
+    assert set(names.values()) == set(
+        db.execute(
+            select(Category.name)
+            .join(Athlete, Athlete.category_id == Category.id)
+            .where(Athlete.id.in_(scope.athlete_ids))
+        ).scalars()
+    )
+    assert {ev.category_id for ev in future_events(db, scope)} <= set(names)
+
+
+def test_event_title_uses_the_language(db):
+    ev = future_events(db, _scope(db, "luca@club.test"))[0]
+    assert event_title(ev, "U10", "it").startswith(f"{ev.date} · {ev.title} (U10) - ")
+    assert event_title(ev, None, "it") != event_title(ev, None, "en")
@@ -0,0 +1,121 @@
+# tests/test_reminders.py
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from conftest import make_engine
+from core import reminders
+from core.dispatch import USER_BUCKET_CAPACITY, NotificationDispatcher
+from core.migrations import migrate
+from core.models import (
+    Athlete,
+    Category,
+    Club,
+    Event,
+    EventAttendance,
+    ParentAthlete,
+    ReminderLog,
+    User,
+)
+from core.reminders import run_once
+from core.tenancy import set_tenant
+
+# ora UTC: mattina a Roma e sera, dentro le ore di silenzio
+DAYTIME = datetime.combine(date.today(), time(10))
+NIGHT = datetime.combine(date.today(), time(21))
+
+
+class Sender:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, tokens, title, body):
+        self.calls.append((list(tokens), title, body))
+        return {"ok": True}
+
+
+@pytest.fixture
+def family(tmp_path, monkeypatch):
+    """Genitore con un figlio "da confermare" a un allenamento di domani."""
+    engine = make_engine(tmp_path)
+    migrate(engine)
+    db = Session(bind=engine)
+    club = Club(slug="promemoria", name="Promemoria")
+    db.add(club)
+    db.flush()
+    set_tenant(db, club.id)
+    category = Category(name="Giovani")
+    parent = User(name="Genitore", email="genitore@promemoria.test", role="parent")
+    db.add_all([category, parent])
+    db.flush()
+    athlete = Athlete(name="Figlio", category_id=category.id)
+    db.add(athlete)
+    db.flush()
+    event = Event(type="training", category_id=category.id, title="Allenamento",
+                  date=date.today() + timedelta(days=1))
+    db.add_all([event, ParentAthlete(parent_id=parent.id, athlete_id=athlete.id)])
+    db.flush()
+    db.add(EventAttendance(event_id=event.id, athlete_id=athlete.id, status="undecided"))
+    db.commit()
+    set_tenant(db, None)
+
+    sender = Sender()
+    dispatcher = NotificationDispatcher(
+        sender=sender,
+        token_loader=lambda db_, uids: {uid: [f"tok-{uid}"] for uid in uids},
+    )
+    monkeypatch.setattr(reminders, "get_dispatcher", lambda: dispatcher)
+    yield db, parent.id, dispatcher, sender
+    db.close()
+
+
+def _sent_at(db):
+    return db.execute(select(ReminderLog.sent_at)).scalars().all()
+
+
+def test_second_run_sends_nothing_new(family):
+    db, parent_id, dispatcher, sender = family
+
+    first = run_once(db, now_utc=DAYTIME)
+    assert (first.queued, first.parents, first.sent) == (1, 1, 1)
+    assert [(tokens, title) for tokens, title, _ in sender.calls] == [
+        ([f"tok-{parent_id}"], "Presenza da confermare")
+    ]
+
+    second = run_once(db, now_utc=DAYTIME + timedelta(minutes=5))
+    assert (second.queued, second.parents, second.sent) == (0, 0, 0)
+    assert len(sender.calls) == 1
+    assert all(_sent_at(db))
+
+
+def test_quiet_hours_queue_without_sending(family):
+    db, _, _, sender = family
+
+    night = run_once(db, now_utc=NIGHT)
+    assert night.quiet_hours and night.queued == 1
+    assert sender.calls == [] and _sent_at(db) == [None]
+
+    morning = run_once(db, now_utc=DAYTIME + timedelta(days=1) - timedelta(hours=2))
+    assert (morning.queued, morning.sent) == (0, 1)
+
+
+def test_throttled_parent_is_retried_from_the_log_only(family):
+    db, parent_id, dispatcher, sender = family
+    bucket = dispatcher._bucket(parent_id)
+    bucket.take(USER_BUCKET_CAPACITY)
+
+    throttled = run_once(db, now_utc=DAYTIME)
+    assert (throttled.sent, throttled.failed) == (0, 1)
+    # niente in memoria che il thread di invio possa spedire più tardi
+    assert dispatcher.pending_count() == 0
+    assert sender.calls == [] and _sent_at(db) == [None]
+
+    bucket.tokens = bucket.capacity
+    retried = run_once(db, now_utc=DAYTIME + timedelta(minutes=10))
+    assert retried.sent == 1
+    dispatcher.flush(db, force=True)
+    assert len(sender.calls) == 1
@@ -0,0 +1,100 @@
+# tests/test_results.py
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+from sqlalchemy.orm import Session
+
+from conftest import make_engine
+from core.archive import season_of
+from core.migrations import migrate
+from core.models import Athlete, Category, Club, Event
+from core.results import import_race_results, race_results, season_standings
+from core.tenancy import set_tenant
+
+RACE_DAY = date(2030, 1, 20)
+SEASON = season_of(RACE_DAY)
+
+
+@pytest.fixture
+def race(tmp_path):
+    """Gara conclusa di una categoria con tre atlete del club."""
+    engine = make_engine(tmp_path)
+    migrate(engine)
+    db = Session(bind=engine)
+    club = Club(slug="gare", name="Gare")
+    db.add(club)
+    db.flush()
+    set_tenant(db, club.id)
+    category = Category(name="Giovani")
+    db.add(category)
+    db.flush()
+    athletes = {name: Athlete(name=name, category_id=category.id)
+                for name in ("Anna Rossi", "Bruna Verdi", "Carla Neri")}
+    event = Event(type="race", category_id=category.id, title="Gigante", date=RACE_DAY)
+    db.add_all([*athletes.values(), event])
+    db.commit()
+    yield db, event.id, category.id, {name: a.id for name, a in athletes.items()}
+    db.close()
+
+
+def _import(db, event_id, *rows):
+    report = import_race_results(
+        db, event_id,
+        [dict(zip(("bib", "name", "total", "status"), row)) for row in rows],
+    )
+    assert report.errors == []
+    return report
+
+
+def test_equal_times_share_rank_and_points(race):
+    db, event_id, category_id, ids = race
+    report = _import(
+        db, event_id,
+        ("1", "Ospite Esterna", "59.50", ""),
+        ("2", "Anna Rossi", "1:00.00", ""),
+        ("3", "Rossi Bruna", "1:00.00", ""),   # nome non trovato: concorrente esterno
+        ("4", "Verdi Bruna", "1:00.00", ""),   # cognome e nome invertiti
+        ("5", "Carla Neri", "1:01.00", ""),
+        ("6", "Ospite Ritirata", "", "DNF"),
+    )
+    assert report.unmatched == ["Ospite Esterna", "Rossi Bruna", "Ospite Ritirata"]
+
+    assert [(r.rank, r.bib, r.points, r.status) for r in race_results(db, event_id)] == [
+        (1, 1, 100, "OK"),
+        (2, 2, 80, "OK"),
+        (2, 3, 80, "OK"),
+        (2, 4, 80, "OK"),
+        # dopo i tre a pari merito la posizione successiva è la 5ª
+        (5, 5, 45, "OK"),
+        (None, 6, 0, "DNF"),
+    ]
+
+    standings = season_standings(db, SEASON, category_id)
+    assert [(s.rank, s.athlete_name, s.points, s.races, s.podiums, s.wins)
+            for s in standings] == [
+        (1, "Anna Rossi", 80, 1, 1, 0),
+        (1, "Bruna Verdi", 80, 1, 1, 0),
+        (3, "Carla Neri", 45, 1, 0, 0),
+    ]
+
+
+def test_reimport_replaces_the_points_of_the_race(race):
+    db, event_id, category_id, ids = race
+
+    def points():
+        return {s.athlete_id: (s.points, s.races, s.wins)
+                for s in season_standings(db, SEASON, category_id)}
+
+    first = (("1", "Bruna Verdi", "58.00", ""), ("2", "Anna Rossi", "59.00", ""))
+    _import(db, event_id, *first)
+    assert points()[ids["Anna Rossi"]] == (80, 1, 0)
+
+    # stesso file: niente punti doppi
+    _import(db, event_id, *first)
+    assert points()[ids["Anna Rossi"]] == (80, 1, 0)
+
+    # file corretto dal cronometraggio: Anna vince
+    _import(db, event_id, ("1", "Bruna Verdi", "59.50", ""), ("2", "Anna Rossi", "59.00", ""))
+    assert points() == {ids["Anna Rossi"]: (100, 1, 1), ids["Bruna Verdi"]: (80, 1, 0)}
@@ -0,0 +1,64 @@
+# tests/test_roster_import.py
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from conftest import make_engine
+from core.migrations import migrate
+from core.models import Athlete, Club, CoachCategory, ParentAthlete, User
+from core.roster_import import import_roster
+from core.tenancy import set_tenant
+
+
+@pytest.fixture
+def club_db(tmp_path):
+    engine = make_engine(tmp_path)
+    migrate(engine)
+    db = Session(bind=engine)
+    club = Club(slug="rosa", name="Rosa")
+    db.add(club)
+    db.flush()
+    set_tenant(db, club.id)
+    db.add_all([
+        User(name="Carla Coach", email="carla@club.test", role="coach"),
+        User(name="Paolo Papà", email="paolo@club.test", role="parent"),
+    ])
+    db.commit()
+    yield db
+    db.close()
+
+
+ROWS = [
+    # 2: allenatrice esistente indicata come genitore
+    {"atleta": "Anna", "categoria": "Cuccioli", "email_genitore": "carla@club.test"},
+    # 3: ruoli giusti
+    {"atleta": "Bruno", "categoria": "Cuccioli", "email_genitore": "paolo@club.test",
+     "email_allenatore": "carla@club.test"},
+    # 4-5: utente nuovo, prima genitore e poi allenatore nello stesso file
+    {"atleta": "Carlo", "categoria": "Cuccioli", "email_genitore": "nuovo@club.test"},
+    {"atleta": "Dario", "categoria": "Ragazzi", "email_allenatore": "nuovo@club.test"},
+    # 6: stessa email come genitore e allenatore
+    {"atleta": "Elena", "categoria": "Ragazzi", "email_genitore": "paolo@club.test",
+     "email_allenatore": "paolo@club.test"},
+]
+
+
+@pytest.mark.parametrize("dry_run", [True, False])
+def test_role_mismatch_rejects_the_row(club_db, dry_run):
+    report = import_roster(club_db, ROWS, dry_run=dry_run)
+
+    assert [line for line, _ in report.errors] == [2, 5, 6]
+    assert "carla@club.test è già registrato come allenatore" in report.errors[0][1]
+    assert [a[0] for a in report.new_athletes] == ["Bruno", "Carlo"]
+    assert report.new_users == [("nuovo@club.test", "nuovo@club.test", "parent")]
+    assert report.new_categories == ["Cuccioli"]
+
+    if dry_run:
+        return
+    roles = dict(club_db.execute(select(User.email, User.role)).all())
+    assert roles["carla@club.test"] == "coach" and roles["nuovo@club.test"] == "parent"
+    assert set(club_db.execute(select(Athlete.name)).scalars()) == {"Bruno", "Carlo"}
+    assert club_db.query(ParentAthlete).count() == 2
+    assert club_db.query(CoachCategory).count() == 1
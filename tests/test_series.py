@@ -0,0 +1,148 @@
+# tests/test_series.py
+from __future__ import annotations
+
+import threading
+from datetime import date, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from conftest import make_engine
+from core import series
+from core.archive import season_of
+from core.attendance import populate_for_events
+from core.history import STATUS_CODES
+from core.migrations import migrate
+from core.models import (
+    Athlete,
+    AttendanceHistory,
+    Category,
+    Club,
+    Event,
+    EventAttendance,
+    RaceResult,
+)
+from core.results import import_race_results, season_standings
+from core.series import (
+    cancel_occurrence,
+    create_series,
+    edit_occurrence,
+    materialize_due_series,
+    start_materializer,
+    weekly_rule,
+)
+from core.tenancy import set_tenant
+
+
+def test_materializer_runs_once_per_process(monkeypatch):
+    calls = []
+    done = threading.Event()
+    monkeypatch.setattr(
+        series, "materialize_due_series", lambda db: calls.append(db) or done.set()
+    )
+    # il thread resta fermo dopo il primo giro
+    monkeypatch.setattr(series, "sleep", lambda seconds: threading.Event().wait())
+    monkeypatch.setattr(series, "_materializer", None)
+    # quello avviato dalle pagine di altri test (AppTest) resta attivo
+    running = sum(t.name == series.SERIES_JOB for t in threading.enumerate())
+
+    start_materializer()
+    start_materializer()  # rerun della pagina: nessun thread in più
+    assert done.wait(5)
+    assert len(calls) == 1
+    assert sum(t.name == series.SERIES_JOB for t in threading.enumerate()) == running + 1
+
+
+def test_cancel_occurrence_keeps_history_and_removes_results_and_points(db):
+    seth = db.execute(select(Athlete).where(Athlete.name == "Seth Favre")).scalar_one()
+    race = Event(type="race", category_id=seth.category_id, title="Gara da annullare",
+                 date=date.today() + timedelta(days=20))
+    db.add(race)
+    db.flush()
+    populate_for_events(db, [race.id])
+    db.commit()
+
+    att = db.execute(
+        select(EventAttendance).where(
+            EventAttendance.event_id == race.id, EventAttendance.athlete_id == seth.id
+        )
+    ).scalar_one()
+    att.status = "present"
+    db.commit()  # una riga di storico
+    import_race_results(db, race.id, [{"bib": "7", "name": "Seth Favre", "total": "1:02.50"}])
+
+    season = season_of(race.date)
+    before = {r.athlete_id: r.points for r in season_standings(db, season, seth.category_id)}
+    assert before[seth.id] >= 100
+
+    cancel_occurrence(db, race)
+
+    for model in (EventAttendance, RaceResult):
+        assert db.query(model).filter(model.event_id == race.id).count() == 0
+    # storico tenuto, evento segnato come annullato
+    assert db.query(AttendanceHistory).filter(AttendanceHistory.event_id == race.id).count() == 1
+    assert db.get(Event, race.id).cancelled_at is not None
+    after = {r.athlete_id: r.points for r in season_standings(db, season, seth.category_id)}
+    assert after.get(seth.id, 0) == before[seth.id] - 100
+
+
+def test_moved_race_takes_its_points_and_is_not_generated_again(tmp_path):
+    engine = make_engine(tmp_path)
+    migrate(engine)
+    db = Session(bind=engine)
+    club = Club(slug="serie", name="Serie")
+    db.add(club)
+    db.flush()
+    set_tenant(db, club.id)
+    category = Category(name="Giovani")
+    db.add(category)
+    db.flush()
+    anna = Athlete(name="Anna Rossi", category_id=category.id)
+    db.add(anna)
+    db.flush()
+
+    # gare ogni sabato di giugno, l'ultimo mese della stagione
+    today = date(2031, 6, 1)
+    race_series = create_series(
+        db, category_id=category.id, title="Coppa", type="race",
+        rrule=weekly_rule([5]), start_date=today, end_date=date(2031, 6, 30), today=today,
+    )
+    first = db.execute(
+        select(Event).where(Event.series_id == race_series.id).order_by(Event.date)
+    ).scalars().first()
+    import_race_results(db, first.id, [{"bib": "1", "name": "Anna Rossi", "total": "58.10"}])
+    old_date, new_date = first.date, date(2031, 7, 5)
+    assert season_of(old_date) != season_of(new_date)
+
+    edit_occurrence(db, first, date=new_date)
+
+    def points(season):
+        return {r.athlete_id: r.points for r in season_standings(db, season, category.id)}
+
+    assert points(season_of(old_date)) == {}
+    assert points(season_of(new_date)) == {anna.id: 100}
+
+    # l'orizzonte avanza: la data originale non torna
+    materialize_due_series(db, today=today + timedelta(days=7))
+    dates = db.execute(
+        select(Event.date).where(Event.series_id == race_series.id)
+    ).scalars().all()
+    assert old_date not in dates and dates.count(new_date) == 1
+    assert db.get(Event, first.id).series_date == old_date
+    db.close()
+
+
+def test_unknown_status_does_not_break_the_flush(db):
+    row = db.query(EventAttendance).first()
+    row.status = "forse"
+    try:
+        db.flush()  # listener after_flush dello storico
+        code = db.execute(
+            select(AttendanceHistory.status)
+            .where(AttendanceHistory.event_id == row.event_id,
+                   AttendanceHistory.athlete_id == row.athlete_id)
+            .order_by(AttendanceHistory.id.desc())
+        ).scalars().first()
+        assert code == STATUS_CODES["undecided"]
+    finally:
+        db.rollback()
@@ -0,0 +1,142 @@
+# tests/test_sync.py
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event, select
+
+from conftest import user_by_email
+from core.access import get_scope
+from core.attendance import populate_for_events
+from core.auth import get_principal
+from core.changes import changes_since
+from core.db import SessionLocal, engine
+from core.models import Athlete, Event, EventAttendance
+from core.sync import apply_changes
+from core.tenancy import set_tenant
+
+
+@pytest.fixture
+def race(db):
+    """Gara nuova della categoria di Seth (figlio di noah@club.test), con presenze."""
+    seth = db.execute(select(Athlete).where(Athlete.name == "Seth Favre")).scalar_one()
+    ev = Event(type="race", category_id=seth.category_id, title="Gara test sync",
+               date=date.today() + timedelta(days=10))
+    db.add(ev)
+    db.flush()
+    populate_for_events(db, [ev.id])
+    db.commit()
+    row = db.execute(
+        select(EventAttendance).where(
+            EventAttendance.event_id == ev.id, EventAttendance.athlete_id == seth.id
+        )
+    ).scalar_one()
+    return row.id, row.version
+
+
+@pytest.fixture
+def parent(db):
+    user = user_by_email(db, "noah@club.test")
+    return user.id, get_scope(db, get_principal(db, user.id))
+
+
+def test_mixed_timezone_client_ts_uses_latest_in_utc(db, race, parent):
+    row_id, version = race
+    user_id, scope = parent
+    changes = [
+        # 08:00 UTC
+        {"id": row_id, "base_version": version, "status": "present",
+         "client_ts": "2026-01-10T10:00:00+02:00"},
+        # senza fuso: 09:00 UTC, la più recente
+        {"id": row_id, "base_version": version, "status": "absent",
+         "client_ts": "2026-01-10T09:00:00"},
+        {"id": row_id, "base_version": version, "status": "present",
+         "client_ts": "2026-01-10T08:30:00Z"},
+    ]
+    result = apply_changes(db, scope, user_id, changes)
+
+    assert result.rejected == [] and result.conflicts == []
+    assert result.applied == [{"id": row_id, "version": version + 1}]
+    db.expire_all()
+    assert db.get(EventAttendance, row_id).status == "absent"
+
+
+def test_invalid_client_ts_is_rejected(db, race, parent):
+    row_id, version = race
+    user_id, scope = parent
+    result = apply_changes(db, scope, user_id, [
+        {"id": row_id, "base_version": version, "status": "present", "client_ts": "ieri"},
+    ])
+    assert result.rejected == [{"id": row_id, "reason": "invalid"}]
+
+
+def test_row_deleted_before_update_is_not_found(db, race, parent):
+    row_id, version = race
+    user_id, scope = parent
+
+    # la riga sparisce tra la lettura e l'UPDATE (es. evento annullato)
+    def delete_first(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE event_attendance"):
+            cursor.connection.execute("DELETE FROM event_attendance WHERE id = ?", (row_id,))
+
+    event.listen(engine, "before_cursor_execute", delete_first)
+    try:
+        result = apply_changes(db, scope, user_id, [
+            {"id": row_id, "base_version": version, "status": "present"},
+        ])
+    finally:
+        event.remove(engine, "before_cursor_execute", delete_first)
+
+    assert result.applied == [] and result.conflicts == []
+    assert result.rejected == [{"id": row_id, "reason": "not_found"}]
+
+
+def test_synced_row_is_in_the_feed_after_a_cursor_taken_during_the_sync(
+    seeded, db, parent
+):
+    """La sync scrive dopo che un altro ha fatto commit e un lettore ha preso il cursore."""
+    noah, juno = (
+        db.execute(select(Athlete).where(Athlete.name == name)).scalar_one()
+        for name in ("Noah Favre", "Juno Favre")
+    )
+    ev = Event(type="training", category_id=noah.category_id, title="Allenamento sync lenta",
+               date=date.today() + timedelta(days=4))
+    db.add(ev)
+    db.flush()
+    populate_for_events(db, [ev.id])
+    db.commit()
+    rows = {
+        r.athlete_id: r
+        for r in db.execute(
+            select(EventAttendance).where(EventAttendance.event_id == ev.id)
+        ).scalars()
+    }
+    user_id, scope = parent
+    cursor = []
+
+    def other_writer_first(conn, cursor_, statement, parameters, context, executemany):
+        if cursor or not statement.startswith("UPDATE event_attendance"):
+            return
+        cursor.append(None)
+        other = SessionLocal()
+        set_tenant(other, seeded)
+        try:
+            other.get(EventAttendance, rows[juno.id].id).status = "absent"
+            other.commit()
+            cursor[0] = changes_since(other, None, [ev.id])[1]
+        finally:
+            other.close()
+
+    event.listen(engine, "before_cursor_execute", other_writer_first)
+    try:
+        result = apply_changes(db, scope, user_id, [
+            {"id": rows[noah.id].id, "base_version": rows[noah.id].version,
+             "status": "present"},
+        ])
+    finally:
+        event.remove(engine, "before_cursor_execute", other_writer_first)
+
+    assert [a["id"] for a in result.applied] == [rows[noah.id].id]
+    changed, _ = changes_since(db, cursor[0], [ev.id])
+    assert [(r.id, r.status) for r in changed] == [(rows[noah.id].id, "present")]
@@ -0,0 +1,138 @@
+# tests/test_tenancy.py
+from __future__ import annotations
+
+import uuid
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import delete, select, text, update
+
+from core.access import current_version, get_scope
+from core.attendance import populate_for_events
+from core.auth import get_principal
+from core.db import SessionLocal
+from core.models import Athlete, Category, Event, EventAttendance, ParentAthlete, User
+from core.tenancy import create_club, get_club, set_tenant, tenant_sql
+
+
+SHARED_TITLE = "Allenamento test tenancy"
+
+
+def _populate_club(db, label: str) -> dict:
+    """Un club con categoria, due atleti, un genitore collegato al primo e un evento."""
+    club = create_club(db, f"test-{label}-{uuid.uuid4().hex[:6]}", f"Club {label}")
+    set_tenant(db, club.id)
+    category = Category(name="Cuccioli")
+    first, second = Athlete(name=f"Primo {label}"), Athlete(name=f"Secondo {label}")
+    first.category = second.category = category
+    parent = User(name=f"Genitore {label}", email="genitore@club.test", role="parent")
+    event = Event(type="training", category=category, title=SHARED_TITLE,
+                  date=date.today() + timedelta(days=5))
+    db.add_all([category, first, second, parent, event])
+    db.flush()
+    db.add(ParentAthlete(parent_id=parent.id, athlete_id=first.id))
+    populate_for_events(db, [event.id])
+    db.commit()
+    return {
+        "club": club.id, "parent": parent.id, "event": event.id,
+        "first": first.id, "second": second.id,
+    }
+
+
+@pytest.fixture(scope="module")
+def clubs(seeded):
+    db = SessionLocal()
+    try:
+        return _populate_club(db, "a"), _populate_club(db, "b")
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def session_for():
+    sessions = []
+
+    def open_session(club_id):
+        session = SessionLocal()
+        set_tenant(session, club_id)
+        sessions.append(session)
+        return session
+
+    yield open_session
+    for session in sessions:
+        session.close()
+
+
+def test_queries_see_only_the_session_club(clubs, session_for):
+    a, b = clubs
+    db = session_for(a["club"])
+
+    athletes = set(db.execute(select(Athlete.id)).scalars())
+    assert {a["first"], a["second"]} <= athletes
+    assert not {b["first"], b["second"]} & athletes
+    # anche attraverso le join e sulle righe figlie
+    joined = db.execute(
+        select(EventAttendance.id)
+        .join(Event, Event.id == EventAttendance.event_id)
+        .where(Event.title == SHARED_TITLE)
+    ).scalars().all()
+    assert len(joined) == 2
+    # stessa email in due club: ognuno vede il suo utente
+    assert db.execute(
+        select(User.id).where(User.email == "genitore@club.test")
+    ).scalars().all() == [a["parent"]]
+
+    # senza club (worker, CLI) si vedono tutti
+    assert {a["event"], b["event"]} <= set(
+        session_for(None).execute(select(Event.id)).scalars()
+    )
+
+
+def test_update_and_delete_stay_in_the_session_club(clubs, session_for):
+    a, b = clubs
+    db = session_for(a["club"])
+    db.execute(update(Event).where(Event.title == SHARED_TITLE).values(description="A"))
+    db.commit()
+
+    other = session_for(b["club"])
+    assert other.get(Event, b["event"]).description is None
+    assert db.get(Event, a["event"]).description == "A"
+
+    extra = Athlete(name="Da cancellare", club_id=b["club"])
+    other.add(extra)
+    other.commit()
+    db.execute(delete(Athlete).where(Athlete.name == "Da cancellare"))
+    db.commit()
+    assert other.execute(select(Athlete.id).where(Athlete.id == extra.id)).first()
+
+
+def test_text_queries_and_club_cache(clubs, session_for):
+    a, b = clubs
+    db = session_for(a["club"])
+    condition, params = tenant_sql(db, "e")
+    ids = db.execute(
+        text(f"SELECT e.id FROM events e WHERE e.title = :title{condition}"),
+        {"title": SHARED_TITLE, **params},
+    ).scalars().all()
+    assert ids == [a["event"]]
+
+    assert get_club(db, a["club"])["name"] == "Club a"
+    assert get_club(db, b["club"])["name"] == "Club b"
+
+
+def test_scope_cache_is_invalidated_only_for_the_changed_club(clubs, session_for):
+    a, b = clubs
+    db = session_for(a["club"])
+    principal = get_principal(db, a["parent"])
+    assert get_scope(db, principal).athlete_ids == frozenset({a["first"]})
+    other_version = current_version(b["club"])
+
+    db.add(ParentAthlete(parent_id=a["parent"], athlete_id=a["second"]))
+    db.commit()
+
+    assert get_scope(db, principal).athlete_ids == frozenset({a["first"], a["second"]})
+    assert current_version(b["club"]) == other_version
+    other = session_for(b["club"])
+    assert get_scope(other, get_principal(other, b["parent"])).athlete_ids == frozenset(
+        {b["first"]}
+    )
@@ -0,0 +1,125 @@
+# tests/test_ui.py
+# Query eseguite da un rerun delle pagine (AppTest): un rerun non deve
+# rileggere le righe già caricate una per una.
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from streamlit.testing.v1 import AppTest
+
+from conftest import ROOT
+from core.db import engine
+from core.tenancy import DEFAULT_CLUB_SLUG
+
+
+def logged_in(email: str) -> AppTest:
+    at = AppTest.from_file(str(ROOT / "streamlit_app.py"), default_timeout=60)
+    # altri test aggiungono club: si sceglie quello demo dall'URL
+    at.query_params["club"] = DEFAULT_CLUB_SLUG
+    at.run()
+    at.text_input[0].input(email)
+    at.text_input[1].input("valdayas")
+    at.button[0].click()
+    at.run()
+    assert not at.exception
+    return at
+
+
+@contextmanager
+def recorded_queries():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(" ".join(statement.split()))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def _on(statements, prefix: str, table: str):
+    return [s for s in statements if s.startswith(prefix) and f"FROM {table} " in s + " "]
+
+
+@pytest.fixture
+def parent_page(seeded):
+    at = logged_in("noah@club.test")
+    at.run()  # primo rerun: scalda le cache di processo
+    return at
+
+
+def test_parent_rerun_queries(parent_page):
+    with recorded_queries() as statements:
+        parent_page.run()
+    assert not parent_page.exception
+
+    # presenze dei figli con una sola query, principal e perimetro dalla cache
+    assert len(_on(statements, "SELECT", "event_attendance")) == 1
+    assert _on(statements, "SELECT", "users") == []
+    assert not [s for s in statements if s.startswith(("PRAGMA", "CREATE", "UPDATE", "INSERT"))]
+    assert len(statements) <= 5
+
+
+def test_parent_save_reloads_only_the_saved_row(parent_page):
+    save = next(b for b in parent_page.button if b.key and b.key.startswith("save_"))
+    _, event_id, athlete_id = save.key.split("_")
+    status = parent_page.radio(key=f"status_{event_id}_{athlete_id}")
+    status.set_value("absent" if status.value != "absent" else "present")
+
+    with recorded_queries() as statements:
+        save.click()
+        parent_page.run()
+    assert not parent_page.exception
+
+    assert len([s for s in statements if s.startswith("UPDATE event_attendance")]) == 1
+    # rendering (1) + rilettura della sola version salvata (1), non una per riga
+    assert len(_on(statements, "SELECT", "event_attendance")) <= 2
+
+
+def _live_totals(at) -> int:
+    table = at.dataframe[0].value
+    return int(table[["Presenti", "Assenti", "Da confermare"]].to_numpy().sum())
+
+
+def test_coach_live_summary_sees_deleted_rows(db):
+    from sqlalchemy import delete, select
+
+    from core.models import EventAttendance
+
+    at = logged_in("luca@club.test")
+    state = at.session_state["live_attendance"]
+    before = _live_totals(at)
+    assert before == len(state["rows"]) > 0
+
+    # riga cancellata fuori dalla pagina (es. atleta spostato di categoria):
+    # il feed delle modifiche non la riporta
+    row_id = db.execute(
+        select(EventAttendance.id).where(EventAttendance.id.in_(list(state["rows"])))
+    ).scalars().first()
+    removed = db.get(EventAttendance, row_id)
+    snapshot = {c.key: getattr(removed, c.key) for c in EventAttendance.__table__.columns}
+    db.execute(delete(EventAttendance).where(EventAttendance.id == row_id))
+    db.commit()
+    try:
+        at.run()
+        assert not at.exception
+        assert _live_totals(at) == before - 1
+        assert row_id not in at.session_state["live_attendance"]["rows"]
+    finally:
+        db.add(EventAttendance(**snapshot))
+        db.commit()
+
+
+@pytest.mark.parametrize("email", ["admin@club.test", "luca@club.test"])
+def test_rerun_runs_no_schema_statements(seeded, email):
+    # lo schema d'archivio lo crea migrate(), non le letture delle pagine
+    at = logged_in(email)
+    with recorded_queries() as statements:
+        at.run()
+    assert not at.exception
+    assert [s for s in statements if s.startswith(("PRAGMA", "CREATE", "ALTER"))] == []
@@ -1,9 +1,16 @@
 # ui_admin.py
 #
-# Pannello Admin per l'app Sci Club Val d'Ayas.
+# Pannello Admin per l'app Sci Club Val d'Ayas (un club per sessione).
 # - Metriche rapide
-# - Elenco prossimi eventi
+# - Elenco prossimi eventi e calendario del mese
+# - Località degli eventi (coordinate e quota)
+# - Credenziali di accesso degli utenti
+# - Import rosa (atleti, genitori, allenatori) da CSV/XLSX
+# - Statistiche presenze di stagione
+# - Export presenze / logistica
+# - Archivio stagioni concluse
 # - Sezione test notifiche push (FCM) manuale con token
+# - Metriche del dispatcher delle notifiche
 
 from __future__ import annotations
 
@@ -12,36 +19,144 @@ from datetime import date
 import streamlit as st
 from sqlalchemy.orm import Session
 
-from core.models import User, Category, Athlete, Event
+from core.auth import Principal, set_password
+from core.models import User, Category, Athlete, Event, Location
+from core.dispatch import get_dispatcher
 from core.notifications import send_push_to_tokens
+from core.archive import (
+    archive_completed_seasons,
+    archived_seasons,
+    season_attendance_stats,
+    season_label,
+)
+from core.roster_import import COLUMNS, ImportReport, import_roster, iter_file_rows
+from core.i18n import Translator, translator
+from core.access import get_scope
+from core.conditions import prefetch_conditions
+from core.locations import list_locations
+from core.read_models import category_names, scope_categories
+from core.tenancy import get_club
+from ui_analytics import render_season_stats
+from ui_calendar import render_calendar
+from ui_exports import render_export_section
+from ui_results import render_results_section
 
 
-def render_admin_dashboard(db: Session, user: User):
-    st.header("Pannello Admin")
+def _render_import_report(report: ImportReport, t: Translator):
+    col1, col2, col3 = st.columns(3)
+    col1.metric(t("admin.import.rows"), report.rows)
+    col2.metric(t("admin.import.new_athletes"), len(report.new_athletes))
+    col3.metric(t("admin.import.new_users"), len(report.new_users))
+
+    if report.errors:
+        st.warning(t("admin.import.rejected", count=len(report.errors)))
+        row, error = t("admin.import.col.row"), t("admin.import.col.error")
+        st.table([{row: line, error: msg} for line, msg in report.errors[:50]])
+
+    athlete, category = t("col.athlete"), t("field.category")
+    name, email, role = t("admin.import.col.name"), t("login.email"), t("admin.import.col.role")
+    year, moved_from, moved_to = (
+        t("admin.import.col.year"), t("admin.import.col.from"), t("admin.import.col.to")
+    )
+    parent, coach = t("role.parent"), t("role.coach")
+    sections = [
+        (t("admin.import.new_categories"), [{category: c} for c in report.new_categories]),
+        (t("admin.import.new_users"), [
+            {name: n, email: e, role: r} for n, e, r in report.new_users
+        ]),
+        (t("admin.import.new_athletes"), [
+            {athlete: n, year: y or "-", category: c}
+            for n, y, c in report.new_athletes
+        ]),
+        (t("admin.import.moved_athletes"), [
+            {athlete: n, moved_from: a, moved_to: b} for n, a, b in report.moved_athletes
+        ]),
+        (t("admin.import.new_parent_links"), [
+            {parent: e, athlete: a} for e, a in report.new_parent_links
+        ]),
+        (t("admin.import.new_coach_links"), [
+            {coach: e, category: c} for e, c in report.new_coach_links
+        ]),
+    ]
+    for title, rows in sections:
+        if rows:
+            st.markdown(f"**{title}** ({len(rows)})")
+            st.dataframe(rows, hide_index=True)
+
+
+def _render_locations(db: Session, t: Translator):
+    locations = list_locations(db)
+    if not locations:
+        st.info(t("admin.locations.none"))
+        return
+
+    st.caption(t("admin.locations.help"))
+    # colonne con nomi stabili, intestazioni nella lingua dell'utente
+    columns = ("resort", "piste", "latitude", "longitude", "altitude")
+    edited = st.data_editor(
+        [
+            {
+                "resort": loc.resort,
+                "piste": loc.piste,
+                "latitude": loc.latitude,
+                "longitude": loc.longitude,
+                "altitude": loc.altitude,
+            }
+            for loc in locations
+        ],
+        column_config={c: t(f"admin.locations.{c}") for c in columns},
+        disabled=["resort", "piste"],
+        hide_index=True,
+        key="admin_locations",
+    )
+    if st.button(t("admin.locations.save"), key="admin_locations_save"):
+        changed = 0
+        for loc, row in zip(locations, edited):
+            altitude = row["altitude"]
+            values = (
+                row["latitude"],
+                row["longitude"],
+                int(altitude) if altitude is not None else None,
+            )
+            if values != (loc.latitude, loc.longitude, loc.altitude):
+                place = db.get(Location, loc.id)
+                place.latitude, place.longitude, place.altitude = values
+                changed += 1
+        db.commit()
+        st.success(t("admin.locations.saved", count=changed))
+
+
+def render_admin_dashboard(db: Session, user: Principal):
+    t = translator(user.language)
+    st.header(t("admin.header"))
 
     # ---------- METRICHE RAPIDE ----------
     col1, col2, col3, col4 = st.columns(4)
-    col1.metric("Utenti", db.query(User).count())
-    col2.metric("Categorie", db.query(Category).count())
-    col3.metric("Atleti", db.query(Athlete).count())
-    col4.metric("Eventi", db.query(Event).count())
+    col1.metric(t("admin.metric.users"), db.query(User).count())
+    col2.metric(t("admin.metric.categories"), db.query(Category).count())
+    col3.metric(t("admin.metric.athletes"), db.query(Athlete).count())
+    col4.metric(
+        t("admin.metric.events"),
+        db.query(Event).filter(Event.cancelled_at.is_(None)).count(),
+    )
 
     # ---------- PROSSIMI EVENTI ----------
     today = date.today()
     events = (
         db.query(Event)
-        .filter(Event.date >= today)
+        .filter(Event.date >= today, Event.cancelled_at.is_(None))
         .order_by(Event.date.asc())
         .all()
     )
 
-    st.subheader("Prossimi eventi del club")
+    st.subheader(t("admin.upcoming"))
     if not events:
-        st.info("Nessun evento futuro.")
+        st.info(t("events.none"))
     else:
+        conditions = prefetch_conditions(db, events)
         for ev in events:
-            cat = db.query(Category).get(ev.category_id)
-            tipo = "Gara" if ev.type == "race" else "Allenamento"
+            cat = db.get(Category, ev.category_id)
+            tipo = t("event.race") if ev.type == "race" else t("event.training")
             with st.expander(
                 f"{ev.date} · {ev.title} "
                 f"({cat.name if cat else '-'}) · {tipo}",
@@ -50,44 +165,162 @@ def render_admin_dashboard(db: Session, user: User):
                 if ev.description:
                     st.caption(ev.description)
                 if ev.location:
-                    st.caption(f"Località: {ev.location}")
-                st.write(f"Richiesta sci in ski-room: {'✅' if ev.ask_skiroom else '❌'}")
-                st.write(f"Richiesta auto/carpooling: {'✅' if ev.ask_carpool else '❌'}")
+                    st.caption(t("event.location", location=ev.location))
+                if ev.id in conditions:
+                    st.caption(
+                        t("event.conditions", conditions=conditions[ev.id].label(user.language))
+                    )
+                st.write(t("admin.ask_skiroom", mark="✅" if ev.ask_skiroom else "❌"))
+                st.write(t("admin.ask_carpool", mark="✅" if ev.ask_carpool else "❌"))
+
+    with st.expander(t("admin.calendar"), expanded=False):
+        render_calendar(
+            db,
+            user,
+            category_names(scope_categories(db, get_scope(db, user))),
+            key_prefix="admin_calendar",
+        )
+
+    # ---------- LOCALITÀ ----------
+    with st.expander(t("admin.locations"), expanded=False):
+        _render_locations(db, t)
 
     st.markdown("---")
 
-    # ---------- SEZIONE TEST NOTIFICHE PUSH ----------
-    with st.expander("Test notifiche push (FCM)", expanded=False):
+    # ---------- CREDENZIALI ----------
+    with st.expander(t("admin.credentials"), expanded=False):
+        email = st.text_input(t("admin.credentials.email"), key="cred_email").strip().lower()
+        new_password = st.text_input(
+            t("admin.credentials.password"), type="password", key="cred_password"
+        )
+        if st.button(t("admin.credentials.save"), key="cred_save"):
+            target = db.query(User).filter(User.email == email).first()
+            if target is None:
+                st.warning(t("admin.credentials.unknown"))
+            elif len(new_password) < 8:
+                st.warning(t("admin.credentials.too_short"))
+            else:
+                set_password(db, target, new_password)
+                st.success(t("admin.credentials.saved", name=target.name))
+
+    # ---------- IMPORT ROSA ----------
+    with st.expander(t("admin.import"), expanded=False):
         st.caption(
-            "Per ora test manuale: incolla un token FCM ottenuto dalla pagina token.html "
-            "e invia una notifica di prova al tuo telefono."
+            t("admin.import.help", columns=", ".join(f"`{c}`" for c in COLUMNS))
+        )
+        uploaded = st.file_uploader(
+            t("admin.import.file"), type=["csv", "xlsx"], key="roster_file"
+        )
+        if uploaded is not None:
+            col_sim, col_imp = st.columns(2)
+            if col_sim.button(t("admin.import.dry_run"), key="roster_dry_run"):
+                report = import_roster(
+                    db, iter_file_rows(uploaded.name, uploaded.getvalue()), dry_run=True
+                )
+                if not report.has_changes:
+                    st.info(t("admin.import.no_changes"))
+                _render_import_report(report, t)
+            if col_imp.button(t("admin.import.run"), key="roster_import"):
+                report = import_roster(
+                    db, iter_file_rows(uploaded.name, uploaded.getvalue()), dry_run=False
+                )
+                st.success(t("admin.import.done"))
+                _render_import_report(report, t)
+
+    # ---------- STATISTICHE ----------
+    with st.expander(t("stats.season_header"), expanded=False):
+        render_season_stats(db, None, key_prefix="admin_stats", language=user.language)
+
+    # ---------- RISULTATI GARE ----------
+    with st.expander(t("results.header"), expanded=False):
+        render_results_section(
+            db,
+            scope_categories(db, get_scope(db, user)),
+            key_prefix="admin_results",
+            language=user.language,
         )
 
+    # ---------- EXPORT ----------
+    with st.expander(t("exports.header"), expanded=False):
+        render_export_section(db, None, key_prefix="admin_export", language=user.language)
+
+    # ---------- ARCHIVIO STAGIONI ----------
+    with st.expander(t("admin.archive"), expanded=False):
+        st.caption(t("admin.archive.help"))
+        if st.button(t("admin.archive.run"), key="archive_run"):
+            results = archive_completed_seasons(db)
+            moved = sum(r.rows.get("events", 0) for r in results)
+            st.success(t("admin.archive.done", count=moved))
+
+        seasons = archived_seasons(db)
+        if not seasons:
+            st.info(t("admin.archive.none"))
+        else:
+            labels = {season_label(s["season"]): s["season"] for s in seasons}
+            selected = st.selectbox(
+                t("field.season"), list(labels.keys()), key="archive_season"
+            )
+            stats = season_attendance_stats(db, labels[selected])
+            athlete_names = {a.id: a.name for a in db.query(Athlete).all()}
+            athlete, events, present, absent = (
+                t("col.athlete"), t("stats.col.events"), t("stats.col.present"),
+                t("admin.archive.col.absent"),
+            )
+            st.table(
+                [
+                    {
+                        athlete: athlete_names.get(row["athlete_id"], row["athlete_id"]),
+                        events: row["events"],
+                        present: row["present"],
+                        absent: row["absent"],
+                    }
+                    for row in stats
+                ]
+            )
+
+    # ---------- METRICHE NOTIFICHE ----------
+    with st.expander(t("admin.notifications"), expanded=False):
+        m = get_dispatcher().metrics()
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric(t("admin.notifications.submitted"), m.get("submitted", 0))
+        col2.metric(t("admin.notifications.pushes"), m.get("pushes", 0))
+        col3.metric(t("admin.notifications.dedup"), f"{m['dedup_rate']:.0%}")
+        col4.metric(t("admin.notifications.per_minute"), f"{m['pushes_per_minute']:.1f}")
+        col5, col6, col7, col8 = st.columns(4)
+        col5.metric(t("admin.notifications.pending"), m["pending_users"])
+        col6.metric(t("admin.notifications.throttled_user"), m.get("throttled_user", 0))
+        col7.metric(t("admin.notifications.throttled_global"), m.get("throttled_global", 0))
+        col8.metric(t("admin.notifications.failures"), m.get("failures", 0))
+
+    # ---------- SEZIONE TEST NOTIFICHE PUSH ----------
+    with st.expander(t("admin.fcm"), expanded=False):
+        st.caption(t("admin.fcm.help"))
+
         token = st.text_input(
-            "Token dispositivo FCM",
+            t("admin.fcm.token"),
             value="",
             key="fcm_test_token",
         )
 
-        default_title = "Test notifica Sci Club"
-        default_body = "Questa è una notifica di prova dall'app Sci Club Val d'Ayas."
+        default_title = t("admin.fcm.default_title")
+        default_body = t("admin.fcm.default_body", club=get_club(db, user.club_id)["name"])
 
         col_titolo, col_vuoto = st.columns([2, 1])
         with col_titolo:
             title = st.text_input(
-                "Titolo notifica",
+                t("admin.fcm.title"),
                 value=default_title,
                 key="fcm_test_title",
             )
         body = st.text_area(
-            "Messaggio",
+            t("admin.fcm.body"),
             value=default_body,
             key="fcm_test_body",
         )
 
-        if st.button("Invia notifica di test", key="fcm_test_send"):
+        if st.button(t("admin.fcm.send"), key="fcm_test_send"):
             if not token.strip():
-                st.warning("Inserisci prima un token FCM valido.")
+                st.warning(t("admin.fcm.missing"))
             else:
                 success, total, error_msg = send_push_to_tokens(
                     [token.strip()],
@@ -96,9 +329,9 @@ def render_admin_dashboard(db: Session, user: User):
                     data={"type": "test", "source": "admin_panel"},
                 )
                 if success > 0:
-                    st.success(f"Notifica inviata correttamente ({success}/{total}).")
+                    st.success(t("admin.fcm.sent", success=success, total=total))
                 else:
                     if error_msg:
                         st.error(error_msg)
                     else:
-                        st.error("Nessuna notifica inviata. Controlla token e configurazione FCM.")
+                        st.error(t("admin.fcm.failed"))
@@ -0,0 +1,75 @@
+# ui_analytics.py
+# Sezione statistiche di stagione condivisa da pannello Allenatore e Admin.
+
+from __future__ import annotations
+
+from typing import Optional, Sequence
+
+import streamlit as st
+from sqlalchemy.orm import Session
+
+from core.analytics import available_seasons, season_stats
+from core.archive import season_label
+from core.i18n import translator
+
+
+def render_season_stats(
+    db: Session,
+    category_ids: Optional[Sequence[int]],
+    key_prefix: str,
+    language: Optional[str] = None,
+):
+    """
+    category_ids=None considera tutte le categorie (admin);
+    per l'allenatore passare le sue categorie.
+    """
+    t = translator(language)
+    season = st.selectbox(
+        t("field.season"),
+        options=available_seasons(db),
+        format_func=season_label,
+        key=f"{key_prefix}_season",
+    )
+    stats = season_stats(db, season, category_ids)
+
+    if stats.by_athlete.empty:
+        st.info(t("stats.none"))
+        return
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric(t("stats.events"), stats.events)
+    col2.metric(t("stats.athletes"), len(stats.by_athlete))
+    overall = stats.by_athlete["present"].sum() / stats.by_athlete["events"].sum()
+    col3.metric(t("stats.average"), f"{overall:.0%}")
+
+    st.markdown(f"**{t('stats.by_athlete')}**")
+    st.bar_chart(
+        stats.by_athlete.set_index("athlete")["rate"] * 100,
+        y_label=t("stats.rate"),
+        x_label="",
+    )
+
+    columns = {
+        "athlete": t("col.athlete"),
+        "category": t("field.category"),
+        "events": t("stats.col.events"),
+        "present": t("stats.col.present"),
+        "rate": t("stats.rate"),
+        "best_streak": t("stats.col.best_streak"),
+        "current_streak": t("stats.col.current_streak"),
+    }
+    table = stats.by_athlete[list(columns)].rename(columns=columns)
+    table[columns["rate"]] = (table[columns["rate"]] * 100).round(0)
+    st.dataframe(
+        table,
+        hide_index=True,
+        use_container_width=True,
+    )
+
+    col_a, col_b = st.columns(2)
+    with col_a:
+        st.markdown(f"**{t('stats.by_weekday')}**")
+        st.bar_chart(stats.by_weekday["rate"].fillna(0) * 100, y_label="%", x_label="")
+    with col_b:
+        st.markdown(f"**{t('stats.trend')}**")
+        st.line_chart(stats.category_trend * 100, y_label="%", x_label="")
@@ -0,0 +1,80 @@
+# ui_calendar.py
+# Vista calendario (griglia del mese) condivisa dai pannelli Allenatore,
+# Genitore e Admin, con il link di abbonamento al feed ICS dell'utente.
+
+from __future__ import annotations
+
+import html
+from datetime import date
+from typing import Dict
+
+import streamlit as st
+from sqlalchemy.orm import Session
+
+from core.access import get_scope
+from core.auth import Principal, rotate_feed_token
+from core.calendar_feed import feed_url, month_events, month_grid, shift_month
+from core.i18n import month_names, translator, weekday_labels
+
+
+def _cell_text(text: str) -> str:
+    # testo libero dentro una cella di tabella markdown
+    return html.escape(text).replace("|", "&#124;")
+
+
+def render_calendar(
+    db: Session,
+    user: Principal,
+    category_names: Dict[int, str],
+    key_prefix: str,
+):
+    """Griglia del mese con gli eventi del perimetro dell'utente."""
+    t = translator(user.language)
+    weekdays = weekday_labels(user.language)
+    offset_key = f"{key_prefix}_month_offset"
+    offset = st.session_state.get(offset_key, 0)
+
+    col_prev, col_label, col_next = st.columns([1, 4, 1])
+    if col_prev.button("◀", key=f"{key_prefix}_prev"):
+        offset -= 1
+    if col_next.button("▶", key=f"{key_prefix}_next"):
+        offset += 1
+    st.session_state[offset_key] = offset
+
+    today = date.today()
+    year, month = shift_month(today.year, today.month, offset)
+    col_label.markdown(f"**{month_names(user.language)[month]} {year}**")
+
+    by_day = month_events(db, get_scope(db, user), year, month)
+
+    lines = [
+        "| " + " | ".join(weekdays) + " |",
+        "|" + "---|" * len(weekdays),
+    ]
+    for week in month_grid(year, month):
+        cells = []
+        for day in week:
+            if day is None:
+                cells.append(" ")
+                continue
+            label = f"**{day.day}**" if day != today else f"**<u>{day.day}</u>**"
+            for ev in by_day.get(day, []):
+                icon = "🏁" if ev.is_race else "⛷️"
+                category = category_names.get(ev.category_id, "-")
+                label += f"<br>{icon} {_cell_text(ev.title)} ({_cell_text(category)})"
+            cells.append(label)
+        lines.append("| " + " | ".join(cells) + " |")
+    st.markdown("\n".join(lines), unsafe_allow_html=True)
+
+    if not by_day:
+        st.caption(t("calendar.empty"))
+
+    with st.expander(t("calendar.subscribe"), expanded=False):
+        st.caption(t("calendar.subscribe_help"))
+        # il link appena generato si mostra già in questo rerun
+        rotated = st.button(t("calendar.subscribe_rotate"), key=f"{key_prefix}_feed_rotate")
+        if rotated:
+            rotate_feed_token(db, user.id)
+        st.code(feed_url(db, user.id), language=None)
+        if rotated:
+            st.success(t("calendar.subscribe_rotated"))
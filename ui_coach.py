@@ -1,51 +1,66 @@
 # ui_coach.py
 # Pannello Allenatore – Sci Club Val d'Ayas
 
-from datetime import date
-from typing import List, Set
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Mapping, Set
 
 import streamlit as st
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from core.access import get_scope
+from core.auth import Principal
+from core.changes import attendance_count, changes_since, snapshot
+from core.conditions import prefetch_conditions
 from core.models import (
-    User,
-    Category,
     Athlete,
     ParentAthlete,
     Event,
-    EventAttendance,
     Message,
-    DeviceToken,
 )
-from core.notifications import send_push_to_tokens
+from core.dispatch import get_dispatcher
+from core.history import SOURCE_SYNC, event_timeline
+from core.i18n import status_labels, translator, weekday_labels
+from core.read_models import (
+    attendance_by_event,
+    category_names,
+    event_title,
+    future_events,
+    scope_athletes,
+    scope_categories,
+)
+from core.series import create_series, cancel_occurrence, weekly_rule
+from core.tenancy import set_tenant
+from seed import get_db
+from ui_analytics import render_season_stats
+from ui_calendar import render_calendar
+from ui_exports import render_export_section
+from ui_results import render_results_section
+
+
+STATUS_ICONS = {"present": "✅", "absent": "❌", "undecided": "❓"}
+
+# ogni quanti secondi aggiornare il riepilogo presenze
+LIVE_REFRESH_SECONDS = 10
 
 
 # --------- UTILS ----------
 
 
-def _get_coach_categories(db: Session, user: User):
-    links = db.query(Category).join(
-        "events", isouter=True
-    )  # solo per tenerle "vive"
-    # ma in realtà abbiamo già la relazione in CoachCategory, quindi:
-    coach_links = [c for c in user.coached_categories]
-    cat_ids = [cl.category_id for cl in coach_links]
-    if not cat_ids:
-        return [], []
+@lru_cache(maxsize=None)
+def _status_texts(language: str) -> Mapping[str, str]:
+    """Stato -> "icona etichetta" nella lingua, costruito una volta."""
+    return {s: f"{STATUS_ICONS[s]} {label}" for s, label in status_labels(language).items()}
 
-    categories = db.query(Category).filter(Category.id.in_(cat_ids)).all()
-    cat_map = {c.id: c for c in categories}
-    return categories, cat_ids, cat_map
 
+def _get_coach_categories(db: Session, user: Principal):
+    scope = get_scope(db, user)
+    if not scope.category_ids:
+        return [], [], {}
 
-def _load_future_events_for_cats(db: Session, cat_ids: List[int]):
-    today = date.today()
-    return (
-        db.query(Event)
-        .filter(Event.category_id.in_(cat_ids), Event.date >= today)
-        .order_by(Event.date.asc())
-        .all()
-    )
+    categories = scope_categories(db, scope)
+    return categories, sorted(scope.category_ids), category_names(categories)
 
 
 def _collect_parent_ids_for_category(db: Session, category_id: int) -> Set[int]:
@@ -71,124 +86,305 @@ def _collect_parent_ids_for_athlete(db: Session, athlete_id: int) -> Set[int]:
     return {l.parent_id for l in links}
 
 
-def _get_tokens_for_users(db: Session, user_ids: List[int]) -> List[str]:
-    if not user_ids:
-        return []
-    tokens = (
-        db.query(DeviceToken)
-        .filter(DeviceToken.user_id.in_(user_ids))
-        .all()
+# --------- TAB EVENTI ----------
+
+
+def _render_series_form(db: Session, user: Principal, categories):
+    t = translator(user.language)
+    with st.expander(t("coach.series.header"), expanded=False):
+        cat_names = {c.name: c.id for c in categories}
+        selected_cat = st.selectbox(
+            t("field.category"), list(cat_names.keys()), key="series_category"
+        )
+        title = st.text_input(t("field.title"), value=t("event.training"), key="series_title")
+        location = st.text_input(t("field.location"), value="", key="series_location")
+        description = st.text_area(t("field.description"), value="", key="series_description")
+
+        weekdays = st.multiselect(
+            t("coach.series.weekdays"),
+            options=list(range(7)),
+            format_func=weekday_labels(user.language).__getitem__,
+            key="series_weekdays",
+        )
+
+        today = date.today()
+        col1, col2 = st.columns(2)
+        start_date = col1.date_input(t("field.from"), value=today, key="series_start")
+        end_date = col2.date_input(
+            t("field.to"), value=today + timedelta(days=120), key="series_end"
+        )
+        ask_skiroom = st.checkbox(t("coach.series.ask_skiroom"), key="series_skiroom")
+
+        if st.button(t("coach.series.create"), key="series_create"):
+            if not title or not weekdays:
+                st.warning(t("coach.series.missing"))
+                return
+            try:
+                create_series(
+                    db,
+                    category_id=cat_names[selected_cat],
+                    title=title,
+                    rrule=weekly_rule(weekdays),
+                    start_date=start_date,
+                    end_date=end_date,
+                    description=description or None,
+                    location=location or None,
+                    ask_skiroom=ask_skiroom,
+                    created_by=user.id,
+                )
+            except ValueError as exc:
+                st.warning(str(exc))
+                return
+            st.success(t("coach.series.created"))
+            st.rerun()
+
+
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def _render_live_summary(user: Principal, event_labels):
+    """
+    Riepilogo presenze aggiornato in automatico: a ogni giro legge solo le
+    righe cambiate dal cursore e aggiorna lo stato tenuto in sessione.
+    Il feed non riporta le cancellazioni (data annullata, atleta spostato
+    di categoria): se il numero di righe non torna si rilegge tutto.
+    """
+    state = st.session_state.get("live_attendance")
+    if state is None or state["event_ids"] != set(event_labels):
+        return
+
+    # il frammento gira senza il resto della pagina: sessione propria,
+    # legata al club come quella della pagina
+    db = get_db()
+    set_tenant(db, user.club_id)
+    try:
+        if get_scope(db, user).category_ids != state["category_ids"]:
+            # categorie dell'allenatore cambiate: cambia l'elenco degli eventi
+            st.rerun()
+
+        rows, cursor = changes_since(db, state["cursor"], state["event_ids"])
+        for r in rows:
+            state["rows"][r.id] = r
+        state["cursor"] = cursor
+
+        if attendance_count(db, state["event_ids"]) != len(state["rows"]):
+            rows, cursor = snapshot(db, state["event_ids"])
+            state["rows"] = {r.id: r for r in rows}
+            state["cursor"] = cursor
+    finally:
+        db.close()
+
+    # conteggi per chiave stabile; le intestazioni tradotte solo alla fine
+    columns = ("present", "absent", "undecided", "skis", "seats")
+    summary = {ev_id: dict.fromkeys(columns, 0) for ev_id in event_labels}
+    for r in state["rows"].values():
+        item = summary[r.event_id]
+        item[r.status if r.status in ("present", "absent") else "undecided"] += 1
+        if r.skis_in_skiroom:
+            item["skis"] += 1
+        if r.car_available:
+            item["seats"] += r.car_seats or 0
+
+    t = translator(user.language)
+    headers = dict(zip(columns, (
+        t("coach.live.present"), t("coach.live.absent"), t("status.undecided"),
+        t("attendance.skiroom"), t("coach.live.seats"),
+    )))
+    st.dataframe(
+        [
+            {t("col.event"): event_labels[ev_id],
+             **{headers[c]: n for c, n in counts.items()}}
+            for ev_id, counts in summary.items()
+        ],
+        hide_index=True,
     )
-    return [t.token for t in tokens]
+    st.caption(t("coach.live.refresh", seconds=LIVE_REFRESH_SECONDS))
 
 
-# --------- TAB EVENTI ----------
+def _init_live_summary(db: Session, events, category_ids):
+    event_ids = {ev.id for ev in events}
+    state = st.session_state.get("live_attendance")
+    if (
+        state is not None
+        and state["event_ids"] == event_ids
+        and state["category_ids"] == category_ids
+    ):
+        return
+
+    rows, cursor = snapshot(db, event_ids)
+    st.session_state["live_attendance"] = {
+        "event_ids": event_ids,
+        "category_ids": category_ids,
+        "rows": {r.id: r for r in rows},
+        "cursor": cursor,
+    }
+
+
+def _render_event_history(
+    db: Session, event_id: int, statuses: Mapping[str, str], language: str
+):
+    t = translator(language)
+    entries = event_timeline(db, event_id)
+    if not entries:
+        st.caption(t("history.none"))
+        return
+
+    names = dict(
+        db.execute(
+            select(Athlete.id, Athlete.name).where(
+                Athlete.id.in_({e.athlete_id for e in entries})
+            )
+        ).all()
+    )
+    when, athlete, status, skis, car, by, origin = (
+        t("history.when"), t("col.athlete"), t("col.status"), t("attendance.skiroom"),
+        t("col.car"), t("history.by"), t("history.source"),
+    )
+    sources = {SOURCE_SYNC: t("history.source_app")}
+    web = t("history.source_web")
+    st.dataframe(
+        [
+            {
+                when: e.changed_at.strftime("%d/%m %H:%M"),
+                athlete: names.get(e.athlete_id, "?"),
+                status: statuses.get(e.status, e.status),
+                skis: "🎿" if e.skis_in_skiroom else "—",
+                car: f"🚗 {e.car_seats}" if e.car_available else "—",
+                by: e.changed_by or "-",
+                origin: sources.get(e.source, web),
+            }
+            for e in entries
+        ],
+        hide_index=True,
+    )
 
 
-def _render_events_tab(db: Session, user: User):
+def _render_events_tab(db: Session, user: Principal):
+    t = translator(user.language)
     categories, cat_ids, cat_map = _get_coach_categories(db, user)
 
     if not categories:
-        st.info("Non sei assegnato a nessuna categoria.")
+        st.info(t("coach.no_categories"))
         return
 
-    st.subheader("Categorie seguite")
+    st.subheader(t("coach.categories"))
     st.write(", ".join(c.name for c in categories))
 
-    events = _load_future_events_for_cats(db, cat_ids)
+    _render_series_form(db, user, categories)
+
+    view = st.radio(
+        t("view.label"),
+        ["list", "calendar"],
+        format_func=lambda v: t(f"view.{v}"),
+        horizontal=True,
+        key="coach_events_view",
+    )
+    if view == "calendar":
+        render_calendar(db, user, cat_map, key_prefix="coach_calendar")
+        return
+
+    events = future_events(db, get_scope(db, user))
 
-    st.subheader("Prossimi eventi delle tue categorie")
+    st.subheader(t("coach.upcoming"))
     if not events:
-        st.info("Nessun evento futuro per le tue categorie.")
+        st.info(t("coach.no_events"))
         return
 
+    st.markdown(f"**{t('coach.live.header')}**")
+    _init_live_summary(db, events, frozenset(cat_ids))
+    _render_live_summary(
+        user, {ev.id: f"{ev.date} · {ev.title}" for ev in events}
+    )
+
+    attendance = attendance_by_event(db, [ev.id for ev in events])
+    statuses = _status_texts(user.language)
+    # condizioni neve/meteo di tutte le località in un solo lotto
+    conditions = prefetch_conditions(db, events)
+    # testi delle righe, una volta per pagina
+    skis_yes, not_applicable = f"🎿 {t('yes')}", t("not_applicable")
+    athlete_col, status_col, skis_col, car_col = (
+        t("col.athlete"), t("col.status"), t("attendance.skiroom"), t("col.car")
+    )
+
     for ev in events:
-        cat = cat_map.get(ev.category_id)
-        is_race = ev.type == "race"
+        is_race = ev.is_race
 
         with st.expander(
-            f"{ev.date} · {ev.title} "
-            f"({cat.name if cat else '-'}) "
-            f"- {'Gara' if is_race else 'Allenamento'}",
-            expanded=False,
+            event_title(ev, cat_map.get(ev.category_id), user.language), expanded=False
         ):
             if ev.description:
                 st.caption(ev.description)
             if ev.location:
-                st.caption(f"Località: {ev.location}")
-
-            rows = (
-                db.query(EventAttendance, Athlete)
-                .join(Athlete, EventAttendance.athlete_id == Athlete.id)
-                .filter(EventAttendance.event_id == ev.id)
-                .order_by(Athlete.name.asc())
-                .all()
-            )
+                st.caption(t("event.location", location=ev.location))
+            if ev.id in conditions:
+                st.caption(
+                    t("event.conditions", conditions=conditions[ev.id].label(user.language))
+                )
+
+            if ev.series_id is not None:
+                if st.button(t("coach.cancel_occurrence"), key=f"cancel_occ_{ev.id}"):
+                    cancel_occurrence(db, db.get(Event, ev.id))
+                    st.rerun()
+
+            rows = attendance[ev.id]
 
             if not rows:
-                st.info("Nessun atleta collegato a questo evento.")
+                st.info(t("coach.no_athletes_event"))
                 continue
 
-            present = sum(1 for a, _ in rows if a.status == "present")
-            absent = sum(1 for a, _ in rows if a.status == "absent")
-            undecided = sum(1 for a, _ in rows if a.status == "undecided")
+            present = sum(1 for a in rows if a.status == "present")
+            absent = sum(1 for a in rows if a.status == "absent")
+            undecided = sum(1 for a in rows if a.status == "undecided")
 
-            skis_count = sum(1 for a, _ in rows if a.skis_in_skiroom)
-            car_drivers = sum(1 for a, _ in rows if a.car_available)
-            total_car_seats = sum((a.car_seats or 0) for a, _ in rows)
+            skis_count = sum(1 for a in rows if a.skis_in_skiroom)
+            car_drivers = sum(1 for a in rows if a.car_available)
+            total_car_seats = sum((a.car_seats or 0) for a in rows)
 
             col1, col2, col3, col4 = st.columns(4)
-            col1.metric("Presenze previste", present)
-            col2.metric("Assenti", absent)
-            col3.metric("Da confermare", undecided)
-            col4.metric("Sci in ski-room", skis_count)
+            col1.metric(t("coach.metric.expected"), present)
+            col2.metric(t("coach.live.absent"), absent)
+            col3.metric(t("status.undecided"), undecided)
+            col4.metric(t("attendance.skiroom"), skis_count)
 
             col5, col6 = st.columns(2)
-            col5.metric("Automuniti", car_drivers)
-            col6.metric("Posti auto totali", total_car_seats)
+            col5.metric(t("coach.metric.drivers"), car_drivers)
+            col6.metric(t("coach.metric.seats"), total_car_seats)
 
             st.markdown("----")
-            st.markdown("**Dettaglio atleti:**")
-
-            table_data = []
-            for att, athlete in rows:
-                status_icon = {
-                    "present": "✅ Presente",
-                    "absent": "❌ Assente",
-                    "undecided": "❓ Da confermare",
-                }.get(att.status, att.status)
-
-                skis_label = "🎿 Sì" if att.skis_in_skiroom else "—"
-                if att.car_available:
-                    car_label = f"🚗 Sì ({att.car_seats or 0} posti)"
-                else:
-                    car_label = "—"
-
-                table_data.append(
-                    {
-                        "Atleta": athlete.name,
-                        "Stato": status_icon,
-                        "Sci in ski-room": skis_label,
-                        "Auto": car_label if is_race else "N/A" if not is_race else car_label,
-                    }
-                )
+            st.markdown(f"**{t('coach.athletes_detail')}**")
+
+            table_data = [
+                {
+                    athlete_col: att.athlete_name,
+                    status_col: statuses.get(att.status, att.status),
+                    skis_col: skis_yes if att.skis_in_skiroom else "—",
+                    car_col: (
+                        not_applicable if not is_race
+                        else "🚗 " + t("coach.car_seats", seats=att.car_seats or 0)
+                        if att.car_available
+                        else "—"
+                    ),
+                }
+                for att in rows
+            ]
 
             st.table(table_data)
 
-            st.markdown(
-                "_Nota: in questa versione l'allenatore vede ma non modifica; le modifiche vengono dal genitore._"
-            )
+            if st.checkbox(t("coach.show_history"), key=f"history_{ev.id}"):
+                _render_event_history(db, ev.id, statuses, user.language)
+
+            st.markdown(t("coach.read_only_note"))
 
 
 # --------- TAB COMUNICAZIONI ----------
 
 
-def _render_comunicazioni_tab(db: Session, user: User):
-    st.subheader("Nuova comunicazione ai genitori")
+def _render_comunicazioni_tab(db: Session, user: Principal):
+    t = translator(user.language)
+    st.subheader(t("coach.messages.header"))
 
     mode = st.radio(
-        "Destinatari",
-        options=["Tutti i genitori delle mie categorie", "Solo una categoria", "Per atleta"],
+        t("coach.messages.recipients"),
+        options=["all", "category", "athlete"],
+        format_func=lambda m: t(f"coach.messages.to_{m}"),
         horizontal=False,
     )
 
@@ -197,37 +393,32 @@ def _render_comunicazioni_tab(db: Session, user: User):
     target_category_id = None
     target_athlete_id = None
 
-    if mode == "Solo una categoria":
+    if mode == "category":
         cat_names = {c.name: c.id for c in categories}
-        selected = st.selectbox("Categoria", list(cat_names.keys()))
+        selected = st.selectbox(t("field.category"), list(cat_names.keys()))
         target_category_id = cat_names[selected]
 
-    elif mode == "Per atleta":
+    elif mode == "athlete":
         # elenco atleti delle categorie del coach
-        athletes = (
-            db.query(Athlete)
-            .filter(Athlete.category_id.in_(cat_ids))
-            .order_by(Athlete.name.asc())
-            .all()
-        )
+        athletes = scope_athletes(db, get_scope(db, user))
         if not athletes:
-            st.info("Nessun atleta collegato alle tue categorie.")
+            st.info(t("coach.messages.no_athletes"))
             return
         ath_labels = {a.name: a.id for a in athletes}
-        selected = st.selectbox("Atleta", list(ath_labels.keys()))
+        selected = st.selectbox(t("col.athlete"), list(ath_labels.keys()))
         target_athlete_id = ath_labels[selected]
 
-    title = st.text_input("Titolo", value="")
-    content = st.text_area("Contenuto", height=150)
+    title = st.text_input(t("field.title"), value="")
+    content = st.text_area(t("coach.messages.content"), height=150)
 
-    if st.button("Invia comunicazione"):
+    if st.button(t("coach.messages.send")):
         if not title or not content:
-            st.warning("Inserisci titolo e contenuto.")
+            st.warning(t("coach.messages.missing"))
             return
 
         parent_ids: Set[int] = set()
 
-        if mode == "Tutti i genitori delle mie categorie":
+        if mode == "all":
             for c in categories:
                 parent_ids |= _collect_parent_ids_for_category(db, c.id)
             msg = Message(
@@ -237,7 +428,7 @@ def _render_comunicazioni_tab(db: Session, user: User):
                 category_id=None,
                 athlete_id=None,
             )
-        elif mode == "Solo una categoria" and target_category_id:
+        elif mode == "category" and target_category_id:
             parent_ids |= _collect_parent_ids_for_category(db, target_category_id)
             msg = Message(
                 sender_id=user.id,
@@ -246,7 +437,7 @@ def _render_comunicazioni_tab(db: Session, user: User):
                 category_id=target_category_id,
                 athlete_id=None,
             )
-        elif mode == "Per atleta" and target_athlete_id:
+        elif mode == "athlete" and target_athlete_id:
             parent_ids |= _collect_parent_ids_for_athlete(db, target_athlete_id)
             msg = Message(
                 sender_id=user.id,
@@ -256,37 +447,68 @@ def _render_comunicazioni_tab(db: Session, user: User):
                 athlete_id=target_athlete_id,
             )
         else:
-            st.warning("Seleziona correttamente i destinatari.")
+            st.warning(t("coach.messages.bad_recipients"))
             return
 
         db.add(msg)
         db.commit()
 
-        tokens = _get_tokens_for_users(db, list(parent_ids))
-        result = send_push_to_tokens(tokens, title=title, body=content)
+        # i push passano dal dispatcher: accorpa messaggi ravvicinati allo
+        # stesso genitore e rispetta i limiti di invio
+        dispatcher = get_dispatcher()
+        dispatcher.start_background()
+        queued = dispatcher.submit(parent_ids, title=title, body=content)
 
-        if result.get("ok"):
-            st.success(f"Messaggio salvato e notifiche inviate a {len(tokens)} dispositivi.")
-        else:
-            st.warning(
-                f"Messaggio salvato ma problema nell'invio notifiche: {result.get('reason')}"
-            )
-            st.json(result.get("response", {}))
+        st.success(
+            t("coach.messages.sent", queued=queued, seconds=int(dispatcher.window))
+        )
 
 
-def _render_reports_tab(db: Session, user: User):
-    st.subheader("Report di squadra")
-    st.info("In questa versione demo i report sono ancora in sola lettura / placeholder.")
+def _render_reports_tab(db: Session, user: Principal):
+    t = translator(user.language)
+    st.subheader(t("results.header"))
+
+    categories, _, _ = _get_coach_categories(db, user)
+    if not categories:
+        st.info(t("coach.no_categories"))
+        return
+
+    render_results_section(db, categories, key_prefix="coach_results", language=user.language)
+
+
+def _render_export_tab(db: Session, user: Principal):
+    t = translator(user.language)
+    st.subheader(t("exports.header"))
+
+    categories, cat_ids, _ = _get_coach_categories(db, user)
+    if not categories:
+        st.info(t("coach.no_categories"))
+        return
+
+    render_export_section(db, cat_ids, key_prefix="coach_export", language=user.language)
+
+
+def _render_stats_tab(db: Session, user: Principal):
+    t = translator(user.language)
+    st.subheader(t("stats.header"))
+
+    categories, cat_ids, _ = _get_coach_categories(db, user)
+    if not categories:
+        st.info(t("coach.no_categories"))
+        return
+
+    render_season_stats(db, cat_ids, key_prefix="coach_stats", language=user.language)
 
 
 # --------- ENTRY POINT ----------
 
 
-def render_coach_dashboard(db: Session, user: User):
-    st.header("Pannello Allenatore")
+def render_coach_dashboard(db: Session, user: Principal):
+    t = translator(user.language)
+    st.header(t("coach.header"))
 
-    tab_eventi, tab_comunicazioni, tab_report = st.tabs(
-        ["Eventi", "Comunicazioni", "Report"]
+    tab_eventi, tab_comunicazioni, tab_report, tab_stats, tab_export = st.tabs(
+        [t(f"coach.tab.{tab}") for tab in ("events", "messages", "reports", "stats", "export")]
     )
 
     with tab_eventi:
@@ -297,3 +519,9 @@ def render_coach_dashboard(db: Session, user: User):
 
     with tab_report:
         _render_reports_tab(db, user)
+
+    with tab_stats:
+        _render_stats_tab(db, user)
+
+    with tab_export:
+        _render_export_tab(db, user)
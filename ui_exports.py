@@ -0,0 +1,101 @@
+# ui_exports.py
+# Sezione export (CSV / Excel) condivisa da pannello Allenatore e Admin.
+
+from __future__ import annotations
+
+from datetime import date
+from typing import Optional, Sequence
+
+import streamlit as st
+from sqlalchemy.orm import Session
+
+from core.archive import archived_seasons, hot_seasons, season_bounds, season_label
+from core.exports import (
+    EXPORT_KINDS,
+    available_formats,
+    export_file_name,
+    write_export,
+)
+from core.i18n import translator
+from core.tenancy import current_club_id, set_tenant
+from seed import get_db
+
+
+def render_export_section(
+    db: Session,
+    category_ids: Optional[Sequence[int]],
+    key_prefix: str,
+    language: Optional[str] = None,
+):
+    """
+    category_ids=None esporta tutte le categorie (admin);
+    per l'allenatore passare le sue categorie.
+    """
+    t = translator(language)
+    kind = st.selectbox(
+        t("exports.kind"),
+        options=list(EXPORT_KINDS.keys()),
+        format_func=lambda k: t(f"exports.kind.{k}"),
+        key=f"{key_prefix}_kind",
+    )
+
+    period = st.radio(
+        t("exports.period"),
+        options=["season", "range"],
+        format_func=lambda p: t("field.season") if p == "season" else t("exports.period.range"),
+        horizontal=True,
+        key=f"{key_prefix}_period",
+    )
+
+    today = date.today()
+    if period == "season":
+        # stagioni ancora nelle tabelle calde e quelle archiviate del club
+        # (core/exports.py le legge dall'archivio)
+        seasons = sorted(
+            set(hot_seasons(db, today)) | {s["season"] for s in archived_seasons(db)},
+            reverse=True,
+        )
+        season = st.selectbox(
+            t("field.season"),
+            options=seasons,
+            format_func=season_label,
+            key=f"{key_prefix}_season",
+        )
+        start, end = season_bounds(season)
+    else:
+        col1, col2 = st.columns(2)
+        start = col1.date_input(t("field.from"), value=today, key=f"{key_prefix}_start")
+        end = col2.date_input(t("field.to"), value=today, key=f"{key_prefix}_end")
+
+    fmt = st.radio(
+        t("exports.format"),
+        options=available_formats(),
+        horizontal=True,
+        key=f"{key_prefix}_fmt",
+    )
+
+    file_name = export_file_name(kind, start, end, fmt)
+    club_id = current_club_id(db)
+
+    def build() -> bytes:
+        # gira al clic, fuori dal rerun della pagina: sessione propria legata
+        # al club; il file temporaneo si chiude appena letto, in sessione non
+        # resta niente
+        session = get_db()
+        set_tenant(session, club_id)
+        try:
+            with write_export(session, kind, start, end, category_ids, fmt=fmt) as file_obj:
+                return file_obj.read()
+        finally:
+            session.close()
+
+    # il file viene generato solo al clic, non a ogni rerun
+    st.download_button(
+        t("exports.download"),
+        data=build,
+        file_name=file_name,
+        mime="text/csv" if fmt == "csv" else
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        key=f"{key_prefix}_download",
+        on_click="ignore",
+    )
@@ -7,125 +7,143 @@
 # - Report: placeholder per report personali
 # - Impostazioni: salva il token FCM per le notifiche push
 
-from datetime import date, datetime
+from datetime import datetime
 
 import streamlit as st
 from sqlalchemy.orm import Session
 
+from core.access import get_scope
+from core.auth import Principal
 from core.models import (
-    User,
-    Athlete,
-    ParentAthlete,
-    Category,
-    Event,
     EventAttendance,
     DeviceToken,
 )
+from core.attendance import populate_for_events
+from core.conditions import prefetch_conditions
+from core.i18n import status_labels, translator
+from core.read_models import event_title, family_rows, future_events
+from core.uow import unit_of_work
+from ui_calendar import render_calendar
+
+
+def _load_family_data(db: Session, user: Principal):
+    # figli e categorie visibili dal perimetro in cache: una sola query
+    # (solo colonne) per nomi atleti e categorie
+    scope = get_scope(db, user)
+    if not scope.athlete_ids:
+        return [], [], {}
+
+    athletes, cat_names = family_rows(db, scope)
+    return athletes, sorted(scope.category_ids), cat_names
+
+
+def _load_family_attendance(db: Session, events, athletes):
+    """
+    Presenze dei figli per tutti gli eventi mostrati, in una query, per
+    (event_id, athlete_id). Sono oggetti ORM: il salvataggio li modifica.
+    """
+    event_ids = [ev.id for ev in events]
+    athlete_ids = [ath.id for ath in athletes]
+
+    def load():
+        rows = (
+            db.query(EventAttendance)
+            .filter(
+                EventAttendance.event_id.in_(event_ids),
+                EventAttendance.athlete_id.in_(athlete_ids),
+            )
+            .all()
+        )
+        return {(att.event_id, att.athlete_id): att for att in rows}
+
+    attendance = load()
+
+    # se mancano (dati precedenti al pre-popolamento), creiamo in un colpo
+    # solo le righe degli eventi interessati
+    missing = {
+        ev.id
+        for ev in events
+        for ath in athletes
+        if ath.category_id == ev.category_id and (ev.id, ath.id) not in attendance
+    }
+    if missing:
+        populate_for_events(db, missing)
+        db.commit()
+        attendance = load()
+    return attendance
 
 
-def _load_family_data(db: Session, user: User):
-    links = (
-        db.query(ParentAthlete)
-        .filter(ParentAthlete.parent_id == user.id)
-        .all()
-    )
-    if not links:
-        return [], [], []
-
-    athlete_ids = [l.athlete_id for l in links]
-    athletes = db.query(Athlete).filter(Athlete.id.in_(athlete_ids)).all()
-    cat_ids = list({a.category_id for a in athletes if a.category_id})
-
-    categories = db.query(Category).filter(Category.id.in_(cat_ids)).all()
-    cat_map = {c.id: c for c in categories}
-
-    return athletes, cat_ids, cat_map
-
-
-def _render_events_tab(db: Session, user: User, athletes, cat_ids, cat_map):
-    st.subheader("Prossimi eventi per i tuoi figli")
-
+def _render_events_tab(db: Session, user: Principal, athletes, cat_ids, cat_map):
+    t = translator(user.language)
     if not cat_ids:
-        st.info("Nessuna categoria collegata ai tuoi atleti.")
+        st.info(t("parent.no_categories"))
         return
 
-    today = date.today()
-    events = (
-        db.query(Event)
-        .filter(Event.category_id.in_(cat_ids), Event.date >= today)
-        .order_by(Event.date.asc())
-        .all()
+    view = st.radio(
+        t("view.label"),
+        ["list", "calendar"],
+        format_func=lambda v: t(f"view.{v}"),
+        horizontal=True,
+        key="parent_events_view",
     )
+    if view == "calendar":
+        render_calendar(db, user, cat_map, key_prefix="parent_calendar")
+        return
+
+    st.subheader(t("parent.upcoming"))
+
+    events = future_events(db, get_scope(db, user))
 
     if not events:
-        st.info("Nessun evento futuro.")
+        st.info(t("events.none"))
         return
 
+    attendance = _load_family_attendance(db, events, athletes)
+    conditions = prefetch_conditions(db, events)
+
+    # etichette lette una volta dal catalogo compilato, non per riga
+    labels = status_labels(user.language)
+    statuses = list(labels)
+
     for ev in events:
-        cat = cat_map.get(ev.category_id)
-        is_race = ev.type == "race"
+        is_race = ev.is_race
 
         with st.expander(
-            f"{ev.date} · {ev.title} "
-            f"({cat.name if cat else '-'}) "
-            f"- {'Gara' if is_race else 'Allenamento'}",
-            expanded=False,
+            event_title(ev, cat_map.get(ev.category_id), user.language), expanded=False
         ):
             if ev.description:
                 st.caption(ev.description)
             if ev.location:
-                st.caption(f"Località: {ev.location}")
+                st.caption(t("event.location", location=ev.location))
+            if ev.id in conditions:
+                st.caption(
+                    t("event.conditions", conditions=conditions[ev.id].label(user.language))
+                )
 
             for ath in athletes:
                 if ath.category_id != ev.category_id:
                     continue
 
-                att = (
-                    db.query(EventAttendance)
-                    .filter(
-                        EventAttendance.event_id == ev.id,
-                        EventAttendance.athlete_id == ath.id,
-                    )
-                    .first()
-                )
-
-                # se manca, creiamo record base
+                att = attendance.get((ev.id, ath.id))
                 if att is None:
-                    att = EventAttendance(
-                        event_id=ev.id,
-                        athlete_id=ath.id,
-                        status="undecided",
-                    )
-                    db.add(att)
-                    db.commit()
+                    continue
 
                 st.markdown(f"#### {ath.name}")
 
-                status_label_map = {
-                    "undecided": "Da confermare",
-                    "present": "Presente",
-                    "absent": "Assente",
-                }
-                reverse_status_map = {v: k for k, v in status_label_map.items()}
-                current_status_label = status_label_map.get(
-                    att.status, "Da confermare"
-                )
-
                 col1, col2 = st.columns([2, 1])
 
                 with col1:
-                    chosen_label = st.radio(
-                        "Presenza",
-                        options=list(status_label_map.values()),
-                        index=list(status_label_map.values()).index(
-                            current_status_label
-                        ),
+                    chosen_status = st.radio(
+                        t("attendance.label"),
+                        options=statuses,
+                        index=statuses.index(att.status) if att.status in labels else 0,
+                        format_func=labels.__getitem__,
                         key=f"status_{ev.id}_{ath.id}",
                         horizontal=True,
                     )
 
                     skis_flag = st.checkbox(
-                        "Sci in ski-room",
+                        t("attendance.skiroom"),
                         value=att.skis_in_skiroom,
                         key=f"skiroom_{ev.id}_{ath.id}",
                     )
@@ -136,13 +154,13 @@ def _render_events_tab(db: Session, user: User, athletes, cat_ids, cat_map):
                 if is_race:
                     with col2:
                         car_flag = st.checkbox(
-                            "Automunito (per questa gara)",
+                            t("attendance.car"),
                             value=att.car_available,
                             key=f"car_{ev.id}_{ath.id}",
                         )
                         if car_flag:
                             car_seats = st.number_input(
-                                "Posti liberi auto",
+                                t("attendance.seats"),
                                 min_value=0,
                                 max_value=8,
                                 step=1,
@@ -153,39 +171,44 @@ def _render_events_tab(db: Session, user: User, athletes, cat_ids, cat_map):
                             car_seats = 0
                 else:
                     with col2:
-                        st.caption("Automunito non richiesto per gli allenamenti.")
-
-                if st.button("Salva", key=f"save_{ev.id}_{ath.id}"):
-                    att.status = reverse_status_map[chosen_label]
-                    att.skis_in_skiroom = skis_flag
-                    if is_race:
-                        att.car_available = car_flag
-                        att.car_seats = car_seats
-                    else:
-                        att.car_available = False
-                        att.car_seats = 0
+                        st.caption(t("attendance.car_not_needed"))
+
+                if st.button(t("save"), key=f"save_{ev.id}_{ath.id}"):
+                    # commit senza far scadere le altre righe già caricate:
+                    # si rilegge solo questa (version calcolata dal database)
+                    with unit_of_work(db):
+                        att.status = chosen_status
+                        att.skis_in_skiroom = skis_flag
+                        if is_race:
+                            att.car_available = car_flag
+                            att.car_seats = car_seats
+                        else:
+                            att.car_available = False
+                            att.car_seats = 0
 
-                    att.updated_by = user.id
-                    att.updated_at = datetime.utcnow()
+                        # updated_at e change_seq li aggiorna l'UPDATE
+                        att.updated_by = user.id
 
-                    db.commit()
-                    st.success("Dati aggiornati per questo atleta.")
+                    st.success(t("attendance.saved"))
 
             st.markdown("---")
 
 
-def _render_messages_tab(db: Session, user: User):
-    st.subheader("Messaggi dallo staff")
-    st.info("In questa versione demo i messaggi sono ancora in sola lettura / placeholder.")
+def _render_messages_tab(db: Session, user: Principal):
+    t = translator(user.language)
+    st.subheader(t("parent.messages"))
+    st.info(t("parent.messages_placeholder"))
 
 
-def _render_reports_tab(db: Session, user: User):
-    st.subheader("Report personali atleta")
-    st.info("In questa versione demo i report sono ancora in sola lettura / placeholder.")
+def _render_reports_tab(db: Session, user: Principal):
+    t = translator(user.language)
+    st.subheader(t("parent.reports"))
+    st.info(t("parent.reports_placeholder"))
 
 
-def _render_settings_tab(db: Session, user: User):
-    st.subheader("Impostazioni notifiche")
+def _render_settings_tab(db: Session, user: Principal):
+    t = translator(user.language)
+    st.subheader(t("settings.header"))
 
     existing = (
         db.query(DeviceToken)
@@ -196,21 +219,18 @@ def _render_settings_tab(db: Session, user: User):
 
     current_token = existing.token if existing else ""
 
-    st.write(
-        "Incolla qui il **device token FCM** che hai ottenuto dalla pagina "
-        "`token.html`. Questo collega il tuo telefono alle notifiche dello Sci Club."
-    )
+    st.write(t("settings.intro"))
 
     token_input = st.text_area(
-        "FCM device token",
+        t("settings.token"),
         value=current_token,
         height=120,
     )
 
-    if st.button("Salva token"):
+    if st.button(t("settings.save_token")):
         token_str = token_input.strip()
         if not token_str:
-            st.warning("Inserisci un token valido prima di salvare.")
+            st.warning(t("settings.token_missing"))
             return
 
         if existing:
@@ -225,22 +245,23 @@ def _render_settings_tab(db: Session, user: User):
                 )
             )
         db.commit()
-        st.success("Token salvato. Questo dispositivo ora può ricevere notifiche push.")
+        st.success(t("settings.token_saved"))
 
 
-def render_parent_dashboard(db: Session, user: User):
-    st.header("Pannello Genitore")
+def render_parent_dashboard(db: Session, user: Principal):
+    t = translator(user.language)
+    st.header(t("parent.header"))
 
     athletes, cat_ids, cat_map = _load_family_data(db, user)
     if not athletes:
-        st.info("Nessun atleta collegato a questo genitore.")
+        st.info(t("parent.no_athletes"))
         return
 
-    st.subheader("I tuoi atleti")
+    st.subheader(t("parent.your_athletes"))
     st.write(", ".join(a.name for a in athletes))
 
     tab_eventi, tab_messaggi, tab_report, tab_impostazioni = st.tabs(
-        ["Eventi", "Messaggi", "Report", "Impostazioni"]
+        [t(f"parent.tab.{tab}") for tab in ("events", "messages", "reports", "settings")]
     )
 
     with tab_eventi:
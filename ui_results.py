@@ -0,0 +1,157 @@
+# ui_results.py
+# Sezione risultati gare e classifiche di stagione condivisa da pannello
+# Allenatore e Admin.
+
+from __future__ import annotations
+
+from datetime import date
+from typing import Optional, Sequence
+
+import streamlit as st
+from sqlalchemy.orm import Session
+
+from core.analytics import available_seasons
+from core.archive import season_label, season_of
+from core.i18n import Translator, translator
+from core.read_models import CategoryRow
+from core.results import (
+    format_time,
+    import_race_results,
+    iter_results_file,
+    past_races,
+    race_results,
+    season_standings,
+)
+
+
+def _render_race(
+    db: Session, categories: Sequence[CategoryRow], key_prefix: str, t: Translator
+):
+    names = {c.id: c.name for c in categories}
+    races = past_races(db, list(names))
+    if not races:
+        st.info(t("results.no_races"))
+        return
+
+    race = st.selectbox(
+        t("event.race"),
+        options=races,
+        format_func=lambda r: (
+            f"{r.date} · {r.title} ({names.get(r.category_id, '-')})"
+            + (t("results.count", count=r.results) if r.results else "")
+        ),
+        key=f"{key_prefix}_race",
+    )
+
+    st.caption(t("results.file_help"))
+    uploaded = st.file_uploader(
+        t("results.file"), type=["csv", "xml"], key=f"{key_prefix}_file"
+    )
+    if uploaded is not None and st.button(t("results.upload"), key=f"{key_prefix}_import"):
+        try:
+            report = import_race_results(
+                db, race.id, iter_results_file(uploaded.name, uploaded)
+            )
+        except Exception as exc:
+            st.error(t("results.failed", error=exc))
+        else:
+            st.success(
+                t("results.imported", rows=report.rows, imported=report.imported)
+            )
+            if report.unmatched:
+                st.caption(
+                    t("results.unmatched", count=len(report.unmatched))
+                    + ", ".join(report.unmatched[:20])
+                    + (" …" if len(report.unmatched) > 20 else "")
+                )
+            for line, message in report.errors[:50]:
+                st.warning(t("results.row_error", line=line, message=message))
+
+    rows = race_results(db, race.id)
+    if not rows:
+        st.info(t("results.none"))
+        return
+    rank, bib, name, run1, run2, total, points = (
+        t(f"results.col.{c}") for c in ("rank", "bib", "name", "run1", "run2", "total", "points")
+    )
+    st.dataframe(
+        [
+            {
+                rank: r.rank,
+                bib: r.bib,
+                name: r.name + ("" if r.athlete_id is None else " ⭐"),
+                run1: format_time(r.run1_ms),
+                run2: format_time(r.run2_ms),
+                total: format_time(r.total_ms) if r.status == "OK" else r.status,
+                points: r.points,
+            }
+            for r in rows
+        ],
+        hide_index=True,
+        use_container_width=True,
+    )
+    st.caption(t("results.club_athletes"))
+
+
+def _render_standings(
+    db: Session, categories: Sequence[CategoryRow], key_prefix: str, t: Translator
+):
+    col_season, col_category = st.columns(2)
+    season = col_season.selectbox(
+        t("field.season"),
+        options=available_seasons(db),
+        index=0,
+        format_func=season_label,
+        key=f"{key_prefix}_season",
+    )
+    category = col_category.selectbox(
+        t("field.category"),
+        options=list(categories),
+        format_func=lambda c: c.name,
+        key=f"{key_prefix}_category",
+    )
+    if category is None:
+        return
+
+    rows = season_standings(db, season or season_of(date.today()), category.id)
+    if not rows:
+        st.info(t("results.no_points"))
+        return
+    rank, athlete, points, races, wins, podiums = (
+        t("results.col.rank"), t("col.athlete"), t("results.col.points"),
+        t("results.col.races"), t("results.col.wins"), t("results.col.podiums"),
+    )
+    st.dataframe(
+        [
+            {
+                rank: r.rank,
+                athlete: r.athlete_name,
+                points: r.points,
+                races: r.races,
+                wins: r.wins,
+                podiums: r.podiums,
+            }
+            for r in rows
+        ],
+        hide_index=True,
+        use_container_width=True,
+    )
+
+
+def render_results_section(
+    db: Session,
+    categories: Sequence[CategoryRow],
+    key_prefix: str,
+    language: Optional[str] = None,
+):
+    """Risultati delle gare delle categorie e classifiche di stagione."""
+    t = translator(language)
+    if not categories:
+        st.info(t("results.no_categories"))
+        return
+
+    st.markdown(f"**{t('results.race_header')}**")
+    _render_race(db, categories, key_prefix, t)
+
+    st.markdown(f"**{t('results.standings_header')}**")
+    _render_standings(db, categories, key_prefix, t)